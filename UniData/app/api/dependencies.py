@@ -1,4 +1,27 @@
 """Shared dependencies for API."""
-from app.core.database import get_db
+from typing import AsyncGenerator
 
-__all__ = ["get_db"]
\ No newline at end of file
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import AppIdentity, get_current_app
+from app.core.database import get_db, shard_session
+from app.services.shard_service import shard_service
+
+
+async def get_app_db(
+    request: Request,
+    current_app: AppIdentity = Depends(get_current_app),
+) -> AsyncGenerator[AsyncSession, None]:
+    """当前应用所在分片的数据库会话，用于读写文档数据的接口。
+
+    应用迁移切换期间，非 GET 请求返回 503。
+    """
+    shard = await shard_service.shard_for_app(
+        current_app.app_name, write=request.method not in ("GET", "HEAD")
+    )
+    async with shard_session(shard) as session:
+        yield session
+
+
+__all__ = ["get_db", "get_app_db"]
@@ -2,5 +2,7 @@
 from app.api.v1.endpoints.auth import router as auth_router
 from app.api.v1.endpoints.testcases import router as testcases_router
 from app.api.v1.endpoints.documents import router as documents_router
+from app.api.v1.endpoints.admin import router as admin_router
+from app.api.v1.endpoints.stats import router as stats_router
 
-__all__ = ["auth_router", "testcases_router", "documents_router"]
+__all__ = ["auth_router", "testcases_router", "documents_router", "admin_router", "stats_router"]
@@ -0,0 +1,209 @@
+"""管理类 API 端点模块。
+
+所有接口都要求调用方令牌带有 admin scope（见 app.core.auth.get_admin_app）。
+"""
+import asyncio
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import AppIdentity, get_admin_app
+from app.core.config import get_settings
+from app.core.database import get_db
+from app.core.profiler import profiler
+from app.core.timing import TimedRoute
+from app.models.collection_index import CollectionIndex
+from app.schemas.collection_index import CollectionIndexCreateRequest, CollectionIndexResponse
+from app.schemas.memory import MemoryStatsResponse, SnapshotResponse, TracemallocStatusResponse
+from app.schemas.stats import AppQuotaRequest, AppQuotaResponse, AppStatsResponse
+from app.services.collection_index_service import collection_index_service
+from app.services.memory_service import memory_service
+from app.services.stats_service import stats_service
+
+router = APIRouter(route_class=TimedRoute)
+
+
+def _to_response(obj: CollectionIndex) -> CollectionIndexResponse:
+    return CollectionIndexResponse(
+        collection=obj.collection,
+        field=obj.field,
+        type=obj.field_type,
+        index_name=obj.index_name,
+        created_at=obj.created_at,
+    )
+
+
+@router.post(
+    "/collections/{collection}/indexes",
+    response_model=CollectionIndexResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="声明集合的索引字段",
+    description=(
+        "为集合的 payload 字段并发创建表达式索引（CREATE INDEX CONCURRENTLY），之后 list 接口可在该字段上做范围过滤；"
+        "search 类型建 pg_trgm 三元组索引，供 _search 接口做关键字搜索；分片未提供 pg_trgm 时返回 501。"
+    ),
+)
+async def declare_collection_index(
+    collection: str = Path(..., description="集合名称"),
+    body: CollectionIndexCreateRequest = ...,
+    db: AsyncSession = Depends(get_db),
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> CollectionIndexResponse:
+    obj = await collection_index_service.declare_index(db, collection, body.field, body.type)
+    return _to_response(obj)
+
+
+@router.get(
+    "/collections/{collection}/indexes",
+    response_model=List[CollectionIndexResponse],
+    status_code=status.HTTP_200_OK,
+    summary="列出集合已声明的索引字段",
+)
+async def list_collection_indexes(
+    collection: str = Path(..., description="集合名称"),
+    db: AsyncSession = Depends(get_db),
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> List[CollectionIndexResponse]:
+    items = await collection_index_service.list_indexes(db, collection)
+    return [_to_response(i) for i in items]
+
+
+@router.get(
+    "/stats",
+    response_model=List[AppStatsResponse],
+    status_code=status.HTTP_200_OK,
+    summary="所有应用的文档统计",
+)
+async def list_app_stats(
+    db: AsyncSession = Depends(get_db),
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> List[AppStatsResponse]:
+    items = await stats_service.get_all_stats(db)
+    return [AppStatsResponse(**i) for i in items]
+
+
+@router.put(
+    "/apps/{app_name}/quota",
+    response_model=AppQuotaResponse,
+    status_code=status.HTTP_200_OK,
+    summary="设置应用配额",
+    description="设置应用的文档数与 payload 字节数上限，字段为空表示不限制。写入超限时返回 403。",
+)
+async def set_app_quota(
+    app_name: str = Path(..., description="应用名称"),
+    body: AppQuotaRequest = ...,
+    db: AsyncSession = Depends(get_db),
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> AppQuotaResponse:
+    quota = await stats_service.set_quota(db, app_name, body.max_documents, body.max_payload_bytes)
+    return AppQuotaResponse(**quota)
+
+
+@router.post(
+    "/profile",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    summary="对当前 worker 采样分析",
+    description=(
+        "在处理该请求的 worker 上按 interval_ms 间隔采样所有线程的调用栈，持续 seconds 秒，"
+        "返回 collapsed-stack 文本（可直接用 flamegraph.pl / speedscope 生成火焰图）。"
+        "同一 worker 同时只能有一个采样器，冲突时返回 409。"
+    ),
+)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, description="采样秒数"),
+    interval_ms: int = Query(5, ge=1, le=1000, description="采样间隔（毫秒）"),
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> PlainTextResponse:
+    max_seconds = get_settings().profile_max_seconds
+    if seconds > max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"采样时间不能超过 {max_seconds} 秒",
+        )
+    sampler = profiler.start(interval_ms / 1000)
+    if sampler is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="当前 worker 已有采样器在运行",
+        )
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        collapsed = profiler.stop(sampler)
+    return PlainTextResponse(collapsed)
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_class=PlainTextResponse,
+    status_code=status.HTTP_200_OK,
+    summary="获取单个请求的采样结果",
+    description="带 X-Profile 请求头的 admin 请求会在响应头 X-Profile-Id 中返回结果 id。",
+)
+async def get_request_profile(
+    profile_id: str = Path(..., description="X-Profile-Id 响应头中的 id"),
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> PlainTextResponse:
+    collapsed = profiler.load(profile_id)
+    if collapsed is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"采样结果不存在: {profile_id}",
+        )
+    return PlainTextResponse(collapsed)
+
+
+@router.get(
+    "/memory",
+    response_model=MemoryStatsResponse,
+    status_code=status.HTTP_200_OK,
+    summary="当前 worker 的内存概况",
+    description="返回 RSS、存活的 Document/TestCase 实例数、Session identity map 大小与进程内缓存大小。会遍历整个堆，不宜高频调用。",
+)
+async def get_memory_stats(
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> MemoryStatsResponse:
+    return MemoryStatsResponse(**await memory_service.memory_stats())
+
+
+@router.post(
+    "/memory/tracemalloc/start",
+    response_model=TracemallocStatusResponse,
+    status_code=status.HTTP_200_OK,
+    summary="开启 tracemalloc",
+)
+async def start_tracemalloc(
+    frames: int = Query(1, ge=1, le=25, description="每个分配记录的栈帧数，越大开销越高"),
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> TracemallocStatusResponse:
+    return TracemallocStatusResponse(**memory_service.start_tracing(frames))
+
+
+@router.post(
+    "/memory/tracemalloc/stop",
+    response_model=TracemallocStatusResponse,
+    status_code=status.HTTP_200_OK,
+    summary="关闭 tracemalloc 并丢弃快照",
+)
+async def stop_tracemalloc(
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> TracemallocStatusResponse:
+    return TracemallocStatusResponse(**memory_service.stop_tracing())
+
+
+@router.post(
+    "/memory/snapshot",
+    response_model=SnapshotResponse,
+    status_code=status.HTTP_200_OK,
+    summary="拍摄内存快照",
+    description="与上一次快照比较，返回增长最多的前 N 个代码位置；首次调用返回当前占用前 N。",
+)
+async def take_memory_snapshot(
+    top: int = Query(20, ge=1, le=200, description="返回条数"),
+    group_by: str = Query("lineno", description="分组方式：lineno / filename"),
+    admin_app: AppIdentity = Depends(get_admin_app),
+) -> SnapshotResponse:
+    return SnapshotResponse(**await memory_service.take_snapshot(top, group_by))
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import generate_jwt
 from app.core.database import get_db
+from app.core.timing import TimedRoute
 from app.services.token_service import token_service
 
 
@@ -32,7 +33,7 @@ class TokenRecord(BaseModel):
     created_at: str
 
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post(
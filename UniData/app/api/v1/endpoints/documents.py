@@ -2,20 +2,47 @@
 
 支持通过 /{collection} 路径管理任意类型的文档（Requirements, Bugs, UserSettings 等）。
 """
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Path, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Path, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.dependencies import get_app_db
 from app.core.auth import AppIdentity, get_current_app
 from app.core.database import get_db
+from app.core.timing import TimedRoute
 from app.schemas.document import (
+    BulkDeleteResponse,
+    CollectionProjectionRequest,
+    CollectionProjectionResponse,
+    CollectionSchemaRequest,
+    CollectionSchemaResponse,
+    DocumentBulkDeleteRequest,
+    DocumentBulkUpsertRequest,
+    DocumentBulkUpsertResponse,
+    DocumentChangesResponse,
     DocumentCreateRequest,
+    DocumentDeleteByQueryRequest,
+    DocumentFacetsResponse,
+    DocumentMultiGetRequest,
+    DocumentMultiGetResponse,
     DocumentResponse,
+    DocumentSearchRequest,
+    DocumentSearchResponse,
 )
+from app.models.collection_projection import CollectionProjection
+from app.models.collection_schema import CollectionSchema
+from app.services.change_feed_service import change_feed_service
+from app.services.collection_projection_service import collection_projection_service
+from app.services.collection_schema_service import collection_schema_service
 from app.services.document_service import document_service
+from app.services.export_service import EXPORT_FORMATS, export_service
+from app.services.facet_service import facet_service
+from app.services.search_service import search_service
+from app.services.write_spool import OP_DELETE, OP_UPSERT, QUEUED, write_spool
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post(
@@ -23,12 +50,16 @@ router = APIRouter()
     response_model=DocumentResponse,
     status_code=status.HTTP_201_CREATED,
     summary="创建/更新通用文档",
-    description="向指定集合（collection）中插入或更新文档。请求体必须包含 'id'。",
+    description=(
+        "向指定集合（collection）中插入或更新文档。请求体必须包含 'id'。"
+        "开启写入暂存且数据库暂不可用时返回 202（status=queued），数据库恢复后按顺序写入。"
+    ),
 )
 async def upsert_document(
+    response: Response,
     collection: str = Path(..., description="集合名称，如 requirements, bugs"),
     body: DocumentCreateRequest = ...,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_app_db),
     current_app: AppIdentity = Depends(get_current_app),
 ) -> DocumentResponse:
     if " " in collection:
@@ -39,31 +70,412 @@ async def upsert_document(
 
     payload = body.model_dump()
     
-    # 执行业务逻辑
-    id_value = await document_service.upsert_document(
-        db, 
-        collection=collection, 
-        payload=payload, 
-        app_name=current_app.app_name
+    # 执行业务逻辑（数据库不可用时进入写入暂存）
+    id_value = await write_spool.run(
+        db,
+        collection,
+        current_app.app_name,
+        OP_UPSERT,
+        [payload],
+        lambda: document_service.upsert_document(
+            db, 
+            collection=collection, 
+            payload=payload, 
+            app_name=current_app.app_name
+        ),
     )
+    if id_value is QUEUED:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return DocumentResponse(status="queued", id=str(payload["id"]), collection=collection)
 
     return DocumentResponse(status="success", id=id_value, collection=collection)
 
 
+@router.post(
+    "/{collection}/_mget",
+    response_model=DocumentMultiGetResponse,
+    status_code=status.HTTP_200_OK,
+    summary="批量获取文档",
+    description="按 ID 列表一次性获取多个文档（单条 SQL），结果按请求顺序返回，并列出不存在的 ID。支持 fields 投影。",
+)
+async def mget_documents(
+    collection: str = Path(..., description="集合名称"),
+    body: DocumentMultiGetRequest = ...,
+    db: AsyncSession = Depends(get_app_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> DocumentMultiGetResponse:
+    docs, missing = await document_service.get_documents(db, collection, body.ids, fields=body.fields)
+    return DocumentMultiGetResponse(docs=docs, missing=missing)
+
+
+@router.post(
+    "/{collection}/_search",
+    response_model=DocumentSearchResponse,
+    status_code=status.HTTP_200_OK,
+    summary="数据库关键字搜索",
+    description=(
+        "不经过 Meilisearch，直接在数据库中搜索当前应用的文档，请求与响应字段与搜索网关一致，"
+        "供 Meilisearch 不可用或同步滞后时回退。关键字匹配 id（完全相同）与集合声明的 search 字段（包含，忽略大小写），"
+        "按匹配程度与更新时间排序；prefix 为 true 时按 ID 前缀查找。"
+    ),
+)
+async def search_documents(
+    collection: str = Path(..., description="集合名称"),
+    body: DocumentSearchRequest = ...,
+    db: AsyncSession = Depends(get_app_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> DocumentSearchResponse:
+    result = await search_service.search(
+        db,
+        collection,
+        current_app.app_name,
+        body.q,
+        offset=body.offset,
+        limit=body.limit,
+        attributes=body.attributesToSearchOn,
+        prefix=body.prefix,
+    )
+    return DocumentSearchResponse(**result)
+
+
+@router.post(
+    "/{collection}/_bulk_delete",
+    response_model=BulkDeleteResponse,
+    status_code=status.HTTP_200_OK,
+    summary="按 ID 批量删除文档",
+    description=(
+        "按 ID 列表软删除当前应用的文档（分块执行的集合式 UPDATE），返回实际删除的行数。"
+        "进入写入暂存时返回 202（status=queued，deleted 为 0）。"
+    ),
+)
+async def bulk_delete_documents(
+    response: Response,
+    collection: str = Path(..., description="集合名称"),
+    body: DocumentBulkDeleteRequest = ...,
+    current_app: AppIdentity = Depends(get_current_app),
+) -> BulkDeleteResponse:
+    deleted = await write_spool.run(
+        None,
+        collection,
+        current_app.app_name,
+        OP_DELETE,
+        body.ids,
+        lambda: document_service.bulk_delete_documents(collection, body.ids, current_app.app_name),
+    )
+    if deleted is QUEUED:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return BulkDeleteResponse(status="queued", deleted=0)
+    return BulkDeleteResponse(status="success", deleted=deleted)
+
+
+@router.post(
+    "/{collection}/_delete_by_query",
+    response_model=BulkDeleteResponse,
+    status_code=status.HTTP_200_OK,
+    summary="按条件批量删除文档",
+    description=(
+        "按 payload 条件软删除当前应用的文档，过滤语法与列表接口相同，"
+        "filter 与 contains 至少提供一个。返回实际删除的行数。"
+    ),
+)
+async def delete_documents_by_query(
+    collection: str = Path(..., description="集合名称"),
+    body: DocumentDeleteByQueryRequest = ...,
+    db: AsyncSession = Depends(get_app_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> BulkDeleteResponse:
+    deleted = await document_service.delete_documents_by_query(
+        db, collection, current_app.app_name, filters=body.filter, contains=body.contains
+    )
+    return BulkDeleteResponse(status="success", deleted=deleted)
+
+
+@router.post(
+    "/{collection}/_bulk",
+    response_model=DocumentBulkUpsertResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="批量创建/更新文档",
+    description=(
+        "一次写入最多 1000 个文档（单条 INSERT ... ON CONFLICT）。"
+        "整批先按集合 schema 校验，任一文档不合法时整批拒绝，返回每个错误的 index/id/error。"
+        "进入写入暂存时返回 202（status=queued），schema 等校验推迟到重放时进行。"
+    ),
+)
+async def bulk_upsert_documents(
+    response: Response,
+    collection: str = Path(..., description="集合名称"),
+    body: DocumentBulkUpsertRequest = ...,
+    db: AsyncSession = Depends(get_app_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> DocumentBulkUpsertResponse:
+    if " " in collection:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="collection 名称不能包含空格",
+        )
+    ids = await write_spool.run(
+        db,
+        collection,
+        current_app.app_name,
+        OP_UPSERT,
+        body.docs,
+        lambda: document_service.upsert_documents(
+            db, collection=collection, payloads=body.docs, app_name=current_app.app_name
+        ),
+    )
+    if ids is QUEUED:
+        response.status_code = status.HTTP_202_ACCEPTED
+        ids = list(dict.fromkeys(str(doc["id"]) for doc in body.docs))
+        return DocumentBulkUpsertResponse(status="queued", collection=collection, ids=ids)
+    return DocumentBulkUpsertResponse(status="success", collection=collection, ids=ids)
+
+
+def _schema_response(obj: CollectionSchema) -> CollectionSchemaResponse:
+    return CollectionSchemaResponse(
+        collection=obj.collection,
+        app_name=obj.app_name,
+        json_schema=obj.schema,
+        version=obj.version,
+        updated_at=obj.updated_at,
+    )
+
+
+@router.put(
+    "/{collection}/_schema",
+    response_model=CollectionSchemaResponse,
+    status_code=status.HTTP_200_OK,
+    summary="注册集合 JSON Schema",
+    description="注册或替换当前应用在集合上的 JSON Schema，之后该应用写入该集合的文档都会按它校验，不影响其他应用的写入。",
+)
+async def put_collection_schema(
+    collection: str = Path(..., description="集合名称"),
+    body: CollectionSchemaRequest = ...,
+    db: AsyncSession = Depends(get_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> CollectionSchemaResponse:
+    obj = await collection_schema_service.register_schema(db, collection, body.json_schema, current_app)
+    return _schema_response(obj)
+
+
+@router.get(
+    "/{collection}/_schema",
+    response_model=CollectionSchemaResponse,
+    status_code=status.HTTP_200_OK,
+    summary="获取集合 JSON Schema",
+)
+async def get_collection_schema(
+    collection: str = Path(..., description="集合名称"),
+    db: AsyncSession = Depends(get_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> CollectionSchemaResponse:
+    obj = await collection_schema_service.get_schema(db, collection, current_app)
+    return _schema_response(obj)
+
+
+@router.delete(
+    "/{collection}/_schema",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="删除集合 JSON Schema",
+)
+async def delete_collection_schema(
+    collection: str = Path(..., description="集合名称"),
+    db: AsyncSession = Depends(get_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> None:
+    await collection_schema_service.delete_schema(db, collection, current_app)
+
+
+def _projection_response(obj: CollectionProjection) -> CollectionProjectionResponse:
+    return CollectionProjectionResponse(
+        collection=obj.collection,
+        app_name=obj.app_name,
+        fields=obj.fields,
+        version=obj.version,
+        updated_at=obj.updated_at,
+    )
+
+
+@router.put(
+    "/{collection}/_projection",
+    response_model=CollectionProjectionResponse,
+    status_code=status.HTTP_200_OK,
+    summary="声明集合搜索投影",
+    description=(
+        "声明集合中需要搜索或展示的字段，之后写入的文档会把这些字段存入 search_doc，"
+        "CDC 与 Meilisearch 只同步 search_doc。已有文档需运行 scripts/backfill_search_doc.py 重算。"
+        "投影按应用各自声明，只作用于当前应用写入的文档。"
+    ),
+)
+async def put_collection_projection(
+    collection: str = Path(..., description="集合名称"),
+    body: CollectionProjectionRequest = ...,
+    db: AsyncSession = Depends(get_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> CollectionProjectionResponse:
+    obj = await collection_projection_service.register_projection(db, collection, body.fields, current_app)
+    return _projection_response(obj)
+
+
+@router.get(
+    "/{collection}/_projection",
+    response_model=CollectionProjectionResponse,
+    status_code=status.HTTP_200_OK,
+    summary="获取集合搜索投影",
+)
+async def get_collection_projection(
+    collection: str = Path(..., description="集合名称"),
+    db: AsyncSession = Depends(get_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> CollectionProjectionResponse:
+    obj = await collection_projection_service.get_projection(db, collection, current_app)
+    return _projection_response(obj)
+
+
+@router.delete(
+    "/{collection}/_projection",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="删除集合搜索投影",
+    description="删除当前应用的投影，之后该应用新写入的文档 search_doc 为 NULL，同步服务回退到完整 payload。",
+)
+async def delete_collection_projection(
+    collection: str = Path(..., description="集合名称"),
+    db: AsyncSession = Depends(get_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> None:
+    await collection_projection_service.delete_projection(db, collection, current_app)
+
+
+@router.get(
+    "/{collection}/_changes",
+    response_model=DocumentChangesResponse,
+    status_code=status.HTTP_200_OK,
+    summary="增量变更订阅",
+    description=(
+        "按提交顺序（写入事务号, id）返回当前应用在该集合下的变更（含删除），晚提交的写入不会被跳过。"
+        "将响应中的 cursor 作为下一次请求的 since 即可续传；同一文档可能重复返回（至少一次），"
+        "旧版本的 cursor 返回 400，需不带 since 重新拉取；"
+        "传入 wait 时，没有新变更会长轮询等待，直到有变更或超时。"
+    ),
+)
+async def get_document_changes(
+    collection: str = Path(..., description="集合名称"),
+    since: Optional[str] = Query(None, description="上一次响应返回的 cursor，不传时从头开始"),
+    limit: int = Query(100, ge=1, le=1000),
+    wait: int = Query(0, ge=0, le=60, description="没有变更时最多等待的秒数"),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> DocumentChangesResponse:
+    result = await change_feed_service.get_changes(
+        collection, current_app.app_name, since=since, limit=limit, wait=wait
+    )
+    return DocumentChangesResponse(**result)
+
+
+@router.get(
+    "/{collection}/_stream",
+    status_code=status.HTTP_200_OK,
+    summary="变更推送（SSE）",
+    description=(
+        "以 Server-Sent Events 推送当前应用在该集合下的 upsert/delete 通知（只含 id）。"
+        "收到 resync 事件表示可能漏掉了通知（客户端过慢或服务重连），应重新拉取列表。"
+    ),
+    response_class=StreamingResponse,
+)
+async def stream_document_changes(
+    collection: str = Path(..., description="集合名称"),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> StreamingResponse:
+    return StreamingResponse(
+        change_feed_service.open_stream(collection, current_app.app_name),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/{collection}/_facets",
+    response_model=DocumentFacetsResponse,
+    status_code=status.HTTP_200_OK,
+    summary="字段取值分布",
+    description=(
+        "统计当前应用在该集合下各字段的取值及文档数（field 可重复，数组字段按元素计数），"
+        "用于筛选侧边栏。支持与列表接口相同的 filter / contains 过滤。"
+        "结果按集合的写入版本缓存，没有新写入时不会重新扫描。"
+    ),
+)
+async def get_document_facets(
+    collection: str = Path(..., description="集合名称"),
+    field: List[str] = Query(..., description="要统计的字段路径，如 status、owner.name，可重复"),
+    size: int = Query(10, ge=1, le=100, description="每个字段最多返回的取值数"),
+    filter: Optional[List[str]] = Query(None, description="过滤条件 field:op:value，op 可选 eq/in/gt/gte/lt/lte，可重复"),
+    contains: Optional[str] = Query(None, description="JSON 对象，按 payload 包含关系过滤"),
+    include_archived: bool = Query(False, description="是否包含已归档的冷文档"),
+    db: AsyncSession = Depends(get_app_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> DocumentFacetsResponse:
+    result = await facet_service.get_facets(
+        db,
+        collection,
+        current_app.app_name,
+        field,
+        size=size,
+        filters=filter,
+        contains=contains,
+        include_archived=include_archived,
+    )
+    return DocumentFacetsResponse(**result)
+
+
+@router.get(
+    "/{collection}/_export",
+    status_code=status.HTTP_200_OK,
+    summary="列式导出集合",
+    description=(
+        "以 Parquet（默认）或 Arrow IPC 流导出当前应用在该集合下的全部未删除文档，"
+        "服务端游标分批读取，内存占用与集合大小无关。固定包含 id 与 _updated_at 列；"
+        "columns 形如 status,priority:int64,owner.name，类型可选 string/int64/float64/bool/timestamp/json，"
+        "不传时按最近更新的文档推断。需要服务端安装 pyarrow，否则返回 501。"
+    ),
+    response_class=StreamingResponse,
+)
+async def export_documents(
+    collection: str = Path(..., description="集合名称"),
+    format: str = Query("parquet", description="导出格式：parquet 或 arrow"),
+    columns: Optional[str] = Query(None, description="逗号分隔的 field[:type]，不传时自动推断"),
+    include_archived: bool = Query(True, description="是否包含已归档的冷文档"),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> StreamingResponse:
+    media_type, chunks = await export_service.open_export(
+        collection, current_app.app_name, format, columns, include_archived
+    )
+    filename = f"{collection}.{EXPORT_FORMATS[format][1]}"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get(
     "/{collection}/{id}",
     response_model=Dict[str, Any], # 直接返回 payload 内容
     status_code=status.HTTP_200_OK,
     summary="获取文档详情",
-    description="根据集合和 ID 获取文档完整内容。",
+    description=(
+        "根据集合和 ID 获取文档完整内容。传入 fields 时只返回指定字段（支持 owner.name 形式的嵌套路径）。"
+        "外置的大字段默认以 {\"$blob\": hash, \"$size\": 字节数} 引用返回，resolve_blobs=true 时取回原值。"
+    ),
 )
 async def get_document(
     collection: str = Path(..., description="集合名称"),
     id: str = Path(..., description="文档 ID"),
-    db: AsyncSession = Depends(get_db),
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,name,status"),
+    resolve_blobs: bool = Query(False, description="是否把外置大字段的引用替换为原值"),
+    db: AsyncSession = Depends(get_app_db),
     current_app: AppIdentity = Depends(get_current_app),
 ) -> Dict[str, Any]:
-    doc = await document_service.get_document(db, collection, id)
+    doc = await document_service.get_document(
+        db, collection, id, fields=fields, resolve_blobs=resolve_blobs
+    )
     return doc
 
 
@@ -72,15 +484,26 @@ async def get_document(
     response_model=DocumentResponse,
     status_code=status.HTTP_200_OK,
     summary="删除文档",
-    description="软删除指定文档。",
+    description="软删除指定文档。进入写入暂存时返回 202（status=queued），不再检查文档是否存在。",
 )
 async def delete_document(
+    response: Response,
     collection: str = Path(..., description="集合名称"),
     id: str = Path(..., description="文档 ID"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_app_db),
     current_app: AppIdentity = Depends(get_current_app),
 ) -> DocumentResponse:
-    await document_service.delete_document(db, collection, id)
+    result = await write_spool.run(
+        db,
+        collection,
+        current_app.app_name,
+        OP_DELETE,
+        [id],
+        lambda: document_service.delete_document(db, collection, id),
+    )
+    if result is QUEUED:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return DocumentResponse(status="queued", id=id, collection=collection)
     return DocumentResponse(status="success", id=id, collection=collection)
 
 
@@ -89,13 +512,22 @@ async def delete_document(
     response_model=List[Dict[str, Any]],
     status_code=status.HTTP_200_OK,
     summary="列出集合文档",
-    description="分页列出指定集合下的文档。默认只返回当前应用的文档。",
+    description=(
+        "分页列出指定集合下的文档。默认只返回当前应用的文档。"
+        "支持在数据库侧按 payload 字段过滤：filter=status:eq:open、filter=priority:gte:3、"
+        "filter=status:in:open,closed，或 contains={\"owner\":\"qa\"}。"
+        "范围过滤仅支持通过管理接口声明过索引的字段。传入 fields 时只返回指定字段。"
+    ),
 )
 async def list_documents(
     collection: str = Path(..., description="集合名称"),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: AsyncSession = Depends(get_db),
+    filter: Optional[List[str]] = Query(None, description="过滤条件 field:op:value，op 可选 eq/in/gt/gte/lt/lte，可重复"),
+    contains: Optional[str] = Query(None, description="JSON 对象，按 payload 包含关系过滤"),
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，如 id,name,status"),
+    include_archived: bool = Query(False, description="是否包含已归档的冷文档（默认只查热表）"),
+    db: AsyncSession = Depends(get_app_db),
     current_app: AppIdentity = Depends(get_current_app),
 ) -> List[Dict[str, Any]]:
     # 这里默认只看自己应用的文档，如果需要跨应用查看，需要更高权限
@@ -104,6 +536,10 @@ async def list_documents(
         collection=collection, 
         app_name=current_app.app_name, 
         limit=limit, 
-        offset=offset
+        offset=offset,
+        filters=filter,
+        contains=contains,
+        fields=fields,
+        include_archived=include_archived,
     )
     return docs
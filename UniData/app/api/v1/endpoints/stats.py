@@ -0,0 +1,29 @@
+"""文档统计 API 端点模块。
+
+统计数据来自增量维护的计数表，不对 uni_documents 做全表 COUNT(*)。
+"""
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies import get_app_db
+from app.core.auth import AppIdentity, get_current_app
+from app.core.timing import TimedRoute
+from app.schemas.stats import AppStatsResponse
+from app.services.stats_service import stats_service
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get(
+    "",
+    response_model=AppStatsResponse,
+    status_code=status.HTTP_200_OK,
+    summary="当前应用的文档统计",
+    description="返回当前应用各集合的未删除文档数、payload 字节数、合计以及配额。",
+)
+async def get_app_stats(
+    db: AsyncSession = Depends(get_app_db),
+    current_app: AppIdentity = Depends(get_current_app),
+) -> AppStatsResponse:
+    stats = await stats_service.get_app_stats(db, current_app.app_name)
+    return AppStatsResponse(**stats)
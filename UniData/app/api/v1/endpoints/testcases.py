@@ -15,15 +15,19 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.auth import AppIdentity, get_current_app
 from app.core.config import get_settings
 from app.core.database import get_db
+from app.core.timing import TimedRoute
 from app.schemas.testcase import (
     MeiliEndpointResponse,
+    TestCaseBulkDeleteRequest,
+    TestCaseBulkDeleteResponse,
     TestCaseCreateRequest,
+    TestCaseDeleteByQueryRequest,
     TestCaseResponse,
     TestCaseUpdateRequest,
 )
 from app.services.testcase_service import testcase_service
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post(
@@ -51,6 +55,39 @@ async def create_test_case(
     return TestCaseResponse(status="success", id=id_value)
 
 
+@router.post(
+    "/_bulk_delete",
+    response_model=TestCaseBulkDeleteResponse,
+    status_code=status.HTTP_200_OK,
+    summary="按 ID 批量删除测试用例",
+    description="按 ID 列表软删除当前应用的测试用例，返回实际删除的行数。",
+)
+async def bulk_delete_test_cases(
+        body: TestCaseBulkDeleteRequest,
+        current_app: AppIdentity = Depends(get_current_app),
+) -> TestCaseBulkDeleteResponse:
+    # 只会删除 payload.app_name 属于当前应用的用例，其他应用的 ID 会被忽略。
+    deleted = await testcase_service.bulk_delete_test_cases(body.ids, current_app.app_name)
+    return TestCaseBulkDeleteResponse(status="success", deleted=deleted)
+
+
+@router.post(
+    "/_delete_by_query",
+    response_model=TestCaseBulkDeleteResponse,
+    status_code=status.HTTP_200_OK,
+    summary="按条件批量删除测试用例",
+    description="按 payload 条件（filter=field:eq:value / field:in:a,b，或 contains）软删除当前应用的测试用例。",
+)
+async def delete_test_cases_by_query(
+        body: TestCaseDeleteByQueryRequest,
+        current_app: AppIdentity = Depends(get_current_app),
+) -> TestCaseBulkDeleteResponse:
+    deleted = await testcase_service.delete_test_cases_by_query(
+        current_app.app_name, filters=body.filter, contains=body.contains
+    )
+    return TestCaseBulkDeleteResponse(status="success", deleted=deleted)
+
+
 @router.put(
     "/{id}",
     response_model=TestCaseResponse,
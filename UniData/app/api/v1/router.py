@@ -3,7 +3,13 @@
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth_router, testcases_router, documents_router
+from app.api.v1.endpoints import (
+    auth_router,
+    testcases_router,
+    documents_router,
+    admin_router,
+    stats_router,
+)
 
 api_router = APIRouter()
 
@@ -28,3 +34,15 @@ api_router.include_router(
     prefix="/data",
     tags=["generic-data"],
 )
+
+api_router.include_router(
+    admin_router,
+    prefix="/admin",
+    tags=["admin"],
+)
+
+api_router.include_router(
+    stats_router,
+    prefix="/stats",
+    tags=["stats"],
+)
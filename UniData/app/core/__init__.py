@@ -1,12 +1,21 @@
 """核心模块。"""
 from app.core.config import Settings, get_settings
-from app.core.database import get_db, get_db_context, close_db, engine
+from app.core.database import (
+    get_db,
+    get_db_context,
+    get_autocommit_conn,
+    create_listen_connection,
+    close_db,
+    engine,
+)
 
 __all__ = [
     "Settings",
     "get_settings",
     "get_db",
     "get_db_context",
+    "get_autocommit_conn",
+    "create_listen_connection",
     "close_db",
     "engine",
 ]
\ No newline at end of file
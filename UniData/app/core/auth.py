@@ -13,9 +13,10 @@ import time
 from dataclasses import dataclass
 from typing import List, Optional
 
-from fastapi import Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 
 from app.core.config import get_settings
+from app.core.timing import measure
 
 
 @dataclass
@@ -37,10 +38,19 @@ def _base64url_encode(data: bytes) -> str:
     return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
 
 
+def _token_scopes(payload: dict) -> List[str]:
+    """读取令牌中的 scopes（或 scope），字符串（空格分隔）与列表统一归一化为 List[str]。"""
+    scopes_raw = payload.get("scopes") or payload.get("scope") or []
+    if isinstance(scopes_raw, str):
+        return [s for s in scopes_raw.split() if s]
+    if isinstance(scopes_raw, list):
+        return [str(s) for s in scopes_raw]
+    return []
+
+
 def generate_jwt(app_name: str, scopes: List[str], ttl_seconds: int) -> str:
     settings = get_settings()
     secret = settings.jwt_secret
-    print(secret)
     header = {"alg": "HS256", "typ": "JWT"}
     payload = {
         "app_name": app_name,
@@ -163,7 +173,8 @@ async def get_current_app(
     settings = get_settings()
     secret = settings.jwt_secret
 
-    payload = _decode_jwt(token, secret=secret, algorithms=["HS256"])
+    with measure("auth"):
+        payload = _decode_jwt(token, secret=secret, algorithms=["HS256"])
 
     # 从 payload 中提取应用名称
     app_name = payload.get("app_name") or payload.get("sub")
@@ -180,13 +191,51 @@ async def get_current_app(
             detail="令牌与头部应用名称不匹配",
         )
 
-    # scopes 可以是字符串（空格分隔）或列表，这里统一归一化为 List[str]
-    scopes_raw = payload.get("scopes") or payload.get("scope") or []
-    if isinstance(scopes_raw, str):
-        scopes = [s for s in scopes_raw.split() if s]
-    elif isinstance(scopes_raw, list):
-        scopes = [str(s) for s in scopes_raw]
-    else:
-        scopes = []
+    return AppIdentity(app_name=app_name, scopes=_token_scopes(payload))
+
 
-    return AppIdentity(app_name=app_name, scopes=scopes)
+# 管理接口所需的 scope
+ADMIN_SCOPE = "admin"
+
+
+def is_admin_authorization(authorization: str) -> bool:
+    """判断 Authorization 头是否为有效且带 admin scope 的令牌（不抛异常）。
+
+    供中间件在依赖注入之外做权限判断。
+    """
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        payload = _decode_jwt(token, secret=get_settings().jwt_secret, algorithms=["HS256"])
+    except HTTPException:
+        return False
+    return ADMIN_SCOPE in _token_scopes(payload)
+
+
+def peek_token_claims(authorization: str) -> Optional[dict]:
+    """不验签地读取 Bearer 令牌中的 app_name 与 scopes，仅用于记录，不能用于鉴权。"""
+    scheme, _, token = authorization.partition(" ")
+    parts = token.split(".")
+    if scheme.lower() != "bearer" or len(parts) != 3:
+        return None
+    try:
+        payload = json.loads(_base64url_decode(parts[1]))
+    except Exception:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    return {
+        "app_name": payload.get("app_name") or payload.get("sub"),
+        "scopes": _token_scopes(payload),
+    }
+
+
+async def get_admin_app(current_app: AppIdentity = Depends(get_current_app)) -> AppIdentity:
+    """要求调用方令牌中带有 admin scope，用于管理类接口。"""
+    if ADMIN_SCOPE not in current_app.scopes:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要 admin 权限",
+        )
+    return current_app
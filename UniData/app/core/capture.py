@@ -0,0 +1,149 @@
+"""线上流量采集模块。
+
+开启 capture_path 后，按 capture_sample_rate 采样 /api 请求，每个请求写一行 JSON：
+请求时间、方法、路径、查询串、请求头（去掉凭据）、请求体、调用方 app_name/scopes，
+以及响应状态码、耗时、响应体长度与 SHA-1。scripts/replay_traffic.py 读取该文件，
+按原始到达间隔（或 N 倍速）重放到本地实例，对比延迟与响应差异。
+
+记录在请求结束时放入内存队列，由后台线程写文件（见 jsonl_logger），不阻塞事件循环。
+
+请求体会原样落盘，只应在可接受保存业务数据的环境中开启。
+令牌不落盘：重放时用 jwt_secret 按记录的 app_name/scopes 重新签发。
+"""
+import base64
+import hashlib
+import json
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.auth import peek_token_claims
+from app.core.config import get_settings
+from app.core.timing import jsonl_logger
+
+logger = logging.getLogger(__name__)
+
+# 不落盘的请求头：凭据，以及重放时由客户端重新生成的头
+_DROP_HEADERS = {
+    b"authorization",
+    b"proxy-authorization",
+    b"cookie",
+    b"x-api-key",
+    b"host",
+    b"content-length",
+    b"connection",
+}
+
+# 不采集的接口：管理接口、令牌申请（会发送通知）与 SSE 长连接
+_SKIP_PREFIXES = ("/api/v1/admin/", "/api/v1/auth/")
+_SKIP_SUFFIXES = ("/_stream",)
+
+
+def _should_capture(path: str) -> bool:
+    if not path.startswith("/api/"):
+        return False
+    if path.startswith(_SKIP_PREFIXES) or path.endswith(_SKIP_SUFFIXES):
+        return False
+    return True
+
+
+class TrafficCaptureMiddleware:
+    """把采样到的请求/响应摘要写入 capture_path（JSON 行）。"""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        settings = get_settings()
+        if (
+            scope["type"] != "http"
+            or not settings.capture_path
+            or not _should_capture(scope["path"])
+            or random.random() >= settings.capture_sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        max_body = settings.capture_max_body_bytes
+        body_chunks: List[bytes] = []
+        body_size = 0
+        response: Dict[str, Any] = {"status": 0, "bytes": 0}
+        digest = hashlib.sha1()
+
+        async def receive_wrapper() -> Dict[str, Any]:
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                if body_size < max_body:
+                    body_chunks.append(chunk[: max_body - body_size])
+                body_size += len(chunk)
+            return message
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                response["bytes"] += len(chunk)
+                digest.update(chunk)
+            await send(message)
+
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            record = self._build_record(
+                scope, started_at, time.perf_counter() - started,
+                b"".join(body_chunks), body_size, response, digest.hexdigest(),
+            )
+            try:
+                jsonl_logger("unidata.capture", settings.capture_path).info(
+                    json.dumps(record, ensure_ascii=False)
+                )
+            except Exception as e:
+                logger.warning(f"写入流量采集文件失败: {e}")
+
+    @staticmethod
+    def _build_record(
+        scope: Dict[str, Any],
+        started_at: float,
+        duration: float,
+        body: bytes,
+        body_size: int,
+        response: Dict[str, Any],
+        response_sha1: str,
+    ) -> Dict[str, Any]:
+        headers: Dict[str, str] = {}
+        auth: Optional[dict] = None
+        for key, value in scope["headers"]:
+            if key == b"authorization":
+                auth = peek_token_claims(value.decode("latin-1"))
+            if key not in _DROP_HEADERS:
+                headers[key.decode("latin-1")] = value.decode("latin-1")
+
+        record: Dict[str, Any] = {
+            "ts": started_at,
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "route": getattr(scope.get("route"), "path", None),
+            "headers": headers,
+            "auth": auth,
+        }
+        try:
+            record["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            record["body_b64"] = base64.b64encode(body).decode("ascii")
+        if body_size > len(body):
+            # 截断的请求体无法重放，只保留前缀便于排查
+            record["body_truncated"] = True
+        record.update(
+            status=response["status"],
+            duration_ms=round(duration * 1000, 3),
+            response_bytes=response["bytes"],
+            response_sha1=response_sha1,
+        )
+        return record
@@ -5,14 +5,22 @@
 2. AsyncSession 的获取与事务提交/回滚；
 3. 提供 get_db 依赖函数供 FastAPI 注入使用。
 
+支持按 app_name 分片：pg_conn_string 是 default 分片（控制库），settings.shards 中可配置更多分片，
+每个分片一个引擎与连接池。文档数据表（SHARDED_TABLES）按应用落在各自的分片上，
+其余表（令牌、集合元数据、配额、分片映射等）只在控制库中：
+非 default 分片的会话把这些表绑定到控制库的引擎，同一会话内按表自动路由。
+应用到分片的映射见 app/services/shard_service.py。
+
 上层代码不直接操作引擎和 sessionmaker，而是通过本模块暴露的接口访问数据库。
 """
 
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, Dict, List, Optional
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
+import asyncpg
 from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
@@ -20,48 +28,96 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from app.core.config import get_settings
+from app.core.timing import TimedAsyncPool, install_sql_timing
+
+# 控制库（pg_conn_string）对应的分片名
+DEFAULT_SHARD = "default"
+
+# 按应用分片存放的文档数据表，其余表只在控制库中
+SHARDED_TABLES = ("uni_documents", "uni_documents_archive", "uni_collection_counters", "uni_blobs")
+
+# 延迟初始化各分片的引擎与会话工厂，避免在模块导入阶段就连接数据库
+_engines: Dict[str, AsyncEngine] = {}
+_session_locals: Dict[str, async_sessionmaker] = {}
+
+
+def shard_names() -> List[str]:
+    """返回所有分片名，default 在前，其余按名称排序。"""
+    return [DEFAULT_SHARD] + sorted(n for n in get_settings().shards if n != DEFAULT_SHARD)
+
 
-# 延迟初始化引擎与会话工厂，避免在模块导入阶段就连接数据库
-_engine: Optional[AsyncEngine] = None
-_async_session_local: Optional[async_sessionmaker] = None
+def _shard_conn_string(shard: str) -> str:
+    settings = get_settings()
+    if shard == DEFAULT_SHARD:
+        return settings.pg_conn_string
+    try:
+        return settings.shards[shard]
+    except KeyError:
+        raise ValueError(f"未配置的分片: {shard}")
 
 
-def _get_engine() -> AsyncEngine:
-    """获取或创建异步引擎。
+def _get_engine(shard: str = DEFAULT_SHARD) -> AsyncEngine:
+    """获取或创建分片的异步引擎。
 
-    使用配置中的 pg_conn_string 创建 asyncpg 驱动的 SQLAlchemy AsyncEngine，
-    并设置连接池大小等参数。只在首次调用时真正创建。
+    使用分片的连接串创建 asyncpg 驱动的 SQLAlchemy AsyncEngine，
+    并设置连接池大小等参数。每个分片只在首次调用时真正创建。
     """
-    global _engine
-    if _engine is None:
-        settings = get_settings()
-        async_conn_string = _make_async_conn_string(settings.pg_conn_string)
-        _engine = create_async_engine(
+    engine = _engines.get(shard)
+    if engine is None:
+        async_conn_string = _make_async_conn_string(_shard_conn_string(shard))
+        engine = create_async_engine(
             async_conn_string,
             echo=False,
             future=True,
             pool_size=10,
             max_overflow=0,
+            poolclass=TimedAsyncPool,
         )
-    return _engine
+        # 统计 SQL 执行耗时，输出到 Server-Timing
+        install_sql_timing(engine.sync_engine)
+        _engines[shard] = engine
+    return engine
 
 
-def _get_session_local() -> async_sessionmaker:
-    """获取或创建异步会话工厂。
+def get_engine(shard: str = DEFAULT_SHARD) -> AsyncEngine:
+    return _get_engine(shard)
+
+
+def _get_session_local(shard: str = DEFAULT_SHARD) -> async_sessionmaker:
+    """获取或创建分片的异步会话工厂。
 
     通过 async_sessionmaker 统一生成 AsyncSession，禁用自动提交与自动 flush，
     以方便在 get_db 中显式控制事务生命周期。
+    非 default 分片的会话把控制库中的表绑定到 default 引擎，文本 SQL 与文档数据表走分片引擎。
     """
-    global _async_session_local
-    if _async_session_local is None:
-        _async_session_local = async_sessionmaker(
-            _get_engine(),
+    session_local = _session_locals.get(shard)
+    if session_local is None:
+        binds = None
+        if shard != DEFAULT_SHARD:
+            # 导入模型包，确保所有表都已注册到 Base.metadata
+            from app.models import Base
+
+            control = _get_engine(DEFAULT_SHARD)
+            binds = {
+                table: control
+                for table in Base.metadata.sorted_tables
+                if table.name not in SHARDED_TABLES
+            }
+        session_local = _session_locals[shard] = async_sessionmaker(
+            _get_engine(shard),
             class_=AsyncSession,
+            binds=binds,
             expire_on_commit=False,
             autocommit=False,
             autoflush=False,
+            info={"shard": shard},
         )
-    return _async_session_local
+    return session_local
+
+
+def session_shard(db: AsyncSession) -> str:
+    """返回会话所属的分片名。"""
+    return db.info.get("shard", DEFAULT_SHARD)
 
 
 def _make_async_conn_string(conn_string: str) -> str:
@@ -113,7 +169,7 @@ class _LazyEngine:
         return getattr(_get_engine(), name)
 
     def __bool__(self):
-        return _engine is not None
+        return DEFAULT_SHARD in _engines
 
 
 engine = _LazyEngine()
@@ -133,15 +189,27 @@ AsyncSessionLocal = _LazySessionLocal()
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """获取数据库会话的依赖注入。
+    """获取数据库会话的依赖注入（控制库）。
 
     用于 FastAPI 的 Depends，保证：
     - 每个请求使用一个独立的 AsyncSession；
     - 正常结束时自动 commit；
     - 发生异常时自动 rollback；
     - 最后无论成功失败都 close。
+    按应用访问文档数据的接口使用 app.api.dependencies.get_app_db。
+    """
+    async with shard_session(DEFAULT_SHARD) as session:
+        yield session
+
+
+@asynccontextmanager
+async def shard_session(shard: str) -> AsyncGenerator[AsyncSession, None]:
+    """请求会话的上下文管理器，绑定到指定分片。
+
+    接口函数直接使用的会话已由 TimedRoute 在构建响应前提交（计入 Server-Timing 的 commit），
+    这里的提交只处理其余情况。
     """
-    async with _get_session_local()() as session:
+    async with _get_session_local(shard)() as session:
         try:
             yield session
             await session.commit()
@@ -155,22 +223,23 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 async def close_db():
     """关闭数据库连接。
 
-    在应用退出时调用，安全地释放连接池资源。
+    在应用退出时调用，安全地释放所有分片的连接池资源。
     """
-    global _engine
-    if _engine is not None:
-        await _engine.dispose()
-        _engine = None
+    engines = list(_engines.values())
+    _engines.clear()
+    _session_locals.clear()
+    for engine in engines:
+        await engine.dispose()
 
 
 @asynccontextmanager
-async def get_db_context() -> AsyncGenerator[AsyncSession, None]:
+async def get_db_context(shard: str = DEFAULT_SHARD) -> AsyncGenerator[AsyncSession, None]:
     """数据库会话的上下文管理器。
 
     用于脚本或后台任务中手动控制数据库生命周期，与 get_db 类似，
-    但不依赖 FastAPI 的依赖注入机制。
+    但不依赖 FastAPI 的依赖注入机制。shard 为会话绑定的分片，默认控制库。
     """
-    async with _get_session_local()() as session:
+    async with _get_session_local(shard)() as session:
         try:
             yield session
             await session.commit()
@@ -178,4 +247,24 @@ async def get_db_context() -> AsyncGenerator[AsyncSession, None]:
             await session.rollback()
             raise
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+
+@asynccontextmanager
+async def get_autocommit_conn(shard: str = DEFAULT_SHARD) -> AsyncGenerator[AsyncConnection, None]:
+    """自动提交模式的连接上下文管理器。
+
+    用于 CREATE INDEX CONCURRENTLY 等不能在事务块中执行的语句。
+    """
+    async with _get_engine(shard).connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        yield conn
+
+
+async def create_listen_connection(shard: str = DEFAULT_SHARD) -> asyncpg.Connection:
+    """创建一条独立于连接池的 asyncpg 连接，用于 LISTEN。
+
+    LISTEN 连接需要长期占用，放在连接池外，避免挤占业务请求的连接。
+    """
+    dsn = _make_async_conn_string(_shard_conn_string(shard))
+    return await asyncpg.connect(dsn.replace("postgresql+asyncpg://", "postgresql://", 1))
@@ -0,0 +1,222 @@
+"""线上 worker 的采样分析器模块。
+
+用独立线程按固定间隔读取 sys._current_frames()，把各线程的调用栈计数，
+输出 flamegraph.pl / speedscope 可直接读取的 collapsed-stack 文本
+（每行「帧;帧;帧 次数」，根帧为线程名）。
+
+两种用法：
+1. 管理接口 POST /admin/profile：在当前 worker 上采样 N 秒后返回结果；
+2. 请求头 X-Profile: 1（需 admin 令牌）：只在该请求处理期间采样，
+   响应头 X-Profile-Id 给出结果文件名，再用 GET /admin/profiles/{id} 取回；
+   结果目录只保留最新的 profile_max_files 个文件。
+
+采样的是整个进程而不只是该请求：事件循环上并发的其他请求也会出现在栈中。
+未开启时没有采样线程，中间件只多一次请求头查找。
+同一 worker 同一时间只允许一个采样器运行。
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+import anyio
+
+from app.core.auth import is_admin_authorization
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+_PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _short_path(filename: str) -> str:
+    """去掉 site-packages / 标准库前缀，让帧名更短。"""
+    for marker in ("site-packages" + os.sep, "lib" + os.sep + "python"):
+        pos = filename.rfind(marker)
+        if pos >= 0:
+            return filename[pos + len(marker):]
+    return filename
+
+
+class StackSampler:
+    """按固定间隔对所有线程的调用栈计数。"""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.samples = 0
+        self._counts: Counter = Counter()
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _label(self, code: Any) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            # 分号是 collapsed 格式的帧分隔符，不能出现在帧名中
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            label = self._labels[code] = label.replace(";", ":")
+        return label
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(f"thread:{names.get(ident, ident)}")
+            stack.reverse()
+            self._counts[";".join(stack)] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """停止采样并返回 collapsed-stack 文本。"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self._counts.most_common())
+
+
+class Profiler:
+    """当前 worker 上唯一的采样器入口。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._active: Optional[StackSampler] = None
+
+    @property
+    def running(self) -> bool:
+        return self._active is not None
+
+    def start(self, interval: float) -> Optional[StackSampler]:
+        """启动采样器，已有采样器在运行时返回 None。"""
+        with self._lock:
+            if self._active is not None:
+                return None
+            self._active = StackSampler(interval)
+            self._active.start()
+            return self._active
+
+    def stop(self, sampler: StackSampler) -> str:
+        try:
+            return sampler.stop()
+        finally:
+            with self._lock:
+                if self._active is sampler:
+                    self._active = None
+
+    @staticmethod
+    def save(profile_id: str, collapsed: str) -> None:
+        """写入结果文件，并只保留最新的 profile_max_files 个。"""
+        settings = get_settings()
+        directory = settings.profile_dir
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{profile_id}.collapsed"), "w", encoding="utf-8") as f:
+            f.write(collapsed)
+        Profiler.prune(directory, settings.profile_max_files)
+
+    @staticmethod
+    def prune(directory: str, keep: int) -> int:
+        """按修改时间删除最旧的结果文件，只保留 keep 个，返回删除的文件数。"""
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.endswith(".collapsed") and _PROFILE_ID_RE.match(entry.name[: -len(".collapsed")]):
+                    try:
+                        entries.append((entry.stat().st_mtime_ns, entry.path))
+                    except FileNotFoundError:
+                        continue
+        entries.sort(reverse=True)
+        removed = 0
+        for _, path in entries[max(keep, 0):]:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    @staticmethod
+    def load(profile_id: str) -> Optional[str]:
+        """读取已保存的结果，id 非法或文件不存在时返回 None。"""
+        if not _PROFILE_ID_RE.match(profile_id):
+            return None
+        path = os.path.join(get_settings().profile_dir, f"{profile_id}.collapsed")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+profiler = Profiler()
+
+
+class ProfileMiddleware:
+    """对带 X-Profile 头且持有 admin 令牌的请求，在其处理期间采样。"""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if PROFILE_HEADER not in headers:
+            await self.app(scope, receive, send)
+            return
+
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        sampler = None
+        if is_admin_authorization(authorization):
+            sampler = profiler.start(get_settings().profile_interval_ms / 1000)
+            if sampler is None:
+                logger.info(f"已有采样器在运行，跳过请求 {scope.get('path')} 的采样")
+        if sampler is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER, profile_id.encode("ascii")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            collapsed = profiler.stop(sampler)
+            try:
+                # 写文件与清理旧文件放到线程中，不阻塞事件循环
+                await anyio.to_thread.run_sync(profiler.save, profile_id, collapsed)
+            except OSError as e:
+                logger.warning(f"保存采样结果失败: {e}")
+            logger.info(
+                f"请求采样完成 path={scope.get('path')} id={profile_id} "
+                f"samples={sampler.samples} elapsed={time.perf_counter() - started:.3f}s"
+            )
@@ -0,0 +1,239 @@
+"""静态资源（/libs 与注册/审核页面）的缓存与压缩模块。
+
+layui.js / layui.css 合计约 530 KB，远程办公网络下每次完整下载需要数秒，这里：
+1. 文件按内容 SHA-256 生成强 ETag，首次访问时在内存中压缩出 gzip（安装 brotli 时还有 br）版本，
+   之后按 Accept-Encoding 直接返回；文件的 mtime 或大小变化后自动重建；
+2. 页面中引用的 /libs 资源改写为带版本号的 URL（?v=内容哈希），带当前版本号的请求
+   返回一年的 immutable 缓存，内容变化后 URL 随之变化，浏览器不会用到旧文件；
+   没有版本号（如 layui.css 中引用的字体）或版本号过期的请求使用 no-cache + ETag 协商；
+3. 注册/审核页面本身渲染后缓存在内存中，使用 no-cache + ETag，重复打开只需一次 304。
+
+brotli 为可选依赖（pip install 'unidata[static]'），未安装时只提供 gzip。
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import stat
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, QueryParams
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 带当前版本号的资源 URL 的缓存策略：内容变化时 URL 随之变化，可以永久缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 页面与未带版本号的资源：每次使用前向服务端协商（命中时 304，不传输正文）
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# 超过该大小的文件不进内存缓存，交给 StaticFiles 直接按文件返回
+_MAX_CACHED_BYTES = 4 * 1024 * 1024
+# 小于该大小的文件压缩收益不明显，只提供原文
+_MIN_COMPRESS_BYTES = 1024
+# 值得压缩的类型（woff/woff2、图片本身已压缩）
+_COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "font/ttf",
+    "application/vnd.ms-fontobject",
+)
+# 编码名 -> ETag 后缀；强 ETag 必须区分同一资源的不同编码
+_ENCODING_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+# 页面中对 /libs 资源的引用：src="/libs/..." 或 href="/libs/..."
+_LIBS_REF_RE = re.compile(r'((?:src|href)=")/libs/([^"?#]+)(")')
+
+
+@dataclass
+class CachedAsset:
+    """一个文件（或渲染后的页面）的原文、压缩版本与校验信息。"""
+
+    media_type: str
+    body: bytes
+    digest: str
+    # 编码名（br / gzip）-> 压缩后的正文，只保留比原文小的版本
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+    # 生成时源文件的 (mtime_ns, size)；页面为 ((mtime_ns, size), 引用的资源, 资源版本)
+    source: Tuple = ()
+
+    @property
+    def version(self) -> str:
+        """写入 URL 的版本号。"""
+        return self.digest[:12]
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        return f'"{self.digest[:20]}{_ENCODING_SUFFIX.get(encoding, "")}"'
+
+
+def build_asset(body: bytes, media_type: str, source: Tuple = ()) -> CachedAsset:
+    """计算摘要并生成压缩版本（CPU 密集，调用方应放到线程中执行）。"""
+    asset = CachedAsset(
+        media_type=media_type,
+        body=body,
+        digest=hashlib.sha256(body).hexdigest(),
+        source=source,
+    )
+    if len(body) >= _MIN_COMPRESS_BYTES and media_type.startswith(_COMPRESSIBLE_TYPES):
+        candidates = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            candidates["br"] = brotli.compress(body)
+        asset.encoded = {name: data for name, data in candidates.items() if len(data) < len(body)}
+    return asset
+
+
+def accepted_encodings(header: str) -> List[str]:
+    """解析 Accept-Encoding，返回 q 值大于 0 的编码名（小写）。"""
+    names = []
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        names.append(name)
+    return names
+
+
+def asset_response(
+    asset: CachedAsset,
+    scope: Scope,
+    cache_control: str = REVALIDATE_CACHE_CONTROL,
+) -> Response:
+    """按请求的 Accept-Encoding 与 If-None-Match 返回资源（br 优先于 gzip）。"""
+    request_headers = Headers(scope=scope)
+    accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+    encoding = next((name for name in ("br", "gzip") if name in asset.encoded and name in accepted), None)
+
+    etag = asset.etag(encoding)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if asset.encoded:
+        headers["Vary"] = "Accept-Encoding"
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        return Response(asset.encoded[encoding], media_type=asset.media_type, headers=headers)
+    return Response(asset.body, media_type=asset.media_type, headers=headers)
+
+
+class AssetCache:
+    """按文件路径缓存 CachedAsset，源文件变化后重建（每个 worker 一份）。"""
+
+    def __init__(self) -> None:
+        self._assets: Dict[str, CachedAsset] = {}
+
+    async def get(self, path: str, stat_result: os.stat_result, media_type: str) -> CachedAsset:
+        source = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self._assets.get(path)
+        if cached is not None and cached.source == source:
+            return cached
+
+        def load() -> CachedAsset:
+            with open(path, "rb") as f:
+                return build_asset(f.read(), media_type, source)
+
+        asset = await anyio.to_thread.run_sync(load)
+        self._assets[path] = asset
+        return asset
+
+
+class CachedStaticFiles(StaticFiles):
+    """带内存缓存、预压缩与版本化缓存策略的 StaticFiles。"""
+
+    def __init__(self, *, directory: Path, cache: AssetCache) -> None:
+        super().__init__(directory=directory)
+        self.cache = cache
+
+    async def lookup(self, path: str) -> Optional[CachedAsset]:
+        """按 /libs 下的相对路径取资源，不存在或过大时返回 None。"""
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        if not stat_result or not stat.S_ISREG(stat_result.st_mode) or stat_result.st_size > _MAX_CACHED_BYTES:
+            return None
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        return await self.cache.get(full_path, stat_result, media_type)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        try:
+            asset = await self.lookup(path)
+        except OSError:
+            asset = None
+        if asset is None:
+            return await super().get_response(path, scope)
+
+        immutable = QueryParams(scope.get("query_string", b"")).get("v") == asset.version
+        return asset_response(asset, scope, IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL)
+
+
+class PageCache:
+    """页面（注册/审核 HTML）的渲染缓存：/libs 引用改写为带版本号的 URL。"""
+
+    def __init__(self, libs: Optional[CachedStaticFiles]) -> None:
+        self.libs = libs
+        self._pages: Dict[str, CachedAsset] = {}
+
+    async def _versions(self, refs: Tuple[str, ...]) -> Tuple[Tuple[str, str], ...]:
+        """返回页面引用的各资源的当前版本 ((相对路径, 版本号), ...)，不存在的资源不改写。"""
+        versions = []
+        for ref in refs:
+            asset = await self.libs.lookup(ref) if self.libs is not None else None
+            if asset is not None:
+                versions.append((ref, asset.version))
+        return tuple(versions)
+
+    async def response(self, path: Path, scope: Scope) -> Response:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+        file_source = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self._pages.get(str(path))
+        if cached is not None and cached.source[0] == file_source:
+            # 页面未变时还要确认引用的资源未变，否则页面中的版本号会过期
+            refs, versions = cached.source[1], cached.source[2]
+            if await self._versions(refs) == versions:
+                return asset_response(cached, scope)
+
+        html = await anyio.to_thread.run_sync(path.read_text, "utf-8")
+        refs = tuple(dict.fromkeys(m.group(2) for m in _LIBS_REF_RE.finditer(html)))
+        versions = await self._versions(refs)
+        version_map = dict(versions)
+
+        def rewrite(match: re.Match) -> str:
+            ref = match.group(2)
+            if ref not in version_map:
+                return match.group(0)
+            return f"{match.group(1)}/libs/{ref}?v={version_map[ref]}{match.group(3)}"
+
+        body = _LIBS_REF_RE.sub(rewrite, html).encode("utf-8")
+        page = await anyio.to_thread.run_sync(
+            build_asset, body, "text/html; charset=utf-8", (file_source, refs, versions)
+        )
+        self._pages[str(path)] = page
+        logger.debug(f"已缓存页面 {path.name} size={len(body)} encodings={list(page.encoded)}")
+        return asset_response(page, scope)
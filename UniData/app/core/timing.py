@@ -0,0 +1,282 @@
+"""请求耗时分解（Server-Timing）模块。
+
+每个 HTTP 请求在 contextvar 中持有一个 RequestTimings，各环节把耗时累加进去：
+- auth：get_current_app 中的 JWT 校验；
+- pool：从连接池取连接（含等待与新建连接）；
+- sql：游标执行 SQL（含网络往返）；
+- commit：请求会话（get_db / get_app_db）的事务提交，由 TimedRoute 在接口函数返回后、构建响应前执行；
+- serialize：接口函数返回后到 JSON 响应体编码完成（响应模型校验 + 序列化）。
+
+ServerTimingMiddleware 在响应头中输出 Server-Timing，
+并可按采样率把分解结果以 JSON 行写入本地 span 日志。
+"""
+import functools
+import inspect
+import json
+import logging
+import queue
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, request_response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Server-Timing 中各环节的输出顺序
+PHASES = ("auth", "pool", "sql", "commit", "serialize")
+
+
+class RequestTimings:
+    """单个请求内各环节的累计耗时（秒）与次数。"""
+
+    __slots__ = ("started", "durations", "counts", "handler_end")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        # 接口函数返回的时间点，用于计算 serialize
+        self.handler_end: Optional[float] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header_value(self) -> str:
+        parts = []
+        for name in PHASES:
+            if name in self.durations:
+                part = f"{name};dur={self.durations[name] * 1000:.2f}"
+                if name == "sql":
+                    part += f';desc="{self.counts[name]} queries"'
+                parts.append(part)
+        parts.append(f"total;dur={self.total() * 1000:.2f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record(name: str, seconds: float) -> None:
+    """把一段耗时记到当前请求上（不在请求上下文中时忽略）。"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def measure(name: str) -> Iterator[None]:
+    """统计 with 块的耗时。"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+class TimedAsyncPool(AsyncAdaptedQueuePool):
+    """记录取连接耗时的连接池，连接池耗尽时的排队时间会体现在 pool 上。"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record("pool", time.perf_counter() - started)
+
+
+# 连接池按类所在模块命名 logger，保持与 sqlalchemy.pool 相同的默认级别，避免 INFO 日志刷屏
+logging.getLogger(f"{__name__}.{TimedAsyncPool.__name__}").setLevel(logging.WARNING)
+
+
+def install_sql_timing(sync_engine: Any) -> None:
+    """在引擎上注册游标执行事件，统计 SQL 执行耗时。"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("timing_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack: List[float] = conn.info.get("timing_started") or []
+        if stack:
+            record("sql", time.perf_counter() - stack.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None:
+            stack = conn.info.get("timing_started") or []
+            if stack:
+                record("sql", time.perf_counter() - stack.pop())
+
+
+def _timed_endpoint(call: Callable) -> Callable:
+    """接口函数成功返回后提交其请求会话，再记录返回时间点。
+
+    依赖的 yield 清理发生在响应发出之后，在那里提交时 commit 进不了 Server-Timing，
+    提交失败时客户端也已经收到了成功响应；这里提交后清理阶段的 commit 不再有事务可提交。
+    """
+
+    @functools.wraps(call)
+    async def wrapper(**kwargs: Any) -> Any:
+        try:
+            result = await call(**kwargs)
+            for value in kwargs.values():
+                if isinstance(value, AsyncSession):
+                    with measure("commit"):
+                        await value.commit()
+            return result
+        finally:
+            timings = _current.get()
+            if timings is not None:
+                timings.handler_end = time.perf_counter()
+
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """在构建响应前提交请求会话并记录接口返回时间点的路由类，配合 TimedJSONResponse 统计 serialize。"""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, endpoint, **kwargs)
+        # 只包装 async 接口；同步接口在线程池中执行，不统计 serialize
+        if inspect.iscoroutinefunction(self.dependant.call):
+            self.dependant.call = _timed_endpoint(self.dependant.call)
+            self.app = request_response(self.get_route_handler())
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSON 响应：把「接口返回 -> 响应体编码完成」计为 serialize。"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        timings = _current.get()
+        if timings is not None and timings.handler_end is not None:
+            timings.add("serialize", time.perf_counter() - timings.handler_end)
+            timings.handler_end = None
+
+
+# 每个 JSON 行文件最多积压的消息数，磁盘跟不上时丢弃新消息而不是占用更多内存
+_JSONL_QUEUE_SIZE = 10000
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """队列已满时丢弃消息（采样日志允许丢失），不阻塞也不打印异常。"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+_jsonl_loggers: Dict[str, logging.Logger] = {}
+_jsonl_listeners: Dict[str, QueueListener] = {}
+
+
+def jsonl_logger(name: str, path: str) -> logging.Logger:
+    """返回写入独立文件的 logger（每条消息一行），不进入应用日志。
+
+    消息只放入内存队列，由后台线程写文件，调用方（事件循环）不做磁盘 I/O。
+    """
+    file_logger = _jsonl_loggers.get(name)
+    if file_logger is None:
+        file_logger = logging.getLogger(name)
+        file_logger.setLevel(logging.INFO)
+        file_logger.propagate = False
+        handler = logging.FileHandler(path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records: queue.Queue = queue.Queue(_JSONL_QUEUE_SIZE)
+        file_logger.addHandler(_DroppingQueueHandler(records))
+        listener = _jsonl_listeners[name] = QueueListener(records, handler)
+        listener.start()
+        _jsonl_loggers[name] = file_logger
+    return file_logger
+
+
+def close_jsonl_loggers() -> None:
+    """写完队列中剩余的消息并关闭文件（应用退出时调用）。"""
+    for name, listener in _jsonl_listeners.items():
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        file_logger = _jsonl_loggers.pop(name)
+        for handler in list(file_logger.handlers):
+            file_logger.removeHandler(handler)
+    _jsonl_listeners.clear()
+
+
+class ServerTimingMiddleware:
+    """为每个 HTTP 请求建立 RequestTimings，输出 Server-Timing 头与采样的 span 日志。
+
+    使用纯 ASGI 中间件而非 BaseHTTPMiddleware，不缓冲响应体，SSE 等流式响应不受影响。
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        settings = get_settings()
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status_code = 0
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.server_timing_enabled:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.header_value().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if settings.span_log_path and random.random() < settings.span_log_sample_rate:
+                self._write_span(settings.span_log_path, scope, status_code, timings)
+
+    @staticmethod
+    def _write_span(path: str, scope: Dict[str, Any], status_code: int, timings: RequestTimings) -> None:
+        route = scope.get("route")
+        span = {
+            "ts": datetime.utcnow().isoformat(),
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "route": getattr(route, "path", None),
+            "status": status_code,
+            "total_ms": round(timings.total() * 1000, 3),
+            "spans": {
+                name: {"ms": round(seconds * 1000, 3), "count": timings.counts[name]}
+                for name, seconds in timings.durations.items()
+            },
+        }
+        try:
+            jsonl_logger("unidata.spans", path).info(json.dumps(span, ensure_ascii=False))
+        except Exception as e:
+            logger.warning(f"写入 span 日志失败: {e}")
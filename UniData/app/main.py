@@ -8,19 +8,27 @@ UniData 生产者服务入口。
 所有业务逻辑都在其他模块中实现（api/core/services 等），这里不做任何业务处理。
 """
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
 
 from app.core.config import Settings, get_settings
 from app.core.database import close_db
+from app.core.capture import TrafficCaptureMiddleware
+from app.core.profiler import ProfileMiddleware
+from app.core.static_assets import AssetCache, CachedStaticFiles, PageCache
+from app.core.timing import ServerTimingMiddleware, TimedJSONResponse, close_jsonl_loggers
 from app.api.v1.router import api_router
+from app.services.change_listener import change_listener
+from app.services.archive_service import archive_service
+from app.services.purge_service import purge_service
+from app.services.search_writer import search_writer
+from app.services.write_spool import write_spool
 
 
 def create_app(settings: Optional[Settings] = None) -> FastAPI:
@@ -50,11 +58,36 @@ def create_app(settings: Optional[Settings] = None) -> FastAPI:
         logger.info(f"PostgreSQL 连接: {settings.pg_conn_string}")
         logger.info(f"服务端口: {settings.server_port}")
 
+        # 后台墓碑清理任务（可选）
+        purge_task = None
+        if settings.purge_enabled:
+            purge_task = asyncio.create_task(purge_service.run_forever())
+            logger.info(f"墓碑清理已启用，保留期 {settings.purge_retention_days} 天")
+
+        # 后台冷文档归档任务（可选）
+        archive_task = None
+        if archive_service.enabled():
+            archive_task = asyncio.create_task(archive_service.run_forever())
+            logger.info(f"冷文档归档已启用，{settings.archive_after_days} 天未更新的文档移入归档表")
+
+        # 写入暂存（可选）：启动重放任务，接手遗留的 spool 段
+        if settings.spool_enabled:
+            await write_spool.start()
+            logger.info(f"写入暂存已启用，目录 {settings.spool_dir}")
+
         # 应用运行期
         yield
 
         # 应用关闭阶段：清理资源
         logger.info("正在关闭服务...")
+        if purge_task is not None:
+            purge_task.cancel()
+        if archive_task is not None:
+            archive_task.cancel()
+        await change_listener.stop()
+        await write_spool.stop()
+        await search_writer.stop()
+        close_jsonl_loggers()
         await close_db()
         logger.info("数据库连接已关闭")
 
@@ -64,6 +97,7 @@ def create_app(settings: Optional[Settings] = None) -> FastAPI:
         description="分布式搜索生产者 API 服务",
         version="0.1.0",
         lifespan=lifespan,
+        default_response_class=TimedJSONResponse,
     )
 
     # 全局 CORS 配置：
@@ -76,23 +110,34 @@ def create_app(settings: Optional[Settings] = None) -> FastAPI:
         allow_headers=["*"],
     )
 
+    # 请求耗时分解：Server-Timing 响应头与采样 span 日志
+    app.add_middleware(ServerTimingMiddleware)
+    # 按需采样分析：带 X-Profile 头的 admin 请求
+    app.add_middleware(ProfileMiddleware)
+    # 流量采集（配置 capture_path 后开启）
+    app.add_middleware(TrafficCaptureMiddleware)
+
     # 挂载 API v1 的所有业务路由到统一前缀 /api/v1
     app.include_router(api_router, prefix="/api/v1")
 
+    # 静态资源：内存缓存 + 预压缩（gzip/br）+ 强 ETag，页面中的 /libs 引用带内容版本号，可长期缓存
     project_root = Path(__file__).resolve().parents[2]
     libs_dir = project_root / "libs"
+    libs = None
     if libs_dir.exists():
-        app.mount("/libs", StaticFiles(directory=libs_dir), name="libs")
+        libs = CachedStaticFiles(directory=libs_dir, cache=AssetCache())
+        app.mount("/libs", libs, name="libs")
+    pages = PageCache(libs)
 
     @app.get("/app/register", include_in_schema=False)
-    async def app_register_page():
+    async def app_register_page(request: Request):
         html_path = project_root / "app_token_register.html"
-        return FileResponse(html_path)
+        return await pages.response(html_path, request.scope)
 
     @app.get("/app/review", include_in_schema=False)
-    async def app_review_page():
+    async def app_review_page(request: Request):
         html_path = project_root / "app_token_review.html"
-        return FileResponse(html_path)
+        return await pages.response(html_path, request.scope)
 
     # 简单的健康检查端点，方便 K8s/监控系统探测服务状态
     @app.get("/health", tags=["health"])
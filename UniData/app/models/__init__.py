@@ -2,5 +2,26 @@
 from app.models.testcase import Base, TestCase
 from app.models.token import AppToken
 from app.models.document import Document
+from app.models.collection_index import CollectionIndex
+from app.models.collection_schema import CollectionSchema
+from app.models.collection_projection import CollectionProjection
+from app.models.collection_counter import CollectionCounter
+from app.models.app_quota import AppQuota
+from app.models.blob import Blob
+from app.models.app_shard import AppShard
+from app.models.document_archive import ArchivedDocument
 
-__all__ = ["Base", "TestCase", "AppToken", "Document"]
+__all__ = [
+    "Base",
+    "TestCase",
+    "AppToken",
+    "Document",
+    "CollectionIndex",
+    "CollectionSchema",
+    "CollectionProjection",
+    "CollectionCounter",
+    "AppQuota",
+    "Blob",
+    "AppShard",
+    "ArchivedDocument",
+]
@@ -0,0 +1,20 @@
+"""应用配额的数据库模型模块。"""
+from sqlalchemy import BigInteger, Column, String
+
+from app.models.testcase import Base
+
+
+class AppQuota(Base):
+    """应用配额，映射到 uni_app_quotas 表；字段为空表示不限制。
+
+    配额按 uni_collection_counters 中该应用各 collection 的合计检查。
+    """
+
+    __tablename__ = "uni_app_quotas"
+
+    app_name = Column(String, primary_key=True, nullable=False)
+    max_documents = Column(BigInteger, nullable=True, comment="未删除文档数上限")
+    max_payload_bytes = Column(BigInteger, nullable=True, comment="payload 存储字节数上限")
+
+    def __repr__(self) -> str:
+        return f"<AppQuota(app_name={self.app_name})>"
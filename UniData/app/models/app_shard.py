@@ -0,0 +1,30 @@
+"""应用到分片映射的数据库模型模块。"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, String
+
+from app.models.testcase import Base
+
+# 映射状态：active 正常读写；migrating 正在向 target_shard 拷贝（仍读写 shard）；
+# frozen 迁移切换中，写请求返回 503
+SHARD_ACTIVE = "active"
+SHARD_MIGRATING = "migrating"
+SHARD_FROZEN = "frozen"
+
+
+class AppShard(Base):
+    """应用所在的分片，映射到控制库的 uni_app_shards 表。
+
+    应用首次访问时按一致性哈希选定分片并登记，之后以该表为准，
+    新增分片不会移动已有应用；迁移应用使用 scripts/migrate_app_shard.py。
+    """
+
+    __tablename__ = "uni_app_shards"
+
+    app_name = Column(String, primary_key=True, nullable=False)
+    shard = Column(String, nullable=False)
+    state = Column(String, nullable=False, default=SHARD_ACTIVE)
+    target_shard = Column(String, nullable=True, comment="迁移目标分片，仅 migrating / frozen 时有值")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<AppShard(app_name={self.app_name}, shard={self.shard}, state={self.state})>"
@@ -0,0 +1,26 @@
+"""外置大字段（blob）的数据库模型模块。"""
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.testcase import Base
+
+
+class Blob(Base):
+    """按内容寻址的外置字段值，映射到 uni_blobs 表。
+
+    payload 中超过 blob_offload_threshold_bytes 的顶层字段写入这里，
+    原位置只保留 {"$blob": hash, "$size": 字节数} 引用；相同内容只存一份。
+    touched_at 在每次写入引用时刷新，清理任务只删除超过保留期且不再被引用的行。
+    """
+
+    __tablename__ = "uni_blobs"
+
+    hash = Column(String(64), primary_key=True, nullable=False, comment="值的 SHA-256（十六进制）")
+    value = Column(JSONB, nullable=False)
+    size = Column(BigInteger, nullable=False, comment="值的 JSON 编码字节数")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    touched_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<Blob(hash={self.hash}, size={self.size})>"
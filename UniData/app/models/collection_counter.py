@@ -0,0 +1,102 @@
+"""按 (app_name, collection) 增量维护的文档计数模型模块。"""
+from sqlalchemy import DDL, BigInteger, Column, SmallInteger, String, event
+
+from app.models.document import Document
+from app.models.testcase import Base
+
+COUNTERS_TABLE = "uni_collection_counters"
+
+# 计数分槽：每个数据库连接写自己的槽（pg_backend_pid() % N），读时求和，
+# 避免并发写入同一 collection 时在同一计数行上排队
+COUNTER_SLOTS = 16
+
+
+class CollectionCounter(Base):
+    """未删除文档数、payload 存储字节数与写入行数，映射到 uni_collection_counters 表。
+
+    由 uni_documents 上的语句级触发器按批增量更新（见 COUNTER_TRIGGER_SQL），
+    统计与配额检查只读这张小表，不扫描 uni_documents。
+    write_count 只增不减（每写入、删除一行加一），作为 (app_name, collection) 的数据版本，
+    用于判断聚合结果的缓存是否过期。
+    app_name 为空的文档记在 '' 下。
+    """
+
+    __tablename__ = COUNTERS_TABLE
+
+    app_name = Column(String, primary_key=True, nullable=False)
+    collection = Column(String, primary_key=True, nullable=False)
+    slot = Column(SmallInteger, primary_key=True, nullable=False, default=0)
+    live_count = Column(BigInteger, nullable=False, default=0)
+    payload_bytes = Column(BigInteger, nullable=False, default=0)
+    write_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    def __repr__(self) -> str:
+        return f"<CollectionCounter(app_name={self.app_name}, collection={self.collection}, slot={self.slot})>"
+
+
+def _delta_sql(source: str) -> str:
+    """把变更行聚合为按 (app_name, collection) 的增量并累加到当前槽。
+
+    ORDER BY 保证多个 collection 时加锁顺序一致，避免死锁。
+    """
+    return f"""
+        INSERT INTO {COUNTERS_TABLE} AS c (app_name, collection, slot, live_count, payload_bytes, write_count)
+        SELECT app_name, collection, pg_backend_pid() % {COUNTER_SLOTS}, sum(dc), sum(db), sum(dw)
+        FROM ({source}) d
+        GROUP BY app_name, collection
+        HAVING sum(dc) <> 0 OR sum(db) <> 0 OR sum(dw) <> 0
+        ORDER BY app_name, collection
+        ON CONFLICT (app_name, collection, slot) DO UPDATE
+        SET live_count = c.live_count + excluded.live_count,
+            payload_bytes = c.payload_bytes + excluded.payload_bytes,
+            write_count = c.write_count + excluded.write_count;"""
+
+
+# 新行全部计入写入数（软删除也是一次写入），只有未删除的行计入文档数与字节数
+_NEW_ROWS = (
+    "SELECT coalesce(app_name, '') AS app_name, collection, "
+    "CASE WHEN is_delete THEN 0 ELSE 1 END AS dc, "
+    "CASE WHEN is_delete THEN 0 ELSE coalesce(pg_column_size(payload), 0)::bigint END AS db, "
+    "1 AS dw FROM new_rows"
+)
+
+
+def _old_rows(dw: int) -> str:
+    """旧行的增量；UPDATE 时写入已由新行计入（dw=0），DELETE 时每行计一次（dw=1）。"""
+    return (
+        "SELECT coalesce(app_name, '') AS app_name, collection, -1 AS dc, "
+        f"-coalesce(pg_column_size(payload), 0)::bigint AS db, {dw} AS dw "
+        "FROM old_rows WHERE NOT is_delete"
+    )
+
+
+COUNTER_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION uni_documents_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN{_delta_sql(_NEW_ROWS)}
+    ELSIF TG_OP = 'UPDATE' THEN{_delta_sql(_NEW_ROWS + " UNION ALL " + _old_rows(0))}
+    ELSE{_delta_sql(_old_rows(1))}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# 带转换表的触发器只能对应单一事件，因此分别为 INSERT / UPDATE / DELETE 建立
+COUNTER_TRIGGER_SQL = [
+    "DROP TRIGGER IF EXISTS trg_uni_documents_count_ins ON uni_documents",
+    "DROP TRIGGER IF EXISTS trg_uni_documents_count_upd ON uni_documents",
+    "DROP TRIGGER IF EXISTS trg_uni_documents_count_del ON uni_documents",
+    "CREATE TRIGGER trg_uni_documents_count_ins AFTER INSERT ON uni_documents "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uni_documents_count()",
+    "CREATE TRIGGER trg_uni_documents_count_upd AFTER UPDATE ON uni_documents "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION uni_documents_count()",
+    "CREATE TRIGGER trg_uni_documents_count_del AFTER DELETE ON uni_documents "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION uni_documents_count()",
+]
+
+# create_all 建 uni_documents 后一并安装计数触发器（DDL 语句会做 % 格式化，取模运算符需转义）
+event.listen(Document.__table__, "after_create", DDL(COUNTER_FUNCTION_SQL.replace("%", "%%")))
+for _sql in COUNTER_TRIGGER_SQL:
+    event.listen(Document.__table__, "after_create", DDL(_sql))
@@ -0,0 +1,24 @@
+"""集合字段索引声明的数据库模型模块。"""
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime
+
+from app.models.testcase import Base
+
+
+class CollectionIndex(Base):
+    """集合内已声明索引的 payload 字段，映射到 uni_collection_indexes 表。
+
+    声明后会在 uni_documents（或该 collection 的分区）上并发创建表达式索引，
+    list_documents 的过滤条件据此选择可命中索引的 SQL 写法。
+    """
+
+    __tablename__ = "uni_collection_indexes"
+
+    collection = Column(String, primary_key=True, nullable=False)
+    field = Column(String, primary_key=True, nullable=False, comment="payload 字段路径，如 status、owner.name")
+    field_type = Column(String, nullable=False, default="text", comment="text 或 numeric")
+    index_name = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<CollectionIndex(collection={self.collection}, field={self.field})>"
@@ -0,0 +1,29 @@
+"""集合搜索投影声明的数据库模型模块。"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.testcase import Base
+
+
+class CollectionProjection(Base):
+    """集合的搜索投影，映射到 uni_collection_projections 表。
+
+    fields 为需要进入搜索索引的字段路径列表，写入文档时据此计算 uni_documents.search_doc，
+    CDC 只同步 search_doc，大字段不再经过 WAL 解码、Kafka 与 Meilisearch。
+    按 (app_name, collection) 各自一份：每个应用的投影只作用于它自己写入的文档。
+    """
+
+    __tablename__ = "uni_collection_projections"
+
+    app_name = Column(String, primary_key=True, nullable=False, comment="声明该投影的应用，只作用于该应用的写入")
+    collection = Column(String, primary_key=True, nullable=False)
+    fields = Column(JSONB, nullable=False)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return (
+            f"<CollectionProjection(app_name={self.app_name}, collection={self.collection}, "
+            f"version={self.version})>"
+        )
@@ -0,0 +1,26 @@
+"""集合 JSON Schema 注册的数据库模型模块。"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.testcase import Base
+
+
+class CollectionSchema(Base):
+    """集合的 JSON Schema，映射到 uni_collection_schemas 表。
+
+    按 (app_name, collection) 各自一份：同一集合可能有多个应用写入，
+    每个应用的 schema 只校验它自己写入的文档，互不影响；
+    version 每次更新加一，用于使各进程缓存的已编译校验器失效。
+    """
+
+    __tablename__ = "uni_collection_schemas"
+
+    app_name = Column(String, primary_key=True, nullable=False, comment="注册该 schema 的应用，只校验该应用的写入")
+    collection = Column(String, primary_key=True, nullable=False)
+    schema = Column(JSONB, nullable=False)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<CollectionSchema(app_name={self.app_name}, collection={self.collection}, version={self.version})>"
@@ -1,28 +1,133 @@
 """通用文档的数据库模型模块。"""
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Boolean, Index
+from sqlalchemy import DDL, BigInteger, Column, String, DateTime, Boolean, Index, event, text
 from sqlalchemy.dialects.postgresql import JSONB
 
 from app.models.testcase import Base
 
+# 变更通知：每行写入后 pg_notify 到该频道，事务提交时才投递，
+# 供变更订阅接口（_changes 长轮询）唤醒等待者，而不必反复查询
+CHANGES_CHANNEL = "uni_documents_changes"
+
+# NOTIFY 的 payload 上限约 8000 字节，超长时只保留 collection
+NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION uni_documents_notify() RETURNS trigger AS $$
+DECLARE
+    body text;
+BEGIN
+    body := json_build_object(
+        'collection', NEW.collection,
+        'app_name', NEW.app_name,
+        'id', NEW.id,
+        'deleted', NEW.is_delete
+    )::text;
+    IF octet_length(body) > 7900 THEN
+        body := json_build_object('collection', NEW.collection)::text;
+    END IF;
+    PERFORM pg_notify('{CHANGES_CHANNEL}', body);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# 只有文档内容或删除状态变化的 UPDATE 才算变更：重算 search_doc 等维护性更新
+# （backfill_search_doc.py 保留 updated_at）不发通知、不改变更序号，避免变更订阅收到一轮全量事件
+DOCUMENT_CHANGED_WHEN = (
+    "(OLD.updated_at IS DISTINCT FROM NEW.updated_at "
+    "OR OLD.is_delete IS DISTINCT FROM NEW.is_delete "
+    "OR OLD.payload IS DISTINCT FROM NEW.payload)"
+)
+
+# INSERT 触发器的 WHEN 不能引用 OLD，因此 INSERT 与 UPDATE 各一个触发器
+NOTIFY_TRIGGER_SQL = [
+    "DROP TRIGGER IF EXISTS trg_uni_documents_notify ON uni_documents",
+    "DROP TRIGGER IF EXISTS trg_uni_documents_notify_ins ON uni_documents",
+    "DROP TRIGGER IF EXISTS trg_uni_documents_notify_upd ON uni_documents",
+    "CREATE TRIGGER trg_uni_documents_notify_ins AFTER INSERT ON uni_documents "
+    "FOR EACH ROW EXECUTE FUNCTION uni_documents_notify()",
+    "CREATE TRIGGER trg_uni_documents_notify_upd AFTER UPDATE ON uni_documents "
+    f"FOR EACH ROW WHEN {DOCUMENT_CHANGED_WHEN} EXECUTE FUNCTION uni_documents_notify()",
+]
+
+# 变更序号：每行写入时记录写入事务的事务号（PostgreSQL 13+ 的 pg_current_xact_id）。
+# 变更订阅按 (change_xid, id) 翻页，只返回事务号小于当前快照 xmin 的行：
+# 这些事务都已结束，之后不会再有更小事务号的行提交，游标不会跳过晚提交的事务
+CHANGE_XID_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION uni_documents_change_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+CHANGE_XID_TRIGGER_SQL = [
+    "DROP TRIGGER IF EXISTS trg_uni_documents_change_xid ON uni_documents",
+    "DROP TRIGGER IF EXISTS trg_uni_documents_change_xid_ins ON uni_documents",
+    "DROP TRIGGER IF EXISTS trg_uni_documents_change_xid_upd ON uni_documents",
+    "CREATE TRIGGER trg_uni_documents_change_xid_ins BEFORE INSERT ON uni_documents "
+    "FOR EACH ROW EXECUTE FUNCTION uni_documents_change_xid()",
+    "CREATE TRIGGER trg_uni_documents_change_xid_upd BEFORE UPDATE ON uni_documents "
+    f"FOR EACH ROW WHEN {DOCUMENT_CHANGED_WHEN} EXECUTE FUNCTION uni_documents_change_xid()",
+]
+
 
 class Document(Base):
-    """通用文档模型，映射到 uni_documents 表。"""
+    """通用文档模型，映射到 uni_documents 表。
+
+    主键为 (collection, id)：启用按 collection 的 LIST 分区后，
+    PostgreSQL 要求主键必须包含分区键，见 scripts/partition_documents.py。
+    """
 
     __tablename__ = "uni_documents"
 
     id = Column(String, primary_key=True, nullable=False)
-    collection = Column(String, nullable=False, index=True, comment="集合名称，如 requirements, bugs")
+    collection = Column(String, primary_key=True, nullable=False, index=True, comment="集合名称，如 requirements, bugs")
     app_name = Column(String, nullable=True, index=True)
     payload = Column(JSONB, nullable=True)
+    # 搜索投影：集合声明了 uni_collection_projections 时为 payload 的字段子集，
+    # CDC 只同步这一列；未声明时为 NULL，同步服务回退到 payload
+    search_doc = Column(JSONB, nullable=True)
     is_delete = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 最后一次写入该行的事务号，由 trg_uni_documents_change_xid_* 填写；加列前已有的行为 0
+    change_xid = Column(BigInteger, nullable=False, server_default=text("0"))
 
     # 复合索引：加速按应用和集合的查询
+    # 部分索引：读路径只访问未删除的行，墓碑不占用热索引；
+    # 另建墓碑索引供 PurgeService 定位可清理的行
     __table_args__ = (
         Index("idx_collection_app", "collection", "app_name"),
+        Index(
+            "idx_uni_documents_live",
+            "collection",
+            "app_name",
+            updated_at.desc(),
+            postgresql_where=text("is_delete = false"),
+        ),
+        # GIN 索引：加速 payload @> 包含查询（list_documents 的 contains / eq 过滤）
+        Index(
+            "idx_uni_documents_payload",
+            "payload",
+            postgresql_using="gin",
+            postgresql_ops={"payload": "jsonb_path_ops"},
+        ),
+        Index(
+            "idx_uni_documents_tombstone",
+            "updated_at",
+            postgresql_where=text("is_delete = true"),
+        ),
+        # 变更订阅按 (change_xid, id) 顺序翻页，需包含墓碑
+        Index("idx_uni_documents_change_xid", "collection", "app_name", "change_xid", "id"),
     )
 
     def __repr__(self) -> str:
         return f"<Document(id={self.id}, collection={self.collection})>"
+
+
+# create_all 建表后一并安装变更通知与变更序号触发器
+event.listen(Document.__table__, "after_create", DDL(NOTIFY_FUNCTION_SQL))
+event.listen(Document.__table__, "after_create", DDL(CHANGE_XID_FUNCTION_SQL))
+for _sql in NOTIFY_TRIGGER_SQL + CHANGE_XID_TRIGGER_SQL:
+    event.listen(Document.__table__, "after_create", DDL(_sql))
@@ -0,0 +1,53 @@
+"""冷文档归档表的数据库模型模块。"""
+from datetime import datetime
+from sqlalchemy import DDL, Boolean, Column, DateTime, Index, String, event
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.collection_counter import COUNTER_FUNCTION_SQL
+from app.models.testcase import Base
+
+ARCHIVE_TABLE = "uni_documents_archive"
+
+# 与 uni_documents 共用计数函数：归档只是换表存放，统计与配额仍计入归档文档
+ARCHIVE_COUNTER_TRIGGER_SQL = [
+    f"DROP TRIGGER IF EXISTS trg_uni_documents_archive_count_ins ON {ARCHIVE_TABLE}",
+    f"DROP TRIGGER IF EXISTS trg_uni_documents_archive_count_del ON {ARCHIVE_TABLE}",
+    f"CREATE TRIGGER trg_uni_documents_archive_count_ins AFTER INSERT ON {ARCHIVE_TABLE} "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uni_documents_count()",
+    f"CREATE TRIGGER trg_uni_documents_archive_count_del AFTER DELETE ON {ARCHIVE_TABLE} "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION uni_documents_count()",
+]
+
+
+class ArchivedDocument(Base):
+    """长期未更新的文档，映射到 uni_documents_archive 表。
+
+    列与 uni_documents 相同，只存未删除的文档；归档任务按批从热表移入，
+    写入或删除归档文档时先移回热表。只建主键与列表索引，不建 GIN 与表达式索引。
+    """
+
+    __tablename__ = ARCHIVE_TABLE
+
+    id = Column(String, primary_key=True, nullable=False)
+    collection = Column(String, primary_key=True, nullable=False)
+    app_name = Column(String, nullable=True)
+    payload = Column(JSONB, nullable=True)
+    search_doc = Column(JSONB, nullable=True)
+    is_delete = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_uni_documents_archive_list", "collection", "app_name", updated_at.desc()),
+        Index("idx_uni_documents_archive_app", "app_name"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ArchivedDocument(id={self.id}, collection={self.collection})>"
+
+
+# create_all 建表后一并安装计数触发器（DDL 语句会做 % 格式化，取模运算符需转义）
+event.listen(ArchivedDocument.__table__, "after_create", DDL(COUNTER_FUNCTION_SQL.replace("%", "%%")))
+for _sql in ARCHIVE_COUNTER_TRIGGER_SQL:
+    event.listen(ArchivedDocument.__table__, "after_create", DDL(_sql))
@@ -1,6 +1,6 @@
 """测试用例的数据库模型模块。"""
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Boolean
+from sqlalchemy import Column, String, DateTime, Boolean, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base
 
@@ -18,5 +18,14 @@ class TestCase(Base):
     is_delete = Column(Boolean, nullable=False, default=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # 墓碑部分索引：供 PurgeService 定位可清理的已删除行
+    __table_args__ = (
+        Index(
+            "idx_test_cases_tombstone",
+            "updated_at",
+            postgresql_where=text("is_delete = true"),
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<TestCase(id={self.id})>"
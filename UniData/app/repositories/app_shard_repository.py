@@ -0,0 +1,53 @@
+"""应用分片映射的仓储模块。"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.app_shard import SHARD_ACTIVE, AppShard
+
+
+class AppShardRepository:
+    """uni_app_shards 的读写（控制库）。"""
+
+    @staticmethod
+    async def get(db: AsyncSession, app_name: str) -> Optional[AppShard]:
+        result = await db.execute(select(AppShard).where(AppShard.app_name == app_name))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def list_all(db: AsyncSession) -> List[AppShard]:
+        result = await db.execute(select(AppShard).order_by(AppShard.app_name))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def pin(db: AsyncSession, app_name: str, shard: str) -> None:
+        """登记应用所在分片，已登记时保持不变（并发登记以先提交者为准）。"""
+        stmt = insert(AppShard).values(
+            app_name=app_name, shard=shard, state=SHARD_ACTIVE, updated_at=datetime.utcnow()
+        )
+        await db.execute(stmt.on_conflict_do_nothing(index_elements=[AppShard.app_name]))
+
+    @staticmethod
+    async def set_state(
+        db: AsyncSession, app_name: str, state: str, target_shard: Optional[str]
+    ) -> None:
+        await db.execute(
+            update(AppShard)
+            .where(AppShard.app_name == app_name)
+            .values(state=state, target_shard=target_shard, updated_at=datetime.utcnow())
+        )
+
+    @staticmethod
+    async def move(db: AsyncSession, app_name: str, shard: str) -> None:
+        """切换应用到新分片并恢复为 active。"""
+        await db.execute(
+            update(AppShard)
+            .where(AppShard.app_name == app_name)
+            .values(shard=shard, state=SHARD_ACTIVE, target_shard=None, updated_at=datetime.utcnow())
+        )
+
+
+app_shard_repository = AppShardRepository()
@@ -0,0 +1,241 @@
+"""冷文档归档表的仓储模块。
+
+归档与移回都是单条语句（DELETE ... RETURNING 作为 CTE 再 INSERT），
+行在两张表之间原子地移动，计数触发器的增减相互抵消。
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import String, any_, bindparam, delete, func, literal, select, text, tuple_, union_all
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.document import Document
+from app.models.document_archive import ARCHIVE_TABLE, ArchivedDocument
+from app.repositories.document_repository import DOCUMENTS_TABLE
+
+# 两张表共有的列
+COLUMNS = ("id", "collection", "app_name", "payload", "search_doc", "is_delete", "created_at", "updated_at")
+_COLUMNS_SQL = ", ".join(COLUMNS)
+
+# 把一批超过期限的未删除文档移入归档表。不排序：顺序扫描找到一批即停止，不需要额外的索引
+_ARCHIVE_SQL = text(f"""
+WITH batch AS (
+    SELECT collection, id FROM {DOCUMENTS_TABLE}
+    WHERE updated_at < :before AND is_delete = false
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+), moved AS (
+    DELETE FROM {DOCUMENTS_TABLE} d USING batch b
+    WHERE d.collection = b.collection AND d.id = b.id
+    RETURNING d.*
+)
+INSERT INTO {ARCHIVE_TABLE} ({_COLUMNS_SQL}, archived_at)
+SELECT {_COLUMNS_SQL}, :now FROM moved
+ON CONFLICT (collection, id) DO UPDATE SET
+    app_name = excluded.app_name,
+    payload = excluded.payload,
+    search_doc = excluded.search_doc,
+    created_at = excluded.created_at,
+    updated_at = excluded.updated_at,
+    archived_at = excluded.archived_at
+""")
+
+
+def _columns(model: Any) -> List[Any]:
+    table = model.__table__
+    return [table.c[name] for name in COLUMNS]
+
+
+class ArchiveRepository:
+    """uni_documents_archive 的读写。"""
+
+    @staticmethod
+    async def archive_batch(db: AsyncSession, before: datetime, limit: int) -> int:
+        """把最多 limit 行 updated_at 早于 before 的文档移入归档表，返回移动行数。"""
+        result = await db.execute(
+            _ARCHIVE_SQL, {"before": before, "limit": limit, "now": datetime.utcnow()}
+        )
+        return result.rowcount
+
+    @staticmethod
+    async def _restore(db: AsyncSession, where: List[ColumnElement]) -> int:
+        """把匹配的归档行移回热表，返回从归档表删除的行数。"""
+        moved = (
+            delete(ArchivedDocument).where(*where).returning(*_columns(ArchivedDocument)).cte("moved")
+        )
+        restored = (
+            insert(Document)
+            .from_select(list(COLUMNS), select(*[moved.c[name] for name in COLUMNS]))
+            .on_conflict_do_nothing(index_elements=[Document.collection, Document.id])
+            .cte("restored")
+        )
+        result = await db.execute(select(func.count()).select_from(moved).add_cte(restored))
+        return int(result.scalar() or 0)
+
+    @staticmethod
+    async def restore_by_ids(db: AsyncSession, collection: str, ids: List[str]) -> int:
+        """把归档表中的这些文档移回热表（热表中已有的以热表为准），返回移回行数。"""
+        return await ArchiveRepository._restore(db, [
+            ArchivedDocument.collection == collection,
+            ArchivedDocument.id == any_(bindparam("ids", ids, type_=ARRAY(String))),
+        ])
+
+    @staticmethod
+    async def restore_by_query(
+        db: AsyncSession, collection: str, app_name: str, clauses: List[ColumnElement], limit: int
+    ) -> int:
+        """把一批（最多 limit 行）匹配条件的当前应用归档文档移回热表，返回归档表中删除的行数。"""
+        batch = (
+            select(ArchivedDocument.collection, ArchivedDocument.id)
+            .where(
+                ArchivedDocument.collection == collection,
+                ArchivedDocument.app_name == app_name,
+                *clauses,
+            )
+            .limit(limit)
+        )
+        return await ArchiveRepository._restore(db, [
+            ArchivedDocument.collection == collection,
+            tuple_(ArchivedDocument.collection, ArchivedDocument.id).in_(batch),
+        ])
+
+    @staticmethod
+    async def get_document(db: AsyncSession, collection: str, id: str) -> Optional[ArchivedDocument]:
+        stmt = select(ArchivedDocument).where(
+            ArchivedDocument.collection == collection, ArchivedDocument.id == id
+        )
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_document_fields(
+        db: AsyncSession, collection: str, id: str, projection: ColumnElement
+    ) -> Optional[Dict[str, Any]]:
+        stmt = select(projection).where(
+            ArchivedDocument.collection == collection, ArchivedDocument.id == id
+        )
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_documents_by_ids(
+        db: AsyncSession,
+        collection: str,
+        ids: List[str],
+        projection: Optional[ColumnElement] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        stmt = select(
+            ArchivedDocument.id, projection if projection is not None else ArchivedDocument.payload
+        ).where(
+            ArchivedDocument.collection == collection,
+            ArchivedDocument.id == any_(bindparam("ids", ids, type_=ARRAY(String))),
+        )
+        result = await db.execute(stmt)
+        return {row[0]: row[1] for row in result.all()}
+
+    @staticmethod
+    async def list_with_archive(
+        db: AsyncSession,
+        collection: str,
+        doc_expr: ColumnElement,
+        app_name: Optional[str],
+        limit: int,
+        offset: int,
+        hot_clauses: Optional[List[ColumnElement]],
+        archive_clauses: Optional[List[ColumnElement]],
+    ) -> List[Any]:
+        """合并热表与归档表，按 updated_at 倒序分页，返回 doc_expr 的值。
+
+        doc_expr 只能引用不带表名的 payload 列（如 payload_query.projection_expr），两张表共用。
+        两侧各自先取 offset + limit 行，再在外层合并排序。
+        """
+
+        def side(model: Any, clauses: Optional[List[ColumnElement]]):
+            query = select(doc_expr.label("doc"), model.updated_at.label("updated_at")).where(
+                model.collection == collection, model.is_delete == False
+            )
+            if app_name:
+                query = query.where(model.app_name == app_name)
+            if clauses:
+                query = query.where(*clauses)
+            return query.order_by(model.updated_at.desc()).limit(offset + limit)
+
+        merged = union_all(side(Document, hot_clauses), side(ArchivedDocument, archive_clauses)).subquery()
+        query = select(merged.c.doc).order_by(merged.c.updated_at.desc()).limit(limit).offset(offset)
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def list_app_rows_batch(
+        db: AsyncSession, app_name: str, after: Optional[Tuple[str, str]], limit: int
+    ) -> List[ArchivedDocument]:
+        """按 (collection, id) 顺序读取应用的一批归档行，用于跨分片迁移。"""
+        query = select(ArchivedDocument).where(ArchivedDocument.app_name == app_name)
+        if after is not None:
+            query = query.where(
+                tuple_(ArchivedDocument.collection, ArchivedDocument.id)
+                > tuple_(literal(after[0]), literal(after[1]))
+            )
+        query = query.order_by(ArchivedDocument.collection, ArchivedDocument.id).limit(limit)
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def copy_rows(db: AsyncSession, rows: List[ArchivedDocument]) -> List[Tuple[str, str]]:
+        """把其他库读出的归档行原样写入，已存在时覆盖；同一 (collection, id) 已属于其他应用时不覆盖并返回。"""
+        if not rows:
+            return []
+        values = [
+            {**{name: getattr(row, name) for name in COLUMNS}, "archived_at": row.archived_at}
+            for row in rows
+        ]
+        stmt = insert(ArchivedDocument).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ArchivedDocument.collection, ArchivedDocument.id],
+            set_={
+                name: stmt.excluded[name]
+                for name in COLUMNS + ("archived_at",)
+                if name not in ("id", "collection")
+            },
+            where=ArchivedDocument.app_name == stmt.excluded.app_name,
+        ).returning(ArchivedDocument.collection, ArchivedDocument.id)
+        written = {tuple(key) for key in (await db.execute(stmt)).all()}
+        return [(row.collection, row.id) for row in rows if (row.collection, row.id) not in written]
+
+    @staticmethod
+    async def drop_restored(db: AsyncSession, app_name: str) -> int:
+        """删除热表中已有同一文档的归档行（以热表为准），返回删除行数。"""
+        stmt = delete(ArchivedDocument).where(
+            ArchivedDocument.app_name == app_name,
+            tuple_(ArchivedDocument.collection, ArchivedDocument.id).in_(
+                select(Document.collection, Document.id).where(Document.app_name == app_name)
+            ),
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
+
+    @staticmethod
+    async def count_app_rows(db: AsyncSession, app_name: str) -> int:
+        result = await db.execute(
+            select(func.count()).select_from(ArchivedDocument).where(ArchivedDocument.app_name == app_name)
+        )
+        return int(result.scalar() or 0)
+
+    @staticmethod
+    async def delete_app_rows_batch(db: AsyncSession, app_name: str, limit: int) -> int:
+        """物理删除应用的一批归档行（迁移到其他分片后清理源库），返回删除行数。"""
+        batch = (
+            select(ArchivedDocument.collection, ArchivedDocument.id)
+            .where(ArchivedDocument.app_name == app_name)
+            .limit(limit)
+        )
+        stmt = delete(ArchivedDocument).where(
+            tuple_(ArchivedDocument.collection, ArchivedDocument.id).in_(batch)
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
+
+
+archive_repository = ArchiveRepository()
@@ -0,0 +1,84 @@
+"""外置大字段（blob）的仓储模块。"""
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.blob import Blob
+from app.models.document_archive import ARCHIVE_TABLE
+from app.repositories.document_repository import DOCUMENTS_TABLE
+
+# 处理一批超过保留期的 blob：仍被文档（含归档表）顶层字段引用的刷新 touched_at（推迟到下一个保留期再检查），
+# 其余物理删除。候选行加锁后会重新判断 touched_at，并发写入刷新过的行不会被删除。
+_PURGE_SQL = text(f"""
+WITH candidates AS (
+    SELECT hash FROM uni_blobs WHERE touched_at < :before
+    ORDER BY touched_at LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+), referenced AS (
+    SELECT DISTINCT e.value ->> '$blob' AS hash
+    FROM (
+        SELECT payload FROM {DOCUMENTS_TABLE}
+        UNION ALL SELECT payload FROM {ARCHIVE_TABLE}
+    ) d CROSS JOIN LATERAL jsonb_each(d.payload) e
+    WHERE jsonb_typeof(e.value) = 'object'
+      AND e.value ->> '$blob' IN (SELECT hash FROM candidates)
+), touched AS (
+    UPDATE uni_blobs SET touched_at = :now
+    WHERE hash IN (SELECT hash FROM referenced)
+    RETURNING hash
+), deleted AS (
+    DELETE FROM uni_blobs
+    WHERE hash IN (SELECT hash FROM candidates)
+      AND hash NOT IN (SELECT hash FROM referenced)
+    RETURNING hash
+)
+SELECT (SELECT count(*) FROM candidates), (SELECT count(*) FROM deleted)
+""")
+
+
+class BlobRepository:
+    """blob 的读写与清理。"""
+
+    @staticmethod
+    async def save_blobs(db: AsyncSession, blobs: List[Tuple[str, Any, int]]) -> None:
+        """写入 [(hash, value, size)]，已存在的只刷新 touched_at。"""
+        if not blobs:
+            return
+        now = datetime.utcnow()
+        stmt = insert(Blob).values([
+            {"hash": h, "value": value, "size": size, "created_at": now, "touched_at": now}
+            for h, value, size in blobs
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Blob.hash],
+            set_={"touched_at": stmt.excluded.touched_at},
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def get_blobs(db: AsyncSession, hashes: List[str]) -> Dict[str, Any]:
+        """按 hash 批量读取，返回 {hash: value}，不存在的不出现在结果中。"""
+        if not hashes:
+            return {}
+        result = await db.execute(select(Blob.hash, Blob.value).where(Blob.hash.in_(hashes)))
+        return {h: value for h, value in result.all()}
+
+    @staticmethod
+    async def purge_unreferenced_blobs(
+        db: AsyncSession, before: datetime, limit: int
+    ) -> Tuple[int, int]:
+        """处理一批 touched_at 早于 before 的 blob，返回 (检查数, 删除数)。
+
+        引用检查需要扫描一遍 uni_documents 与归档表的 payload，只适合在清理任务中低频执行。
+        """
+        result = await db.execute(
+            _PURGE_SQL, {"before": before, "limit": limit, "now": datetime.utcnow()}
+        )
+        checked, deleted = result.one()
+        return int(checked), int(deleted)
+
+
+blob_repository = BlobRepository()
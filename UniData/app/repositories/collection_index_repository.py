@@ -0,0 +1,83 @@
+"""集合字段索引声明的仓储模块。"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.models.collection_index import CollectionIndex
+
+
+class CollectionIndexRepository:
+    """索引声明的读写，以及表达式索引的 DDL。"""
+
+    @staticmethod
+    async def list_indexes(db: AsyncSession, collection: str) -> List[CollectionIndex]:
+        result = await db.execute(
+            select(CollectionIndex).where(CollectionIndex.collection == collection)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_index(db: AsyncSession, collection: str, field: str) -> Optional[CollectionIndex]:
+        return await db.get(CollectionIndex, (collection, field))
+
+    @staticmethod
+    async def save_index(
+        db: AsyncSession,
+        collection: str,
+        field: str,
+        field_type: str,
+        index_name: str,
+    ) -> CollectionIndex:
+        obj = CollectionIndex(
+            collection=collection,
+            field=field,
+            field_type=field_type,
+            index_name=index_name,
+            created_at=datetime.utcnow(),
+        )
+        db.add(obj)
+        await db.flush()
+        return obj
+
+    @staticmethod
+    async def create_index_concurrently(
+        conn: AsyncConnection,
+        index_name: str,
+        table: str,
+        columns_sql: str,
+        where_sql: str,
+        method: str = "btree",
+    ) -> None:
+        """并发创建索引，conn 必须处于自动提交模式。
+
+        CONCURRENTLY 失败会残留 INVALID 索引，这里负责清理后再抛出异常。
+        """
+        try:
+            await conn.execute(
+                text(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name}" '
+                    f'ON "{table}" USING {method} ({columns_sql}) WHERE {where_sql}'
+                )
+            )
+        except Exception:
+            await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"'))
+            raise
+
+    @staticmethod
+    async def ensure_extension(conn: AsyncConnection, name: str) -> bool:
+        """安装扩展（已安装时跳过），服务器未提供或无权限时返回 False。"""
+        available = await conn.scalar(
+            text("SELECT 1 FROM pg_available_extensions WHERE name = :name"), {"name": name}
+        )
+        if not available:
+            return False
+        try:
+            await conn.execute(text(f'CREATE EXTENSION IF NOT EXISTS "{name}"'))
+        except Exception:
+            return False
+        return True
+
+
+collection_index_repository = CollectionIndexRepository()
@@ -0,0 +1,62 @@
+"""集合搜索投影声明的仓储模块。"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.collection_projection import CollectionProjection
+
+
+class CollectionProjectionRepository:
+    """集合搜索投影的读写。"""
+
+    @staticmethod
+    async def get_projection(
+        db: AsyncSession, app_name: str, collection: str
+    ) -> Optional[CollectionProjection]:
+        return await db.get(CollectionProjection, (app_name, collection))
+
+    @staticmethod
+    async def list_projections(db: AsyncSession, collection: str) -> List[CollectionProjection]:
+        """列出各应用在 collection 上声明的投影。"""
+        result = await db.execute(
+            select(CollectionProjection).where(CollectionProjection.collection == collection)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def save_projection(
+        db: AsyncSession, app_name: str, collection: str, fields: List[str]
+    ) -> CollectionProjection:
+        """新建或替换应用在 collection 上的投影，替换时 version 加一。"""
+        now = datetime.utcnow()
+        obj = await db.get(CollectionProjection, (app_name, collection))
+        if obj:
+            obj.fields = fields
+            obj.version = obj.version + 1
+            obj.updated_at = now
+        else:
+            obj = CollectionProjection(
+                collection=collection,
+                app_name=app_name,
+                fields=fields,
+                version=1,
+                updated_at=now,
+            )
+            db.add(obj)
+        await db.flush()
+        return obj
+
+    @staticmethod
+    async def delete_projection(db: AsyncSession, app_name: str, collection: str) -> bool:
+        result = await db.execute(
+            delete(CollectionProjection).where(
+                CollectionProjection.app_name == app_name,
+                CollectionProjection.collection == collection,
+            )
+        )
+        return result.rowcount > 0
+
+
+collection_projection_repository = CollectionProjectionRepository()
@@ -0,0 +1,52 @@
+"""集合 JSON Schema 注册的仓储模块。"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.collection_schema import CollectionSchema
+
+
+class CollectionSchemaRepository:
+    """集合 JSON Schema 的读写。"""
+
+    @staticmethod
+    async def get_schema(db: AsyncSession, app_name: str, collection: str) -> Optional[CollectionSchema]:
+        return await db.get(CollectionSchema, (app_name, collection))
+
+    @staticmethod
+    async def save_schema(
+        db: AsyncSession, app_name: str, collection: str, schema: Dict[str, Any]
+    ) -> CollectionSchema:
+        """新建或替换应用在 collection 上的 schema，替换时 version 加一。"""
+        now = datetime.utcnow()
+        obj = await db.get(CollectionSchema, (app_name, collection))
+        if obj:
+            obj.schema = schema
+            obj.version = obj.version + 1
+            obj.updated_at = now
+        else:
+            obj = CollectionSchema(
+                collection=collection,
+                app_name=app_name,
+                schema=schema,
+                version=1,
+                updated_at=now,
+            )
+            db.add(obj)
+        await db.flush()
+        return obj
+
+    @staticmethod
+    async def delete_schema(db: AsyncSession, app_name: str, collection: str) -> bool:
+        result = await db.execute(
+            delete(CollectionSchema).where(
+                CollectionSchema.app_name == app_name,
+                CollectionSchema.collection == collection,
+            )
+        )
+        return result.rowcount > 0
+
+
+collection_schema_repository = CollectionSchemaRepository()
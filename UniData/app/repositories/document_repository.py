@@ -1,73 +1,248 @@
-"""通用文档数据库操作的仓储模块。"""
+"""通用文档数据库操作的仓储模块。
+
+uni_documents 可以按 collection 做 LIST 分区，因此这里所有查询都必须带上
+collection 等值条件，让 PostgreSQL 只扫描对应分区（分区裁剪）。
+"""
+import hashlib
 import json
+import re
 from datetime import datetime
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any, Dict, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import (
+    BigInteger,
+    String,
+    any_,
+    bindparam,
+    case,
+    delete,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    text,
+    true,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
 
 from app.models.document import Document
+from app.models.document_archive import ArchivedDocument
+from app.repositories.payload_query import field_expr, split_field_path
+
+# 分区表的父表与默认分区名称
+DOCUMENTS_TABLE = "uni_documents"
+DEFAULT_PARTITION = "uni_documents_default"
+
+# 当前快照的事务号边界（PostgreSQL 13+），与 uni_documents.change_xid 比较
+_SNAPSHOT_XMIN = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+_SNAPSHOT_XMAX = "pg_snapshot_xmax(pg_current_snapshot())::text::bigint"
+
+
+def partition_table_name(collection: str) -> str:
+    """根据 collection 生成分区子表名。
+
+    collection 可以是任意字符串，这里只保留小写字母、数字和下划线，
+    再附加一段哈希保证唯一性，并控制在 PostgreSQL 63 字节的标识符长度内。
+    """
+    slug = re.sub(r"[^a-z0-9_]", "_", collection.lower())[:32]
+    digest = hashlib.md5(collection.encode("utf-8")).hexdigest()[:8]
+    return f"{DOCUMENTS_TABLE}_p_{slug}_{digest}"
+
+
+def _quote_literal(value: str) -> str:
+    """将字符串转为 SQL 字面量（DDL 中的分区边界无法使用绑定参数）。"""
+    return "'" + value.replace("'", "''") + "'"
 
 
 class DocumentRepository:
     """通用文档 CRUD 操作的仓储类。"""
 
+    @staticmethod
+    async def partition_exists(db: AsyncSession, collection: str) -> bool:
+        """判断 collection 对应的分区子表是否已存在。"""
+        result = await db.execute(
+            text("SELECT to_regclass(:name) IS NOT NULL"),
+            {"name": partition_table_name(collection)},
+        )
+        return bool(result.scalar())
+
+    @staticmethod
+    async def default_partition_has_rows(db: AsyncSession, collection: str) -> bool:
+        """默认分区中是否已有 collection 的行（有时无法再为它建分区，需先迁出）。"""
+        result = await db.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE collection = :collection)"),
+            {"collection": collection},
+        )
+        return bool(result.scalar())
+
+    @staticmethod
+    async def create_collection_partition(
+        db: AsyncSession, collection: str, lock_timeout_ms: Optional[int] = None
+    ) -> str:
+        """为 collection 创建 LIST 分区子表，返回子表名。
+
+        lock_timeout_ms 限制本事务等待父表锁的时间，避免在线请求被长事务阻塞。
+        """
+        name = partition_table_name(collection)
+        if lock_timeout_ms:
+            await db.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+        await db.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {DOCUMENTS_TABLE} '
+                f"FOR VALUES IN ({_quote_literal(collection)})"
+            )
+        )
+        return name
+
     @staticmethod
     async def upsert_document(
         db: AsyncSession, 
         collection: str, 
         id: str, 
         app_name: str,
-        payload: Dict[str, Any]
+        payload: Dict[str, Any],
+        search_doc: Optional[Dict[str, Any]] = None,
     ) -> None:
         """
-        插入或更新文档。
-        """
-        stmt = select(Document).where(Document.id == id, Document.collection == collection)
-        result = await db.execute(stmt)
-        existing = result.scalar_one_or_none()
+        插入或更新文档：一条 INSERT ... ON CONFLICT (collection, id) DO UPDATE，不先 SELECT。
 
+        已存在时覆盖 payload、允许归属应用变更并复活已删除的文档，保留 created_at。
+        """
         now = datetime.utcnow()
+        stmt = insert(Document).values(
+            id=id,
+            collection=collection,
+            app_name=app_name,
+            payload=payload,
+            search_doc=search_doc,
+            is_delete=False,
+            created_at=now,
+            updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Document.collection, Document.id],
+            set_={
+                "payload": stmt.excluded.payload,
+                "search_doc": stmt.excluded.search_doc,
+                "app_name": stmt.excluded.app_name,
+                "is_delete": False,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await db.execute(stmt)
 
-        if existing:
-            # 确保 app_name 一致性，或者允许修改 app_name？
-            # 通常 id 应该是全局唯一的，但这里我们加上 collection 约束，id 在 collection 内唯一？
-            # 现在的 PK 是 id，意味着全局唯一。所以 collection 其实是属性。
-            # 如果 id 相同但 collection 不同，数据库会报错（主键冲突）。
-            # 假设 id 是 UUID 或者业务唯一 ID。
-            
-            existing.payload = payload
-            existing.app_name = app_name # 允许归属变更
-            existing.updated_at = now
-            existing.is_delete = False # 复活
-        else:
-            obj = Document(
-                id=id, 
-                collection=collection,
-                app_name=app_name,
-                payload=payload, 
-                created_at=now,
-                updated_at=now
-            )
-            db.add(obj)
+    @staticmethod
+    async def bulk_upsert_documents(
+        db: AsyncSession,
+        collection: str,
+        app_name: str,
+        payloads: List[Dict[str, Any]],
+        search_docs: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """
+        批量插入或更新文档：一条 INSERT ... ON CONFLICT (collection, id) DO UPDATE。
 
-        await db.flush()
+        语义与 upsert_document 一致（覆盖 payload、复活已删除文档、保留 created_at）。
+        同一条语句不能两次更新同一行，调用方需保证 payloads 中的 id 不重复。
+        search_docs 与 payloads 一一对应，不传时 search_doc 为 NULL。
+        """
+        now = datetime.utcnow()
+        if search_docs is None:
+            search_docs = [None] * len(payloads)
+        stmt = insert(Document).values([
+            {
+                "id": str(payload["id"]),
+                "collection": collection,
+                "app_name": app_name,
+                "payload": payload,
+                "search_doc": search_doc,
+                "is_delete": False,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for payload, search_doc in zip(payloads, search_docs)
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Document.collection, Document.id],
+            set_={
+                "payload": stmt.excluded.payload,
+                "search_doc": stmt.excluded.search_doc,
+                "app_name": stmt.excluded.app_name,
+                "is_delete": False,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await db.execute(stmt)
 
     @staticmethod
-    async def soft_delete_document(db: AsyncSession, collection: str, id: str) -> bool:
-        """软删除文档。"""
+    async def soft_delete_document(db: AsyncSession, collection: str, id: str) -> Optional[str]:
+        """软删除文档（单条 UPDATE ... RETURNING），返回文档所属应用，不存在时返回 None。"""
         # 为了安全，必须匹配 collection
-        stmt = select(Document).where(Document.id == id, Document.collection == collection)
+        stmt = (
+            update(Document)
+            .where(Document.id == id, Document.collection == collection)
+            .values(is_delete=True, updated_at=datetime.utcnow())
+            .returning(Document.app_name)
+            .execution_options(synchronize_session=False)
+        )
         result = await db.execute(stmt)
-        obj = result.scalar_one_or_none()
-        
-        if not obj:
-            return False
-            
-        obj.is_delete = True
-        obj.updated_at = datetime.utcnow()
-        await db.flush()
-        return True
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def soft_delete_documents_by_ids(
+        db: AsyncSession, collection: str, app_name: str, ids: List[str]
+    ) -> int:
+        """按 ID 列表批量软删除当前应用的文档（单条 UPDATE），返回影响行数。"""
+        stmt = (
+            update(Document)
+            .where(
+                Document.collection == collection,
+                Document.app_name == app_name,
+                Document.id == any_(bindparam("ids", ids, type_=ARRAY(String))),
+                Document.is_delete == False,
+            )
+            .values(is_delete=True, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
+
+    @staticmethod
+    async def soft_delete_documents_by_query(
+        db: AsyncSession,
+        collection: str,
+        app_name: str,
+        clauses: List[ColumnElement],
+        limit: int,
+    ) -> int:
+        """软删除一批（最多 limit 行）匹配过滤条件的当前应用文档，返回影响行数。"""
+        batch = (
+            select(Document.collection, Document.id)
+            .where(
+                Document.collection == collection,
+                Document.app_name == app_name,
+                Document.is_delete == False,
+                *clauses,
+            )
+            .limit(limit)
+        )
+        stmt = (
+            update(Document)
+            .where(
+                Document.collection == collection,
+                tuple_(Document.collection, Document.id).in_(batch),
+            )
+            .values(is_delete=True, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
 
     @staticmethod
     async def get_document(db: AsyncSession, collection: str, id: str) -> Optional[Document]:
@@ -76,24 +251,445 @@ class DocumentRepository:
         result = await db.execute(stmt)
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_document_fields(
+        db: AsyncSession, collection: str, id: str, projection: ColumnElement
+    ) -> Optional[Dict[str, Any]]:
+        """根据 ID 获取文档的投影（projection 见 payload_query.projection_expr）。"""
+        stmt = select(projection).where(Document.id == id, Document.collection == collection, Document.is_delete == False)
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_documents_by_ids(
+        db: AsyncSession,
+        collection: str,
+        ids: List[str],
+        projection: Optional[ColumnElement] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """一次查询按 ID 批量获取文档，返回 {id: payload 或投影}。
+
+        ids 作为单个数组参数绑定（id = ANY($1)），语句文本与 ID 个数无关，可复用预编译语句。
+        """
+        ids_param = bindparam("ids", ids, type_=ARRAY(String))
+        stmt = select(Document.id, projection if projection is not None else Document.payload).where(
+            Document.collection == collection,
+            Document.id == any_(ids_param),
+            Document.is_delete == False,
+        )
+        result = await db.execute(stmt)
+        return {row[0]: row[1] for row in result.all()}
+
+    @staticmethod
+    async def existing_ids(db: AsyncSession, collection: str, ids: List[str]) -> List[str]:
+        """返回 ids 中已存在且未删除的 ID（只读主键，不取 payload）。"""
+        stmt = select(Document.id).where(
+            Document.collection == collection,
+            Document.id == any_(bindparam("ids", ids, type_=ARRAY(String))),
+            Document.is_delete == False,
+        )
+        result = await db.execute(stmt)
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def app_has_documents(db: AsyncSession, app_name: str) -> bool:
+        """判断应用在当前库中是否有文档（含已软删除的）。"""
+        result = await db.execute(select(Document.id).where(Document.app_name == app_name).limit(1))
+        return result.first() is not None
+
+    @staticmethod
+    async def list_app_rows_batch(
+        db: AsyncSession,
+        app_name: str,
+        after: Optional[Tuple[int, str, str]],
+        limit: int,
+    ) -> List[Document]:
+        """按 (change_xid, collection, id) 顺序读取应用的一批行（含墓碑），用于跨分片迁移。
+
+        与 list_changes 相同，只返回事务号小于当前快照 xmin 的行，游标不会跳过晚提交的事务。
+        """
+        query = select(Document).where(
+            Document.app_name == app_name,
+            Document.change_xid < literal_column(_SNAPSHOT_XMIN),
+        )
+        if after is not None:
+            query = query.where(
+                tuple_(Document.change_xid, Document.collection, Document.id)
+                > tuple_(literal(after[0], BigInteger), literal(after[1]), literal(after[2]))
+            )
+        query = query.order_by(Document.change_xid, Document.collection, Document.id).limit(limit)
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def snapshot_bounds(db: AsyncSession) -> Tuple[int, int]:
+        """返回当前快照的 (xmin, xmax)：小于 xmin 的事务都已结束，不小于 xmax 的事务尚未开始。"""
+        result = await db.execute(
+            select(literal_column(_SNAPSHOT_XMIN), literal_column(_SNAPSHOT_XMAX))
+        )
+        xmin, xmax = result.one()
+        return xmin, xmax
+
+    @staticmethod
+    async def copy_rows(db: AsyncSession, rows: List[Document]) -> List[Tuple[str, str]]:
+        """把其他库读出的行原样写入（保留 is_delete 与时间戳），已存在时覆盖。
+
+        目标库中同一 (collection, id) 已属于其他应用时不覆盖，返回这些行的 (collection, id)。
+        """
+        if not rows:
+            return []
+        stmt = insert(Document).values([
+            {
+                "id": row.id,
+                "collection": row.collection,
+                "app_name": row.app_name,
+                "payload": row.payload,
+                "search_doc": row.search_doc,
+                "is_delete": row.is_delete,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+            }
+            for row in rows
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Document.collection, Document.id],
+            set_={
+                "app_name": stmt.excluded.app_name,
+                "payload": stmt.excluded.payload,
+                "search_doc": stmt.excluded.search_doc,
+                "is_delete": stmt.excluded.is_delete,
+                "created_at": stmt.excluded.created_at,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            where=Document.app_name == stmt.excluded.app_name,
+        ).returning(Document.collection, Document.id)
+        written = {tuple(key) for key in (await db.execute(stmt)).all()}
+        return [(row.collection, row.id) for row in rows if (row.collection, row.id) not in written]
+
+    @staticmethod
+    async def count_app_rows(db: AsyncSession, app_name: str) -> int:
+        result = await db.execute(
+            select(func.count()).select_from(Document).where(Document.app_name == app_name)
+        )
+        return int(result.scalar() or 0)
+
+    @staticmethod
+    async def delete_app_rows_batch(db: AsyncSession, app_name: str, limit: int) -> int:
+        """物理删除应用的一批行（迁移到其他分片后清理源库），返回删除行数。"""
+        batch = select(Document.collection, Document.id).where(Document.app_name == app_name).limit(limit)
+        stmt = delete(Document).where(tuple_(Document.collection, Document.id).in_(batch))
+        result = await db.execute(stmt)
+        return result.rowcount
+
+    @staticmethod
+    async def list_payload_batch(
+        db: AsyncSession, collection: str, after_id: Optional[str], limit: int
+    ) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """按 id 顺序分批读取 collection 的 (id, app_name, payload)，用于离线重算 search_doc。"""
+        stmt = select(Document.id, Document.app_name, Document.payload).where(
+            Document.collection == collection
+        )
+        if after_id is not None:
+            stmt = stmt.where(Document.id > after_id)
+        result = await db.execute(stmt.order_by(Document.id).limit(limit))
+        return [(row.id, row.app_name, row.payload) for row in result.all()]
+
+    @staticmethod
+    async def sample_payloads(
+        db: AsyncSession, collection: str, app_name: str, limit: int
+    ) -> List[Dict[str, Any]]:
+        """读取应用在 collection 下最近更新的一批 payload（走列表索引），用于推断导出列。"""
+        query = DocumentRepository._list_query(Document.payload, collection, app_name, limit, 0, None)
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    def export_query(
+        collection: str, app_name: str, exprs: List[ColumnElement], include_archived: bool
+    ):
+        """导出用的查询：(id, updated_at, *exprs)，不排序，由服务端游标分批读取。
+
+        exprs 只能引用不带表名的 payload 列，include_archived 时与归档表 UNION ALL。
+        """
+
+        def side(model: Any):
+            return select(model.id, model.updated_at, *exprs).where(
+                model.collection == collection,
+                model.app_name == app_name,
+                model.is_delete == False,
+            )
+
+        if include_archived:
+            return union_all(side(Document), side(ArchivedDocument))
+        return side(Document)
+
+    @staticmethod
+    async def facet_counts(
+        db: AsyncSession,
+        collection: str,
+        app_name: str,
+        fields: List[str],
+        size: int,
+        clauses: Optional[List[ColumnElement]] = None,
+        archive_clauses: Optional[List[ColumnElement]] = None,
+        include_archived: bool = False,
+    ) -> List[Tuple[str, str, int]]:
+        """统计各字段的取值分布，返回 [(field, value, count)]，每个字段最多 size 个取值。
+
+        所有字段在一次扫描中完成：jsonb_each(jsonb_build_object(...)) 把每行展开为 (field, 值)，
+        数组值再经 jsonb_array_elements 展开为元素，标量视为单元素数组；
+        值按 JSON 文本分组（#>> '{}'，数字与布尔为其字面量），null 与缺失的字段不计入。
+        计数为包含该取值的文档数（count(DISTINCT id)），同一数组中重复的元素只计一次。
+        字段路径经过校验后以字面量写入 SQL。
+        """
+
+        def side(model: Any, side_clauses: Optional[List[ColumnElement]]):
+            query = select(model.id.label("id"), model.payload.label("payload")).where(
+                model.collection == collection,
+                model.app_name == app_name,
+                model.is_delete == False,
+            )
+            if side_clauses:
+                query = query.where(*side_clauses)
+            return query
+
+        if include_archived:
+            docs = union_all(side(Document, clauses), side(ArchivedDocument, archive_clauses))
+        else:
+            docs = side(Document, clauses)
+        docs = docs.subquery("docs")
+
+        payload = docs.c.payload
+        pairs = []
+        for field in fields:
+            path = ",".join(split_field_path(field))
+            pairs += [literal_column(f"'{field}'"), payload.op("#>")(literal_column(f"'{{{path}}}'"))]
+        f = func.jsonb_each(func.jsonb_build_object(*pairs)).table_valued("key", "value").lateral("f")
+        elements = case(
+            (func.jsonb_typeof(f.c.value) == "array", f.c.value),
+            else_=func.jsonb_build_array(f.c.value),
+        )
+        e = func.jsonb_array_elements(elements).table_valued("value").lateral("e")
+        value = e.c.value.op("#>>")(literal_column("'{}'"))
+        counted = (
+            select(f.c.key.label("field"), value.label("value"), func.count(docs.c.id.distinct()).label("n"))
+            .select_from(docs.join(f, true()).join(e, true()))
+            .where(func.jsonb_typeof(e.c.value) != "null")
+            .group_by(f.c.key, value)
+            .subquery("counted")
+        )
+        ranked = select(
+            counted.c.field,
+            counted.c.value,
+            counted.c.n,
+            func.row_number()
+            .over(partition_by=counted.c.field, order_by=(counted.c.n.desc(), counted.c.value))
+            .label("rank"),
+        ).subquery("ranked")
+        query = (
+            select(ranked.c.field, ranked.c.value, ranked.c.n)
+            .where(ranked.c.rank <= size)
+            .order_by(ranked.c.field, ranked.c.rank)
+        )
+        result = await db.execute(query)
+        return [(field, value, int(n)) for field, value, n in result.all()]
+
+    @staticmethod
+    async def search_documents(
+        db: AsyncSession,
+        collection: str,
+        app_name: str,
+        q: str,
+        fields: List[str],
+        limit: int,
+        offset: int,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """按关键字搜索文档，返回 (当前页的 payload, 命中总数)。
+
+        命中条件：id 等于 q（主键），或任一 search 字段 ILIKE '%q%'（pg_trgm GIN 索引）。
+        排序：id 完全相同 > 字段完全相同（忽略大小写）> 字段以 q 开头 > 字段包含 q，同分按更新时间倒序。
+        ILIKE 按字符匹配，不依赖分词，中文关键字同样适用。
+        """
+        escaped = re.sub(r"([\\%_])", r"\\\1", q)
+        contains_pattern, prefix_pattern = f"%{escaped}%", f"{escaped}%"
+        exprs = [field_expr(field, "search") for field in fields]
+        scores = [case((Document.id == q, 4), else_=0)]
+        for expr in exprs:
+            scores.append(
+                case(
+                    (func.lower(expr) == q.lower(), 3),
+                    (expr.ilike(prefix_pattern), 2),
+                    (expr.ilike(contains_pattern), 1),
+                    else_=0,
+                )
+            )
+        score = func.greatest(*scores).label("score")
+        query = (
+            select(Document.payload, score, func.count().over().label("total"))
+            .where(
+                Document.collection == collection,
+                Document.app_name == app_name,
+                Document.is_delete == False,
+                or_(Document.id == q, *[expr.ilike(contains_pattern) for expr in exprs]),
+            )
+            .order_by(score.desc(), Document.updated_at.desc(), Document.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        rows = (await db.execute(query)).all()
+        return [row.payload for row in rows], (int(rows[0].total) if rows else 0)
+
+    @staticmethod
+    async def list_by_id_prefix(
+        db: AsyncSession,
+        collection: str,
+        app_name: str,
+        prefix: str,
+        limit: int,
+        offset: int,
+    ) -> List[Dict[str, Any]]:
+        """按 ID 前缀列出文档，按 ID 排序。
+
+        id >= prefix 让扫描从主键索引上的前缀位置开始（任何排序规则下前缀都不大于以它开头的串），
+        starts_with 负责精确判断，不受 LIKE 通配符与排序规则影响。
+        """
+        query = (
+            select(Document.payload)
+            .where(
+                Document.collection == collection,
+                Document.app_name == app_name,
+                Document.is_delete == False,
+                Document.id >= prefix,
+                func.starts_with(Document.id, prefix),
+            )
+            .order_by(Document.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def set_search_docs(
+        db: AsyncSession,
+        collection: str,
+        items: List[Tuple[str, str, Optional[Dict[str, Any]]]],
+    ) -> None:
+        """批量更新 search_doc，items 为 (app_name, id, search_doc)。
+
+        只更新仍属于该 app_name 的行：读取后文档若被其他应用覆盖写入，不会套用旧应用的投影。
+        不修改 updated_at；payload、is_delete、updated_at 都不变时 NOTIFY 与 change_xid 触发器
+        不触发（见 models/document.py），变更订阅与 _changes 不会因重算收到事件。
+        """
+        stmt = (
+            update(Document)
+            .where(
+                Document.collection == collection,
+                Document.id == bindparam("b_id"),
+                Document.app_name == bindparam("b_app_name"),
+            )
+            # 显式保留 updated_at，否则会触发列上的 onupdate
+            .values(search_doc=bindparam("b_search_doc"), updated_at=Document.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        conn = await db.connection()
+        await conn.execute(
+            stmt,
+            [
+                {"b_app_name": app_name, "b_id": id, "b_search_doc": doc}
+                for app_name, id, doc in items
+            ],
+        )
+
     @staticmethod
     async def list_documents(
         db: AsyncSession, 
         collection: str, 
         app_name: Optional[str] = None, 
         limit: int = 20, 
-        offset: int = 0
+        offset: int = 0,
+        clauses: Optional[List[ColumnElement]] = None,
     ) -> List[Document]:
-        """列出文档。"""
-        query = select(Document).where(Document.collection == collection, Document.is_delete == False)
+        """列出文档。clauses 为 payload 过滤条件，见 payload_query.build_filter_clauses。"""
+        query = DocumentRepository._list_query(Document, collection, app_name, limit, offset, clauses)
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    @staticmethod
+    async def list_document_fields(
+        db: AsyncSession,
+        collection: str,
+        projection: ColumnElement,
+        app_name: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        clauses: Optional[List[ColumnElement]] = None,
+    ) -> List[Dict[str, Any]]:
+        """列出文档的投影，只有请求的字段会从数据库返回。"""
+        query = DocumentRepository._list_query(projection, collection, app_name, limit, offset, clauses)
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    @staticmethod
+    def _list_query(
+        columns: Any,
+        collection: str,
+        app_name: Optional[str],
+        limit: int,
+        offset: int,
+        clauses: Optional[List[ColumnElement]],
+    ):
+        query = select(columns).where(Document.collection == collection, Document.is_delete == False)
         
         if app_name:
             query = query.where(Document.app_name == app_name)
+
+        if clauses:
+            query = query.where(*clauses)
             
-        query = query.order_by(Document.updated_at.desc()).limit(limit).offset(offset)
-        
+        return query.order_by(Document.updated_at.desc()).limit(limit).offset(offset)
+
+    @staticmethod
+    async def list_changes(
+        db: AsyncSession,
+        collection: str,
+        app_name: str,
+        after: Optional[Tuple[int, str]],
+        limit: int,
+    ) -> List[Document]:
+        """按 (change_xid, id) 顺序列出 after 之后的变更（包含墓碑）。
+
+        只返回事务号小于当前快照 xmin 的行：更小事务号的事务都已结束，
+        之后提交的写入事务号一定不小于 xmin，不会落到游标之前。
+        行比较 (change_xid, id) > (:xid, :id) 可直接走 idx_uni_documents_change_xid。
+        """
+        query = select(Document).where(
+            Document.collection == collection,
+            Document.app_name == app_name,
+            Document.change_xid < literal_column(_SNAPSHOT_XMIN),
+        )
+        if after is not None:
+            query = query.where(
+                tuple_(Document.change_xid, Document.id) > tuple_(literal(after[0], BigInteger), literal(after[1]))
+            )
+        query = query.order_by(Document.change_xid, Document.id).limit(limit)
         result = await db.execute(query)
-        return result.scalars().all()
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def purge_deleted_documents(db: AsyncSession, before: datetime, limit: int) -> int:
+        """物理删除一批在 before 之前软删除的文档，返回删除行数。
+
+        清理任务横跨所有 collection，依赖 idx_uni_documents_tombstone 部分索引定位墓碑。
+        """
+        batch = (
+            select(Document.collection, Document.id)
+            .where(Document.is_delete == True, Document.updated_at < before)
+            .limit(limit)
+        )
+        stmt = delete(Document).where(tuple_(Document.collection, Document.id).in_(batch))
+        result = await db.execute(stmt)
+        return result.rowcount
 
 
 document_repository = DocumentRepository()
@@ -0,0 +1,240 @@
+"""payload 字段的 SQL 表达式构造模块。
+
+把 API 层传入的字段路径（如 status、owner.name）转换为 PostgreSQL JSONB 表达式。
+字段路径经过严格校验后以字面量写入 SQL，这样生成的表达式与声明索引时
+使用的表达式完全一致，规划器才能命中表达式索引（绑定参数无法匹配索引表达式）。
+"""
+import json
+import re
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Numeric, Text, literal_column, or_
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.document import Document
+
+# 字段路径：以点分隔的标识符，例如 status、owner.name
+FIELD_PATH_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+# 可声明索引的字段类型；search 与 text 取值相同，但建 pg_trgm 的 GIN 索引，供 _search 子串匹配
+FIELD_TYPES = ("text", "numeric", "search")
+
+# 单次投影允许的最多字段数（jsonb_build_object 最多 100 个参数）
+MAX_PROJECTION_FIELDS = 50
+
+# 支持的过滤操作符
+RANGE_OPS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+FILTER_OPS = ("eq", "in") + tuple(RANGE_OPS)
+
+
+def split_field_path(field: str) -> List[str]:
+    """校验并拆分字段路径，非法时抛出 ValueError。"""
+    if not field or not FIELD_PATH_RE.match(field):
+        raise ValueError(f"非法的字段路径: {field}")
+    return field.split(".")
+
+
+def field_text_sql(field: str) -> str:
+    """字段的文本取值表达式：payload ->> 'a' 或 payload #>> '{a,b}'。"""
+    parts = split_field_path(field)
+    if len(parts) == 1:
+        return f"(payload ->> '{parts[0]}')"
+    return f"(payload #>> '{{{','.join(parts)}}}')"
+
+
+def field_index_sql(field: str, field_type: str) -> str:
+    """声明索引与查询共用的字段表达式。"""
+    if field_type == "numeric":
+        return f"({field_text_sql(field)}::numeric)"
+    return field_text_sql(field)
+
+
+def field_expr(field: str, field_type: str = "text") -> ColumnElement:
+    """字段表达式的 SQLAlchemy 形式，可直接参与比较运算。"""
+    return literal_column(
+        field_index_sql(field, field_type),
+        type_=Numeric if field_type == "numeric" else Text,
+    )
+
+
+def field_json_sql(field: str) -> str:
+    """字段的 JSONB 取值表达式：payload -> 'a' 或 payload #> '{a,b}'。"""
+    parts = split_field_path(field)
+    if len(parts) == 1:
+        return f"(payload -> '{parts[0]}')"
+    return f"(payload #> '{{{','.join(parts)}}}')"
+
+
+def nest_value(field: str, value: Any) -> Dict[str, Any]:
+    """把 a.b = v 转为 {"a": {"b": v}}，用于 payload @> 包含查询。"""
+    parts = split_field_path(field)
+    nested: Any = value
+    for part in reversed(parts):
+        nested = {part: nested}
+    return nested
+
+
+def get_path_value(payload: Dict[str, Any], field: str) -> Any:
+    """按字段路径从 payload 中取值，不存在时返回 None。"""
+    current: Any = payload
+    for part in field.split("."):
+        if not isinstance(current, dict):
+            return None
+        current = current.get(part)
+    return current
+
+
+def _parse_value(raw: str) -> Any:
+    """过滤值按 JSON 解析（3、true、"3"），无法解析时按普通字符串处理。"""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def _to_numeric(value: Any) -> Decimal:
+    if isinstance(value, bool):
+        raise ValueError(f"不是数值: {value}")
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"不是数值: {value}")
+
+
+@dataclass
+class PayloadFilter:
+    """单个 payload 过滤条件。"""
+
+    field: str
+    op: str
+    values: List[Any]
+
+
+def parse_filter(raw: str) -> PayloadFilter:
+    """解析 field:op:value 形式的过滤参数。
+
+    - status:eq:open
+    - priority:gte:3
+    - status:in:open,closed
+    """
+    parts = raw.split(":", 2)
+    if len(parts) != 3:
+        raise ValueError(f"过滤条件格式应为 field:op:value: {raw}")
+    field, op, value = parts
+    split_field_path(field)
+    if op not in FILTER_OPS:
+        raise ValueError(f"不支持的过滤操作符 {op}，可选: {', '.join(FILTER_OPS)}")
+    if op == "in":
+        values = [_parse_value(v) for v in value.split(",") if v != ""]
+        if not values:
+            raise ValueError(f"in 过滤至少需要一个值: {raw}")
+    else:
+        values = [_parse_value(value)]
+    return PayloadFilter(field=field, op=op, values=values)
+
+
+def parse_contains(raw: Optional[str]) -> Optional[Dict[str, Any]]:
+    """解析 contains 参数（JSON 对象），用于 payload @> 包含查询。"""
+    if not raw:
+        return None
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        raise ValueError("contains 必须是合法的 JSON 对象")
+    if not isinstance(value, dict):
+        raise ValueError("contains 必须是 JSON 对象")
+    return value
+
+
+def build_filter_clauses(
+    filters: List[PayloadFilter],
+    contains: Optional[Dict[str, Any]],
+    declared: Dict[str, str],
+    payload_column: Any = Document.payload,
+) -> List[ColumnElement]:
+    """把过滤条件翻译为 WHERE 子句。
+
+    - contains 与未声明字段上的 eq/in 使用 payload @> ...，可走 GIN(jsonb_path_ops) 索引；
+    - 已声明字段（declared: field -> 类型）上的比较使用与表达式索引一致的表达式；
+    - 范围过滤只允许在已声明字段上使用，避免无索引的全分区扫描。
+
+    payload_column 默认为 uni_documents.payload，test_cases 传入 TestCase.payload。
+    """
+    clauses: List[ColumnElement] = []
+    if contains:
+        clauses.append(payload_column.contains(contains))
+
+    for f in filters:
+        field_type = declared.get(f.field)
+        if field_type is None:
+            if f.op in RANGE_OPS:
+                raise ValueError(f"字段 {f.field} 未声明索引，不支持范围过滤")
+            clauses.append(
+                or_(*[payload_column.contains(nest_value(f.field, v)) for v in f.values])
+            )
+            continue
+
+        if field_type == "numeric":
+            values = [_to_numeric(v) for v in f.values]
+        else:
+            values = [v if isinstance(v, str) else json.dumps(v) for v in f.values]
+
+        expr = field_expr(f.field, field_type)
+        if f.op == "eq":
+            clauses.append(expr == values[0])
+        elif f.op == "in":
+            clauses.append(expr.in_(values))
+        else:
+            clauses.append(expr.op(RANGE_OPS[f.op])(values[0]))
+    return clauses
+
+
+def parse_fields(raw: Optional[str]) -> Optional[List[str]]:
+    """解析 fields 投影参数（逗号分隔的字段路径），未传时返回 None。"""
+    if raw is None:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    if not fields:
+        raise ValueError("fields 不能为空")
+    if len(fields) > MAX_PROJECTION_FIELDS:
+        raise ValueError(f"fields 最多 {MAX_PROJECTION_FIELDS} 个字段")
+    for field in fields:
+        split_field_path(field)
+    return fields
+
+
+def _projection_tree(fields: List[str]) -> Dict[str, Any]:
+    """把字段路径合并为树，叶子为 True；同时请求 a 和 a.b 时以 a 为准。"""
+    tree: Dict[str, Any] = {}
+    for field in sorted(fields, key=lambda f: f.count(".")):
+        node = tree
+        parts = field.split(".")
+        for part in parts[:-1]:
+            child = node.setdefault(part, {})
+            if child is True:
+                break
+            node = child
+        else:
+            node.setdefault(parts[-1], True)
+    return tree
+
+
+def _build_object_sql(tree: Dict[str, Any], prefix: List[str]) -> str:
+    args = []
+    for key, sub in tree.items():
+        path = ".".join(prefix + [key])
+        value = field_json_sql(path) if sub is True else _build_object_sql(sub, prefix + [key])
+        args.append(f"'{key}', {value}")
+    return f"jsonb_build_object({', '.join(args)})"
+
+
+def projection_expr(fields: List[str]) -> ColumnElement:
+    """在数据库侧构造只含指定字段的 JSON 对象。
+
+    嵌套路径保持原有层级：fields=id,owner.name 得到 {"id": ..., "owner": {"name": ...}}，
+    缺失的字段值为 null。
+    """
+    return literal_column(_build_object_sql(_projection_tree(fields), []), type_=JSONB)
@@ -0,0 +1,102 @@
+"""文档计数与应用配额的仓储模块。"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.models.app_quota import AppQuota
+from app.models.collection_counter import COUNTERS_TABLE, CollectionCounter
+from app.models.document_archive import ARCHIVE_TABLE
+
+
+class StatsRepository:
+    """计数表的读取与重建，以及配额的读写。"""
+
+    @staticmethod
+    async def list_counters(
+        db: AsyncSession, app_name: Optional[str] = None
+    ) -> List[Tuple[str, str, int, int]]:
+        """返回 [(app_name, collection, live_count, payload_bytes)]，各槽已求和。"""
+        query = select(
+            CollectionCounter.app_name,
+            CollectionCounter.collection,
+            func.sum(CollectionCounter.live_count),
+            func.sum(CollectionCounter.payload_bytes),
+        ).group_by(CollectionCounter.app_name, CollectionCounter.collection)
+        if app_name is not None:
+            query = query.where(CollectionCounter.app_name == app_name)
+        query = query.order_by(CollectionCounter.app_name, CollectionCounter.collection)
+        result = await db.execute(query)
+        return [(a, c, int(n or 0), int(b or 0)) for a, c, n, b in result.all()]
+
+    @staticmethod
+    async def get_app_totals(db: AsyncSession, app_name: str) -> Tuple[int, int]:
+        """返回应用的 (未删除文档数, payload 字节数)，按主键前缀只读该应用的计数行。"""
+        result = await db.execute(
+            select(
+                func.coalesce(func.sum(CollectionCounter.live_count), 0),
+                func.coalesce(func.sum(CollectionCounter.payload_bytes), 0),
+            ).where(CollectionCounter.app_name == app_name)
+        )
+        count, size = result.one()
+        return int(count), int(size)
+
+    @staticmethod
+    async def get_write_version(db: AsyncSession, app_name: str, collection: str) -> int:
+        """返回 (app_name, collection) 的累计写入行数（各槽求和），数据变化时一定变大。"""
+        result = await db.execute(
+            select(func.coalesce(func.sum(CollectionCounter.write_count), 0)).where(
+                CollectionCounter.app_name == app_name, CollectionCounter.collection == collection
+            )
+        )
+        return int(result.scalar())
+
+    @staticmethod
+    async def get_quota(db: AsyncSession, app_name: str) -> Optional[AppQuota]:
+        return await db.get(AppQuota, app_name)
+
+    @staticmethod
+    async def save_quota(
+        db: AsyncSession,
+        app_name: str,
+        max_documents: Optional[int],
+        max_payload_bytes: Optional[int],
+    ) -> AppQuota:
+        obj = await db.get(AppQuota, app_name)
+        if obj is None:
+            obj = AppQuota(app_name=app_name)
+            db.add(obj)
+        obj.max_documents = max_documents
+        obj.max_payload_bytes = max_payload_bytes
+        await db.flush()
+        return obj
+
+    @staticmethod
+    async def rebuild_counters(conn: AsyncConnection) -> int:
+        """按 uni_documents（及已建的归档表）全量重算计数表，返回写入的行数。
+
+        调用方需在同一事务中先锁住 uni_documents（SHARE 模式），避免重算期间的写入被漏计；
+        归档表在这里一并锁住。
+        """
+        source = "SELECT app_name, collection, payload FROM uni_documents WHERE is_delete = false"
+        result = await conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": ARCHIVE_TABLE})
+        if result.scalar():
+            await conn.execute(text(f"LOCK TABLE {ARCHIVE_TABLE} IN SHARE MODE"))
+            source += f" UNION ALL SELECT app_name, collection, payload FROM {ARCHIVE_TABLE}"
+
+        # 只重算文档数与字节数，write_count（缓存版本）保留，保证只增不减
+        await conn.execute(text(f"UPDATE {COUNTERS_TABLE} SET live_count = 0, payload_bytes = 0"))
+        result = await conn.execute(
+            text(
+                f"INSERT INTO {COUNTERS_TABLE} (app_name, collection, slot, live_count, payload_bytes) "
+                f"SELECT coalesce(app_name, ''), collection, 0, count(*), "
+                f"coalesce(sum(pg_column_size(payload)), 0) "
+                f"FROM ({source}) d GROUP BY 1, 2 "
+                f"ON CONFLICT (app_name, collection, slot) DO UPDATE "
+                f"SET live_count = excluded.live_count, payload_bytes = excluded.payload_bytes"
+            )
+        )
+        return result.rowcount
+
+
+stats_repository = StatsRepository()
@@ -1,9 +1,12 @@
 """测试用例数据库操作的仓储模块。"""
 import json
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
+from sqlalchemy import String, any_, bindparam, delete, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
 
 from app.models.testcase import TestCase
 
@@ -47,10 +50,63 @@ class TestCaseRepository:
 
         await db.flush()
 
+    @staticmethod
+    async def soft_delete_test_cases_by_ids(db: AsyncSession, app_name: str, ids: List[str]) -> int:
+        """按 ID 列表批量软删除当前应用的测试用例（单条 UPDATE），返回影响行数。
+
+        测试用例的归属应用记录在 payload.app_name 中。
+        """
+        stmt = (
+            update(TestCase)
+            .where(
+                TestCase.id == any_(bindparam("ids", ids, type_=ARRAY(String))),
+                TestCase.payload.contains({"app_name": app_name}),
+                TestCase.is_delete == False,
+            )
+            .values(is_delete=True, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
+
+    @staticmethod
+    async def soft_delete_test_cases_by_query(
+        db: AsyncSession, app_name: str, clauses: List[ColumnElement], limit: int
+    ) -> int:
+        """软删除一批（最多 limit 行）匹配过滤条件的当前应用测试用例，返回影响行数。"""
+        batch = (
+            select(TestCase.id)
+            .where(
+                TestCase.payload.contains({"app_name": app_name}),
+                TestCase.is_delete == False,
+                *clauses,
+            )
+            .limit(limit)
+        )
+        stmt = (
+            update(TestCase)
+            .where(TestCase.id.in_(batch))
+            .values(is_delete=True, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
+
     @staticmethod
     async def get_test_case(db: AsyncSession, id: str) -> Optional[TestCase]:
         """根据 ID 获取测试用例（ORM 方式）。"""
         return await db.get(TestCase, id)
 
+    @staticmethod
+    async def purge_deleted_test_cases(db: AsyncSession, before: datetime, limit: int) -> int:
+        """物理删除一批在 before 之前软删除的测试用例，返回删除行数。"""
+        batch = (
+            select(TestCase.id)
+            .where(TestCase.is_delete == True, TestCase.updated_at < before)
+            .limit(limit)
+        )
+        result = await db.execute(delete(TestCase).where(TestCase.id.in_(batch)))
+        return result.rowcount
+
 
 testcase_repository = TestCaseRepository()
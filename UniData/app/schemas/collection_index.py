@@ -0,0 +1,24 @@
+"""集合字段索引声明的 Pydantic 模式定义模块。"""
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class CollectionIndexCreateRequest(BaseModel):
+    """声明索引字段的请求模型。"""
+
+    field: str = Field(..., description="payload 字段路径，如 status、owner.name")
+    type: str = Field(
+        "text", description="字段类型：text、numeric（支持数值范围过滤）或 search（支持 _search 关键字搜索）"
+    )
+
+
+class CollectionIndexResponse(BaseModel):
+    """已声明索引字段的响应模型。"""
+
+    collection: str
+    field: str
+    type: str
+    index_name: str
+    created_at: Optional[datetime] = None
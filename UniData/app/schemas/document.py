@@ -1,4 +1,5 @@
 """通用文档的 Pydantic 模式定义模块。"""
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -27,3 +28,123 @@ class DocumentDetailResponse(BaseModel):
     collection: str
     app_name: Optional[str] = None
     payload: Dict[str, Any]
+
+
+class DocumentMultiGetRequest(BaseModel):
+    """批量获取文档的请求模型。"""
+    ids: List[str] = Field(..., min_length=1, max_length=1000, description="文档 ID 列表")
+    fields: Optional[str] = Field(None, description="逗号分隔的返回字段，如 id,name,status")
+
+
+class DocumentMultiGetResponse(BaseModel):
+    """批量获取文档的响应：docs 按请求顺序排列，missing 为不存在或已删除的 ID。"""
+    docs: List[Dict[str, Any]]
+    missing: List[str]
+
+
+class DocumentBulkDeleteRequest(BaseModel):
+    """按 ID 列表批量删除文档的请求模型。"""
+    ids: List[str] = Field(..., min_length=1, max_length=10000, description="文档 ID 列表")
+
+
+class DocumentDeleteByQueryRequest(BaseModel):
+    """按条件批量删除文档的请求模型，filter 与 contains 至少提供一个。"""
+    filter: List[str] = Field(default_factory=list, description="过滤条件 field:op:value，语法同列表接口")
+    contains: Optional[Dict[str, Any]] = Field(None, description="JSON 对象，按 payload 包含关系过滤")
+
+
+class BulkDeleteResponse(BaseModel):
+    """批量删除的响应：deleted 为实际软删除的行数。"""
+    status: str = "success"
+    deleted: int
+
+
+class DocumentChange(BaseModel):
+    """单条文档变更：op 为 upsert 或 delete，删除时 doc 为空。"""
+    id: str
+    op: str
+    updated_at: str
+    doc: Optional[Dict[str, Any]] = None
+
+
+class DocumentChangesResponse(BaseModel):
+    """变更订阅的响应：cursor 用于下一次请求的 since 参数。"""
+    changes: List[DocumentChange]
+    cursor: Optional[str] = None
+    has_more: bool = False
+
+
+class FacetValue(BaseModel):
+    """字段的一个取值及其文档数。"""
+    value: str = Field(..., description="取值的文本形式（数字与布尔为其 JSON 字面量）")
+    count: int
+
+
+class DocumentFacetsResponse(BaseModel):
+    """字段取值分布：每个请求的字段对应按文档数倒序的取值列表。"""
+    facets: Dict[str, List[FacetValue]]
+    cached: bool = Field(False, description="是否命中缓存（该集合自上次统计以来没有写入）")
+
+
+class DocumentSearchRequest(BaseModel):
+    """数据库关键字搜索的请求模型，字段名与 Meilisearch 搜索请求一致。"""
+    q: str = Field(..., min_length=1, max_length=200, description="关键字；prefix 为 true 时为 ID 前缀")
+    offset: int = Field(0, ge=0, description="起始偏移量")
+    limit: int = Field(20, ge=1, le=1000, description="返回条数")
+    attributesToSearchOn: Optional[List[str]] = Field(
+        None, description="只在这些 search 字段中匹配，默认为集合声明的全部 search 字段"
+    )
+    prefix: bool = Field(False, description="按 ID 前缀查找，结果按 ID 排序，不需要声明 search 字段")
+
+
+class DocumentSearchResponse(BaseModel):
+    """搜索结果，结构与 Meilisearch 搜索响应一致，客户端可直接切换。"""
+    hits: List[Dict[str, Any]]
+    query: str
+    offset: int
+    limit: int
+    estimatedTotalHits: int = Field(..., description="命中总数；ID 前缀查找时为 offset + 本页条数，之后还有文档时再加 1")
+    processingTimeMs: int
+
+
+class DocumentBulkUpsertRequest(BaseModel):
+    """批量创建/更新文档的请求模型，每个文档必须包含 id。"""
+    docs: List[Dict[str, Any]] = Field(..., min_length=1, max_length=1000, description="文档列表")
+
+
+class DocumentBulkUpsertResponse(BaseModel):
+    """批量写入的响应：ids 为写入的文档 ID（去重）。"""
+    status: str = "success"
+    collection: str
+    ids: List[str]
+
+
+class CollectionSchemaRequest(BaseModel):
+    """注册集合 JSON Schema 的请求模型。"""
+    json_schema: Dict[str, Any] = Field(..., alias="schema", description="JSON Schema（draft-04/06/07）")
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class CollectionProjectionRequest(BaseModel):
+    """声明集合搜索投影的请求模型。"""
+    fields: List[str] = Field(
+        ..., min_length=1, description="进入搜索索引的字段路径，如 title、owner.name；id 会自动加入"
+    )
+
+
+class CollectionProjectionResponse(BaseModel):
+    """集合搜索投影的响应模型。"""
+    collection: str
+    app_name: str
+    fields: List[str]
+    version: int
+    updated_at: Optional[datetime] = None
+
+
+class CollectionSchemaResponse(BaseModel):
+    """集合 JSON Schema 的响应模型。"""
+    collection: str
+    app_name: str
+    json_schema: Dict[str, Any] = Field(..., serialization_alias="schema")
+    version: int
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,43 @@
+"""内存诊断接口的 Pydantic 模式定义模块。"""
+from typing import Dict, List
+
+from pydantic import BaseModel, Field
+
+
+class AllocationStat(BaseModel):
+    """按代码位置分组的内存分配统计（与上一快照比较时带差值）。"""
+
+    location: str = Field(..., description="文件:行号（group_by=filename 时只有文件）")
+    size: int = Field(..., description="当前分配字节数")
+    size_diff: int = Field(0, description="相对上一快照的字节数变化")
+    count: int = Field(..., description="当前分配块数")
+    count_diff: int = Field(0, description="相对上一快照的块数变化")
+
+
+class TracemallocStatusResponse(BaseModel):
+    """tracemalloc 状态。"""
+
+    tracing: bool
+    frames: int = Field(0, description="每个分配记录的栈帧数")
+    traced_current: int = Field(0, description="当前被追踪的分配字节数")
+    traced_peak: int = Field(0, description="追踪期间的峰值字节数")
+    has_baseline: bool = Field(False, description="是否已有可比较的快照")
+
+
+class SnapshotResponse(TracemallocStatusResponse):
+    """快照结果：有上一快照时为差值，按 size_diff 绝对值排序；否则为当前占用前 N。"""
+
+    compared: bool
+    top: List[AllocationStat]
+
+
+class MemoryStatsResponse(BaseModel):
+    """进程内存概况。"""
+
+    rss_bytes: int = Field(..., description="当前常驻内存（无法读取时为 0）")
+    max_rss_bytes: int = Field(..., description="进程生命周期内的峰值常驻内存")
+    orm_objects: Dict[str, int] = Field(..., description="存活的 ORM 实例数（按类名）")
+    sessions: int = Field(..., description="存活的 ORM Session 数")
+    identity_map_objects: int = Field(..., description="所有 Session identity map 中的对象总数")
+    caches: Dict[str, int] = Field(..., description="进程内缓存的条目数")
+    gc_counts: List[int] = Field(..., description="各代待回收对象计数（gc.get_count）")
@@ -0,0 +1,35 @@
+"""文档统计与应用配额的 Pydantic 模式定义模块。"""
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class CollectionStats(BaseModel):
+    """单个集合的统计。"""
+
+    collection: str
+    live_count: int = Field(..., description="未删除文档数")
+    payload_bytes: int = Field(..., description="payload 存储字节数（压缩后）")
+
+
+class AppQuotaRequest(BaseModel):
+    """设置应用配额的请求模型，字段为空表示不限制。"""
+
+    max_documents: Optional[int] = Field(None, ge=0, description="未删除文档数上限")
+    max_payload_bytes: Optional[int] = Field(None, ge=0, description="payload 存储字节数上限")
+
+
+class AppQuotaResponse(AppQuotaRequest):
+    """应用配额的响应模型。"""
+
+    app_name: str
+
+
+class AppStatsResponse(BaseModel):
+    """应用统计的响应模型。"""
+
+    app_name: str
+    collections: List[CollectionStats]
+    total_count: int
+    total_bytes: int
+    quota: Optional[AppQuotaRequest] = None
@@ -1,4 +1,6 @@
 """测试用例的 Pydantic 模式定义模块。"""
+from typing import Any, Dict, List, Optional
+
 from pydantic import BaseModel, Field, ConfigDict
 
 
@@ -24,6 +26,26 @@ class TestCaseResponse(BaseModel):
     id: str
 
 
+class TestCaseBulkDeleteRequest(BaseModel):
+    """按 ID 列表批量删除测试用例的请求模型。"""
+
+    ids: List[str] = Field(..., min_length=1, max_length=10000, description="测试用例 ID 列表")
+
+
+class TestCaseDeleteByQueryRequest(BaseModel):
+    """按条件批量删除测试用例的请求模型，filter 与 contains 至少提供一个。"""
+
+    filter: List[str] = Field(default_factory=list, description="过滤条件 field:eq:value 或 field:in:a,b")
+    contains: Optional[Dict[str, Any]] = Field(None, description="JSON 对象，按 payload 包含关系过滤")
+
+
+class TestCaseBulkDeleteResponse(BaseModel):
+    """批量删除测试用例的响应。"""
+
+    status: str = "success"
+    deleted: int
+
+
 class MeiliEndpointResponse(BaseModel):
     """获取 Meilisearch 端点的响应模式。"""
 
@@ -0,0 +1,161 @@
+"""冷文档归档（tiering）的服务层模块。
+
+超过 archive_after_days 天未更新的文档由后台任务按小批次移到 uni_documents_archive，
+热表的索引与写入开销只与近期活跃的文档有关。对调用方透明：
+- 按 ID 读取（get / _mget）在热表未命中时回查归档表，两处都不存在的 ID 记入进程内负缓存；
+- 写入、按 ID 删除与按条件删除先把涉及的归档文档移回热表，再走原有逻辑；
+- 列表默认只查热表，显式传 include_archived=true 时合并归档表。
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.config import get_settings
+from app.core.database import get_db_context, session_shard, shard_names
+from app.repositories.archive_repository import archive_repository
+
+logger = logging.getLogger(__name__)
+
+# (分片, collection, id) -> 记录时间：热表与归档表都不存在的 ID
+_miss_cache: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+
+
+@dataclass
+class ArchiveReport:
+    """单次归档的统计结果。"""
+
+    documents_archived: int = 0
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+
+
+class ArchiveService:
+    """冷文档归档与回查的业务逻辑类。"""
+
+    @staticmethod
+    def enabled() -> bool:
+        return get_settings().archive_after_days > 0
+
+    @staticmethod
+    def _miss_key(db: AsyncSession, collection: str, id: str) -> Tuple[str, str, str]:
+        return session_shard(db), collection, id
+
+    @staticmethod
+    def _is_known_miss(key: Tuple[str, str, str]) -> bool:
+        recorded = _miss_cache.get(key)
+        if recorded is None:
+            return False
+        if time.monotonic() - recorded < get_settings().archive_miss_ttl_seconds:
+            return True
+        _miss_cache.pop(key, None)
+        return False
+
+    @staticmethod
+    def _record_miss(key: Tuple[str, str, str]) -> None:
+        _miss_cache[key] = time.monotonic()
+        _miss_cache.move_to_end(key)
+        while len(_miss_cache) > get_settings().archive_miss_cache_size:
+            _miss_cache.popitem(last=False)
+
+    @staticmethod
+    async def find_document(
+        db: AsyncSession, collection: str, id: str, projection: Optional[ColumnElement] = None
+    ) -> Optional[Dict[str, Any]]:
+        """热表未命中后回查归档表，返回 payload（或投影），不存在时返回 None。"""
+        if not ArchiveService.enabled():
+            return None
+        key = ArchiveService._miss_key(db, collection, id)
+        if ArchiveService._is_known_miss(key):
+            return None
+        if projection is not None:
+            doc = await archive_repository.get_document_fields(db, collection, id, projection)
+        else:
+            obj = await archive_repository.get_document(db, collection, id)
+            doc = obj.payload if obj else None
+        if doc is None:
+            ArchiveService._record_miss(key)
+        return doc
+
+    @staticmethod
+    async def find_documents(
+        db: AsyncSession, collection: str, ids: List[str], projection: Optional[ColumnElement] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """热表未命中的一组 ID 在归档表中批量回查（单条 SQL）。"""
+        if not ArchiveService.enabled() or not ids:
+            return {}
+        return await archive_repository.get_documents_by_ids(db, collection, ids, projection)
+
+    @staticmethod
+    async def restore(db: AsyncSession, collection: str, ids: List[str]) -> None:
+        """写入或删除前把归档表中的这些文档移回热表（未开启归档时不产生查询）。"""
+        if not ArchiveService.enabled() or not ids:
+            return
+        restored = await archive_repository.restore_by_ids(db, collection, ids)
+        if restored:
+            logger.info(f"归档文档移回热表 collection={collection} count={restored}")
+
+    @staticmethod
+    async def restore_by_query(
+        db: AsyncSession, collection: str, app_name: str, clauses: List[ColumnElement]
+    ) -> int:
+        """按条件删除前把匹配的当前应用归档文档分批移回热表，每批一个短事务。"""
+        if not ArchiveService.enabled():
+            return 0
+        chunk_size = get_settings().bulk_delete_chunk_size
+        total = 0
+        while True:
+            async with get_db_context(session_shard(db)) as chunk_db:
+                count = await archive_repository.restore_by_query(
+                    chunk_db, collection, app_name, clauses, chunk_size
+                )
+            total += count
+            if count < chunk_size:
+                return total
+
+    @staticmethod
+    async def run_once() -> ArchiveReport:
+        """在每个分片上按批归档超过期限的文档，直到某一批不满 archive_batch_size 为止。"""
+        settings = get_settings()
+        before = datetime.utcnow() - timedelta(days=settings.archive_after_days)
+        report = ArchiveReport()
+        started = time.perf_counter()
+
+        for shard in shard_names():
+            while True:
+                async with get_db_context(shard) as db:
+                    moved = await archive_repository.archive_batch(db, before, settings.archive_batch_size)
+                report.documents_archived += moved
+                report.batches += 1
+                if moved < settings.archive_batch_size:
+                    break
+                await asyncio.sleep(settings.archive_batch_pause_seconds)
+
+        report.elapsed_seconds = time.perf_counter() - started
+        logger.info(
+            f"冷文档归档完成 documents={report.documents_archived} batches={report.batches} "
+            f"elapsed={report.elapsed_seconds:.2f}s before={before.isoformat()}"
+        )
+        return report
+
+    @staticmethod
+    async def run_forever() -> None:
+        """后台循环：每隔 archive_interval_seconds 执行一次归档。"""
+        settings = get_settings()
+        while True:
+            try:
+                await ArchiveService.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"冷文档归档失败: {e}")
+            await asyncio.sleep(settings.archive_interval_seconds)
+
+
+archive_service = ArchiveService()
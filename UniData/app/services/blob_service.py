@@ -0,0 +1,133 @@
+"""payload 大字段外置（blob）的服务层模块。
+
+写入文档时，JSON 编码超过 blob_offload_threshold_bytes 的顶层字段移到 uni_blobs 表（按内容 SHA-256 寻址），
+payload 中原位置只保留引用 {"$blob": hash, "$size": 字节数}。uni_documents 的行、WAL、CDC 消息
+与列表接口的响应因此不再携带大字段；blob 与文档写在同一个事务中。
+
+- id / collection / app_name 与已声明索引的字段不外置，保证主键、过滤与排序不受影响；
+- 读取时默认返回引用，GET /{collection}/{id}?resolve_blobs=true 才按引用取回原值；
+- 不再被引用的 blob 由墓碑清理任务在保留期后删除。
+"""
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.repositories.blob_repository import blob_repository
+from app.services.collection_index_service import collection_index_service
+
+logger = logging.getLogger(__name__)
+
+BLOB_KEY = "$blob"
+SIZE_KEY = "$size"
+
+# 始终留在 payload 中的字段
+_KEEP_FIELDS = ("id", "collection", "app_name")
+
+
+def encode_value(value: Any) -> bytes:
+    """字段值的规范 JSON 编码（键排序、无多余空白），用于计算大小与 hash。"""
+    return json.dumps(
+        value, ensure_ascii=False, separators=(",", ":"), sort_keys=True, default=str
+    ).encode("utf-8")
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(BLOB_KEY), str) and set(value) <= {
+        BLOB_KEY,
+        SIZE_KEY,
+    }
+
+
+def _collect_refs(value: Any, hashes: List[str]) -> None:
+    if is_blob_ref(value):
+        hashes.append(value[BLOB_KEY])
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_refs(item, hashes)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_refs(item, hashes)
+
+
+def blob_hashes(value: Any) -> List[str]:
+    """返回 value 中引用的 blob hash（去重，保持出现顺序）。"""
+    hashes: List[str] = []
+    _collect_refs(value, hashes)
+    return list(dict.fromkeys(hashes))
+
+
+def _replace_refs(value: Any, blobs: Dict[str, Any]) -> Any:
+    if is_blob_ref(value):
+        return blobs.get(value[BLOB_KEY], value)
+    if isinstance(value, dict):
+        return {k: _replace_refs(v, blobs) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_replace_refs(v, blobs) for v in value]
+    return value
+
+
+class BlobService:
+    """大字段外置与引用解析的业务逻辑类。"""
+
+    @staticmethod
+    async def offload_payloads(
+        db: AsyncSession, collection: str, payloads: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """把各 payload 中超过阈值的顶层字段写入 uni_blobs，返回替换为引用后的新 payload。
+
+        未开启（阈值为 0）或没有字段超过阈值时原样返回，传入的 payload 不会被修改。
+        """
+        threshold = get_settings().blob_offload_threshold_bytes
+        if threshold <= 0:
+            return payloads
+
+        declared = await collection_index_service.get_declared_fields(db, collection)
+        keep = set(_KEEP_FIELDS) | {field.split(".")[0] for field in declared}
+        blobs: Dict[str, Tuple[str, Any, int]] = {}
+        result = []
+        for payload in payloads:
+            stored: Optional[Dict[str, Any]] = None
+            for key, value in payload.items():
+                if key in keep or value is None or isinstance(value, (bool, int, float)):
+                    continue
+                encoded = encode_value(value)
+                if len(encoded) <= threshold:
+                    continue
+                digest = hashlib.sha256(encoded).hexdigest()
+                blobs[digest] = (digest, value, len(encoded))
+                if stored is None:
+                    stored = dict(payload)
+                stored[key] = {BLOB_KEY: digest, SIZE_KEY: len(encoded)}
+            result.append(stored if stored is not None else payload)
+
+        if blobs:
+            await blob_repository.save_blobs(db, list(blobs.values()))
+            logger.debug(f"外置大字段 collection={collection} blobs={len(blobs)}")
+        return result
+
+    @staticmethod
+    async def offload_payload(
+        db: AsyncSession, collection: str, payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        return (await BlobService.offload_payloads(db, collection, [payload]))[0]
+
+    @staticmethod
+    async def resolve_payload(db: AsyncSession, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """把 payload 中的 blob 引用替换为原值（单条查询），找不到的引用保持原样。"""
+        return (await BlobService.resolve_values(db, [payload]))[0]
+
+    @staticmethod
+    async def resolve_values(db: Any, values: List[Any]) -> List[Any]:
+        """批量替换一组 JSON 值中的 blob 引用（整批一条查询），db 可以是会话或连接。"""
+        hashes = list(dict.fromkeys(h for value in values for h in blob_hashes(value)))
+        if not hashes:
+            return values
+        blobs = await blob_repository.get_blobs(db, hashes)
+        return [_replace_refs(value, blobs) for value in values]
+
+
+blob_service = BlobService()
@@ -0,0 +1,174 @@
+"""文档变更订阅（_changes / _stream）的服务层模块。
+
+下游按 (change_xid, id) 顺序增量拉取某个 collection 的变更（含删除），
+游标是最后一条变更所在的 (分片, change_xid, id)，可断点续传。change_xid 是写入事务的事务号，
+只返回已越过快照 xmin 的变更，晚提交的事务不会被游标跳过（见 document_repository.list_changes）。
+同一文档多次写入时只返回最新版本，投递语义为至少一次：应用迁移到其他分片后事务号不再可比，
+游标所属分片与当前分片不同时从头重新返回该集合的全部变更。
+没有新变更时可以长轮询，由 ChangeListener 的 NOTIFY 唤醒，而不是反复查询。
+
+_stream 以 SSE 推送变更通知（只含 id 与操作类型），页面收到后按需拉取；
+收到 resync 事件表示可能漏掉了通知，应重新拉取列表。
+"""
+import asyncio
+import base64
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import get_settings
+from app.core.database import get_db_context
+from app.models.document import Document
+from app.repositories.document_repository import document_repository
+from app.services.change_listener import change_listener
+from app.services.shard_service import shard_service
+
+logger = logging.getLogger(__name__)
+
+# 长轮询收到通知但变更尚不可见时的重查间隔（秒）
+_RECHECK_SECONDS = 0.2
+
+
+def encode_cursor(shard: str, change_xid: int, id: str) -> str:
+    """把 (分片, change_xid, id) 编码为不透明的游标字符串。"""
+    raw = json.dumps([shard, change_xid, id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, str]:
+    """解析游标，格式非法（包括旧版本按 updated_at 的游标）时抛出 ValueError。"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        shard, change_xid, id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(change_xid, int):
+            raise ValueError(change_xid)
+        return str(shard), change_xid, str(id)
+    except Exception:
+        raise ValueError(f"非法的游标: {cursor}，请不带 since 重新拉取")
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """按 text/event-stream 格式编码一条事件。"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _change_item(doc: Document) -> Dict[str, Any]:
+    return {
+        "id": doc.id,
+        "op": "delete" if doc.is_delete else "upsert",
+        "updated_at": doc.updated_at.isoformat(),
+        "doc": None if doc.is_delete else doc.payload,
+    }
+
+
+class ChangeFeedService:
+    """文档变更订阅的业务逻辑类。"""
+
+    @staticmethod
+    async def _fetch(
+        collection: str, app_name: str, after: Optional[Tuple[str, int, str]], limit: int
+    ) -> Tuple[str, list]:
+        """返回 (应用所在分片, 变更行)。"""
+        shard = await shard_service.shard_for_app(app_name)
+        position = None
+        if after is not None:
+            if after[0] == shard:
+                position = after[1:]
+            else:
+                logger.info(f"游标属于分片 {after[0]}，应用 {app_name} 已在分片 {shard}，从头返回变更")
+        # 每次查询使用独立短会话：长轮询期间不占用连接池中的连接
+        async with get_db_context(shard) as db:
+            rows = await document_repository.list_changes(db, collection, app_name, position, limit + 1)
+        return shard, rows
+
+    @staticmethod
+    async def get_changes(
+        collection: str,
+        app_name: str,
+        since: Optional[str] = None,
+        limit: int = 100,
+        wait: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        返回 since 游标之后的变更。
+
+        since: 上次响应中的 cursor，不传时从头开始
+        wait: 没有变更时最多等待的秒数（长轮询），0 表示立即返回
+        返回的 cursor 始终可用于下一次请求；没有新变更时与 since 相同。
+        """
+        settings = get_settings()
+        try:
+            after = decode_cursor(since) if since else None
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        deadline = time.monotonic() + min(wait, settings.changes_max_wait_seconds)
+        notified = False
+        while True:
+            # 先注册等待事件再查询，避免查询与等待之间的通知丢失
+            event = change_listener.waiter(collection) if wait > 0 else None
+            shard, rows = await ChangeFeedService._fetch(collection, app_name, after, limit)
+            remaining = deadline - time.monotonic()
+            if rows or event is None or remaining <= 0:
+                break
+            # 收到通知后仍查不到时，是更早的写入事务尚未结束（快照 xmin 未越过），短间隔重查
+            timeout = min(remaining, _RECHECK_SECONDS) if notified else remaining
+            try:
+                await asyncio.wait_for(event.wait(), timeout=timeout)
+                notified = True
+            except asyncio.TimeoutError:
+                continue
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        cursor = encode_cursor(shard, rows[-1].change_xid, rows[-1].id) if rows else since
+        return {
+            "changes": [_change_item(doc) for doc in rows],
+            "cursor": cursor,
+            "has_more": has_more,
+        }
+
+    @staticmethod
+    def open_stream(collection: str, app_name: str) -> AsyncIterator[str]:
+        """
+        注册 SSE 订阅并返回事件流。
+
+        订阅在调用时立即注册（超过 sse_max_subscribers 返回 503），
+        客户端断开后生成器被关闭，订阅随之注销。
+        """
+        settings = get_settings()
+        if change_listener.subscriber_count >= settings.sse_max_subscribers:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="订阅数已达上限",
+            )
+        sub = change_listener.subscribe(collection, app_name)
+
+        async def events() -> AsyncIterator[str]:
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    try:
+                        item = await asyncio.wait_for(
+                            sub.queue.get(), timeout=settings.sse_heartbeat_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        yield ": ping\n\n"
+                        continue
+                    if sub.dropped:
+                        yield format_sse("resync", {"reason": "overflow", "dropped": sub.dropped})
+                        sub.dropped = 0
+                    event = item.pop("event")
+                    yield format_sse(event, {"collection": collection, **item})
+                    if sub.overflowed:
+                        break
+            finally:
+                change_listener.unsubscribe(sub)
+
+        return events()
+
+
+change_feed_service = ChangeFeedService()
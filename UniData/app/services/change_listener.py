@@ -0,0 +1,204 @@
+"""文档变更通知的监听模块。
+
+每个 worker 进程在每个分片上只维护一条独立于连接池的 LISTEN 连接，
+uni_documents 上的触发器在事务提交时 NOTIFY，这里按 collection 分发：
+- 长轮询等待者（_changes）：唤醒后自行查询；
+- SSE 订阅者（_stream）：通知直接放入各自的有界队列，在内存中扇出。
+连接断开后自动重连，并唤醒所有等待者让它们重新查询，避免漏掉断线期间的变更。
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+from app.core.config import get_settings
+from app.core.database import create_listen_connection, shard_names
+from app.models.document import CHANGES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# 连接失败后的重连间隔与存活检查间隔（秒）
+_RECONNECT_SECONDS = 5.0
+_HEALTH_CHECK_SECONDS = 5.0
+
+# 订阅队列写满时的处理策略
+DROP_OLDEST = "drop_oldest"  # 丢弃最旧的通知，并提示客户端重新同步
+DISCONNECT = "disconnect"  # 清空队列、提示重新同步后断开连接
+
+
+@dataclass(eq=False)
+class Subscription:
+    """一个 SSE 订阅者：只接收 collection 下属于 app_name 的变更。"""
+
+    collection: str
+    app_name: str
+    queue: asyncio.Queue
+    # 因队列已满而丢弃的通知数，消费者发送 resync 后清零
+    dropped: int = 0
+    # DISCONNECT 策略下队列溢出，消费者应发送 resync 后结束
+    overflowed: bool = False
+
+
+class ChangeListener:
+    """共享的 LISTEN 连接（每个分片一条），按 collection 分发变更通知。"""
+
+    def __init__(self) -> None:
+        self._conns: Dict[str, Any] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._events: Dict[str, asyncio.Event] = {}
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def _ensure_started(self) -> None:
+        """首次使用时才建立 LISTEN 连接，未使用变更订阅的进程不占用连接。"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._tasks = {}
+            self._events = {}
+            self._subscribers = {}
+        for shard in shard_names():
+            task = self._tasks.get(shard)
+            if task is None or task.done():
+                self._tasks[shard] = loop.create_task(self._run(shard))
+
+    def waiter(self, collection: str) -> asyncio.Event:
+        """返回 collection 下一次变更时会被 set 的事件。
+
+        调用方需先取事件再查询数据库，否则查询与等待之间的通知会丢失。
+        """
+        self._ensure_started()
+        event = self._events.get(collection)
+        if event is None:
+            event = self._events[collection] = asyncio.Event()
+        return event
+
+    @property
+    def waiter_count(self) -> int:
+        """有长轮询等待者的 collection 数。"""
+        return len(self._events)
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def subscribe(self, collection: str, app_name: str) -> Subscription:
+        """注册一个 SSE 订阅者，队列长度由 sse_queue_size 限制。"""
+        self._ensure_started()
+        sub = Subscription(
+            collection=collection,
+            app_name=app_name,
+            queue=asyncio.Queue(maxsize=get_settings().sse_queue_size),
+        )
+        self._subscribers.setdefault(collection, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.collection)
+        if subs is None:
+            return
+        subs.discard(sub)
+        if not subs:
+            self._subscribers.pop(sub.collection, None)
+
+    @staticmethod
+    def _offer(sub: Subscription, item: Dict[str, Any]) -> None:
+        """把通知放入订阅者队列，队列已满时按 sse_drop_policy 处理，绝不阻塞分发。"""
+        if sub.overflowed:
+            return
+        try:
+            sub.queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if get_settings().sse_drop_policy == DISCONNECT:
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.overflowed = True
+            sub.queue.put_nowait({"event": "resync", "reason": "overflow"})
+        else:
+            sub.queue.get_nowait()
+            sub.dropped += 1
+            sub.queue.put_nowait(item)
+
+    def _on_notify(self, conn: Any, pid: int, channel: str, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.warning(f"无法解析变更通知: {payload[:200]}")
+            return
+        self.dispatch(data)
+
+    def dispatch(self, data: Dict[str, Any]) -> None:
+        """处理一条变更通知：唤醒该 collection 的等待者，并投递给同一应用的订阅者。"""
+        collection = data.get("collection")
+        event = self._events.pop(collection, None)
+        if event is not None:
+            event.set()
+
+        for sub in list(self._subscribers.get(collection, ())):
+            if "id" not in data:
+                # 超长通知被截断，无法判断归属，只提示重新同步
+                self._offer(sub, {"event": "resync", "reason": "truncated"})
+            elif data.get("app_name") == sub.app_name:
+                self._offer(sub, {
+                    "event": "delete" if data.get("deleted") else "upsert",
+                    "id": data["id"],
+                })
+
+    def _wake_all(self) -> None:
+        events, self._events = self._events, {}
+        for event in events.values():
+            event.set()
+
+    def _resync_all(self, reason: str) -> None:
+        for subs in list(self._subscribers.values()):
+            for sub in list(subs):
+                self._offer(sub, {"event": "resync", "reason": reason})
+
+    async def _run(self, shard: str) -> None:
+        while True:
+            try:
+                conn = self._conns[shard] = await create_listen_connection(shard)
+                await conn.add_listener(CHANGES_CHANNEL, self._on_notify)
+                logger.info(f"已监听变更频道 {CHANGES_CHANNEL} shard={shard}")
+                # 重连期间可能漏掉通知，让等待者重新查询一次
+                self._wake_all()
+                while not conn.is_closed():
+                    await asyncio.sleep(_HEALTH_CHECK_SECONDS)
+                logger.warning(f"变更监听连接已断开，准备重连 shard={shard}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"变更监听连接失败 shard={shard}: {e}")
+            finally:
+                await self._close_conn(shard)
+            self._wake_all()
+            self._resync_all("reconnect")
+            await asyncio.sleep(_RECONNECT_SECONDS)
+
+    async def _close_conn(self, shard: str) -> None:
+        conn = self._conns.pop(shard, None)
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close()
+            except Exception:
+                conn.terminate()
+
+    async def stop(self) -> None:
+        """停止监听并关闭连接（应用关闭时调用）。"""
+        tasks, self._tasks = self._tasks, {}
+        for task in tasks.values():
+            task.cancel()
+        for shard, task in tasks.items():
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            await self._close_conn(shard)
+        self._wake_all()
+
+
+change_listener = ChangeListener()
@@ -0,0 +1,207 @@
+"""集合字段索引声明的服务层模块。"""
+import hashlib
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import get_autocommit_conn, get_db_context, shard_names
+from app.models.collection_index import CollectionIndex
+from app.repositories.collection_index_repository import collection_index_repository
+from app.repositories.document_repository import (
+    DOCUMENTS_TABLE,
+    document_repository,
+    partition_table_name,
+)
+from app.repositories.payload_query import (
+    FIELD_TYPES,
+    field_index_sql,
+    get_path_value,
+    split_field_path,
+)
+
+logger = logging.getLogger(__name__)
+
+# 已声明字段的进程内缓存：collection -> (加载时间, {field: field_type})
+# 多 worker 部署下其他进程最多延迟 TTL 秒看到新声明
+_DECLARED_TTL_SECONDS = 30.0
+_declared_cache: Dict[str, Tuple[float, Dict[str, str]]] = {}
+
+
+def index_name_for(collection: str, field: str) -> str:
+    """生成声明索引的名称（collection 与字段路径可能很长，这里取哈希）。"""
+    digest = hashlib.md5(f"{collection}\0{field}".encode("utf-8")).hexdigest()[:16]
+    return f"idx_uni_doc_f_{digest}"
+
+
+def sql_literal(value: str) -> str:
+    """把字符串转为 SQL 字符串字面量（DDL 中的部分索引谓词不能使用绑定参数）。"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _is_numeric(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    return False
+
+
+class CollectionIndexService:
+    """集合字段索引声明的业务逻辑类。"""
+
+    @staticmethod
+    def cache_size() -> int:
+        """进程内缓存的 collection 声明数（内存诊断用）。"""
+        return len(_declared_cache)
+
+    @staticmethod
+    async def get_declared_fields(db: AsyncSession, collection: str) -> Dict[str, str]:
+        """返回 collection 已声明的字段及类型（带 TTL 缓存）。"""
+        now = time.monotonic()
+        cached = _declared_cache.get(collection)
+        if cached and now - cached[0] < _DECLARED_TTL_SECONDS:
+            return cached[1]
+
+        items = await collection_index_repository.list_indexes(db, collection)
+        fields = {i.field: i.field_type for i in items}
+        _declared_cache[collection] = (now, fields)
+        return fields
+
+    @staticmethod
+    async def list_indexes(db: AsyncSession, collection: str) -> List[CollectionIndex]:
+        return await collection_index_repository.list_indexes(db, collection)
+
+    @staticmethod
+    async def declare_index(
+        db: AsyncSession,
+        collection: str,
+        field: str,
+        field_type: str,
+    ) -> CollectionIndex:
+        """声明 collection 的索引字段，并在线并发创建表达式索引。
+
+        - 未分区：在 uni_documents 上建 (表达式) 部分索引，谓词限定 collection；
+        - 已分区：只在该 collection 的分区上建 (表达式) 索引。
+        两种情况都只索引未删除且字段非空的行。
+        """
+        try:
+            split_field_path(field)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if field_type not in FIELD_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的字段类型 {field_type}，可选: {', '.join(FIELD_TYPES)}",
+            )
+
+        # CREATE INDEX CONCURRENTLY 会等待所有持有快照的事务结束，
+        # 因此建索引前不能在请求会话 db 上开启事务，预检查放在独立的短会话中
+        async with get_db_context() as check_db:
+            existing = await collection_index_repository.get_index(check_db, collection, field)
+        if existing:
+            if existing.field_type != field_type:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"字段 {field} 已声明为 {existing.field_type}",
+                )
+            return existing
+
+        index_name = index_name_for(collection, field)
+        if field_type == "search":
+            # 先确认所有分片都提供 pg_trgm，避免只在部分分片上建出索引
+            for shard in shard_names():
+                await CollectionIndexService.require_trigram(shard)
+        try:
+            # 文档按应用分布在各分片上，每个分片都要建索引
+            for shard in shard_names():
+                await CollectionIndexService.create_index_ddl(shard, collection, field, field_type)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"创建索引失败 collection={collection} field={field}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"创建索引失败: {field}",
+            )
+
+        obj = await collection_index_repository.save_index(
+            db, collection, field, field_type, index_name
+        )
+        _declared_cache.pop(collection, None)
+        logger.info(f"已声明索引 collection={collection} field={field} type={field_type} index={index_name}")
+        return obj
+
+    @staticmethod
+    async def require_trigram(shard: str) -> None:
+        """确保分片上已安装 pg_trgm，服务器未提供或无权限安装时返回 501。"""
+        async with get_autocommit_conn(shard) as conn:
+            if not await collection_index_repository.ensure_extension(conn, "pg_trgm"):
+                raise HTTPException(
+                    status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                    detail=f"分片 {shard} 未提供 pg_trgm 扩展，无法创建 search 索引",
+                )
+
+    @staticmethod
+    async def create_index_ddl(shard: str, collection: str, field: str, field_type: str) -> None:
+        """在分片上为 collection 的字段并发创建表达式索引，已存在时跳过。
+
+        search 字段建 GIN (表达式 gin_trgm_ops) 索引，支持 ILIKE '%关键字%'；
+        分片上没有 pg_trgm 扩展时抛出 501，不建索引。
+        """
+        index_name = index_name_for(collection, field)
+        expr = field_index_sql(field, field_type)
+        where_sql = f"is_delete = false AND {expr} IS NOT NULL"
+        method = "btree"
+        if field_type == "search":
+            await CollectionIndexService.require_trigram(shard)
+            method = "gin"
+
+        if get_settings().documents_partitioned:
+            async with get_db_context(shard) as ddl_db:
+                if not await document_repository.partition_exists(ddl_db, collection):
+                    await document_repository.create_collection_partition(ddl_db, collection)
+            table, columns_sql = partition_table_name(collection), expr
+        else:
+            # 共享表上只索引本 collection 的行：谓词在表达式之前求值，
+            # 其他 collection 同名字段的非数值不会让建索引或之后的写入在 ::numeric 转换上失败
+            table, columns_sql = DOCUMENTS_TABLE, expr
+            where_sql = f"collection = {sql_literal(collection)} AND {where_sql}"
+        if method == "gin":
+            # 只索引表达式；共享表上 collection 已在部分索引谓词中限定，查询带相同条件即可命中
+            columns_sql = f"{expr} gin_trgm_ops"
+
+        async with get_autocommit_conn(shard) as conn:
+            await collection_index_repository.create_index_concurrently(
+                conn, index_name, table, columns_sql, where_sql, method
+            )
+
+    @staticmethod
+    async def validate_payload(db: AsyncSession, collection: str, payload: Dict[str, Any]) -> None:
+        """写入前校验已声明的 numeric 字段。
+
+        numeric 索引表达式为 (payload ->> 'x')::numeric，非数值会让写入在数据库层报错，
+        这里提前返回 400。
+        """
+        declared = await CollectionIndexService.get_declared_fields(db, collection)
+        for field, field_type in declared.items():
+            if field_type != "numeric":
+                continue
+            value = get_path_value(payload, field)
+            if value is not None and not _is_numeric(value):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"字段 {field} 已声明为 numeric，值必须为数值",
+                )
+
+
+collection_index_service = CollectionIndexService()
@@ -0,0 +1,158 @@
+"""集合搜索投影（search_doc）的服务层模块。
+
+集合声明需要搜索或展示的字段后，写入文档时按字段路径从 payload 中取出子集，
+存入 uni_documents.search_doc；CDC 连接器只同步 search_doc，同步服务与直写 Meilisearch
+也只推送它。未声明投影的集合 search_doc 为 NULL，同步服务回退到完整 payload。
+投影按 (app_name, collection) 声明：同一集合可能有多个应用写入，每个应用的投影只作用于
+它自己写入的文档，其他应用的文档不会因此丢掉字段。
+
+修改投影只影响之后的写入，已有文档需用 scripts/backfill_search_doc.py 重算；
+重算时已外置到 uni_blobs 的字段先取回原值再投影，与写入时（外置前投影）的结果一致。
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import AppIdentity
+from app.models.collection_projection import CollectionProjection
+from app.repositories.collection_projection_repository import collection_projection_repository
+from app.repositories.payload_query import MAX_PROJECTION_FIELDS, split_field_path
+from app.services.blob_service import blob_service
+
+logger = logging.getLogger(__name__)
+
+# (app_name, collection) -> (加载时间, 字段路径列表或 None)
+_PROJECTION_TTL_SECONDS = 30.0
+_projection_cache: Dict[Tuple[str, str], Tuple[float, Optional[List[str]]]] = {}
+
+
+def normalize_fields(fields: List[str]) -> List[str]:
+    """校验字段路径并去重，id 始终包含在投影中；非法时抛出 ValueError。"""
+    result = ["id"]
+    for field in fields:
+        field = field.strip()
+        split_field_path(field)
+        if field not in result:
+            result.append(field)
+    if len(result) > MAX_PROJECTION_FIELDS:
+        raise ValueError(f"投影最多 {MAX_PROJECTION_FIELDS} 个字段")
+    return result
+
+
+def project_payload(payload: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """按字段路径从 payload 中取子集，保持嵌套层级；缺失的字段不出现在结果中。"""
+    result: Dict[str, Any] = {}
+    for field in fields:
+        parts = field.split(".")
+        value: Any = payload
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            node = result
+            for part in parts[:-1]:
+                child = node.get(part)
+                if not isinstance(child, dict):
+                    child = node[part] = {}
+                node = child
+            node[parts[-1]] = value
+    return result
+
+
+class CollectionProjectionService:
+    """集合搜索投影的业务逻辑类。"""
+
+    @staticmethod
+    def cache_size() -> int:
+        """进程内缓存的 (app_name, collection) 投影数（内存诊断用）。"""
+        return len(_projection_cache)
+
+    @staticmethod
+    async def get_fields(db: AsyncSession, app_name: str, collection: str) -> Optional[List[str]]:
+        """返回应用在 collection 上的投影字段，未声明时返回 None（带 TTL 缓存）。"""
+        key = (app_name, collection)
+        now = time.monotonic()
+        cached = _projection_cache.get(key)
+        if cached and now - cached[0] < _PROJECTION_TTL_SECONDS:
+            return cached[1]
+
+        obj = await collection_projection_repository.get_projection(db, app_name, collection)
+        fields = list(obj.fields) if obj else None
+        _projection_cache[key] = (now, fields)
+        return fields
+
+    @staticmethod
+    async def search_doc(
+        db: AsyncSession, app_name: str, collection: str, payload: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """计算应用写入的文档的 search_doc，该应用未声明投影时返回 None。"""
+        fields = await CollectionProjectionService.get_fields(db, app_name, collection)
+        if fields is None:
+            return None
+        return project_payload(payload, fields)
+
+    @staticmethod
+    async def project_stored(
+        db: AsyncSession, payloads: List[Optional[Dict[str, Any]]], fields: List[str]
+    ) -> List[Dict[str, Any]]:
+        """按投影重算已入库 payload 的 search_doc。
+
+        入库的 payload 中大字段可能已替换为 blob 引用，投影前先取回原值；
+        只取投影涉及的顶层字段（blob 只外置顶层字段），整批一条查询。
+        """
+        heads = {field.split(".", 1)[0] for field in fields}
+        trimmed = [{k: v for k, v in (payload or {}).items() if k in heads} for payload in payloads]
+        resolved = await blob_service.resolve_values(db, trimmed)
+        return [project_payload(payload, fields) for payload in resolved]
+
+    @staticmethod
+    async def get_projection(
+        db: AsyncSession, collection: str, current_app: AppIdentity
+    ) -> CollectionProjection:
+        obj = await collection_projection_repository.get_projection(db, current_app.app_name, collection)
+        if not obj:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"集合未声明搜索投影: {collection}",
+            )
+        return obj
+
+    @staticmethod
+    async def register_projection(
+        db: AsyncSession,
+        collection: str,
+        fields: List[str],
+        current_app: AppIdentity,
+    ) -> CollectionProjection:
+        """声明或替换当前应用在 collection 上的搜索投影。"""
+        try:
+            fields = normalize_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        obj = await collection_projection_repository.save_projection(
+            db, current_app.app_name, collection, fields
+        )
+        _projection_cache.pop((current_app.app_name, collection), None)
+        logger.info(
+            f"已声明搜索投影 collection={collection} version={obj.version} "
+            f"fields={fields} app={current_app.app_name}"
+        )
+        return obj
+
+    @staticmethod
+    async def delete_projection(db: AsyncSession, collection: str, current_app: AppIdentity) -> None:
+        if not await collection_projection_repository.delete_projection(db, current_app.app_name, collection):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"集合未声明搜索投影: {collection}",
+            )
+        _projection_cache.pop((current_app.app_name, collection), None)
+        logger.info(f"已删除搜索投影 collection={collection} app={current_app.app_name}")
+
+
+collection_projection_service = CollectionProjectionService()
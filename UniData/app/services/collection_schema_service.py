@@ -0,0 +1,173 @@
+"""集合 JSON Schema 注册与校验的服务层模块。
+
+schema 用 fastjsonschema 编译为 Python 函数，编译结果按 schema 内容哈希缓存，
+写入路径上只做一次字典查找加函数调用。schema 按 (app_name, collection) 注册，
+每个应用只约束自己写入的文档，不会因为别的应用先注册而被拒绝写入。
+(app_name, collection) -> schema 的映射带 TTL 缓存，本进程修改 schema 时立即失效，
+其他 worker 最多延迟 TTL 秒看到新版本。
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fastjsonschema
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import AppIdentity
+from app.models.collection_schema import CollectionSchema
+from app.repositories.collection_schema_repository import collection_schema_repository
+
+logger = logging.getLogger(__name__)
+
+Validator = Callable[[Any], Any]
+
+# (app_name, collection) -> (加载时间, 校验器或 None)
+_SCHEMA_TTL_SECONDS = 30.0
+_schema_cache: Dict[Tuple[str, str], Tuple[float, Optional[Validator]]] = {}
+
+# schema 内容哈希 -> 已编译校验器（LRU，不同 collection 可共用同一 schema）
+_MAX_COMPILED = 256
+_compiled: "OrderedDict[str, Validator]" = OrderedDict()
+
+
+def _reject_remote_ref(uri: str) -> Dict[str, Any]:
+    raise fastjsonschema.JsonSchemaDefinitionException(f"不支持引用外部 schema: {uri}")
+
+
+# 禁止 $ref 拉取远程或本地文件，schema 必须自包含
+_REF_HANDLERS = {scheme: _reject_remote_ref for scheme in ("http", "https", "file", "ftp")}
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """编译 schema（带缓存），schema 本身不合法时抛出 ValueError。"""
+    key = hashlib.sha1(
+        json.dumps(schema, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+    validator = _compiled.get(key)
+    if validator is not None:
+        _compiled.move_to_end(key)
+        return validator
+
+    try:
+        # use_default=False：只校验，不往 payload 里填默认值
+        validator = fastjsonschema.compile(schema, handlers=_REF_HANDLERS, use_default=False)
+    except Exception as e:
+        raise ValueError(f"schema 不合法: {e}")
+    _compiled[key] = validator
+    if len(_compiled) > _MAX_COMPILED:
+        _compiled.popitem(last=False)
+    return validator
+
+
+def validation_error(validator: Validator, payload: Dict[str, Any]) -> Optional[str]:
+    """返回校验错误信息，通过时返回 None。"""
+    try:
+        validator(payload)
+    except fastjsonschema.JsonSchemaValueException as e:
+        return e.message
+    return None
+
+
+class CollectionSchemaService:
+    """集合 JSON Schema 的业务逻辑类。"""
+
+    @staticmethod
+    def cache_size() -> int:
+        """进程内缓存的 (app_name, collection) 校验器数（内存诊断用）。"""
+        return len(_schema_cache)
+
+    @staticmethod
+    def compiled_count() -> int:
+        """已编译的 schema 数（内存诊断用）。"""
+        return len(_compiled)
+
+    @staticmethod
+    async def get_validator(db: AsyncSession, app_name: str, collection: str) -> Optional[Validator]:
+        """返回应用在 collection 上的已编译校验器，未注册 schema 时返回 None。"""
+        key = (app_name, collection)
+        now = time.monotonic()
+        cached = _schema_cache.get(key)
+        if cached and now - cached[0] < _SCHEMA_TTL_SECONDS:
+            return cached[1]
+
+        obj = await collection_schema_repository.get_schema(db, app_name, collection)
+        validator = compile_schema(obj.schema) if obj else None
+        _schema_cache[key] = (now, validator)
+        return validator
+
+    @staticmethod
+    async def get_schema(db: AsyncSession, collection: str, current_app: AppIdentity) -> CollectionSchema:
+        obj = await collection_schema_repository.get_schema(db, current_app.app_name, collection)
+        if not obj:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"集合未注册 schema: {collection}",
+            )
+        return obj
+
+    @staticmethod
+    async def register_schema(
+        db: AsyncSession,
+        collection: str,
+        schema: Dict[str, Any],
+        current_app: AppIdentity,
+    ) -> CollectionSchema:
+        """注册或替换当前应用在 collection 上的 schema（先编译，保证保存的 schema 可用）。"""
+        try:
+            compile_schema(schema)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        obj = await collection_schema_repository.save_schema(
+            db, current_app.app_name, collection, schema
+        )
+        _schema_cache.pop((current_app.app_name, collection), None)
+        logger.info(f"已注册 schema collection={collection} version={obj.version} app={current_app.app_name}")
+        return obj
+
+    @staticmethod
+    async def delete_schema(db: AsyncSession, collection: str, current_app: AppIdentity) -> None:
+        if not await collection_schema_repository.delete_schema(db, current_app.app_name, collection):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"集合未注册 schema: {collection}",
+            )
+        _schema_cache.pop((current_app.app_name, collection), None)
+        logger.info(f"已删除 schema collection={collection} app={current_app.app_name}")
+
+    @staticmethod
+    async def validate_payload(
+        db: AsyncSession, app_name: str, collection: str, payload: Dict[str, Any]
+    ) -> None:
+        """按应用在 collection 上的 schema 校验单个 payload，不通过时返回 400。"""
+        validator = await CollectionSchemaService.get_validator(db, app_name, collection)
+        if validator is None:
+            return
+        error = validation_error(validator, payload)
+        if error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"文档不符合集合 schema: {error}",
+            )
+
+    @staticmethod
+    async def validate_payloads(
+        db: AsyncSession, app_name: str, collection: str, payloads: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """批量校验：一次取校验器后逐个校验，返回 [{index, id, error}]，全部通过时为空。"""
+        validator = await CollectionSchemaService.get_validator(db, app_name, collection)
+        if validator is None:
+            return []
+        errors = []
+        for index, payload in enumerate(payloads):
+            error = validation_error(validator, payload)
+            if error:
+                errors.append({"index": index, "id": payload.get("id"), "error": error})
+        return errors
+
+
+collection_schema_service = CollectionSchemaService()
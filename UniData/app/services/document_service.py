@@ -1,20 +1,104 @@
 """通用文档业务逻辑的服务层模块。"""
 import json
 import logging
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from fastapi import HTTPException, status
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.repositories.document_repository import document_repository
+from app.core.config import get_settings
+from app.core.database import DEFAULT_SHARD, get_db_context, session_shard
+from app.repositories.document_repository import DEFAULT_PARTITION, document_repository
+from app.repositories.archive_repository import archive_repository
+from app.repositories.payload_query import (
+    build_filter_clauses,
+    parse_contains,
+    parse_fields,
+    parse_filter,
+    projection_expr,
+)
 from app.models.document import Document
+from app.models.document_archive import ArchivedDocument
+from app.services.archive_service import archive_service
+from app.services.blob_service import blob_service
+from app.services.collection_index_service import collection_index_service
+from app.services.collection_projection_service import (
+    collection_projection_service,
+    project_payload,
+)
+from app.services.collection_schema_service import collection_schema_service
+from app.services.search_writer import search_writer
+from app.services.shard_service import shard_service
+from app.services.stats_service import stats_service
 
 logger = logging.getLogger(__name__)
 
+# 本进程内已确认存在分区的 (分片, collection)，避免每次写入都查询系统表
+_known_partitions: Set[Tuple[str, str]] = set()
+# 建分区失败的 (分片, collection) -> (下次重试的 monotonic 时间, 当前退避秒数)
+_partition_retry: Dict[Tuple[str, str], Tuple[float, float]] = {}
+
+
+def _schedule_partition_retry(key: Tuple[str, str], reason: str) -> None:
+    """记录建分区失败，按指数退避安排下次重试。"""
+    settings = get_settings()
+    previous = _partition_retry.get(key)
+    backoff = (
+        min(previous[1] * 2, settings.partition_retry_max_seconds)
+        if previous
+        else settings.partition_retry_seconds
+    )
+    _partition_retry[key] = (time.monotonic() + backoff, backoff)
+    logger.warning(
+        f"创建分区失败 shard={key[0]} collection={key[1]}: {reason}，{backoff:.0f} 秒后重试；"
+        f"期间数据写入默认分区 {DEFAULT_PARTITION}，可通过 scripts/partition_documents.py 迁出"
+    )
+
 
 class DocumentService:
     """通用文档的业务逻辑类。"""
 
+    @staticmethod
+    def known_partition_count() -> int:
+        """本进程已确认存在的 (分片, collection) 分区数（内存诊断用）。"""
+        return len(_known_partitions)
+
+    @staticmethod
+    async def ensure_partition(collection: str, shard: str = DEFAULT_SHARD) -> None:
+        """确保分片上 collection 对应的分区已存在（仅在启用分区时生效）。
+
+        建分区的 DDL 会短暂锁住父表，因此放在独立的短事务中执行，并以 partition_lock_timeout_ms
+        限制等锁时间，不与业务写入的事务混在一起。只有确认分区存在后才缓存；
+        失败时数据落入默认分区，不影响写入，之后按退避间隔重试。
+        默认分区中已有该 collection 的行时无法建分区，需先用 scripts/partition_documents.py 迁出。
+        """
+        key = (shard, collection)
+        if not get_settings().documents_partitioned or key in _known_partitions:
+            return
+        retry = _partition_retry.get(key)
+        if retry and time.monotonic() < retry[0]:
+            return
+
+        try:
+            async with get_db_context(shard) as ddl_db:
+                if not await document_repository.partition_exists(ddl_db, collection):
+                    if await document_repository.default_partition_has_rows(ddl_db, collection):
+                        _schedule_partition_retry(key, f"默认分区 {DEFAULT_PARTITION} 中已有该 collection 的数据")
+                        return
+                    name = await document_repository.create_collection_partition(
+                        ddl_db, collection, get_settings().partition_lock_timeout_ms
+                    )
+                    logger.info(f"已创建分区 shard={shard} collection={collection} table={name}")
+        except Exception as e:
+            _schedule_partition_retry(key, str(e))
+            return
+
+        _partition_retry.pop(key, None)
+        _known_partitions.add(key)
+
     @staticmethod
     async def upsert_document(
         db: AsyncSession, 
@@ -37,17 +121,26 @@ class DocumentService:
 
         id_value = str(payload["id"])
 
+        await DocumentService.ensure_partition(collection, session_shard(db))
+        await collection_index_service.validate_payload(db, collection, payload)
+        await collection_schema_service.validate_payload(db, app_name, collection, payload)
+        await stats_service.check_quota(db, app_name, collection, [id_value])
+
         try:
             # 自动注入 collection 到 payload 中，方便后续检索
             payload["collection"] = collection
             payload["app_name"] = app_name
-            
+            search_doc = await collection_projection_service.search_doc(db, app_name, collection, payload)
+            stored = await blob_service.offload_payload(db, collection, payload)
+            await archive_service.restore(db, collection, [id_value])
+
             await document_repository.upsert_document(
                 db, 
                 collection=collection, 
                 id=id_value, 
                 app_name=app_name, 
-                payload=payload
+                payload=stored,
+                search_doc=search_doc,
             )
         except Exception as e:
             logger.error(f"插入文档失败 collection={collection} id={id_value}: {e}")
@@ -56,20 +149,80 @@ class DocumentService:
                 detail="数据库错误",
             )
 
+        search_writer.defer(db, app_name, collection, id_value, search_doc or stored)
         return id_value
 
+    @staticmethod
+    async def upsert_documents(
+        db: AsyncSession,
+        collection: str,
+        payloads: List[Dict[str, Any]],
+        app_name: str,
+    ) -> List[str]:
+        """
+        批量创建或更新文档，返回写入的 ID（去重后按首次出现顺序）。
+
+        整批先校验（id、numeric 索引字段、集合 schema），任一失败则整批拒绝并返回所有错误；
+        同一 ID 出现多次时以最后一次为准。写入为一条 INSERT ... ON CONFLICT 语句。
+        """
+        errors = []
+        for index, payload in enumerate(payloads):
+            if "id" not in payload or not payload["id"]:
+                errors.append({"index": index, "id": None, "error": "缺少 'id' 字段"})
+                continue
+            try:
+                await collection_index_service.validate_payload(db, collection, payload)
+            except HTTPException as e:
+                errors.append({"index": index, "id": payload["id"], "error": e.detail})
+        errors.extend(await collection_schema_service.validate_payloads(db, app_name, collection, payloads))
+        if errors:
+            errors.sort(key=lambda e: e["index"])
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=errors)
+
+        unique: Dict[str, Dict[str, Any]] = {}
+        for payload in payloads:
+            payload["collection"] = collection
+            payload["app_name"] = app_name
+            unique[str(payload["id"])] = payload
+
+        await stats_service.check_quota(db, app_name, collection, list(unique))
+        await DocumentService.ensure_partition(collection, session_shard(db))
+
+        fields = await collection_projection_service.get_fields(db, app_name, collection)
+        search_docs = [
+            project_payload(payload, fields) if fields is not None else None
+            for payload in unique.values()
+        ]
+        try:
+            stored = await blob_service.offload_payloads(db, collection, list(unique.values()))
+            await archive_service.restore(db, collection, list(unique))
+            await document_repository.bulk_upsert_documents(
+                db, collection, app_name, stored, search_docs
+            )
+        except Exception as e:
+            logger.error(f"批量写入文档失败 collection={collection} count={len(unique)}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="数据库错误",
+            )
+        for id_value, payload, search_doc in zip(unique, stored, search_docs):
+            search_writer.defer(db, app_name, collection, id_value, search_doc or payload)
+        return list(unique)
+
     @staticmethod
     async def delete_document(db: AsyncSession, collection: str, id: str) -> None:
         """
         软删除文档。
         """
         try:
-            success = await document_repository.soft_delete_document(db, collection, id)
-            if not success:
+            await archive_service.restore(db, collection, [id])
+            app_name = await document_repository.soft_delete_document(db, collection, id)
+            if app_name is None:
                  raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail=f"文档不存在或已删除: {id}",
                 )
+            search_writer.defer(db, app_name, collection, id, None)
         except HTTPException:
             raise
         except Exception as e:
@@ -80,14 +233,150 @@ class DocumentService:
             )
 
     @staticmethod
-    async def get_document(db: AsyncSession, collection: str, id: str) -> Dict[str, Any]:
-        doc = await document_repository.get_document(db, collection, id)
-        if not doc:
+    async def bulk_delete_documents(collection: str, ids: List[str], app_name: str) -> int:
+        """
+        按 ID 列表批量软删除当前应用的文档，返回实际删除的行数。
+
+        ID 按 bulk_delete_chunk_size 分块，每块一条 UPDATE、一个短事务，
+        避免一次性锁住大量行；不存在、已删除或属于其他应用的 ID 不计入结果。
+        """
+        chunk_size = get_settings().bulk_delete_chunk_size
+        unique_ids = list(dict.fromkeys(str(i) for i in ids))
+        shard = await shard_service.shard_for_app(app_name, write=True)
+        deleted = 0
+        try:
+            for start in range(0, len(unique_ids), chunk_size):
+                chunk = unique_ids[start:start + chunk_size]
+                async with get_db_context(shard) as db:
+                    await archive_service.restore(db, collection, chunk)
+                    deleted += await document_repository.soft_delete_documents_by_ids(
+                        db, collection, app_name, chunk
+                    )
+        except Exception as e:
+            logger.error(f"批量删除文档失败 collection={collection} deleted={deleted}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="数据库错误",
+            )
+        logger.info(f"批量删除文档 collection={collection} app={app_name} deleted={deleted}")
+        return deleted
+
+    @staticmethod
+    async def delete_documents_by_query(
+        db: AsyncSession,
+        collection: str,
+        app_name: str,
+        filters: Optional[List[str]] = None,
+        contains: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        按 payload 条件批量软删除当前应用的文档，返回实际删除的行数。
+
+        过滤语法与 list_documents 相同；条件不能为空，避免误删整个集合。
+        每批最多 bulk_delete_chunk_size 行，一批一个短事务，直到某批不满为止。
+        """
+        if not filters and not contains:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="删除条件不能为空",
+            )
+        try:
+            parsed = [parse_filter(f) for f in filters or []]
+            declared = await collection_index_service.get_declared_fields(db, collection)
+            clauses = build_filter_clauses(parsed, contains, declared)
+            archive_clauses = build_filter_clauses(
+                parsed, contains, declared, payload_column=ArchivedDocument.payload
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+
+        chunk_size = get_settings().bulk_delete_chunk_size
+        deleted = 0
+        try:
+            await archive_service.restore_by_query(db, collection, app_name, archive_clauses)
+            while True:
+                async with get_db_context(session_shard(db)) as chunk_db:
+                    count = await document_repository.soft_delete_documents_by_query(
+                        chunk_db, collection, app_name, clauses, chunk_size
+                    )
+                deleted += count
+                if count < chunk_size:
+                    break
+        except Exception as e:
+            logger.error(f"按条件删除文档失败 collection={collection} deleted={deleted}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="数据库错误",
+            )
+        logger.info(f"按条件删除文档 collection={collection} app={app_name} deleted={deleted}")
+        return deleted
+
+    @staticmethod
+    def _projection(fields: Optional[str]):
+        """解析 fields 参数并构造投影表达式，未传 fields 时返回 None。"""
+        try:
+            parsed = parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+        return projection_expr(parsed) if parsed else None
+
+    @staticmethod
+    async def get_document(
+        db: AsyncSession,
+        collection: str,
+        id: str,
+        fields: Optional[str] = None,
+        resolve_blobs: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        获取文档详情。
+
+        fields: 逗号分隔的字段路径（如 id,name,owner.name），
+                传入时在数据库侧用 jsonb_build_object 只取这些字段
+        resolve_blobs: 为 True 时把外置大字段的引用替换为原值（多一次查询）
+        """
+        projection = DocumentService._projection(fields)
+        if projection is not None:
+            doc = await document_repository.get_document_fields(db, collection, id, projection)
+        else:
+            obj = await document_repository.get_document(db, collection, id)
+            doc = obj.payload if obj else None
+        if doc is None:
+            doc = await archive_service.find_document(db, collection, id, projection)
+        if doc is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"文档不存在: {id}",
             )
-        return doc.payload
+        if resolve_blobs:
+            doc = await blob_service.resolve_payload(db, doc)
+        return doc
+
+    @staticmethod
+    async def get_documents(
+        db: AsyncSession, collection: str, ids: List[str], fields: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        按 ID 批量获取文档（单条 SQL），返回 (按输入顺序排列的文档, 不存在的 ID)。
+
+        重复的 ID 只返回一次。
+        """
+        projection = DocumentService._projection(fields)
+        unique_ids = list(dict.fromkeys(str(i) for i in ids))
+        found = await document_repository.get_documents_by_ids(db, collection, unique_ids, projection)
+        misses = [i for i in unique_ids if found.get(i) is None]
+        if misses:
+            found.update(await archive_service.find_documents(db, collection, misses, projection))
+
+        docs = [found[i] for i in unique_ids if found.get(i) is not None]
+        missing = [i for i in unique_ids if found.get(i) is None]
+        return docs, missing
 
     @staticmethod
     async def list_documents(
@@ -95,9 +384,53 @@ class DocumentService:
         collection: str, 
         app_name: Optional[str] = None, 
         limit: int = 20, 
-        offset: int = 0
+        offset: int = 0,
+        filters: Optional[List[str]] = None,
+        contains: Optional[str] = None,
+        fields: Optional[str] = None,
+        include_archived: bool = False,
     ) -> List[Dict[str, Any]]:
-        docs = await document_repository.list_documents(db, collection, app_name, limit, offset)
+        """
+        列出文档，支持在数据库侧按 payload 字段过滤与投影。
+
+        filters: field:op:value 形式的过滤条件，如 status:eq:open、priority:gte:3
+        contains: JSON 对象，按 payload @> contains 过滤
+        fields: 逗号分隔的字段路径，只返回这些字段
+        include_archived: 为 True 时合并归档表（未开启归档时忽略）
+        """
+        projection = DocumentService._projection(fields)
+        include_archived = include_archived and archive_service.enabled()
+        clauses = archive_clauses = None
+        if filters or contains:
+            try:
+                parsed = [parse_filter(f) for f in filters or []]
+                declared = await collection_index_service.get_declared_fields(db, collection)
+                clauses = build_filter_clauses(parsed, parse_contains(contains), declared)
+                if include_archived:
+                    archive_clauses = build_filter_clauses(
+                        parsed, parse_contains(contains), declared, payload_column=ArchivedDocument.payload
+                    )
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e),
+                )
+
+        if include_archived:
+            doc_expr = projection if projection is not None else literal_column("payload", type_=JSONB)
+            docs = await archive_repository.list_with_archive(
+                db, collection, doc_expr, app_name, limit, offset, clauses, archive_clauses
+            )
+            return [doc for doc in docs if doc]
+
+        if projection is not None:
+            return await document_repository.list_document_fields(
+                db, collection, projection, app_name, limit, offset, clauses=clauses
+            )
+
+        docs = await document_repository.list_documents(
+            db, collection, app_name, limit, offset, clauses=clauses
+        )
         return [doc.payload for doc in docs if doc.payload]
 
 
@@ -0,0 +1,371 @@
+"""集合列式导出（Parquet / Arrow IPC）的服务层模块。
+
+分析侧不再通过列表接口逐页拉取、再逐行展开 JSON：导出在一个 REPEATABLE READ 只读事务中
+用服务端游标按 export_batch_size 分批读取当前应用的文档，每批转换为一个 Arrow RecordBatch
+（Parquet 中即一个行组）写出后立即发送，内存占用与集合大小无关。
+
+- 列：id、_updated_at 固定在前，其余为 payload 字段（嵌套对象展开为 owner.name 形式）；
+  未指定时按最近更新的 export_sample_size 条文档推断，也可以显式给出 field[:type]；
+- SQL 只取请求的字段（payload #> path），外置的大字段按批取回原值；
+- 值与列类型不符时写入 null，json 类型的列写入 JSON 文本。
+
+pyarrow 为可选依赖（pip install 'unidata[export]'），未安装时导出接口返回 501。
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.core.config import get_settings
+from app.core.database import get_db_context, get_engine
+from app.repositories.document_repository import document_repository
+from app.repositories.payload_query import FIELD_PATH_RE, split_field_path
+from app.services.archive_service import archive_service
+from app.services.blob_service import blob_service, is_blob_ref
+from app.services.shard_service import shard_service
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# 导出格式 -> (Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+COLUMN_TYPES = ("string", "int64", "float64", "bool", "timestamp", "json")
+
+# 由行本身提供的列；同名的 payload 字段与写入时注入的字段不再单独导出
+SYSTEM_COLUMNS = ("id", "_updated_at")
+_SKIP_FIELDS = SYSTEM_COLUMNS + ("collection", "app_name")
+
+# 推断时展开嵌套对象的最大深度，更深的对象整体作为 json 列
+_MAX_DEPTH = 3
+MAX_EXPORT_COLUMNS = 500
+
+
+@dataclass
+class ExportColumn:
+    """导出列：payload 字段路径与列类型。"""
+
+    field: str
+    type: str
+
+
+def parse_columns(raw: Optional[str]) -> Optional[List[Tuple[str, Optional[str]]]]:
+    """解析逗号分隔的 field[:type]，未给类型时为 None（按样本推断）。非法时抛出 ValueError。"""
+    if raw is None:
+        return None
+    columns: Dict[str, Optional[str]] = {}
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        field, _, column_type = item.partition(":")
+        field = field.strip()
+        split_field_path(field)
+        if field in _SKIP_FIELDS:
+            continue
+        column_type = column_type.strip() or None
+        if column_type is not None and column_type not in COLUMN_TYPES:
+            raise ValueError(f"不支持的列类型 {column_type}，可选: {', '.join(COLUMN_TYPES)}")
+        columns[field] = column_type
+    if not columns:
+        raise ValueError("columns 不能为空")
+    if len(columns) > MAX_EXPORT_COLUMNS:
+        raise ValueError(f"最多导出 {MAX_EXPORT_COLUMNS} 列")
+    return list(columns.items())
+
+
+def _value_kind(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int64"
+    if isinstance(value, float):
+        return "float64"
+    if isinstance(value, str):
+        return "string"
+    return "json"
+
+
+def _merge_kinds(kinds: set) -> str:
+    if not kinds:
+        return "string"
+    if len(kinds) == 1:
+        return next(iter(kinds))
+    if kinds == {"int64", "float64"}:
+        return "float64"
+    return "json"
+
+
+def _walk(value: Any, path: str, depth: int, leaves: Dict[str, set], objects: set) -> None:
+    """记录 path 下出现的值类型；可展开的对象继续向下，path 记入 objects。"""
+    if value is None:
+        leaves.setdefault(path, set())
+        return
+    expandable = (
+        isinstance(value, dict)
+        and value
+        and not is_blob_ref(value)
+        and depth < _MAX_DEPTH
+        and all(FIELD_PATH_RE.match(key) and "." not in key for key in value)
+    )
+    if not expandable:
+        leaves.setdefault(path, set()).add(_value_kind(value))
+        return
+    objects.add(path)
+    for key, item in value.items():
+        _walk(item, f"{path}.{key}", depth + 1, leaves, objects)
+
+
+def infer_columns(
+    payloads: List[Dict[str, Any]], requested: Optional[List[Tuple[str, Optional[str]]]] = None
+) -> List[ExportColumn]:
+    """按样本 payload 推断导出列（首次出现顺序）。
+
+    同一路径既出现对象又出现标量时整体作为 json 列；只出现过 null 的字段为 string。
+    requested 中未给类型的字段按样本推断，样本中是对象的字段为 json。
+    """
+    leaves: Dict[str, set] = {}
+    objects: set = set()
+    for payload in payloads:
+        for key, value in payload.items():
+            if key in _SKIP_FIELDS or not FIELD_PATH_RE.match(key) or "." in key:
+                continue
+            _walk(value, key, 1, leaves, objects)
+
+    if requested is not None:
+        return [
+            ExportColumn(
+                field,
+                column_type or ("json" if field in objects else _merge_kinds(leaves.get(field, set()))),
+            )
+            for field, column_type in requested
+        ]
+
+    # 同时是对象与标量的路径：整体作为 json 列，其下的展开列丢弃
+    mixed = {path for path in objects if path in leaves}
+    columns = []
+    for path, kinds in leaves.items():
+        parts = path.split(".")
+        parents = {".".join(parts[:i]) for i in range(1, len(parts))}
+        if parents & mixed:
+            continue
+        columns.append(ExportColumn(path, "json" if path in mixed else _merge_kinds(kinds)))
+    if len(columns) > MAX_EXPORT_COLUMNS:
+        raise ValueError(f"推断出 {len(columns)} 列，超过上限 {MAX_EXPORT_COLUMNS}，请通过 columns 指定")
+    return columns
+
+
+def _to_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    else:
+        return None
+    # 无时区的时间按 UTC 处理（updated_at 即 UTC）
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def convert_value(value: Any, column_type: str) -> Any:
+    """把 JSON 值转换为列类型，无法转换时返回 None。"""
+    if value is None:
+        return None
+    if column_type == "json":
+        return json.dumps(value, ensure_ascii=False)
+    if column_type == "string":
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    if column_type == "bool":
+        return value if isinstance(value, bool) else None
+    if column_type == "timestamp":
+        return _to_timestamp(value)
+    if isinstance(value, bool):
+        return None
+    try:
+        if column_type == "int64":
+            if isinstance(value, float) and not value.is_integer():
+                return None
+            return int(value)
+        return float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _field_expr(field: str):
+    parts = split_field_path(field)
+    return literal_column(f"(payload #> '{{{','.join(parts)}}}')", type_=JSONB)
+
+
+def arrow_schema(columns: List[ExportColumn]) -> Any:
+    types = {
+        "string": pa.string(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "json": pa.string(),
+    }
+    fields = [pa.field("id", pa.string(), nullable=False), pa.field("_updated_at", types["timestamp"])]
+    fields.extend(pa.field(column.field, types[column.type]) for column in columns)
+    return pa.schema(fields)
+
+
+def record_batch(rows: List[Any], columns: List[ExportColumn], schema: Any) -> Any:
+    """把一批 (id, updated_at, *字段值) 行转换为 RecordBatch。"""
+    arrays = [
+        [row[0] for row in rows],
+        [_to_timestamp(row[1]) for row in rows],
+    ]
+    for index, column in enumerate(columns, start=2):
+        arrays.append([convert_value(row[index], column.type) for row in rows])
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(arrays, schema)], schema=schema
+    )
+
+
+class _ChunkSink:
+    """只追加的文件对象：写入器写出的字节暂存在内存中，每批之后取走发送。"""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def open_writer(fmt: str, sink: _ChunkSink, schema: Any) -> Any:
+    stream = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        return pq.ParquetWriter(stream, schema, compression="zstd")
+    return pa.ipc.new_stream(stream, schema)
+
+
+class ExportService:
+    """集合列式导出的业务逻辑类。"""
+
+    @staticmethod
+    async def open_export(
+        collection: str,
+        app_name: str,
+        fmt: str = "parquet",
+        columns: Optional[str] = None,
+        include_archived: bool = True,
+    ) -> Tuple[str, AsyncIterator[bytes]]:
+        """
+        校验参数、确定导出列并返回 (Content-Type, 字节流)。
+
+        参数错误在这里返回 400（而不是在响应已开始后才中断）；未安装 pyarrow 时返回 501。
+        """
+        if pa is None:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="服务端未安装 pyarrow，无法导出",
+            )
+        if fmt not in EXPORT_FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的导出格式 {fmt}，可选: {', '.join(EXPORT_FORMATS)}",
+            )
+        settings = get_settings()
+        shard = await shard_service.shard_for_app(app_name)
+        try:
+            requested = parse_columns(columns)
+            payloads: List[Dict[str, Any]] = []
+            if requested is None or any(column_type is None for _, column_type in requested):
+                async with get_db_context(shard) as db:
+                    payloads = await document_repository.sample_payloads(
+                        db, collection, app_name, settings.export_sample_size
+                    )
+                    payloads = await blob_service.resolve_values(db, payloads)
+            export_columns = infer_columns(payloads, requested)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        query = document_repository.export_query(
+            collection,
+            app_name,
+            [_field_expr(column.field) for column in export_columns],
+            include_archived and archive_service.enabled(),
+        )
+        media_type = EXPORT_FORMATS[fmt][0]
+        return media_type, ExportService._stream(shard, query, fmt, export_columns, collection, app_name)
+
+    @staticmethod
+    async def _stream(
+        shard: str, query: Any, fmt: str, columns: List[ExportColumn], collection: str, app_name: str
+    ) -> AsyncIterator[bytes]:
+        settings = get_settings()
+        schema = arrow_schema(columns)
+        sink = _ChunkSink()
+        writer = open_writer(fmt, sink, schema)
+        started = time.perf_counter()
+        rows_total = 0
+        bytes_total = 0
+        try:
+            async with get_engine(shard).connect() as conn:
+                # 整个导出读同一个快照；服务端游标需要在事务中使用
+                await conn.execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True)
+                async with conn.begin():
+                    result = await conn.stream(query.execution_options(yield_per=settings.export_batch_size))
+                    async for partition in result.partitions():
+                        rows = [tuple(row) for row in partition]
+                        values = await blob_service.resolve_values(conn, [list(row[2:]) for row in rows])
+                        rows = [row[:2] + tuple(resolved) for row, resolved in zip(rows, values)]
+                        batch = await asyncio.to_thread(record_batch, rows, columns, schema)
+                        await asyncio.to_thread(writer.write_batch, batch)
+                        rows_total += len(rows)
+                        data = sink.drain()
+                        if data:
+                            bytes_total += len(data)
+                            yield data
+            writer.close()
+            data = sink.drain()
+            bytes_total += len(data)
+            yield data
+        finally:
+            logger.info(
+                f"导出集合 collection={collection} app={app_name} format={fmt} rows={rows_total} "
+                f"bytes={bytes_total} elapsed={time.perf_counter() - started:.2f}s"
+            )
+
+
+export_service = ExportService()
@@ -0,0 +1,131 @@
+"""字段取值分布（_facets）的服务层模块。
+
+筛选侧边栏需要的是「每个取值有多少文档」，由数据源在一条 SQL 中统计（GROUP BY，数组字段逐元素计数），
+不必导出整个集合或借用 Meilisearch 计数。
+
+结果在进程内按 (分片, 应用, collection, 请求参数) 缓存，缓存项记录计算前读到的 write_count：
+uni_collection_counters 由触发器在每次写入时累加它，只要版本不变就说明该应用在该集合下没有写入，
+直接返回缓存，重复加载面板只需读一次计数表。
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import session_shard
+from app.models.document_archive import ArchivedDocument
+from app.repositories.document_repository import document_repository
+from app.repositories.payload_query import build_filter_clauses, parse_contains, parse_filter, split_field_path
+from app.repositories.stats_repository import stats_repository
+from app.services.archive_service import archive_service
+from app.services.collection_index_service import collection_index_service
+
+logger = logging.getLogger(__name__)
+
+# 缓存键 -> (write_count 版本, 写入缓存的时间, 结果)
+_facet_cache: "OrderedDict[Tuple[Any, ...], Tuple[int, float, Dict[str, Any]]]" = OrderedDict()
+
+
+class FacetService:
+    """字段取值分布统计与缓存的业务逻辑类。"""
+
+    @staticmethod
+    def _cache_get(key: Tuple[Any, ...], version: int) -> Optional[Dict[str, Any]]:
+        cached = _facet_cache.get(key)
+        if cached is None:
+            return None
+        cached_version, stored_at, result = cached
+        if cached_version != version or time.monotonic() - stored_at >= get_settings().facet_cache_ttl_seconds:
+            _facet_cache.pop(key, None)
+            return None
+        _facet_cache.move_to_end(key)
+        return result
+
+    @staticmethod
+    def _cache_put(key: Tuple[Any, ...], version: int, result: Dict[str, Any]) -> None:
+        _facet_cache[key] = (version, time.monotonic(), result)
+        _facet_cache.move_to_end(key)
+        while len(_facet_cache) > get_settings().facet_cache_size:
+            _facet_cache.popitem(last=False)
+
+    @staticmethod
+    async def get_facets(
+        db: AsyncSession,
+        collection: str,
+        app_name: str,
+        fields: List[str],
+        size: int = 10,
+        filters: Optional[List[str]] = None,
+        contains: Optional[str] = None,
+        include_archived: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        统计当前应用在 collection 下各字段的取值分布。
+
+        fields: 字段路径（支持 owner.name），数组字段按元素计数
+        size: 每个字段最多返回的取值数（按文档数倒序）
+        filters / contains: 与列表接口相同的过滤条件，只统计匹配的文档
+        返回 {"facets": {field: [{"value": 取值文本, "count": 文档数}]}, "cached": bool}
+        """
+        settings = get_settings()
+        fields = list(dict.fromkeys(f.strip() for f in fields if f and f.strip()))
+        if not fields:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="至少需要一个 field")
+        if len(fields) > settings.facet_max_fields:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"最多统计 {settings.facet_max_fields} 个字段",
+            )
+        include_archived = include_archived and archive_service.enabled()
+        clauses = archive_clauses = None
+        try:
+            for field in fields:
+                split_field_path(field)
+            parsed = [parse_filter(f) for f in filters or []]
+            contains_value = parse_contains(contains)
+            if parsed or contains_value:
+                declared = await collection_index_service.get_declared_fields(db, collection)
+                clauses = build_filter_clauses(parsed, contains_value, declared)
+                if include_archived:
+                    archive_clauses = build_filter_clauses(
+                        parsed, contains_value, declared, payload_column=ArchivedDocument.payload
+                    )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        key = (
+            session_shard(db),
+            app_name,
+            collection,
+            tuple(fields),
+            size,
+            tuple(filters or ()),
+            contains or "",
+            include_archived,
+        )
+        # 先读版本再统计：统计期间的写入会让下一次请求看到更大的版本而重新计算
+        version = await stats_repository.get_write_version(db, app_name, collection)
+        cached = FacetService._cache_get(key, version)
+        if cached is not None:
+            return {"facets": cached, "cached": True}
+
+        started = time.perf_counter()
+        rows = await document_repository.facet_counts(
+            db, collection, app_name, fields, size, clauses, archive_clauses, include_archived
+        )
+        facets: Dict[str, List[Dict[str, Any]]] = {field: [] for field in fields}
+        for field, value, count in rows:
+            facets[field].append({"value": value, "count": count})
+        FacetService._cache_put(key, version, facets)
+        logger.debug(
+            f"统计字段分布 collection={collection} app={app_name} fields={len(fields)} "
+            f"elapsed={time.perf_counter() - started:.3f}s"
+        )
+        return {"facets": facets, "cached": False}
+
+
+facet_service = FacetService()
@@ -0,0 +1,182 @@
+"""worker 内存诊断的服务层模块。
+
+tracemalloc 默认关闭，由管理接口按需开启（开启后分配有额外开销，诊断完应关闭）。
+每次快照与本进程上一次快照比较，按代码位置汇总增长量，用于在线定位内存持续增长。
+拍摄与比较快照、对象计数都要遍历整个堆，耗时与堆大小成正比，只适合低频调用，
+并放到线程中执行，避免遍历期间阻塞事件循环上的其他请求。
+"""
+import gc
+import logging
+import os
+import resource
+import sys
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.models.document import Document
+from app.models.testcase import TestCase
+from app.services.change_listener import change_listener
+from app.services.collection_index_service import collection_index_service
+from app.services.collection_projection_service import collection_projection_service
+from app.services.collection_schema_service import collection_schema_service
+from app.services.document_service import document_service
+from app.services.stats_service import stats_service
+
+logger = logging.getLogger(__name__)
+
+# 快照中排除 tracemalloc 自身与导入机制的分配
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+_GROUP_BY = ("lineno", "filename")
+
+_ORM_CLASSES = (Document, TestCase)
+
+
+def _rss_bytes() -> int:
+    """读取当前常驻内存（Linux 下读 /proc，其他平台返回 0）。"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _max_rss_bytes() -> int:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 单位是字节，Linux 是 KB
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _snapshot_top(
+    baseline: Optional[tracemalloc.Snapshot], top: int, group_by: str
+) -> Tuple[tracemalloc.Snapshot, List[Dict[str, Any]]]:
+    """拍摄快照，返回 (快照, 增长最多的前 top 项)；没有基线时返回当前占用最多的前 top 项。"""
+    snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    items: List[Dict[str, Any]] = []
+    if baseline is not None:
+        for stat in snapshot.compare_to(baseline, group_by)[:top]:
+            items.append({
+                "location": _location(stat, group_by),
+                "size": stat.size,
+                "size_diff": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            })
+    else:
+        for stat in snapshot.statistics(group_by)[:top]:
+            items.append({
+                "location": _location(stat, group_by),
+                "size": stat.size,
+                "count": stat.count,
+            })
+    return snapshot, items
+
+
+def _count_objects() -> Tuple[Dict[str, int], int, int]:
+    """遍历 gc 追踪的对象，返回 (各 ORM 类的实例数, Session 数, identity map 中的对象数)。"""
+    orm_objects = {cls.__name__: 0 for cls in _ORM_CLASSES}
+    sessions = 0
+    identity_map_objects = 0
+    for obj in gc.get_objects():
+        if isinstance(obj, _ORM_CLASSES):
+            orm_objects[type(obj).__name__] += 1
+        elif isinstance(obj, Session):
+            sessions += 1
+            identity_map_objects += len(obj.identity_map)
+    return orm_objects, sessions, identity_map_objects
+
+
+def _location(stat: Any, group_by: str) -> str:
+    frame = stat.traceback[0]
+    if group_by == "filename":
+        return frame.filename
+    return f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryService:
+    """worker 内存诊断的业务逻辑类。"""
+
+    def __init__(self) -> None:
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "traced_current": current,
+            "traced_peak": peak,
+            "has_baseline": self._baseline is not None,
+        }
+
+    def start_tracing(self, frames: int) -> Dict[str, Any]:
+        """开启 tracemalloc，已开启时保持不变。"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._baseline = None
+            logger.info(f"tracemalloc 已开启 frames={frames}")
+        return self.status()
+
+    def stop_tracing(self) -> Dict[str, Any]:
+        """关闭 tracemalloc 并丢弃快照，释放追踪数据占用的内存。"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc 已关闭")
+        self._baseline = None
+        return self.status()
+
+    async def take_snapshot(self, top: int, group_by: str) -> Dict[str, Any]:
+        """拍摄快照并与上一快照比较，本次快照成为下一次的比较基线。"""
+        if not tracemalloc.is_tracing():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="tracemalloc 未开启",
+            )
+        if group_by not in _GROUP_BY:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"group_by 只支持 {', '.join(_GROUP_BY)}",
+            )
+
+        baseline = self._baseline
+        snapshot, items = await anyio.to_thread.run_sync(_snapshot_top, baseline, top, group_by)
+        # 拍摄期间可能已被关闭，此时不再保留快照
+        self._baseline = snapshot if tracemalloc.is_tracing() else None
+        return {**self.status(), "compared": baseline is not None, "top": items}
+
+    @staticmethod
+    async def memory_stats() -> Dict[str, Any]:
+        """进程内存概况：RSS、存活的 ORM 实例、Session identity map 大小与进程内缓存大小。"""
+        orm_objects, sessions, identity_map_objects = await anyio.to_thread.run_sync(_count_objects)
+
+        return {
+            "rss_bytes": _rss_bytes(),
+            "max_rss_bytes": _max_rss_bytes(),
+            "orm_objects": orm_objects,
+            "sessions": sessions,
+            "identity_map_objects": identity_map_objects,
+            "caches": {
+                "declared_indexes": collection_index_service.cache_size(),
+                "collection_schemas": collection_schema_service.cache_size(),
+                "collection_projections": collection_projection_service.cache_size(),
+                "compiled_schemas": collection_schema_service.compiled_count(),
+                "quotas": stats_service.cache_size(),
+                "known_partitions": document_service.known_partition_count(),
+                "change_waiters": change_listener.waiter_count,
+                "sse_subscribers": change_listener.subscriber_count,
+            },
+            "gc_counts": list(gc.get_count()),
+        }
+
+
+memory_service = MemoryService()
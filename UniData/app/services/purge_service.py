@@ -0,0 +1,116 @@
+"""墓碑清理（compaction）的服务层模块。
+
+soft_delete_document / soft_delete_test_case 只把 is_delete 置为 true，
+CDC 链路据此从 Meilisearch 删除文档。保留期过后墓碑已无用处，
+这里按小批次物理删除，每批一个短事务，批间休眠，避免长事务阻塞 vacuum。
+墓碑清理之后再清理保留期内未被写入、且已不被任何文档引用的外置大字段（uni_blobs）。
+文档与 blob 按分片存放，逐个分片清理；测试用例只在控制库（default 分片）。
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import DEFAULT_SHARD, get_db_context, shard_names
+from app.repositories.blob_repository import blob_repository
+from app.repositories.document_repository import document_repository
+from app.repositories.testcase_repository import testcase_repository
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PurgeReport:
+    """单次清理的统计结果。"""
+
+    documents_purged: int = 0
+    test_cases_purged: int = 0
+    blobs_purged: int = 0
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+
+
+class PurgeService:
+    """墓碑清理的业务逻辑类。"""
+
+    @staticmethod
+    async def _purge_table(
+        purge: Callable[[AsyncSession, datetime, int], Awaitable[int]],
+        before: datetime,
+        report: PurgeReport,
+        shard: str = DEFAULT_SHARD,
+    ) -> int:
+        """循环按批删除，直到某一批不满 batch_size 为止。"""
+        settings = get_settings()
+        total = 0
+        while True:
+            async with get_db_context(shard) as db:
+                purged = await purge(db, before, settings.purge_batch_size)
+            total += purged
+            report.batches += 1
+            if purged < settings.purge_batch_size:
+                return total
+            await asyncio.sleep(settings.purge_batch_pause_seconds)
+
+    @staticmethod
+    async def _purge_blobs(before: datetime, report: PurgeReport, shard: str = DEFAULT_SHARD) -> int:
+        """按批检查 blob，直到某一批检查数不满 batch_size 为止（仍被引用的不计入删除数）。"""
+        settings = get_settings()
+        total = 0
+        while True:
+            async with get_db_context(shard) as db:
+                checked, purged = await blob_repository.purge_unreferenced_blobs(
+                    db, before, settings.purge_batch_size
+                )
+            total += purged
+            report.batches += 1
+            if checked < settings.purge_batch_size:
+                return total
+            await asyncio.sleep(settings.purge_batch_pause_seconds)
+
+    @staticmethod
+    async def run_once() -> PurgeReport:
+        """执行一次清理，返回删除行数与耗时。"""
+        settings = get_settings()
+        before = datetime.utcnow() - timedelta(days=settings.purge_retention_days)
+        report = PurgeReport()
+        started = time.perf_counter()
+
+        for shard in shard_names():
+            report.documents_purged += await PurgeService._purge_table(
+                document_repository.purge_deleted_documents, before, report, shard
+            )
+        report.test_cases_purged = await PurgeService._purge_table(
+            testcase_repository.purge_deleted_test_cases, before, report
+        )
+        for shard in shard_names():
+            report.blobs_purged += await PurgeService._purge_blobs(before, report, shard)
+
+        report.elapsed_seconds = time.perf_counter() - started
+        logger.info(
+            f"墓碑清理完成 documents={report.documents_purged} "
+            f"test_cases={report.test_cases_purged} blobs={report.blobs_purged} batches={report.batches} "
+            f"elapsed={report.elapsed_seconds:.2f}s before={before.isoformat()}"
+        )
+        return report
+
+    @staticmethod
+    async def run_forever() -> None:
+        """后台循环：每隔 purge_interval_seconds 执行一次清理。"""
+        settings = get_settings()
+        while True:
+            try:
+                await PurgeService.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"墓碑清理失败: {e}")
+            await asyncio.sleep(settings.purge_interval_seconds)
+
+
+purge_service = PurgeService()
@@ -0,0 +1,89 @@
+"""数据库关键字搜索（_search）的服务层模块。
+
+Meilisearch 不可用或同步滞后时，客户端可以改用本接口：请求与响应字段与 Meilisearch 的搜索接口一致，
+在 uni_documents 上按已声明的 search 字段做子串匹配并排序分页（见 document_repository.search_documents）。
+已知 ID 或 ID 前缀的小查询直接走主键索引，不必经过搜索服务。
+
+search 字段通过 POST /api/v1/admin/collections/{collection}/indexes（type=search）声明，
+各分片需提供 pg_trgm 以建三元组 GIN 索引（否则声明返回 501）；未声明任何 search 字段时只按 ID 精确匹配。
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.document_repository import document_repository
+from app.services.collection_index_service import collection_index_service
+
+logger = logging.getLogger(__name__)
+
+
+class SearchService:
+    """数据库关键字搜索与 ID 前缀查找的业务逻辑类。"""
+
+    @staticmethod
+    async def search_fields(
+        db: AsyncSession, collection: str, attributes: Optional[List[str]] = None
+    ) -> List[str]:
+        """返回参与匹配的 search 字段；attributes 必须都已声明为 search。"""
+        declared = await collection_index_service.get_declared_fields(db, collection)
+        fields = [field for field, field_type in declared.items() if field_type == "search"]
+        if attributes is None:
+            return sorted(fields)
+        for field in attributes:
+            if field not in fields:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"字段 {field} 未声明为 search",
+                )
+        return list(dict.fromkeys(attributes))
+
+    @staticmethod
+    async def search(
+        db: AsyncSession,
+        collection: str,
+        app_name: str,
+        q: str,
+        offset: int = 0,
+        limit: int = 20,
+        attributes: Optional[List[str]] = None,
+        prefix: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        在当前应用的 collection 中搜索文档（只查热表，不含已删除与已归档的文档）。
+
+        prefix: 为 True 时把 q 当作 ID 前缀，按 ID 排序返回
+        返回 Meilisearch 风格的 {"hits", "query", "offset", "limit", "estimatedTotalHits", "processingTimeMs"}
+        """
+        started = time.perf_counter()
+        if prefix:
+            # 多取一条判断是否还有下一页，避免为了总数扫完整个前缀范围
+            docs = await document_repository.list_by_id_prefix(
+                db, collection, app_name, q, limit + 1, offset
+            )
+            hits = docs[:limit]
+            total = offset + len(hits) + (1 if len(docs) > limit else 0)
+        else:
+            fields = await SearchService.search_fields(db, collection, attributes)
+            hits, total = await document_repository.search_documents(
+                db, collection, app_name, q, fields, limit, offset
+            )
+
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        logger.debug(
+            f"数据库搜索 collection={collection} app={app_name} prefix={prefix} "
+            f"hits={len(hits)} total={total} elapsed={elapsed_ms}ms"
+        )
+        return {
+            "hits": hits,
+            "query": q,
+            "offset": offset,
+            "limit": limit,
+            "estimatedTotalHits": total,
+            "processingTimeMs": elapsed_ms,
+        }
+
+
+search_service = SearchService()
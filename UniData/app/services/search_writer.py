@@ -0,0 +1,187 @@
+"""直写 Meilisearch 的低延迟索引模块（可选，与 CDC 并存）。
+
+CDC 链路（WAL -> Kafka -> meilisearch-sync-service）仍是唯一的数据来源，
+这里只是在事务提交后把同一份变更提前推给 Meilisearch，缩短「写入 -> 可搜索」的延迟：
+- 写接口通过 defer 把变更挂在会话上，会话提交后才入队，回滚则丢弃；
+- 后台任务按索引（{app_name}_{collection}）攒批，同一文档只保留最后一次变更，
+  每批一次 addDocuments / delete-batch 请求；
+- 推送失败或队列已满时直接丢弃并计数，不重试，由 CDC 追平。
+
+文档格式与 meilisearch-sync-service 一致：集合声明了搜索投影时推送 search_doc，否则推送 payload，
+去掉 app_name / collection / is_delete，id 转为字符串。
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "search_writer_pending"
+
+# 推送前从 payload 中去掉的字段（与 sync.go 保持一致）
+_STRIP_FIELDS = ("app_name", "collection", "is_delete")
+
+# (index_uid, id, 文档或 None)，None 表示删除
+Change = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+def index_uid(app_name: str, collection: str) -> str:
+    return f"{app_name}_{collection}"
+
+
+def search_document(payload: Dict[str, Any]) -> Dict[str, Any]:
+    doc = {k: v for k, v in payload.items() if k not in _STRIP_FIELDS}
+    doc["id"] = str(doc["id"])
+    return doc
+
+
+class SearchWriter:
+    """按索引攒批、异步推送到 Meilisearch 的写入器（每个 worker 一个）。"""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # index_uid -> {id: 文档或 None}，dict 保持插入顺序，重复 id 只保留最后一次
+        self._pending: Dict[str, Dict[str, Optional[Dict[str, Any]]]] = {}
+        self._pending_count = 0
+        self._http: Optional[requests.Session] = None
+        self.pushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        settings = get_settings()
+        return settings.search_direct_enabled and bool(settings.meili_default_url)
+
+    @staticmethod
+    def defer(
+        db: AsyncSession,
+        app_name: str,
+        collection: str,
+        id: str,
+        payload: Optional[Dict[str, Any]],
+    ) -> None:
+        """登记一条变更，db 所在事务提交后入队（payload 为 search_doc 或 payload，None 表示删除）。"""
+        if not SearchWriter.enabled():
+            return
+        doc = search_document(payload) if payload is not None else None
+        db.info.setdefault(_PENDING_KEY, []).append((index_uid(app_name, collection), str(id), doc))
+
+    def enqueue(self, changes: List[Change]) -> None:
+        """把已提交的变更放入待推送缓冲区，超过 search_direct_max_pending 的部分丢弃。"""
+        self._ensure_started()
+        max_pending = get_settings().search_direct_max_pending
+        for uid, id, doc in changes:
+            docs = self._pending.setdefault(uid, {})
+            if id in docs:
+                # 覆盖旧变更，并移到末尾保持变更顺序
+                docs.pop(id)
+            elif self._pending_count >= max_pending:
+                self.dropped += 1
+                continue
+            else:
+                self._pending_count += 1
+            docs[id] = doc
+        self._wakeup.set()
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._task = None
+            self._wakeup = asyncio.Event()
+            self._pending = {}
+            self._pending_count = 0
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        settings = get_settings()
+        while True:
+            await self._wakeup.wait()
+            # 等待一个攒批窗口，让同一时间段的写入合并成一批
+            await asyncio.sleep(settings.search_direct_flush_ms / 1000)
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """推送当前缓冲区中的全部变更。"""
+        pending, self._pending = self._pending, {}
+        self._pending_count = 0
+        batch_size = get_settings().search_direct_batch_size
+        for uid, docs in pending.items():
+            upserts: List[Dict[str, Any]] = []
+            deletes: List[str] = []
+            for id, doc in docs.items():
+                # 同一文档先删后写（或先写后删）时只保留最后一次，顺序不影响结果
+                if doc is None:
+                    deletes.append(id)
+                else:
+                    upserts.append(doc)
+            for start in range(0, len(upserts), batch_size):
+                await self._push(uid, "documents?primaryKey=id", upserts[start:start + batch_size])
+            for start in range(0, len(deletes), batch_size):
+                await self._push(uid, "documents/delete-batch", deletes[start:start + batch_size])
+
+    async def _push(self, uid: str, path: str, body: List[Any]) -> None:
+        settings = get_settings()
+        url = f"{settings.meili_default_url.rstrip('/')}/indexes/{uid}/{path}"
+        headers = {"Content-Type": "application/json"}
+        if settings.meili_default_api_key:
+            headers["Authorization"] = f"Bearer {settings.meili_default_api_key}"
+        if self._http is None:
+            self._http = requests.Session()
+        try:
+            # requests 是同步库，放到线程中执行，避免阻塞事件循环
+            res = await asyncio.to_thread(
+                self._http.post,
+                url,
+                data=json.dumps(body, ensure_ascii=False, default=str).encode("utf-8"),
+                headers=headers,
+                timeout=settings.search_direct_timeout_seconds,
+            )
+            res.raise_for_status()
+            self.pushed += len(body)
+        except Exception as e:
+            self.failed += len(body)
+            logger.warning(f"直写 Meilisearch 失败 index={uid} count={len(body)}: {e}，等待 CDC 追平")
+
+    async def stop(self) -> None:
+        """推送剩余变更并停止后台任务（应用关闭时调用）。"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._pending:
+            await self.flush()
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+
+search_writer = SearchWriter()
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        search_writer.enqueue(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,96 @@
+"""应用到分片的路由服务模块。
+
+未配置 settings.shards 时所有应用都在 default 分片，不产生任何查询。
+配置后，应用所在分片以控制库的 uni_app_shards 为准（进程内缓存 shard_map_ttl_seconds 秒）：
+- 尚未登记的应用若在 default 分片已有文档（分片之前的存量应用），登记到 default；
+- 否则按 HRW（rendezvous）一致性哈希在所有分片中选定并登记。
+登记后新增分片不会移动已有应用，迁移应用使用 scripts/migrate_app_shard.py。
+"""
+import hashlib
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import DEFAULT_SHARD, get_db_context, shard_names
+from app.models.app_shard import SHARD_ACTIVE, SHARD_FROZEN
+from app.repositories.app_shard_repository import app_shard_repository
+from app.repositories.document_repository import document_repository
+
+logger = logging.getLogger(__name__)
+
+# app_name -> (加载时间, (shard, state))
+_route_cache: Dict[str, Tuple[float, Tuple[str, str]]] = {}
+
+
+def placement_shard(app_name: str, shards: List[str]) -> str:
+    """HRW 一致性哈希：新增分片时只有落到新分片上的应用改变归属。"""
+    return max(shards, key=lambda shard: hashlib.sha1(f"{shard}:{app_name}".encode("utf-8")).digest())
+
+
+class ShardService:
+    """应用分片路由的业务逻辑类。"""
+
+    @staticmethod
+    def sharded() -> bool:
+        return bool(get_settings().shards)
+
+    @staticmethod
+    async def get_route(app_name: str) -> Tuple[str, str]:
+        """返回应用的 (分片, 状态)，尚未登记时先登记（带 TTL 缓存）。"""
+        if not ShardService.sharded():
+            return DEFAULT_SHARD, SHARD_ACTIVE
+
+        now = time.monotonic()
+        cached = _route_cache.get(app_name)
+        if cached and now - cached[0] < get_settings().shard_map_ttl_seconds:
+            return cached[1]
+
+        async with get_db_context() as db:
+            obj = await app_shard_repository.get(db, app_name)
+            if obj is None:
+                if await document_repository.app_has_documents(db, app_name):
+                    shard = DEFAULT_SHARD
+                else:
+                    shard = placement_shard(app_name, shard_names())
+                await app_shard_repository.pin(db, app_name, shard)
+                obj = await app_shard_repository.get(db, app_name)
+                logger.info(f"应用 {app_name} 登记到分片 {obj.shard}")
+            route = (obj.shard, obj.state)
+        _route_cache[app_name] = (now, route)
+        return route
+
+    @staticmethod
+    async def registered_shards(db: AsyncSession) -> Dict[str, str]:
+        """返回已登记应用的 app_name -> 分片，只读不登记（统计等不应决定应用归属的场景使用）。
+
+        未登记的应用只可能在 default 分片上有数据（写入前一定会先登记）。
+        """
+        if not ShardService.sharded():
+            return {}
+        return {obj.app_name: obj.shard for obj in await app_shard_repository.list_all(db)}
+
+    @staticmethod
+    async def shard_for_app(app_name: str, write: bool = False) -> str:
+        """返回应用所在分片；迁移切换中（frozen）的写请求返回 503。"""
+        shard, state = await ShardService.get_route(app_name)
+        if write and state == SHARD_FROZEN:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"应用 {app_name} 正在迁移分片，请稍后重试",
+                headers={"Retry-After": str(max(1, int(get_settings().shard_map_ttl_seconds)))},
+            )
+        return shard
+
+    @staticmethod
+    def invalidate(app_name: Optional[str] = None) -> None:
+        if app_name is None:
+            _route_cache.clear()
+        else:
+            _route_cache.pop(app_name, None)
+
+
+shard_service = ShardService()
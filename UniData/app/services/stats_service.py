@@ -0,0 +1,141 @@
+"""文档统计与应用配额的服务层模块。
+
+计数来自 uni_collection_counters（由 uni_documents 上的触发器增量维护，与文档在同一分片），
+统计接口与配额检查都只读这张小表，不对 uni_documents 做 COUNT(*)。
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import DEFAULT_SHARD, get_db_context, shard_names
+from app.repositories.document_repository import document_repository
+from app.repositories.stats_repository import stats_repository
+from app.services.shard_service import shard_service
+
+logger = logging.getLogger(__name__)
+
+# 配额的进程内缓存：app_name -> (加载时间, (max_documents, max_payload_bytes) 或 None)
+_QUOTA_TTL_SECONDS = 30.0
+_quota_cache: Dict[str, Tuple[float, Optional[Tuple[Optional[int], Optional[int]]]]] = {}
+
+
+def _quota_dict(quota: Optional[Tuple[Optional[int], Optional[int]]]) -> Optional[Dict[str, Any]]:
+    if quota is None:
+        return None
+    return {"max_documents": quota[0], "max_payload_bytes": quota[1]}
+
+
+class StatsService:
+    """文档统计与配额的业务逻辑类。"""
+
+    @staticmethod
+    def cache_size() -> int:
+        """进程内缓存的应用配额数（内存诊断用）。"""
+        return len(_quota_cache)
+
+    @staticmethod
+    async def get_quota(
+        db: AsyncSession, app_name: str
+    ) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        """返回应用配额 (max_documents, max_payload_bytes)，未设置时返回 None（带 TTL 缓存）。"""
+        now = time.monotonic()
+        cached = _quota_cache.get(app_name)
+        if cached and now - cached[0] < _QUOTA_TTL_SECONDS:
+            return cached[1]
+
+        obj = await stats_repository.get_quota(db, app_name)
+        quota = None
+        if obj and (obj.max_documents is not None or obj.max_payload_bytes is not None):
+            quota = (obj.max_documents, obj.max_payload_bytes)
+        _quota_cache[app_name] = (now, quota)
+        return quota
+
+    @staticmethod
+    async def set_quota(
+        db: AsyncSession,
+        app_name: str,
+        max_documents: Optional[int],
+        max_payload_bytes: Optional[int],
+    ) -> Dict[str, Any]:
+        await stats_repository.save_quota(db, app_name, max_documents, max_payload_bytes)
+        _quota_cache.pop(app_name, None)
+        logger.info(
+            f"已设置配额 app={app_name} max_documents={max_documents} "
+            f"max_payload_bytes={max_payload_bytes}"
+        )
+        return {"app_name": app_name, "max_documents": max_documents, "max_payload_bytes": max_payload_bytes}
+
+    @staticmethod
+    async def check_quota(db: AsyncSession, app_name: str, collection: str, ids: List[str]) -> None:
+        """写入前检查应用配额，超出时返回 403。
+
+        未设置配额的应用不产生任何查询；设置了配额时读一次计数合计，
+        只有文档数将要超限时才再查这些 ID 中哪些已存在（更新不增加文档数）。
+        配额为软限制：并发写入可能略微超出。
+        """
+        quota = await StatsService.get_quota(db, app_name)
+        if quota is None:
+            return
+        max_documents, max_payload_bytes = quota
+        count, size = await stats_repository.get_app_totals(db, app_name)
+
+        if max_payload_bytes is not None and size >= max_payload_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"超出应用配额：payload 存储已达 {size} 字节（上限 {max_payload_bytes}）",
+            )
+        if max_documents is not None and count + len(ids) > max_documents:
+            existing = await document_repository.existing_ids(db, collection, ids)
+            if count + len(ids) - len(existing) > max_documents:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=f"超出应用配额：文档数已达 {count}（上限 {max_documents}）",
+                )
+
+    @staticmethod
+    def _summarize(rows: List[Tuple[str, str, int, int]]) -> Dict[str, Any]:
+        return {
+            "collections": [
+                {"collection": c, "live_count": n, "payload_bytes": b} for _, c, n, b in rows
+            ],
+            "total_count": sum(r[2] for r in rows),
+            "total_bytes": sum(r[3] for r in rows),
+        }
+
+    @staticmethod
+    async def get_app_stats(db: AsyncSession, app_name: str) -> Dict[str, Any]:
+        """返回应用各 collection 的文档数、字节数、合计以及配额。"""
+        rows = await stats_repository.list_counters(db, app_name)
+        stats = StatsService._summarize(rows)
+        stats["app_name"] = app_name
+        stats["quota"] = _quota_dict(await StatsService.get_quota(db, app_name))
+        return stats
+
+    @staticmethod
+    async def get_all_stats(db: AsyncSession) -> List[Dict[str, Any]]:
+        """返回所有应用的统计（管理接口）。
+
+        计数表按分片存放，逐个分片读取，只采用应用当前所在分片的计数
+        （迁移后未清理的源分片残留行不计入）。只读取已有的分片登记，不为未登记的应用分配分片。
+        """
+        registered = await shard_service.registered_shards(db)
+        by_app: Dict[str, List[Tuple[str, str, int, int]]] = {}
+        for shard in shard_names():
+            async with get_db_context(shard) as shard_db:
+                rows = await stats_repository.list_counters(shard_db)
+            for row in rows:
+                if registered.get(row[0], DEFAULT_SHARD) == shard:
+                    by_app.setdefault(row[0], []).append(row)
+        result = []
+        for app_name, app_rows in by_app.items():
+            stats = StatsService._summarize(app_rows)
+            stats["app_name"] = app_name
+            stats["quota"] = _quota_dict(await StatsService.get_quota(db, app_name))
+            result.append(stats)
+        return result
+
+
+stats_service = StatsService()
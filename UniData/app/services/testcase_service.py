@@ -1,11 +1,15 @@
 """测试用例业务逻辑的服务层模块。"""
 import json
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import get_settings
+from app.core.database import get_db_context
+from app.models.testcase import TestCase
+from app.repositories.payload_query import build_filter_clauses, parse_filter
 from app.repositories.testcase_repository import testcase_repository
 
 logger = logging.getLogger(__name__)
@@ -69,5 +73,73 @@ class TestCaseService:
 
         return id
 
+    @staticmethod
+    async def bulk_delete_test_cases(ids: List[str], app_name: str) -> int:
+        """
+        按 ID 列表批量软删除当前应用的测试用例，返回实际删除的行数。
+
+        ID 按 bulk_delete_chunk_size 分块，每块一条 UPDATE、一个短事务。
+        """
+        chunk_size = get_settings().bulk_delete_chunk_size
+        unique_ids = list(dict.fromkeys(ids))
+        deleted = 0
+        try:
+            for start in range(0, len(unique_ids), chunk_size):
+                async with get_db_context() as db:
+                    deleted += await testcase_repository.soft_delete_test_cases_by_ids(
+                        db, app_name, unique_ids[start:start + chunk_size]
+                    )
+        except Exception as e:
+            logger.error(f"批量删除测试用例失败 deleted={deleted}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="数据库错误",
+            )
+        return deleted
+
+    @staticmethod
+    async def delete_test_cases_by_query(
+        app_name: str,
+        filters: Optional[List[str]] = None,
+        contains: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        按 payload 条件批量软删除当前应用的测试用例，返回实际删除的行数。
+
+        仅支持 eq/in 过滤与 contains（test_cases 没有声明索引），条件不能为空。
+        """
+        if not filters and not contains:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="删除条件不能为空",
+            )
+        try:
+            parsed = [parse_filter(f) for f in filters or []]
+            clauses = build_filter_clauses(parsed, contains, {}, payload_column=TestCase.payload)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+
+        chunk_size = get_settings().bulk_delete_chunk_size
+        deleted = 0
+        try:
+            while True:
+                async with get_db_context() as db:
+                    count = await testcase_repository.soft_delete_test_cases_by_query(
+                        db, app_name, clauses, chunk_size
+                    )
+                deleted += count
+                if count < chunk_size:
+                    break
+        except Exception as e:
+            logger.error(f"按条件删除测试用例失败 deleted={deleted}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="数据库错误",
+            )
+        return deleted
+
 
 testcase_service = TestCaseService()
@@ -0,0 +1,511 @@
+"""文档写入的本地磁盘暂存（spool）模块（可选）。
+
+数据库不可用，或取连接等待超过 spool_pool_wait_ms 时，写接口不再返回 500，
+而是把写入追加到本地日志文件，fsync 后以 202（status=queued）确认；
+后台任务在数据库恢复后按原顺序用批量语句重放。
+
+- 只覆盖按 ID 的写入：单条 / 批量 upsert，单条 / 按 ID 批量删除；
+- 本 worker 还有未重放的写入，或 spool 目录中还有任一 worker 的段时，新的写入也进入 spool，
+  不会先于更早的暂存写入落库、随后又被重放覆盖；
+- 追加由单个写入任务完成，积压的记录一次写入、一次 fsync（group commit），确认一定在落盘之后；
+- 文件按段组织并持有 flock：活跃段由写入方持有，重放时由重放方持有，
+  进程崩溃遗留的段可被任一 worker 接手；
+- 重放时按记录时间合并各段，只重放早于其他 worker 仍持有的段中最早一条未重放记录的部分，
+  不同 worker 暂存的写入按时间先后落库；
+- 重放为至少一次：提交后、记录进度前崩溃会导致该批再重放一次，upsert 与删除都是幂等的；
+- 重放时校验失败（schema、配额等）的写入记入 rejected.jsonl，不阻塞后续写入。
+
+暂存期间读接口看不到这些写入；重放时删除只作用于写入方应用的文档。
+spool 目录只在同一主机的 worker 之间共享，多台主机部署时各自暂存、各自重放。
+"""
+import asyncio
+import fcntl
+import glob
+import heapq
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+from fastapi import HTTPException, status
+from sqlalchemy import exc as sa_exc
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import get_db_context
+from app.core.timing import jsonl_logger
+from app.services.document_service import document_service
+from app.services.shard_service import shard_service
+
+logger = logging.getLogger(__name__)
+
+# run() 返回该值表示写入已进入 spool
+QUEUED: Any = object()
+
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+# 视为「数据库不可用」的异常（沿异常链查找）；TimeoutError / ConnectionError 都是 OSError 的子类
+_UNAVAILABLE_ERRORS = (
+    OSError,
+    sa_exc.TimeoutError,
+    asyncpg.exceptions.CannotConnectNowError,
+    asyncpg.exceptions.ConnectionDoesNotExistError,
+    asyncpg.exceptions.TooManyConnectionsError,
+    asyncpg.exceptions.AdminShutdownError,
+    asyncpg.exceptions.CrashShutdownError,
+)
+
+
+def is_db_unavailable(error: Optional[BaseException]) -> bool:
+    """沿 __cause__ / __context__ 判断异常是否由数据库不可用引起（连接失败、断开、连接池超时等）。"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, sa_exc.DBAPIError) and error.connection_invalidated:
+            return True
+        if isinstance(error, _UNAVAILABLE_ERRORS):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _read_segment(path: str) -> Tuple[List[Dict[str, Any]], int]:
+    """读取段文件中的记录与已重放条数；末尾未写完整的一行（正在写入或崩溃时的半行）被忽略。"""
+    records = []
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"忽略 spool 段 {path} 中无法解析的记录")
+    try:
+        with open(path + ".offset", encoding="utf-8") as f:
+            done = int(f.read().strip() or 0)
+    except FileNotFoundError:
+        done = 0
+    return records, done
+
+
+def _write_offset(path: str, done: int) -> None:
+    tmp = path + ".offset.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(str(done))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path + ".offset")
+
+
+def _remove_segment(path: str) -> None:
+    for name in (path, path + ".offset"):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+def _has_segments(directory: str) -> bool:
+    """spool 目录中是否还有未重放完的段（任一 worker 的）。"""
+    try:
+        with os.scandir(directory) as entries:
+            return any(entry.name.endswith(".log") for entry in entries)
+    except FileNotFoundError:
+        return False
+
+
+class _Segment:
+    """一轮重放中的一个段；handle 为 None 表示段由其他 worker 持有（正在写入或重放），只读取不重放。"""
+
+    __slots__ = ("path", "handle", "records", "done")
+
+    def __init__(self, path: str, handle: Any, records: List[Dict[str, Any]], done: int) -> None:
+        self.path = path
+        self.handle = handle
+        self.records = records
+        self.done = done
+
+
+def _open_segments(directory: str) -> List[_Segment]:
+    """按创建顺序打开目录中的段，能获取 flock 的由本 worker 持有并重放。"""
+    segments = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.log"))):
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            continue
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            handle = None
+        try:
+            if not os.path.exists(path):
+                # 获取锁之前已被其他 worker 重放并删除
+                raise FileNotFoundError(path)
+            records, done = _read_segment(path)
+        except FileNotFoundError:
+            if handle is not None:
+                handle.close()
+            continue
+        segments.append(_Segment(path, handle, records, done))
+    return segments
+
+
+def _replay_order(segments: List[_Segment]) -> List[Tuple[int, Dict[str, Any]]]:
+    """按记录时间合并各段未重放的记录，返回本轮可重放的 (段序号, 记录)。
+
+    各段内部保持追加顺序；遇到第一条属于其他 worker 持有的段的记录即截止，
+    它之后的记录留到下一轮，避免更早的写入在更晚的写入之后落库。
+    """
+    merged = heapq.merge(*[
+        [(segment.records[i].get("ts", ""), n, i) for i in range(segment.done, len(segment.records))]
+        for n, segment in enumerate(segments)
+    ])
+    order = []
+    for _, n, i in merged:
+        if segments[n].handle is None:
+            break
+        order.append((n, segments[n].records[i]))
+    return order
+
+
+def _next_run(records: List[Dict[str, Any]], start: int, batch_size: int) -> int:
+    """返回从 start 开始、op / collection / app_name 相同的连续记录的结束位置（条目数不超过 batch_size）。"""
+    first = records[start]
+    key = (first["op"], first["collection"], first["app_name"])
+    end, items = start, 0
+    while end < len(records):
+        record = records[end]
+        if (record["op"], record["collection"], record["app_name"]) != key:
+            break
+        if items and items + len(record["items"]) > batch_size:
+            break
+        items += len(record["items"])
+        end += 1
+    return end
+
+
+class WriteSpool:
+    """单个 worker 的写入暂存：追加、确认与后台重放。"""
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        self._queue: List[Tuple[bytes, asyncio.Future]] = []
+        # 活跃段（由写入方持有 flock），封段后置为 None，下次追加时新建
+        self._file: Any = None
+        # 本 worker 已接受但尚未确认重放完成的记录数，非 0 时新写入也进入 spool
+        self._pending = 0
+        self._bytes = 0
+        self.degraded_reason: Optional[str] = None
+        self.spooled = 0
+        self.replayed = 0
+        self.rejected = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        return get_settings().spool_enabled
+
+    async def start(self) -> None:
+        """启动后台任务；目录中有遗留段（含其他进程崩溃遗留）时先进入暂存模式，等待重放。"""
+        self._ensure_started()
+        segments = glob.glob(os.path.join(get_settings().spool_dir, "*.log"))
+        if segments:
+            self._bytes = sum(os.path.getsize(p) for p in segments)
+            self.mark_degraded(f"存在 {len(segments)} 个未重放的 spool 段")
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._queue = []
+            self._writer_task = None
+            self._drain_task = None
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = loop.create_task(self._write_loop())
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = loop.create_task(self._drain_loop())
+
+    def mark_degraded(self, reason: str) -> None:
+        if self.degraded_reason is None:
+            logger.warning(f"数据库写入转入本地暂存: {reason}")
+        self.degraded_reason = reason
+
+    async def should_spool(self, db: Optional[AsyncSession]) -> bool:
+        """判断本次写入是否直接进入 spool。
+
+        已处于暂存模式或还有未重放的写入时直接返回 True；否则在 spool_pool_wait_ms 内为 db 取连接，
+        超时或连接失败时转入暂存模式。db 为 None 时不探测。
+        """
+        if not self.enabled():
+            return False
+        self._ensure_started()
+        if self._pending or self.degraded_reason or _has_segments(get_settings().spool_dir):
+            return True
+        if db is None:
+            return False
+        wait_ms = get_settings().spool_pool_wait_ms
+        try:
+            await asyncio.wait_for(db.connection(), timeout=wait_ms / 1000)
+        except Exception as e:
+            if not is_db_unavailable(e):
+                raise
+            self.mark_degraded(f"取连接超过 {wait_ms}ms" if isinstance(e, TimeoutError) else str(e))
+            await self._discard(db)
+            return True
+        return False
+
+    async def run(
+        self,
+        db: Optional[AsyncSession],
+        collection: str,
+        app_name: str,
+        op: str,
+        items: List[Any],
+        write: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """执行写入，数据库不可用时改为追加到 spool 并返回 QUEUED。
+
+        items 为 upsert 的 payload 列表或 delete 的 ID 列表，write 为直接写数据库的调用。
+        """
+        if await self.should_spool(db):
+            await self.append(op, collection, app_name, items)
+            return QUEUED
+        try:
+            return await write()
+        except Exception as e:
+            if not (self.enabled() and is_db_unavailable(e)):
+                raise
+            self.mark_degraded(str(e.__context__ or e))
+        if db is not None:
+            await self._discard(db)
+        await self.append(op, collection, app_name, items)
+        return QUEUED
+
+    @staticmethod
+    async def _discard(db: AsyncSession) -> None:
+        """回滚失败的会话，避免 get_db 在响应后再提交一个已失效的事务。"""
+        try:
+            await db.rollback()
+        except Exception:
+            pass
+
+    async def append(self, op: str, collection: str, app_name: str, items: List[Any]) -> None:
+        """追加一条写入记录，fsync 完成后返回。"""
+        settings = get_settings()
+        if op == OP_UPSERT:
+            errors = [
+                {"index": index, "id": None, "error": "缺少 'id' 字段"}
+                for index, payload in enumerate(items)
+                if "id" not in payload or not payload["id"]
+            ]
+            if errors:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=errors)
+        if self._bytes >= settings.spool_max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="数据库暂不可用且本地暂存已满，请稍后重试",
+            )
+
+        self._ensure_started()
+        record = {
+            "op": op,
+            "collection": collection,
+            "app_name": app_name,
+            "items": items,
+            "ts": datetime.utcnow().isoformat(),
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+        future = self._loop.create_future()
+        self._queue.append((line, future))
+        self._pending += 1
+        self._wakeup.set()
+        try:
+            await future
+        except OSError as e:
+            self._pending -= 1
+            logger.error(f"写入本地暂存失败: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="数据库暂不可用且写入本地暂存失败，请稍后重试",
+            )
+        self.spooled += 1
+
+    async def _write_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._queue:
+                # fsync 期间到达的记录留给下一批，一批只 fsync 一次
+                batch, self._queue = self._queue, []
+                try:
+                    async with self._lock:
+                        await asyncio.to_thread(self._write_batch, [line for line, _ in batch])
+                    error = None
+                except OSError as e:
+                    error = e
+                for _, future in batch:
+                    if future.done():
+                        continue
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+
+    def _write_batch(self, lines: List[bytes]) -> None:
+        if self._file is None:
+            directory = get_settings().spool_dir
+            os.makedirs(directory, exist_ok=True)
+            # 文件名以纳秒时间戳开头，按名称排序即按创建顺序
+            path = os.path.join(directory, f"{time.time_ns():020d}-{os.getpid()}.log")
+            self._file = open(path, "ab")
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            _fsync_dir(directory)
+        data = b"".join(lines)
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._bytes += len(data)
+
+    def _seal(self) -> None:
+        """关闭活跃段（释放 flock），使其可被重放。"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def _drain_loop(self) -> None:
+        settings = get_settings()
+        while True:
+            await asyncio.sleep(settings.spool_drain_interval_seconds)
+            if not self._pending and self.degraded_reason is None and not _has_segments(settings.spool_dir):
+                continue
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if is_db_unavailable(e):
+                    logger.info(f"数据库仍不可用，稍后重放 spool: {e}")
+                else:
+                    logger.error(f"重放 spool 失败: {e}")
+
+    async def drain(self) -> None:
+        """数据库可用时按记录时间重放目录中的段，全部完成后恢复直写。"""
+        async with get_db_context() as db:
+            await db.execute(text("SELECT 1"))
+
+        async with self._lock:
+            await asyncio.to_thread(self._seal)
+        directory = get_settings().spool_dir
+        segments = await asyncio.to_thread(_open_segments, directory)
+        try:
+            await self._replay(segments)
+        finally:
+            for segment in segments:
+                if segment.handle is not None:
+                    segment.handle.close()
+
+        # 重放期间没有新的追加、目录中也没有其他 worker 的段时才恢复直写；否则下一轮继续重放
+        if not self._queue and self._file is None and not await asyncio.to_thread(_has_segments, directory):
+            if self.degraded_reason is not None:
+                logger.info(f"spool 已重放完成，恢复直接写入数据库（累计重放 {self.replayed} 条）")
+            self._pending = 0
+            self._bytes = 0
+            self.degraded_reason = None
+
+    async def _replay(self, segments: List[_Segment]) -> None:
+        """按 _replay_order 的顺序合批重放，每批后记录各段进度，重放完的段被删除。"""
+        order = _replay_order(segments)
+        records = [record for _, record in order]
+        batch_size = get_settings().spool_drain_batch_size
+        start = 0
+        while start < len(records):
+            end = _next_run(records, start, batch_size)
+            first = records[start]
+            items = [item for record in records[start:end] for item in record["items"]]
+            await self._apply(first["op"], first["collection"], first["app_name"], items)
+            self.replayed += end - start
+            for n, _ in order[start:end]:
+                segments[n].done += 1
+            for n in dict.fromkeys(n for n, _ in order[start:end]):
+                await asyncio.to_thread(_write_offset, segments[n].path, segments[n].done)
+            start = end
+
+        for segment in segments:
+            if segment.handle is not None and segment.done >= len(segment.records):
+                await asyncio.to_thread(_remove_segment, segment.path)
+                logger.info(f"已重放 spool 段 {os.path.basename(segment.path)}（{len(segment.records)} 条）")
+
+    async def _apply(self, op: str, collection: str, app_name: str, items: List[Any]) -> None:
+        """重放一组写入；数据库不可用或返回 503 时抛出，校验失败的写入逐条重试后记入 rejected.jsonl。"""
+        try:
+            # 应用正在迁移分片时这里抛出 503，与数据库不可用一样留到下一轮重放
+            shard = await shard_service.shard_for_app(app_name, write=True)
+            if op == OP_UPSERT:
+                async with get_db_context(shard) as db:
+                    await document_service.upsert_documents(db, collection, items, app_name)
+            else:
+                await document_service.bulk_delete_documents(collection, items, app_name)
+            return
+        except Exception as e:
+            if is_db_unavailable(e) or (
+                isinstance(e, HTTPException) and e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            ):
+                raise
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+        if len(items) > 1:
+            for item in items:
+                await self._apply(op, collection, app_name, [item])
+            return
+        self.rejected += 1
+        logger.warning(f"spool 重放被拒绝 op={op} collection={collection} app={app_name}: {error}")
+        path = os.path.join(get_settings().spool_dir, "rejected.jsonl")
+        jsonl_logger("unidata.spool.rejected", path).info(json.dumps({
+            "op": op,
+            "collection": collection,
+            "app_name": app_name,
+            "item": items[0],
+            "error": error,
+            "ts": datetime.utcnow().isoformat(),
+        }, ensure_ascii=False, default=str))
+
+    async def stop(self) -> None:
+        """停止后台任务并关闭活跃段（应用关闭时调用），未重放的段留给下次启动。"""
+        for task in (self._writer_task, self._drain_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._writer_task = None
+        self._drain_task = None
+        if self._queue:
+            await asyncio.to_thread(self._write_batch, [line for line, _ in self._queue])
+            for _, future in self._queue:
+                if not future.done():
+                    future.set_result(None)
+            self._queue = []
+        self._seal()
+
+
+write_spool = WriteSpool()
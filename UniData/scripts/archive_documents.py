@@ -0,0 +1,52 @@
+"""手动或通过 cron 执行一次冷文档归档。
+
+把超过 ARCHIVE_AFTER_DAYS 天未更新的未删除文档从 uni_documents 移到 uni_documents_archive，
+批大小与批间休眠由 ARCHIVE_BATCH_SIZE / ARCHIVE_BATCH_PAUSE_SECONDS 控制。
+--days 可临时覆盖期限（仍需服务端开启归档，归档文档才会被读取）。
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# 确保可以从项目根目录导入 app 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.config import get_settings
+from app.core.database import close_db
+from app.services.archive_service import ArchiveReport, archive_service
+
+
+async def _archive() -> ArchiveReport:
+    try:
+        return await archive_service.run_once()
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    """
+    在项目根目录下运行：
+      python3 scripts/archive_documents.py --days 365
+    """
+    parser = argparse.ArgumentParser(description="把长期未更新的文档移入归档表")
+    parser.add_argument("--days", type=int, default=None, help="归档期限（天），默认 ARCHIVE_AFTER_DAYS")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    if args.days is not None:
+        settings.archive_after_days = args.days
+    if settings.archive_after_days <= 0:
+        raise SystemExit("未设置归档期限：请配置 ARCHIVE_AFTER_DAYS 或传入 --days")
+
+    report = asyncio.run(_archive())
+    print(
+        f"✅ 归档完成：uni_documents_archive {report.documents_archived} 行，"
+        f"{report.batches} 批，耗时 {report.elapsed_seconds:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""为 uni_documents 补装 search_doc 列，并按各应用的搜索投影重算已有文档的 search_doc。
+
+声明或修改 PUT /api/v1/data/{collection}/_projection 后，只有之后的写入会带上新的 search_doc，
+已有文档需运行本脚本重算。投影按 (app_name, collection) 声明，每行按写入它的应用的投影计算。
+每批一个短事务，不修改 updated_at，变更订阅与 _changes 不会收到事件；
+更新会产生 CDC 事件，同步服务据此用精简后的文档覆盖 Meilisearch 中的旧文档。
+未声明投影的应用写入的文档会把 search_doc 置为 NULL（同步服务回退到完整 payload）。
+已外置到 uni_blobs 的字段按引用取回原值后再投影。
+配置了 SHARDS 时逐个分片重算。
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+
+# 确保可以从项目根目录导入 app 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.database import DEFAULT_SHARD, close_db, get_db_context, get_engine, shard_names
+from app.models.collection_projection import CollectionProjection
+from app.repositories.collection_projection_repository import collection_projection_repository
+from app.repositories.document_repository import DOCUMENTS_TABLE, document_repository
+from app.services.collection_projection_service import collection_projection_service
+
+
+async def _ensure_schema() -> None:
+    """补装 search_doc 列与投影表（可重复执行；可空列无默认值，不重写表）。"""
+    for shard in shard_names():
+        async with get_engine(shard).begin() as conn:
+            await conn.execute(
+                text(f"ALTER TABLE {DOCUMENTS_TABLE} ADD COLUMN IF NOT EXISTS search_doc JSONB")
+            )
+            if shard == DEFAULT_SHARD:
+                await conn.run_sync(CollectionProjection.__table__.create, checkfirst=True)
+
+
+async def _backfill_collection(collection: str, batch_size: int) -> int:
+    async with get_db_context() as db:
+        projections = await collection_projection_repository.list_projections(db, collection)
+    fields_by_app: Dict[str, List[str]] = {p.app_name: list(p.fields) for p in projections}
+
+    updated = 0
+    for shard in shard_names():
+        after_id: Optional[str] = None
+        while True:
+            async with get_db_context(shard) as db:
+                rows = await document_repository.list_payload_batch(db, collection, after_id, batch_size)
+                if not rows:
+                    break
+                # 按应用分组，每组用该应用的投影计算
+                by_app: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+                for id, app_name, payload in rows:
+                    by_app.setdefault(app_name, []).append((id, payload))
+                items = []
+                for app_name, group in by_app.items():
+                    fields = fields_by_app.get(app_name)
+                    if fields is not None:
+                        docs = await collection_projection_service.project_stored(
+                            db, [payload for _, payload in group], fields
+                        )
+                    else:
+                        docs = [None] * len(group)
+                    items.extend((app_name, id, doc) for (id, _), doc in zip(group, docs))
+                await document_repository.set_search_docs(db, collection, items)
+            updated += len(rows)
+            after_id = rows[-1][0]
+    print(f"collection={collection} apps={sorted(fields_by_app)} 已更新 {updated} 行")
+    return updated
+
+
+async def _backfill(collections: List[str], batch_size: int) -> None:
+    try:
+        await _ensure_schema()
+        if not collections:
+            async with get_db_context() as db:
+                result = await db.execute(select(CollectionProjection.collection).distinct())
+                collections = list(result.scalars().all())
+        for collection in collections:
+            await _backfill_collection(collection, batch_size)
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    """
+    在项目根目录下运行：
+      python3 scripts/backfill_search_doc.py                 # 所有已声明投影的集合
+      python3 scripts/backfill_search_doc.py bugs requirements
+    """
+    parser = argparse.ArgumentParser(description="重算 uni_documents.search_doc")
+    parser.add_argument("collections", nargs="*", help="要重算的集合，不传时为所有已声明投影的集合")
+    parser.add_argument("--batch-size", type=int, default=500, help="每个事务更新的行数")
+    args = parser.parse_args()
+    asyncio.run(_backfill(args.collections, args.batch_size))
+    print("✅ search_doc 已重算")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,10 +8,18 @@ ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
-from app.core.database import engine
+from app.core.database import DEFAULT_SHARD, SHARDED_TABLES, close_db, get_engine, shard_names
 from app.models.testcase import Base
 from app.models.document import Document  # Register Document model
 from app.models.token import AppToken     # Register AppToken model
+from app.models.collection_index import CollectionIndex  # Register CollectionIndex model
+from app.models.collection_schema import CollectionSchema  # Register CollectionSchema model
+from app.models.collection_projection import CollectionProjection  # Register CollectionProjection model
+from app.models.collection_counter import CollectionCounter  # Register CollectionCounter model
+from app.models.app_quota import AppQuota  # Register AppQuota model
+from app.models.blob import Blob  # Register Blob model
+from app.models.app_shard import AppShard  # Register AppShard model
+from app.models.document_archive import ArchivedDocument  # Register ArchivedDocument model
 
 
 async def _create_all() -> None:
@@ -20,9 +28,16 @@ async def _create_all() -> None:
 
     包含：
     - test_cases（测试用例表）
+
+    配置了 SHARDS 时，其他分片上只创建按应用分片存放的表（文档、计数、blob）。
     """
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    for shard in shard_names():
+        tables = None
+        if shard != DEFAULT_SHARD:
+            tables = [Base.metadata.tables[name] for name in SHARDED_TABLES]
+        async with get_engine(shard).begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=tables)
+    await close_db()
 
 
 def main() -> NoReturn:
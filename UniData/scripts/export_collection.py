@@ -0,0 +1,60 @@
+"""把一个应用在某个集合下的文档导出为 Parquet 或 Arrow IPC 文件。
+
+与 GET /api/v1/data/{collection}/_export 使用同一套逻辑：服务端游标分批读取，
+每批写出一个行组，内存占用与集合大小无关。需要安装 pyarrow（pip install 'unidata[export]'）。
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# 确保可以从项目根目录导入 app 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from fastapi import HTTPException
+
+from app.core.database import close_db
+from app.services.export_service import EXPORT_FORMATS, export_service
+
+
+async def _export(args: argparse.Namespace) -> int:
+    try:
+        _, chunks = await export_service.open_export(
+            args.collection, args.app, args.format, args.columns, not args.hot_only
+        )
+        written = 0
+        with open(args.out, "wb") as f:
+            async for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        return written
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    """
+    在项目根目录下运行：
+      python3 scripts/export_collection.py bugs --app my_app --out bugs.parquet
+      python3 scripts/export_collection.py bugs --app my_app --columns status,priority:int64 --format arrow --out bugs.arrows
+    """
+    parser = argparse.ArgumentParser(description="把集合导出为 Parquet / Arrow IPC 文件")
+    parser.add_argument("collection", help="集合名称")
+    parser.add_argument("--app", required=True, help="应用名（app_name）")
+    parser.add_argument("--out", required=True, help="输出文件路径")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="parquet", help="导出格式")
+    parser.add_argument("--columns", default=None, help="逗号分隔的 field[:type]，不传时按样本推断")
+    parser.add_argument("--hot-only", action="store_true", help="不包含已归档的冷文档")
+    args = parser.parse_args()
+
+    try:
+        written = asyncio.run(_export(args))
+    except HTTPException as e:
+        raise SystemExit(f"导出失败: {e.detail}")
+    print(f"✅ 已导出 {args.collection} 到 {args.out}（{written} 字节）")
+
+
+if __name__ == "__main__":
+    main()
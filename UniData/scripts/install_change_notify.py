@@ -0,0 +1,79 @@
+"""为已有的 uni_documents 安装变更通知、变更序号触发器与变更订阅索引。
+
+create_all.py / partition_documents.py 新建表时会自动安装，
+这个脚本用于在已有部署上补装（可重复执行），配置了 SHARDS 时在每个分片上安装。
+change_xid 列以默认值 0 补加（PostgreSQL 11+ 不重写表），之前的行按 0 排在变更流最前面；
+旧版本按 (updated_at, id) 翻页的 idx_uni_documents_changes 不再使用，会被删除。
+旧版本 INSERT OR UPDATE 的单个触发器会替换为 INSERT、UPDATE 各一个，UPDATE 只在
+updated_at、is_delete 或 payload 变化时触发（只改 search_doc 的重算不产生变更事件）。
+索引使用 CREATE INDEX CONCURRENTLY，分区表上则直接创建（会自动下推到各分区）。
+"""
+import asyncio
+import os
+import sys
+
+from sqlalchemy import text
+
+# 确保可以从项目根目录导入 app 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.database import close_db, get_autocommit_conn, get_engine, shard_names
+from app.models.document import (
+    CHANGE_XID_FUNCTION_SQL,
+    CHANGE_XID_TRIGGER_SQL,
+    NOTIFY_FUNCTION_SQL,
+    NOTIFY_TRIGGER_SQL,
+)
+from app.repositories.document_repository import DOCUMENTS_TABLE
+
+INDEX_COLUMNS = "(collection, app_name, change_xid, id)"
+
+
+async def _install_shard(shard: str) -> None:
+    async with get_engine(shard).begin() as conn:
+        await conn.execute(
+            text(f"ALTER TABLE {DOCUMENTS_TABLE} ADD COLUMN IF NOT EXISTS change_xid BIGINT NOT NULL DEFAULT 0")
+        )
+        await conn.execute(text(NOTIFY_FUNCTION_SQL))
+        await conn.execute(text(CHANGE_XID_FUNCTION_SQL))
+        for sql in NOTIFY_TRIGGER_SQL + CHANGE_XID_TRIGGER_SQL:
+            await conn.execute(text(sql))
+        result = await conn.execute(
+            text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": DOCUMENTS_TABLE},
+        )
+        partitioned = result.scalar() == "p"
+
+    # 分区父表不支持 CONCURRENTLY
+    concurrently = "" if partitioned else "CONCURRENTLY "
+    async with get_autocommit_conn(shard) as conn:
+        await conn.execute(
+            text(
+                f"CREATE INDEX {concurrently}IF NOT EXISTS idx_uni_documents_change_xid "
+                f"ON {DOCUMENTS_TABLE} {INDEX_COLUMNS}"
+            )
+        )
+        await conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS idx_uni_documents_changes"))
+
+
+async def _install() -> None:
+    try:
+        for shard in shard_names():
+            await _install_shard(shard)
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    """
+    在项目根目录下运行：
+      python3 scripts/install_change_notify.py
+    """
+    asyncio.run(_install())
+    print("✅ 变更通知、变更序号触发器与 idx_uni_documents_change_xid 已安装")
+
+
+if __name__ == "__main__":
+    main()
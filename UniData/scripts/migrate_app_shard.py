@@ -0,0 +1,243 @@
+"""把一个应用的文档在线迁移到另一个分片。
+
+执行逻辑：
+1. 在控制库 uni_app_shards 中登记应用（尚未登记时按当前路由规则登记），校验目标分片；
+2. 目标分片上建表，映射状态置为 migrating（读写仍在源分片）；
+3. 按 (change_xid, collection, id) 增量拷贝事务号小于源分片快照 xmin 的行（含墓碑）及其引用的 blob，
+   期间被更新的行 change_xid 会变大，在后续轮次中再次拷贝，直到追平；再拷贝归档表中的行。
+   按提交时已结束的事务号翻页，先开始、后提交的事务不会落到游标之前而被漏拷；
+4. 状态置为 frozen，等待各进程的路由缓存过期（此时写请求返回 503），
+   再等待源分片上冻结前开始的事务全部结束（快照 xmin 越过冻结后读到的 xmax）；
+5. 拷贝剩余的行，去掉目标分片上已移回热表的归档行，核对行数后把应用切换到目标分片并恢复为 active；
+6. 指定 --cleanup 时再等待一个缓存周期，按批物理删除源分片上的行。
+
+切换前失败会把状态恢复为 active，应用继续使用源分片；目标分片上已拷贝的行可重新执行本脚本覆盖。
+目标分片上同一 (collection, id) 已属于其他应用时不覆盖，迁移中止并列出冲突的文档，需人工处理后重试。
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import List, Optional, Set, Tuple
+
+# 确保可以从项目根目录导入 app 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.config import get_settings
+from app.core.database import SHARDED_TABLES, close_db, get_db_context, get_engine, shard_names
+from app.models import Base
+from app.models.app_shard import SHARD_FROZEN, SHARD_MIGRATING
+from app.repositories.app_shard_repository import app_shard_repository
+from app.repositories.archive_repository import archive_repository
+from app.repositories.blob_repository import blob_repository
+from app.repositories.document_repository import document_repository
+from app.services.blob_service import blob_hashes, encode_value
+from app.services.collection_index_service import collection_index_service
+from app.services.document_service import document_service
+from app.services.shard_service import shard_service
+
+# 冻结后额外等待的秒数，覆盖各进程之间的时钟与调度误差
+_FREEZE_MARGIN_SECONDS = 1.0
+# 等待源分片在途事务结束时的轮询间隔
+_DRAIN_POLL_SECONDS = 0.5
+# 冲突报告中最多列出的文档数
+_MAX_REPORTED_CONFLICTS = 20
+
+
+def _check_conflicts(target: str, conflicts: List[Tuple[str, str]]) -> None:
+    """目标分片上有属于其他应用的同键文档时中止迁移。"""
+    if not conflicts:
+        return
+    listed = ", ".join(f"{collection}/{id}" for collection, id in conflicts[:_MAX_REPORTED_CONFLICTS])
+    more = f" 等 {len(conflicts)} 个" if len(conflicts) > _MAX_REPORTED_CONFLICTS else ""
+    raise RuntimeError(f"目标分片 {target} 上以下文档已属于其他应用，未覆盖：{listed}{more}")
+
+
+async def _prepare_collection(collection: str, target: str) -> None:
+    """在目标分片上准备 collection 的分区与已声明索引。"""
+    await document_service.ensure_partition(collection, target)
+    async with get_db_context() as db:
+        declared = await collection_index_service.get_declared_fields(db, collection)
+    for field, field_type in declared.items():
+        await collection_index_service.create_index_ddl(target, collection, field, field_type)
+
+
+async def _copy(
+    app_name: str,
+    source: str,
+    target: str,
+    after: Optional[Tuple[int, str, str]],
+    batch_size: int,
+    prepared: Set[str],
+) -> Tuple[int, Optional[Tuple[int, str, str]]]:
+    """拷贝 after 之后、已提交事务写入的行，返回 (拷贝行数, 新的游标)。"""
+    copied = 0
+    while True:
+        async with get_db_context(source) as db:
+            rows = await document_repository.list_app_rows_batch(db, app_name, after, batch_size)
+            hashes = list(dict.fromkeys(h for row in rows for h in blob_hashes(row.payload)))
+            blobs = await blob_repository.get_blobs(db, hashes)
+        if not rows:
+            return copied, after
+
+        for collection in {row.collection for row in rows} - prepared:
+            await _prepare_collection(collection, target)
+            prepared.add(collection)
+        async with get_db_context(target) as db:
+            await blob_repository.save_blobs(
+                db, [(h, value, len(encode_value(value))) for h, value in blobs.items()]
+            )
+            conflicts = await document_repository.copy_rows(db, rows)
+        _check_conflicts(target, conflicts)
+
+        copied += len(rows)
+        last = rows[-1]
+        after = (last.change_xid, last.collection, last.id)
+        if len(rows) < batch_size:
+            return copied, after
+
+
+async def _copy_archive(app_name: str, source: str, target: str, batch_size: int) -> int:
+    """按 (collection, id) 顺序拷贝归档行及其引用的 blob，返回拷贝行数。"""
+    copied = 0
+    after: Optional[Tuple[str, str]] = None
+    while True:
+        async with get_db_context(source) as db:
+            rows = await archive_repository.list_app_rows_batch(db, app_name, after, batch_size)
+            hashes = list(dict.fromkeys(h for row in rows for h in blob_hashes(row.payload)))
+            blobs = await blob_repository.get_blobs(db, hashes)
+        if not rows:
+            return copied
+        async with get_db_context(target) as db:
+            await blob_repository.save_blobs(
+                db, [(h, value, len(encode_value(value))) for h, value in blobs.items()]
+            )
+            conflicts = await archive_repository.copy_rows(db, rows)
+        _check_conflicts(target, conflicts)
+        copied += len(rows)
+        after = (rows[-1].collection, rows[-1].id)
+        if len(rows) < batch_size:
+            return copied
+
+
+async def _drain(source: str) -> None:
+    """等待源分片上此刻已开始的事务全部结束，之后它们写入的行都能被 _copy 读到。"""
+    async with get_db_context(source) as db:
+        _, xmax = await document_repository.snapshot_bounds(db)
+    while True:
+        async with get_db_context(source) as db:
+            xmin, _ = await document_repository.snapshot_bounds(db)
+        if xmin >= xmax:
+            return
+        await asyncio.sleep(_DRAIN_POLL_SECONDS)
+
+
+async def _count(app_name: str, shard: str) -> int:
+    async with get_db_context(shard) as db:
+        return (
+            await document_repository.count_app_rows(db, app_name)
+            + await archive_repository.count_app_rows(db, app_name)
+        )
+
+
+async def _cleanup(app_name: str, source: str, batch_size: int) -> int:
+    deleted = 0
+    for delete_batch in (document_repository.delete_app_rows_batch, archive_repository.delete_app_rows_batch):
+        while True:
+            async with get_db_context(source) as db:
+                count = await delete_batch(db, app_name, batch_size)
+            deleted += count
+            if count < batch_size:
+                break
+    return deleted
+
+
+async def _migrate(app_name: str, target: str, cleanup: bool, batch_size: int) -> None:
+    settings = get_settings()
+    if target not in shard_names():
+        raise SystemExit(f"未知的分片 {target}，可选: {', '.join(shard_names())}")
+
+    try:
+        source = await shard_service.shard_for_app(app_name)
+        if source == target:
+            print(f"应用 {app_name} 已在分片 {target}")
+            return
+
+        async with get_engine(target).begin() as conn:
+            tables = [Base.metadata.tables[name] for name in SHARDED_TABLES]
+            await conn.run_sync(Base.metadata.create_all, tables=tables)
+
+        async with get_db_context() as db:
+            await app_shard_repository.set_state(db, app_name, SHARD_MIGRATING, target)
+        print(f"开始迁移应用 {app_name}: {source} -> {target}")
+
+        flipped = False
+        try:
+            prepared: Set[str] = set()
+            after: Optional[Tuple[int, str, str]] = None
+            total = 0
+            while True:
+                copied, after = await _copy(app_name, source, target, after, batch_size, prepared)
+                total += copied
+                print(f"已拷贝 {total} 行")
+                if copied < batch_size:
+                    break
+            # 热表追平之后再拷贝归档表：期间被归档的行已作为热表行拷贝过
+            archived = await _copy_archive(app_name, source, target, batch_size)
+            print(f"已拷贝归档行 {archived} 行")
+
+            async with get_db_context() as db:
+                await app_shard_repository.set_state(db, app_name, SHARD_FROZEN, target)
+            wait = settings.shard_map_ttl_seconds + _FREEZE_MARGIN_SECONDS
+            print(f"已冻结写入，等待 {wait:.1f}s 让路由缓存过期")
+            await asyncio.sleep(wait)
+            # 冻结前开始、尚未提交的写入事务结束后，它们的行才会出现在 _copy 中
+            await _drain(source)
+
+            copied, after = await _copy(app_name, source, target, after, batch_size, prepared)
+            total += copied
+            # 迁移期间被写入而移回热表的文档，目标分片上以热表为准
+            async with get_db_context(target) as db:
+                await archive_repository.drop_restored(db, app_name)
+
+            source_rows = await _count(app_name, source)
+            target_rows = await _count(app_name, target)
+            if source_rows != target_rows:
+                raise RuntimeError(f"行数不一致：{source}={source_rows} {target}={target_rows}")
+
+            async with get_db_context() as db:
+                await app_shard_repository.move(db, app_name, target)
+            flipped = True
+            print(f"✅ 应用 {app_name} 已切换到分片 {target}（共拷贝 {total} 行）")
+        finally:
+            if not flipped:
+                async with get_db_context() as db:
+                    await app_shard_repository.move(db, app_name, source)
+                print(f"迁移未完成，应用 {app_name} 继续使用分片 {source}")
+
+        if cleanup:
+            await asyncio.sleep(settings.shard_map_ttl_seconds + _FREEZE_MARGIN_SECONDS)
+            deleted = await _cleanup(app_name, source, batch_size)
+            print(f"已删除源分片 {source} 上的 {deleted} 行")
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    """
+    在项目根目录下运行：
+      python3 scripts/migrate_app_shard.py my_app s1 --cleanup
+    """
+    parser = argparse.ArgumentParser(description="把应用的文档在线迁移到另一个分片")
+    parser.add_argument("app_name", help="要迁移的应用")
+    parser.add_argument("target", help="目标分片（SHARDS 中的名称，或 default）")
+    parser.add_argument("--cleanup", action="store_true", help="切换后删除源分片上的行")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每个事务拷贝或删除的行数")
+    args = parser.parse_args()
+    asyncio.run(_migrate(args.app_name, args.target, args.cleanup, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
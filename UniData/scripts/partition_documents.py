@@ -0,0 +1,213 @@
+"""将 uni_documents 迁移为按 collection 的 LIST 分区表。
+
+执行逻辑：
+1. uni_documents 不存在：直接创建分区父表与默认分区；
+2. uni_documents 是普通表：改名为 uni_documents_legacy，创建分区父表，
+   为每个已有 collection 建分区后整体拷贝数据；
+3. uni_documents 已是分区表：把默认分区中积压的 collection 迁出到独立分区。
+
+迁移完成后需在 .env 中设置 DOCUMENTS_PARTITIONED=true，
+配置了 SHARDS 时每个分片都要用 --shard 分别执行一次；
+之后首次写入新 collection 时服务会自动建分区。
+
+注意：Debezium 使用 pgoutput 时，需要让发布按父表名输出变更，
+否则每个分区会产生独立的 topic，可通过 --publication 参数自动设置。
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from sqlalchemy import text
+
+# 确保可以从项目根目录导入 app 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.database import DEFAULT_SHARD, get_engine
+from app.models.collection_counter import (
+    COUNTER_FUNCTION_SQL,
+    COUNTER_TRIGGER_SQL,
+    COUNTERS_TABLE,
+)
+from app.models.document import (
+    CHANGE_XID_FUNCTION_SQL,
+    CHANGE_XID_TRIGGER_SQL,
+    NOTIFY_FUNCTION_SQL,
+    NOTIFY_TRIGGER_SQL,
+)
+from app.repositories.document_repository import (
+    DEFAULT_PARTITION,
+    DOCUMENTS_TABLE,
+    document_repository,
+)
+from app.repositories.stats_repository import stats_repository
+
+LEGACY_TABLE = f"{DOCUMENTS_TABLE}_legacy"
+COLUMNS = "id, collection, app_name, payload, search_doc, is_delete, created_at, updated_at"
+
+CREATE_PARENT_SQL = f"""
+CREATE TABLE {DOCUMENTS_TABLE} (
+    id VARCHAR NOT NULL,
+    collection VARCHAR NOT NULL,
+    app_name VARCHAR,
+    payload JSONB,
+    search_doc JSONB,
+    is_delete BOOLEAN NOT NULL DEFAULT false,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    updated_at TIMESTAMP WITHOUT TIME ZONE,
+    change_xid BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (collection, id)
+) PARTITION BY LIST (collection)
+"""
+
+CREATE_INDEX_SQL = [
+    f"CREATE INDEX idx_collection_app ON {DOCUMENTS_TABLE} (collection, app_name)",
+    f"CREATE INDEX ix_{DOCUMENTS_TABLE}_app_name ON {DOCUMENTS_TABLE} (app_name)",
+    f"CREATE INDEX idx_uni_documents_live ON {DOCUMENTS_TABLE} "
+    f"(collection, app_name, updated_at DESC) WHERE is_delete = false",
+    f"CREATE INDEX idx_uni_documents_payload ON {DOCUMENTS_TABLE} "
+    f"USING gin (payload jsonb_path_ops)",
+    f"CREATE INDEX idx_uni_documents_tombstone ON {DOCUMENTS_TABLE} "
+    f"(updated_at) WHERE is_delete = true",
+    f"CREATE INDEX idx_uni_documents_change_xid ON {DOCUMENTS_TABLE} "
+    f"(collection, app_name, change_xid, id)",
+]
+
+
+async def _relkind(conn, name: str):
+    """返回表类型：'r' 普通表，'p' 分区表，None 不存在。"""
+    result = await conn.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": name},
+    )
+    return result.scalar()
+
+
+async def _create_partition(conn, collection: str) -> None:
+    name = await document_repository.create_collection_partition(conn, collection)
+    print(f"  分区 {name} <- {collection!r}")
+
+
+async def _create_parent(conn) -> None:
+    await conn.execute(text(CREATE_PARENT_SQL))
+    for sql in CREATE_INDEX_SQL:
+        await conn.execute(text(sql))
+    await conn.execute(text(NOTIFY_FUNCTION_SQL))
+    await conn.execute(text(CHANGE_XID_FUNCTION_SQL))
+    await conn.execute(text(COUNTER_FUNCTION_SQL))
+    for sql in NOTIFY_TRIGGER_SQL + CHANGE_XID_TRIGGER_SQL + COUNTER_TRIGGER_SQL:
+        await conn.execute(text(sql))
+    await conn.execute(
+        text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {DOCUMENTS_TABLE} DEFAULT")
+    )
+
+
+async def _migrate_legacy(conn) -> None:
+    """普通表 -> 分区表：旧表及其索引改名保留，数据按 collection 建分区后拷贝。"""
+    await conn.execute(text(f"ALTER TABLE {DOCUMENTS_TABLE} RENAME TO {LEGACY_TABLE}"))
+    result = await conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :t"),
+        {"t": LEGACY_TABLE},
+    )
+    for (index_name,) in result.all():
+        await conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_legacy"'))
+
+    await _create_parent(conn)
+
+    result = await conn.execute(text(f"SELECT DISTINCT collection FROM {LEGACY_TABLE}"))
+    for (collection,) in result.all():
+        await _create_partition(conn, collection)
+
+    result = await conn.execute(
+        text(f"INSERT INTO {DOCUMENTS_TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {LEGACY_TABLE}")
+    )
+    print(f"已拷贝 {result.rowcount} 行，旧表保留为 {LEGACY_TABLE}")
+
+
+async def _split_default(conn) -> None:
+    """把默认分区中的 collection 迁出到各自的分区。
+
+    PostgreSQL 不允许在默认分区里仍有对应数据时创建新分区，
+    因此先把数据暂存到临时表，删除后建分区再写回。
+    """
+    result = await conn.execute(text(f"SELECT DISTINCT collection FROM {DEFAULT_PARTITION}"))
+    for (collection,) in result.all():
+        params = {"collection": collection}
+        await conn.execute(
+            text(
+                f"CREATE TEMP TABLE _moving ON COMMIT DROP AS "
+                f"SELECT {COLUMNS} FROM {DEFAULT_PARTITION} WHERE collection = :collection"
+            ),
+            params,
+        )
+        await conn.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE collection = :collection"), params
+        )
+        await _create_partition(conn, collection)
+        await conn.execute(
+            text(f"INSERT INTO {DOCUMENTS_TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM _moving")
+        )
+        await conn.execute(text("DROP TABLE _moving"))
+
+
+async def _partition(publication: str, drop_legacy: bool, shard: str) -> None:
+    async with get_engine(shard).begin() as conn:
+        kind = await _relkind(conn, DOCUMENTS_TABLE)
+        if kind is None:
+            print(f"{DOCUMENTS_TABLE} 不存在，直接创建分区表")
+            await _create_parent(conn)
+        else:
+            # 早于 search_doc 列建立的表先补列，保证按 COLUMNS 拷贝时列一致
+            await conn.execute(
+                text(f"ALTER TABLE {DOCUMENTS_TABLE} ADD COLUMN IF NOT EXISTS search_doc JSONB")
+            )
+            if kind == "r":
+                print(f"{DOCUMENTS_TABLE} 为普通表，开始迁移")
+                await _migrate_legacy(conn)
+            else:
+                print(f"{DOCUMENTS_TABLE} 已是分区表，检查默认分区")
+                await _split_default(conn)
+
+        # 拷贝数据会触发计数触发器，迁移后按实际数据重算计数
+        if await _relkind(conn, COUNTERS_TABLE) is not None:
+            rows = await stats_repository.rebuild_counters(conn)
+            print(f"已重算 {COUNTERS_TABLE}（{rows} 行）")
+
+        if drop_legacy and await _relkind(conn, LEGACY_TABLE) is not None:
+            await conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+            print(f"已删除 {LEGACY_TABLE}")
+
+        if publication:
+            await conn.execute(
+                text(f'ALTER PUBLICATION "{publication}" SET (publish_via_partition_root = true)')
+            )
+            print(f"发布 {publication} 已设置 publish_via_partition_root = true")
+
+
+def main() -> None:
+    """
+    在项目根目录下运行：
+      python3 scripts/partition_documents.py --publication dbz_publication
+    """
+    parser = argparse.ArgumentParser(description="将 uni_documents 迁移为按 collection 的 LIST 分区表")
+    parser.add_argument(
+        "--publication",
+        default="",
+        help="Debezium 使用的发布名称（如 dbz_publication），设置后按父表名输出变更",
+    )
+    parser.add_argument(
+        "--drop-legacy",
+        action="store_true",
+        help="迁移完成后删除 uni_documents_legacy 旧表",
+    )
+    parser.add_argument("--shard", default=DEFAULT_SHARD, help="要迁移的分片（SHARDS 中的名称）")
+    args = parser.parse_args()
+
+    asyncio.run(_partition(args.publication, args.drop_legacy, args.shard))
+    print("✅ uni_documents 分区迁移完成，请设置 DOCUMENTS_PARTITIONED=true")
+
+
+if __name__ == "__main__":
+    main()
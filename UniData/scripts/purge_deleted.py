@@ -0,0 +1,42 @@
+"""手动或通过 cron 执行一次墓碑清理。
+
+物理删除软删除时间超过 PURGE_RETENTION_DAYS 的 uni_documents / test_cases 行，
+以及同样超过保留期且不再被引用的 uni_blobs 行，
+批大小与批间休眠同样由 PURGE_BATCH_SIZE / PURGE_BATCH_PAUSE_SECONDS 控制。
+"""
+import asyncio
+import os
+import sys
+
+# 确保可以从项目根目录导入 app 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.database import close_db
+from app.services.purge_service import PurgeReport, purge_service
+
+
+async def _purge() -> PurgeReport:
+    try:
+        return await purge_service.run_once()
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    """
+    在项目根目录下运行：
+      python3 scripts/purge_deleted.py
+    """
+    report = asyncio.run(_purge())
+    print(
+        f"✅ 清理完成：uni_documents {report.documents_purged} 行，"
+        f"test_cases {report.test_cases_purged} 行，"
+        f"uni_blobs {report.blobs_purged} 行，"
+        f"{report.batches} 批，耗时 {report.elapsed_seconds:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""安装文档计数触发器，并按 uni_documents 全量重算 uni_collection_counters。
+
+用于首次启用计数（已有数据）、升级计数函数（如新增 write_count 列）或怀疑计数漂移时校正，
+配置了 SHARDS 时逐个分片执行。write_count 不重算，保持原值。
+重算期间以 SHARE 模式锁住 uni_documents：读不受影响，写入会等待重算完成。
+"""
+import asyncio
+import os
+import sys
+
+from sqlalchemy import text
+
+# 确保可以从项目根目录导入 app 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.database import close_db, get_engine, shard_names
+from app.models.collection_counter import (
+    COUNTER_FUNCTION_SQL,
+    COUNTER_TRIGGER_SQL,
+    COUNTERS_TABLE,
+    CollectionCounter,
+)
+from app.repositories.stats_repository import stats_repository
+
+
+async def _rebuild() -> int:
+    rows = 0
+    try:
+        for shard in shard_names():
+            async with get_engine(shard).begin() as conn:
+                await conn.run_sync(CollectionCounter.__table__.create, checkfirst=True)
+                await conn.execute(
+                    text(
+                        f"ALTER TABLE {COUNTERS_TABLE} "
+                        "ADD COLUMN IF NOT EXISTS write_count BIGINT NOT NULL DEFAULT 0"
+                    )
+                )
+                await conn.execute(text("LOCK TABLE uni_documents IN SHARE MODE"))
+                await conn.execute(text(COUNTER_FUNCTION_SQL))
+                for sql in COUNTER_TRIGGER_SQL:
+                    await conn.execute(text(sql))
+                rows += await stats_repository.rebuild_counters(conn)
+        return rows
+    finally:
+        await close_db()
+
+
+def main() -> None:
+    """
+    在项目根目录下运行：
+      python3 scripts/rebuild_counters.py
+    """
+    rows = asyncio.run(_rebuild())
+    print(f"✅ 计数触发器已安装，uni_collection_counters 已重算（{rows} 行）")
+
+
+if __name__ == "__main__":
+    main()
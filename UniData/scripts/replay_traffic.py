@@ -0,0 +1,219 @@
+"""把 TrafficCaptureMiddleware 采集的流量重放到本地实例，统计延迟与响应差异。
+
+每条记录按原始到达间隔发出（--speed 2 表示两倍速，--speed 0 表示不等待、尽快发出），
+令牌按记录中的 app_name/scopes 用 jwt_secret 重新签发（需与目标实例配置一致）。
+
+输出：
+- 整体与按路由的请求数、p50/p90/p99/max 延迟（毫秒），以及与采集时延迟的对比；
+  延迟从计划发出时间算起，包含请求在线程池中排队的时间（并发数不足时不会低估延迟），
+  另外单独给出最大排队时间；
+- 状态码与采集时不同的请求（divergence），按路由汇总并打印前若干条；
+- 响应体 SHA-1 不同的请求数（响应中含时间戳等字段时可能本就不一致，仅供参考）。
+
+注意：重放会真实写入目标实例的数据库，只应对测试库执行。
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+# 确保可以从项目根目录导入 app 包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.auth import generate_jwt
+
+TOKEN_TTL_SECONDS = 24 * 3600
+
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    """读取采集文件，跳过无法解析与请求体被截断的记录，按时间排序。"""
+    records = []
+    skipped = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if record.get("body_truncated"):
+                skipped += 1
+                continue
+            records.append(record)
+    if skipped:
+        print(f"跳过 {skipped} 条无法重放的记录")
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法百分位，values 需已排序。"""
+    if not values:
+        return 0.0
+    index = max(0, math.ceil(p / 100 * len(values)) - 1)
+    return values[index]
+
+
+class Replayer:
+    """按原始节奏发出请求并收集结果。"""
+
+    def __init__(self, base_url: str, concurrency: int, timeout: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.results: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._tokens: Dict[Any, str] = {}
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency)
+
+    def _session(self) -> requests.Session:
+        # 每个线程一个 Session，复用 keep-alive 连接
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _token(self, auth: Optional[Dict[str, Any]]) -> Optional[str]:
+        if not auth or not auth.get("app_name"):
+            return None
+        key = (auth["app_name"], tuple(auth.get("scopes") or []))
+        token = self._tokens.get(key)
+        if token is None:
+            token = self._tokens[key] = generate_jwt(key[0], list(key[1]), TOKEN_TTL_SECONDS)
+        return token
+
+    def _send(self, record: Dict[str, Any], token: Optional[str], scheduled: float) -> None:
+        """发出请求；scheduled 是按重放节奏计划发出的 time.monotonic() 时间。"""
+        headers = dict(record.get("headers") or {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if "body_b64" in record:
+            body = base64.b64decode(record["body_b64"])
+        else:
+            body = (record.get("body") or "").encode("utf-8")
+        url = self.base_url + record["path"]
+        if record.get("query"):
+            url += "?" + record["query"]
+
+        started = time.monotonic()
+        try:
+            res = self._session().request(
+                record["method"], url, data=body or None, headers=headers, timeout=self.timeout
+            )
+            status_code, content, error = res.status_code, res.content, None
+        except requests.RequestException as e:
+            status_code, content, error = 0, b"", str(e)
+        finished = time.monotonic()
+
+        with self._lock:
+            self.results.append({
+                "route": f"{record['method']} {record.get('route') or record['path']}",
+                "path": record["path"],
+                "latency_ms": (finished - scheduled) * 1000,
+                "queued_ms": max(started - scheduled, 0.0) * 1000,
+                "captured_ms": record.get("duration_ms"),
+                "status": status_code,
+                "captured_status": record.get("status"),
+                "sha1_match": hashlib.sha1(content).hexdigest() == record.get("response_sha1"),
+                "error": error,
+            })
+
+    def run(self, records: List[Dict[str, Any]], speed: float) -> float:
+        """按节奏提交全部请求并等待完成，返回总耗时（秒）。"""
+        if not records:
+            return 0.0
+        t0 = records[0]["ts"]
+        started = time.monotonic()
+        for record in records:
+            if speed > 0:
+                scheduled = started + (record["ts"] - t0) / speed
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled = time.monotonic()
+            self._pool.submit(self._send, record, self._token(record.get("auth")), scheduled)
+        self._pool.shutdown(wait=True)
+        return time.monotonic() - started
+
+
+def _latency_line(name: str, results: List[Dict[str, Any]]) -> str:
+    latencies = sorted(r["latency_ms"] for r in results)
+    captured = sorted(r["captured_ms"] for r in results if r["captured_ms"] is not None)
+    line = (
+        f"{name:<60} n={len(results):<6} p50={percentile(latencies, 50):8.1f} "
+        f"p90={percentile(latencies, 90):8.1f} p99={percentile(latencies, 99):8.1f} "
+        f"max={latencies[-1]:8.1f}"
+    )
+    if captured:
+        line += f"  (采集时 p50={percentile(captured, 50):.1f} p99={percentile(captured, 99):.1f})"
+    return line
+
+
+def report(results: List[Dict[str, Any]], elapsed: float, show: int) -> int:
+    """打印统计结果，返回状态码不一致的请求数。"""
+    if not results:
+        print("没有可重放的请求")
+        return 0
+
+    print(f"共 {len(results)} 个请求，耗时 {elapsed:.1f}s，{len(results) / max(elapsed, 1e-9):.1f} req/s")
+    print(f"延迟（毫秒，含排队）：最大排队 {max(r['queued_ms'] for r in results):.1f}")
+    print(_latency_line("ALL", results))
+    by_route: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for r in results:
+        by_route[r["route"]].append(r)
+    for route in sorted(by_route, key=lambda k: -len(by_route[k])):
+        print(_latency_line(route, by_route[route]))
+
+    diverged = [r for r in results if r["status"] != r["captured_status"]]
+    body_diff = sum(1 for r in results if not r["sha1_match"])
+    print(f"状态码不一致: {len(diverged)}，响应体不一致: {body_diff}")
+    if diverged:
+        counts: Dict[str, int] = defaultdict(int)
+        for r in diverged:
+            counts[f"{r['route']} {r['captured_status']} -> {r['status']}"] += 1
+        for key, count in sorted(counts.items(), key=lambda kv: -kv[1]):
+            print(f"  {key}: {count}")
+        for r in diverged[:show]:
+            print(f"  {r['path']}: {r['captured_status']} -> {r['status']} {r['error'] or ''}")
+    return len(diverged)
+
+
+def main() -> None:
+    """
+    在项目根目录下运行：
+      python3 scripts/replay_traffic.py captures/requests.jsonl --base-url http://127.0.0.1:8080 --speed 2
+    """
+    parser = argparse.ArgumentParser(description="重放采集的流量并统计延迟与差异")
+    parser.add_argument("capture", help="TrafficCaptureMiddleware 写出的 JSON 行文件")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8080", help="目标实例地址")
+    parser.add_argument("--speed", type=float, default=1.0, help="重放倍速，0 表示不等待尽快发出")
+    parser.add_argument("--concurrency", type=int, default=32, help="最大并发请求数")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单个请求超时（秒）")
+    parser.add_argument("--show", type=int, default=20, help="最多打印的不一致请求条数")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture)
+    replayer = Replayer(args.base_url, args.concurrency, args.timeout)
+    elapsed = replayer.run(records, args.speed)
+    diverged = report(replayer.results, elapsed, args.show)
+    sys.exit(1 if diverged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 """Pytest 配置和异步测试 fixtures 模块。"""
 import asyncio
-from typing import AsyncGenerator, Generator
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Dict, Generator, List, Tuple
 
 import pytest
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
@@ -12,7 +14,7 @@ from sqlalchemy.ext.asyncio import (
 
 from app.main import app
 from app.core.config import get_settings
-from app.core.database import _make_async_conn_string, get_db
+from app.core.database import _make_async_conn_string, close_db, get_db, get_engine, shard_names
 from app.models.testcase import Base
 
 
@@ -79,4 +81,119 @@ async def clean_client() -> AsyncGenerator[AsyncClient, None]:
         base_url="http://test",
         follow_redirects=True,
     ) as ac:
-        yield ac
\ No newline at end of file
+        yield ac
+
+
+@pytest.fixture
+async def app_tables() -> AsyncGenerator[None, None]:
+    """在应用自身的引擎上建表，供直接调用仓储/服务的数据库测试使用；数据库不可用时跳过。"""
+    try:
+        async with get_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    except OSError as e:
+        await close_db()
+        pytest.skip(f"数据库不可用: {e}")
+    try:
+        yield
+    finally:
+        await close_db()
+
+
+def _value_size(value: Any) -> int:
+    """按文本编码估算单个参数或列值的字节数。"""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return len(str(value).encode("utf-8"))
+
+
+def _params_size(parameters: Any) -> int:
+    if parameters is None:
+        return 0
+    if isinstance(parameters, dict):
+        return sum(_value_size(v) for v in parameters.values())
+    if isinstance(parameters, (list, tuple)):
+        return sum(
+            _params_size(p) if isinstance(p, (dict, list, tuple)) else _value_size(p) for p in parameters
+        )
+    return _value_size(parameters)
+
+
+@dataclass
+class SqlStatement:
+    """一次游标执行：SQL 文本、返回行数与估算的发送字节数（语句文本加参数）。"""
+
+    sql: str
+    rows: int = 0
+    bytes_sent: int = 0
+
+
+@dataclass
+class SqlCounter:
+    """记录测试期间经由应用引擎执行的 SQL 语句。"""
+
+    statements: List[SqlStatement] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def rows(self) -> int:
+        return sum(s.rows for s in self.statements)
+
+    @property
+    def bytes(self) -> int:
+        return sum(s.bytes_sent for s in self.statements)
+
+    def reset(self) -> None:
+        self.statements.clear()
+
+    def assert_at_most(self, limit: int, label: str = "") -> None:
+        """断言语句数不超过 limit，失败时列出实际执行的 SQL。"""
+        if self.count > limit:
+            listing = "\n".join(f"  {i + 1}. {s.sql}" for i, s in enumerate(self.statements))
+            raise AssertionError(f"{label} 执行了 {self.count} 条 SQL（上限 {limit}）：\n{listing}")
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        sent = len(statement.encode("utf-8")) + _params_size(parameters)
+        self.statements.append(SqlStatement(sql=" ".join(statement.split()), bytes_sent=sent))
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if not self.statements or cursor.description is None:
+            return
+        # DB-API 的 rowcount：asyncpg 适配器取自命令状态（SELECT n / INSERT 0 n），未知时为 -1
+        self.statements[-1].rows = max(cursor.rowcount, 0)
+
+
+# nodeid -> (语句数, 行数, 字节数)，在终端摘要中输出
+_sql_stats: Dict[str, Tuple[int, int, int]] = {}
+
+
+@pytest.fixture
+def sql_counter(request) -> Generator[SqlCounter, None, None]:
+    """统计测试期间所有分片引擎上执行的 SQL 语句、返回行数与发送字节数。"""
+    counter = SqlCounter()
+    engines = [get_engine(shard).sync_engine for shard in shard_names()]
+    for sync_engine in engines:
+        event.listen(sync_engine, "before_cursor_execute", counter._before)
+        event.listen(sync_engine, "after_cursor_execute", counter._after)
+    try:
+        yield counter
+    finally:
+        for sync_engine in engines:
+            event.remove(sync_engine, "before_cursor_execute", counter._before)
+            event.remove(sync_engine, "after_cursor_execute", counter._after)
+        stats = (counter.count, counter.rows, counter.bytes)
+        _sql_stats[request.node.nodeid] = stats
+        request.node.user_properties.append(("sql", dict(zip(("statements", "rows", "bytes"), stats))))
+
+
+def pytest_terminal_summary(terminalreporter) -> None:
+    """输出使用 sql_counter 的测试在结束时（最后一次 reset 之后）的 SQL 语句数、行数与发送字节数。"""
+    if not _sql_stats:
+        return
+    terminalreporter.section("SQL statements")
+    for nodeid, (count, rows, size) in sorted(_sql_stats.items()):
+        terminalreporter.write_line(f"{count:>4} stmts {rows:>6} rows {size:>9} bytes sent  {nodeid}")
@@ -0,0 +1,59 @@
+"""冷文档归档的测试模块（不连接数据库）。"""
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from sqlalchemy import literal_column
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import get_settings
+from app.repositories.archive_repository import archive_repository
+from app.services import archive_service as archive_module
+from app.services.archive_service import archive_service
+
+
+def _sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+class TestArchive:
+    """冷文档归档测试类。"""
+
+    async def test_disabled_archive_needs_no_query(self):
+        await archive_service.restore(None, "bugs", ["1"])
+        assert await archive_service.find_document(None, "bugs", "1") is None
+
+    async def test_miss_is_cached(self, monkeypatch):
+        """热表与归档表都没有的 ID 在负缓存有效期内不再回查。"""
+        calls = []
+
+        async def get_document(db, collection, id):
+            calls.append(id)
+            return SimpleNamespace(payload={"id": id}) if id == "cold" else None
+
+        monkeypatch.setattr(get_settings(), "archive_after_days", 30)
+        monkeypatch.setattr(get_settings(), "archive_miss_cache_size", 1)
+        monkeypatch.setattr(archive_module, "_miss_cache", OrderedDict())
+        monkeypatch.setattr(archive_repository, "get_document", get_document)
+        db = SimpleNamespace(info={})
+
+        found = [await archive_service.find_document(db, "bugs", i) for i in ("cold", "x", "x", "y", "x")]
+        assert found == [{"id": "cold"}, None, None, None, None]
+        # 缓存上限为 1：记录 y 后 x 被淘汰，需要再查一次
+        assert calls == ["cold", "x", "y", "x"]
+
+    async def test_list_with_archive_merges_both_tables(self):
+        """include_archived 时热表与归档表各取 offset + limit 行，合并后再分页。"""
+        executed = []
+
+        async def execute(stmt):
+            executed.append(stmt)
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: [{"id": "1"}]))
+
+        db = SimpleNamespace(execute=execute)
+        docs = await archive_repository.list_with_archive(
+            db, "bugs", literal_column("payload"), "app1", 10, 20, None, None
+        )
+        sql = _sql(executed[0])
+        assert docs == [{"id": "1"}]
+        assert "UNION ALL" in sql and "FROM uni_documents_archive" in sql
+        assert sql.count("LIMIT") == 3
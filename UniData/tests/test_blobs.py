@@ -0,0 +1,64 @@
+"""payload 大字段外置的测试模块（替换仓储，无数据库）。"""
+import pytest
+
+from app.core.config import get_settings
+from app.repositories.blob_repository import blob_repository
+from app.services.blob_service import blob_service, is_blob_ref
+from app.services.collection_index_service import collection_index_service
+
+
+@pytest.fixture
+def blobs(monkeypatch):
+    store = {}
+
+    async def save_blobs(db, items):
+        for h, value, size in items:
+            store[h] = value
+
+    async def get_blobs(db, hashes):
+        return {h: store[h] for h in hashes if h in store}
+
+    async def get_declared_fields(db, collection):
+        return {"score": "numeric"}
+
+    monkeypatch.setattr(blob_repository, "save_blobs", save_blobs)
+    monkeypatch.setattr(blob_repository, "get_blobs", get_blobs)
+    monkeypatch.setattr(collection_index_service, "get_declared_fields", get_declared_fields)
+    monkeypatch.setattr(get_settings(), "blob_offload_threshold_bytes", 100)
+    return store
+
+
+class TestBlobOffload:
+    """大字段外置测试类。"""
+
+    async def test_offload_and_resolve(self, blobs):
+        """超过阈值的顶层字段替换为引用，相同内容只存一份，resolve 还原原值。"""
+        log = {"lines": ["x" * 80, "y" * 80]}
+        payloads = [
+            {"id": "1", "title": "t", "log": log, "score": "9" * 200},
+            {"id": "2", "title": "t", "log": dict(log)},
+            {"id": "3", "title": "short"},
+        ]
+        stored = await blob_service.offload_payloads(None, "c", payloads)
+
+        assert is_blob_ref(stored[0]["log"]) and stored[0]["log"] == stored[1]["log"]
+        assert stored[0]["log"]["$size"] > 100
+        # 声明了索引的字段、未超过阈值的字段保持原样，传入的 payload 不被修改
+        assert stored[0]["score"] == "9" * 200 and stored[0]["title"] == "t"
+        assert stored[2] is payloads[2]
+        assert payloads[0]["log"] is log
+        assert len(blobs) == 1
+
+        assert await blob_service.resolve_payload(None, stored[0]) == payloads[0]
+
+    async def test_disabled_by_default(self, blobs, monkeypatch):
+        monkeypatch.setattr(get_settings(), "blob_offload_threshold_bytes", 0)
+        payload = {"id": "1", "log": "x" * 1000}
+        assert await blob_service.offload_payload(None, "c", payload) is payload
+        assert blobs == {}
+
+    def test_ref_shape(self):
+        """只有仅含 $blob/$size 的对象才视为引用。"""
+        assert is_blob_ref({"$blob": "ab", "$size": 3})
+        assert not is_blob_ref({"$blob": "ab", "other": 1})
+        assert not is_blob_ref({"$blob": 1})
@@ -0,0 +1,69 @@
+"""线上流量采集的测试模块（无数据库）。"""
+import json
+from logging.handlers import QueueHandler
+
+from app.core.auth import generate_jwt
+from app.core.capture import TrafficCaptureMiddleware, _should_capture
+from app.core.config import get_settings
+from app.core.timing import close_jsonl_loggers, jsonl_logger
+
+
+class TestTrafficCapture:
+    """流量采集测试类。"""
+
+    def test_should_capture(self):
+        assert _should_capture("/api/v1/data/bugs/1")
+        assert not _should_capture("/health")
+        assert not _should_capture("/api/v1/admin/memory")
+        assert not _should_capture("/api/v1/auth/token")
+        assert not _should_capture("/api/v1/data/bugs/_stream")
+
+    def test_signing_does_not_print_secret(self, capsys):
+        """重放脚本按记录重新签发令牌，签发时不能把 jwt_secret 打到标准输出。"""
+        generate_jwt("app1", ["admin"], 60)
+        assert get_settings().jwt_secret not in capsys.readouterr().out
+
+    def test_record_drops_credentials(self):
+        """令牌不落盘，只记录 app_name/scopes。"""
+        token = generate_jwt("app1", ["admin"], 60)
+        scope = {
+            "method": "POST",
+            "path": "/api/v1/data/bugs",
+            "query_string": b"",
+            "headers": [
+                (b"authorization", f"Bearer {token}".encode()),
+                (b"cookie", b"s=1"),
+                (b"content-type", b"application/json"),
+            ],
+        }
+        record = TrafficCaptureMiddleware._build_record(
+            scope, 0.0, 0.01, b'{"id": "1"}', 11, {"status": 201, "bytes": 2}, "x"
+        )
+        assert record["headers"] == {"content-type": "application/json"}
+        assert record["auth"] == {"app_name": "app1", "scopes": ["admin"]}
+        assert record["body"] == '{"id": "1"}'
+        assert token not in json.dumps(record)
+        assert "body_truncated" not in record
+
+        record = TrafficCaptureMiddleware._build_record(
+            scope, 0.0, 0.01, b'{"id"', 11, {"status": 201, "bytes": 2}, "x"
+        )
+        assert record["body_truncated"] is True
+
+    async def test_records_written_in_background(self, clean_client, tmp_path, monkeypatch):
+        """请求只把记录放入队列，关闭时写完剩余记录。"""
+        path = tmp_path / "capture.jsonl"
+        settings = get_settings()
+        monkeypatch.setattr(settings, "capture_path", str(path))
+        monkeypatch.setattr(settings, "capture_sample_rate", 1.0)
+        try:
+            for i in range(3):
+                await clean_client.get(f"/api/v1/data/bugs/{i}")
+            handlers = jsonl_logger("unidata.capture", str(path)).handlers
+            assert len(handlers) == 1 and isinstance(handlers[0], QueueHandler)
+        finally:
+            close_jsonl_loggers()
+
+        records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert [r["path"] for r in records] == [f"/api/v1/data/bugs/{i}" for i in range(3)]
+        assert all(r["status"] == records[0]["status"] and r["status"] >= 400 for r in records)
@@ -0,0 +1,90 @@
+"""变更订阅（_changes）的测试模块（需要数据库）。"""
+from sqlalchemy import delete
+
+from app.core.database import get_db_context
+from app.models import Document
+from app.repositories.document_repository import document_repository
+from app.services.change_feed_service import change_feed_service, decode_cursor, encode_cursor
+
+APP = "changes_app"
+COLLECTION = "changes_test"
+
+
+async def _write(db, id: str) -> None:
+    await document_repository.upsert_document(db, COLLECTION, id, APP, {"id": id})
+
+
+class TestChangeFeed:
+    """按事务号翻页的变更订阅测试类。"""
+
+    async def test_late_commit_is_not_skipped(self, app_tables):
+        """先开始、后提交的写入事务不会被已越过它的游标跳过。"""
+        async with get_db_context() as db:
+            await db.execute(delete(Document).where(Document.collection == COLLECTION))
+
+        async with get_db_context() as slow:
+            await _write(slow, "late")
+            async with get_db_context() as db:
+                await _write(db, "early")
+            # slow 未结束时快照 xmin 停在它的事务号上，之后提交的 early 也暂不返回
+            pending = await change_feed_service.get_changes(COLLECTION, APP)
+            assert pending == {"changes": [], "cursor": None, "has_more": False}
+
+        first = await change_feed_service.get_changes(COLLECTION, APP, limit=1)
+        assert [c["id"] for c in first["changes"]] == ["late"] and first["has_more"]
+        rest = await change_feed_service.get_changes(COLLECTION, APP, since=first["cursor"])
+        assert [c["id"] for c in rest["changes"]] == ["early"] and not rest["has_more"]
+
+        async with get_db_context() as db:
+            await _write(db, "late")
+        again = await change_feed_service.get_changes(COLLECTION, APP, since=rest["cursor"])
+        assert [(c["id"], c["op"]) for c in again["changes"]] == [("late", "upsert")]
+
+    async def test_cursor_from_other_shard_restarts(self, app_tables):
+        """游标属于其他分片（应用已迁移）时从头返回。"""
+        async with get_db_context() as db:
+            await db.execute(delete(Document).where(Document.collection == COLLECTION))
+            await _write(db, "1")
+
+        result = await change_feed_service.get_changes(COLLECTION, APP, since=encode_cursor("s9", 2**60, "z"))
+        assert [c["id"] for c in result["changes"]] == ["1"]
+        assert decode_cursor(result["cursor"])[0] == "default"
+
+    async def test_search_doc_backfill_is_not_a_change(self, app_tables):
+        """只重算 search_doc 不改变更序号，也不会把行重新放进变更流；app_name 不符的行不更新。"""
+        async with get_db_context() as db:
+            await db.execute(delete(Document).where(Document.collection == COLLECTION))
+            await _write(db, "1")
+        first = await change_feed_service.get_changes(COLLECTION, APP)
+        assert [c["id"] for c in first["changes"]] == ["1"]
+
+        async with get_db_context() as db:
+            await document_repository.set_search_docs(
+                db, COLLECTION, [(APP, "1", {"id": "1"}), ("other_app", "1", {"x": 1})]
+            )
+        async with get_db_context() as db:
+            row = await db.get(Document, ("1", COLLECTION))
+            assert row.search_doc == {"id": "1"}
+            assert row.change_xid == decode_cursor(first["cursor"])[1]
+
+        again = await change_feed_service.get_changes(COLLECTION, APP, since=first["cursor"])
+        assert again["changes"] == []
+
+    async def test_migration_batch_waits_for_late_commit(self, app_tables):
+        """迁移拷贝同样按事务号翻页：未提交事务的行在它结束后仍排在游标之后。"""
+        async with get_db_context() as db:
+            await db.execute(delete(Document).where(Document.app_name == APP))
+
+        async with get_db_context() as slow:
+            await _write(slow, "late")
+            async with get_db_context() as db:
+                await _write(db, "early")
+            async with get_db_context() as db:
+                _, xmax = await document_repository.snapshot_bounds(db)
+                assert await document_repository.list_app_rows_batch(db, APP, None, 10) == []
+
+        async with get_db_context() as db:
+            xmin, _ = await document_repository.snapshot_bounds(db)
+            assert xmin >= xmax
+            rows = await document_repository.list_app_rows_batch(db, APP, None, 10)
+        assert [row.id for row in rows] == ["late", "early"]
@@ -0,0 +1,37 @@
+"""集合字段索引声明的测试模块（需要数据库）。"""
+from sqlalchemy import delete, text
+
+from app.core.database import get_db_context
+from app.models.document import Document
+from app.services.collection_index_service import collection_index_service, index_name_for
+
+NUMERIC_COLLECTION = "idx_numeric"
+TEXT_COLLECTION = "idx_text"
+
+
+class TestDeclaredIndexes:
+    """声明索引只覆盖本 collection 的行。"""
+
+    async def test_same_field_different_types(self, app_tables):
+        """另一个 collection 同名字段为非数值时，numeric 索引仍可创建，且不影响对方写入。"""
+        async with get_db_context() as db:
+            await db.execute(
+                delete(Document).where(Document.collection.in_([NUMERIC_COLLECTION, TEXT_COLLECTION]))
+            )
+            db.add(Document(collection=TEXT_COLLECTION, id="1", payload={"score": "high"}))
+            db.add(Document(collection=NUMERIC_COLLECTION, id="1", payload={"score": 3}))
+
+        index_name = index_name_for(NUMERIC_COLLECTION, "score")
+        try:
+            await collection_index_service.create_index_ddl("default", NUMERIC_COLLECTION, "score", "numeric")
+            await collection_index_service.create_index_ddl("default", TEXT_COLLECTION, "score", "text")
+            async with get_db_context() as db:
+                db.add(Document(collection=TEXT_COLLECTION, id="2", payload={"score": "low"}))
+                definition = await db.scalar(
+                    text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"), {"name": index_name}
+                )
+            assert f"collection)::text = '{NUMERIC_COLLECTION}'::text" in definition
+        finally:
+            async with get_db_context() as db:
+                for collection in (NUMERIC_COLLECTION, TEXT_COLLECTION):
+                    await db.execute(text(f'DROP INDEX IF EXISTS "{index_name_for(collection, "score")}"'))
@@ -0,0 +1,152 @@
+"""通用文档接口的行为测试模块（需要数据库）。"""
+from typing import AsyncGenerator, Dict, Tuple
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import delete, select
+
+from app.main import app
+from app.core.auth import generate_jwt
+from app.core.config import get_settings
+from app.core.database import get_db_context
+from app.models.document import Document
+
+COLLECTION = "doc_api"
+URL = f"/api/v1/data/{COLLECTION}"
+
+
+def _headers(app_name: str) -> Dict[str, str]:
+    token = generate_jwt(app_name, [], 60)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+async def apis(app_tables) -> AsyncGenerator[Tuple[AsyncClient, AsyncClient], None]:
+    """两个应用（doc_api_a / doc_api_b）的客户端，集合在每个用例开始前清空。"""
+    async with get_db_context() as db:
+        await db.execute(delete(Document).where(Document.collection == COLLECTION))
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test", headers=_headers("doc_api_a")) as a, \
+            AsyncClient(transport=transport, base_url="http://test", headers=_headers("doc_api_b")) as b:
+        yield a, b
+
+
+async def _bulk(api: AsyncClient, docs) -> None:
+    response = await api.post(f"{URL}/_bulk", json={"docs": docs})
+    assert response.status_code == 201
+
+
+class TestMultiGet:
+    """POST /data/{collection}/_mget 的返回内容。"""
+
+    async def test_order_and_missing(self, apis):
+        """按请求顺序返回，重复 ID 只返回一次，已删除与不存在的 ID 列入 missing。"""
+        api, _ = apis
+        await _bulk(api, [{"id": "a", "n": 1}, {"id": "b", "n": 2}, {"id": "c", "n": 3}])
+        assert (await api.delete(f"{URL}/c")).status_code == 200
+
+        response = await api.post(f"{URL}/_mget", json={"ids": ["b", "zz", "a", "b", "c"]})
+        body = response.json()
+        assert [d["id"] for d in body["docs"]] == ["b", "a"]
+        assert body["missing"] == ["zz", "c"]
+
+    async def test_fields_projection(self, apis):
+        api, _ = apis
+        await _bulk(api, [{"id": "a", "n": 1, "owner": {"name": "qa", "email": "e"}}])
+        response = await api.post(f"{URL}/_mget", json={"ids": ["a"], "fields": "id,owner.name"})
+        assert response.json()["docs"] == [{"id": "a", "owner": {"name": "qa"}}]
+
+    async def test_id_limit(self, apis):
+        api, _ = apis
+        response = await api.post(f"{URL}/_mget", json={"ids": [str(i) for i in range(1001)]})
+        assert response.status_code == 422
+
+
+class TestBulkDelete:
+    """按 ID 列表与按条件批量删除的结果。"""
+
+    async def test_bulk_delete_by_ids(self, apis, monkeypatch):
+        """跨多个分块删除；重复、不存在和属于其他应用的 ID 不计入，也不被删除。"""
+        api, other = apis
+        monkeypatch.setattr(get_settings(), "bulk_delete_chunk_size", 2)
+        await _bulk(api, [{"id": str(i)} for i in range(5)])
+        await _bulk(other, [{"id": "theirs"}])
+
+        response = await api.post(f"{URL}/_bulk_delete", json={"ids": ["0", "1", "1", "2", "3", "zz", "theirs"]})
+        assert response.json() == {"status": "success", "deleted": 4}
+        assert [d["id"] for d in (await api.get(URL)).json()] == ["4"]
+        assert (await other.get(f"{URL}/theirs")).status_code == 200
+
+    async def test_delete_by_query(self, apis):
+        """只删除当前应用中匹配条件的文档，其余文档的分页列表不受影响。"""
+        api, other = apis
+        await _bulk(api, [{"id": f"a{i}", "status": "closed" if i % 2 else "open"} for i in range(6)])
+        await _bulk(other, [{"id": "b0", "status": "closed"}])
+
+        response = await api.post(f"{URL}/_delete_by_query", json={"filter": ["status:eq:closed"]})
+        assert response.json()["deleted"] == 3
+
+        pages = [(await api.get(f"{URL}?limit=2&offset={offset}")).json() for offset in (0, 2)]
+        assert [len(page) for page in pages] == [2, 1]
+        assert sorted(d["id"] for page in pages for d in page) == ["a0", "a2", "a4"]
+        assert (await other.get(f"{URL}/b0")).status_code == 200
+
+    async def test_delete_by_query_requires_condition(self, apis):
+        api, _ = apis
+        response = await api.post(f"{URL}/_delete_by_query", json={"filter": []})
+        assert response.status_code == 400
+
+
+class TestCollectionSchemaOwnership:
+    """集合 JSON Schema 按应用注册：各应用只约束自己的写入。"""
+
+    async def test_per_app_schema(self, apis):
+        api, other = apis
+        title_schema = {"type": "object", "required": ["title"], "properties": {"title": {"type": "string"}}}
+        n_schema = {"type": "object", "required": ["n"], "properties": {"n": {"type": "integer"}}}
+        try:
+            assert (await api.put(f"{URL}/_schema", json={"schema": title_schema})).status_code == 200
+            # 另一个应用可以在同一集合上注册自己的 schema，而不是被拒绝或覆盖前者
+            assert (await other.put(f"{URL}/_schema", json={"schema": n_schema})).status_code == 200
+
+            assert (await api.post(URL, json={"id": "a1", "title": "t"})).status_code == 201
+            assert (await api.post(URL, json={"id": "a2", "n": 1})).status_code == 400
+            assert (await other.post(URL, json={"id": "b1", "n": 1})).status_code == 201
+            assert (await other.post(URL, json={"id": "b2", "title": "t"})).status_code == 400
+
+            assert (await api.get(f"{URL}/_schema")).json()["schema"] == title_schema
+            assert (await other.delete(f"{URL}/_schema")).status_code == 204
+            assert (await other.post(URL, json={"id": "b2", "title": "t"})).status_code == 201
+            assert (await api.get(f"{URL}/_schema")).json()["app_name"] == "doc_api_a"
+        finally:
+            await api.delete(f"{URL}/_schema")
+            await other.delete(f"{URL}/_schema")
+
+
+class TestSearchProjectionOwnership:
+    """搜索投影按应用声明：各应用的投影只作用于自己写入的文档。"""
+
+    async def test_per_app_projection(self, apis):
+        api, other = apis
+        try:
+            assert (await api.put(f"{URL}/_projection", json={"fields": ["title"]})).status_code == 200
+            # 另一个应用可以声明自己的投影，而不是被拒绝或覆盖前者
+            assert (await other.put(f"{URL}/_projection", json={"fields": ["n"]})).status_code == 200
+
+            assert (await api.post(URL, json={"id": "a1", "title": "t", "n": 1})).status_code == 201
+            assert (await other.post(URL, json={"id": "b1", "title": "t", "n": 2})).status_code == 201
+            async with get_db_context() as db:
+                result = await db.execute(
+                    select(Document.id, Document.search_doc).where(Document.collection == COLLECTION)
+                )
+                docs = dict(result.all())
+            assert docs["a1"] == {"id": "a1", "title": "t"}
+            assert docs["b1"] == {"id": "b1", "n": 2}
+
+            assert (await api.get(f"{URL}/_projection")).json()["fields"] == ["id", "title"]
+            assert (await other.delete(f"{URL}/_projection")).status_code == 204
+            assert (await other.get(f"{URL}/_projection")).status_code == 404
+            assert (await api.get(f"{URL}/_projection")).json()["app_name"] == "doc_api_a"
+        finally:
+            await api.delete(f"{URL}/_projection")
+            await other.delete(f"{URL}/_projection")
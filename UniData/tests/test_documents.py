@@ -0,0 +1,296 @@
+"""通用文档相关的测试模块。"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.main import app
+from app.core.config import get_settings
+from app.services.change_feed_service import decode_cursor, encode_cursor
+from app.services.change_listener import DISCONNECT, ChangeListener, Subscription
+from app.services.collection_schema_service import compile_schema, validation_error
+from app.repositories.document_repository import document_repository, partition_table_name
+from app.services import document_service as document_module
+from app.repositories.payload_query import (
+    build_filter_clauses,
+    parse_fields,
+    parse_filter,
+    projection_expr,
+)
+
+
+def _sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+class TestPartitionTableName:
+    """分区子表命名测试类（无数据库）。"""
+
+    def test_name_is_safe_identifier(self):
+        """非字母数字字符被替换，且不超过 PostgreSQL 标识符长度。"""
+        name = partition_table_name("Bug's 列表" * 10)
+        assert name.startswith("uni_documents_p_")
+        assert len(name) <= 63
+        assert all(c.isalnum() or c == "_" for c in name)
+
+    def test_name_is_unique_per_collection(self):
+        """清洗后相同的 collection 仍然得到不同的子表名。"""
+        assert partition_table_name("a-b") != partition_table_name("a_b")
+        assert partition_table_name("bugs") == partition_table_name("bugs")
+
+
+class TestEnsurePartition:
+    """自动建分区的缓存与失败退避测试类（无数据库）。"""
+
+    @pytest.fixture
+    def ddl(self, monkeypatch):
+        """替换建分区用到的会话与仓储方法，返回可调整的状态与调用记录。"""
+        state = {"exists": False, "default_rows": False, "fail": None, "created": []}
+
+        @asynccontextmanager
+        async def get_db_context(shard):
+            yield None
+
+        async def partition_exists(db, collection):
+            return state["exists"]
+
+        async def default_partition_has_rows(db, collection):
+            return state["default_rows"]
+
+        async def create_collection_partition(db, collection, lock_timeout_ms=None):
+            if state["fail"]:
+                raise state["fail"]
+            state["created"].append((collection, lock_timeout_ms))
+            return partition_table_name(collection)
+
+        monkeypatch.setattr(get_settings(), "documents_partitioned", True)
+        monkeypatch.setattr(get_settings(), "partition_retry_seconds", 30.0)
+        monkeypatch.setattr(get_settings(), "partition_retry_max_seconds", 100.0)
+        monkeypatch.setattr(document_module, "get_db_context", get_db_context)
+        monkeypatch.setattr(document_module, "_known_partitions", set())
+        monkeypatch.setattr(document_module, "_partition_retry", {})
+        monkeypatch.setattr(document_repository, "partition_exists", partition_exists)
+        monkeypatch.setattr(document_repository, "default_partition_has_rows", default_partition_has_rows)
+        monkeypatch.setattr(document_repository, "create_collection_partition", create_collection_partition)
+        return state
+
+    async def test_failure_is_retried_with_backoff(self, ddl, monkeypatch):
+        """失败不缓存，退避期内不重试，退避间隔翻倍且有上限，成功后才缓存。"""
+        now = [1000.0]
+        monkeypatch.setattr(document_module.time, "monotonic", lambda: now[0])
+        ensure = document_module.document_service.ensure_partition
+
+        ddl["fail"] = TimeoutError("canceling statement due to lock timeout")
+        await ensure("bugs")
+        assert document_module._partition_retry[("default", "bugs")] == (1030.0, 30.0)
+        await ensure("bugs")
+        now[0] = 1030.0
+        await ensure("bugs")
+        assert document_module._partition_retry[("default", "bugs")] == (1090.0, 60.0)
+        now[0] = 1090.0
+        await ensure("bugs")
+        assert document_module._partition_retry[("default", "bugs")][1] == 100.0
+        assert document_module._known_partitions == set()
+
+        ddl["fail"] = None
+        now[0] = 2000.0
+        await ensure("bugs")
+        assert ddl["created"] == [("bugs", get_settings().partition_lock_timeout_ms)]
+        assert document_module._known_partitions == {("default", "bugs")}
+        assert document_module._partition_retry == {}
+
+    async def test_rows_in_default_partition(self, ddl):
+        """默认分区中已有该 collection 的行时不执行 DDL，只安排重试。"""
+        ddl["default_rows"] = True
+        await document_module.document_service.ensure_partition("bugs", "s1")
+        assert ddl["created"] == []
+        assert ("s1", "bugs") in document_module._partition_retry
+        assert document_module._known_partitions == set()
+
+
+class TestPayloadFilters:
+    """payload 过滤条件解析与 SQL 翻译测试类（无数据库）。"""
+
+    def test_parse_filter(self):
+        """field:op:value 按 JSON 解析值，in 按逗号拆分。"""
+        f = parse_filter("priority:gte:3")
+        assert (f.field, f.op, f.values) == ("priority", "gte", [3])
+        f = parse_filter("status:in:open,closed")
+        assert f.values == ["open", "closed"]
+        f = parse_filter("url:eq:http://x")
+        assert f.values == ["http://x"]
+
+    @pytest.mark.parametrize("raw", ["status", "status:like:x", "a b:eq:1", "a..b:eq:1"])
+    def test_parse_filter_invalid(self, raw):
+        """非法格式、操作符和字段路径抛出 ValueError。"""
+        with pytest.raises(ValueError):
+            parse_filter(raw)
+
+    def test_undeclared_field_uses_containment(self):
+        """未声明字段的 eq 使用 payload @>，可走 GIN 索引。"""
+        [clause] = build_filter_clauses([parse_filter("owner.name:eq:qa")], None, {})
+        assert "payload @>" in _sql(clause)
+
+    def test_undeclared_field_rejects_range(self):
+        """未声明字段不支持范围过滤。"""
+        with pytest.raises(ValueError):
+            build_filter_clauses([parse_filter("priority:gt:1")], None, {})
+
+    def test_declared_field_uses_index_expression(self):
+        """已声明字段使用与表达式索引一致的字面量表达式。"""
+        [clause] = build_filter_clauses(
+            [parse_filter("owner.priority:lt:5")], None, {"owner.priority": "numeric"}
+        )
+        assert "((payload #>> '{owner,priority}')::numeric) <" in _sql(clause)
+
+
+class TestFieldProjection:
+    """fields 投影参数测试类（无数据库）。"""
+
+    def test_nested_paths_are_grouped(self):
+        """同一前缀的嵌套字段合并为一个子对象。"""
+        sql = _sql(projection_expr(parse_fields("id, owner.name,owner.email")))
+        assert sql == (
+            "jsonb_build_object('id', (payload -> 'id'), 'owner', jsonb_build_object("
+            "'name', (payload #> '{owner,name}'), 'email', (payload #> '{owner,email}')))"
+        )
+
+    def test_parent_field_wins(self):
+        """同时请求 owner 与 owner.name 时返回整个 owner。"""
+        sql = _sql(projection_expr(parse_fields("owner.name,owner")))
+        assert sql == "jsonb_build_object('owner', (payload -> 'owner'))"
+
+    def test_invalid_fields(self):
+        """空字段列表和非法路径抛出 ValueError。"""
+        assert parse_fields(None) is None
+        for raw in [",", "id,x'y"]:
+            with pytest.raises(ValueError):
+                parse_fields(raw)
+
+
+class TestChangeCursor:
+    """变更订阅游标测试类（无数据库）。"""
+
+    def test_round_trip(self):
+        """验证游标编码后可还原为 (分片, change_xid, id)。"""
+        cursor = encode_cursor("s1", 2**40, "doc/1")
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == ("s1", 2**40, "doc/1")
+
+    # 最后一个是旧版本按 (updated_at, id) 编码的游标
+    @pytest.mark.parametrize("raw", ["garbage", "W10", "", "WyIyMDI0LTA1LTAxVDEyOjMwOjQ1IiwgImRvYy8xIl0"])
+    def test_invalid_cursor(self, raw):
+        with pytest.raises(ValueError):
+            decode_cursor(raw)
+
+
+class TestChangeFanout:
+    """SSE 订阅分发与丢弃策略测试类（无数据库）。"""
+
+    @staticmethod
+    def _listener(*subs: Subscription) -> ChangeListener:
+        listener = ChangeListener()
+        for sub in subs:
+            listener._subscribers.setdefault(sub.collection, set()).add(sub)
+        return listener
+
+    async def test_dispatch_scoped_to_app(self):
+        """验证通知只投递给同一 collection、同一应用的订阅者。"""
+        mine = Subscription("bugs", "app1", asyncio.Queue(maxsize=10))
+        other = Subscription("bugs", "app2", asyncio.Queue(maxsize=10))
+        listener = self._listener(mine, other)
+
+        listener.dispatch({"collection": "bugs", "app_name": "app1", "id": "b1", "deleted": True})
+        listener.dispatch({"collection": "reqs", "app_name": "app1", "id": "r1", "deleted": False})
+
+        assert mine.queue.get_nowait() == {"event": "delete", "id": "b1"}
+        assert mine.queue.empty()
+        assert other.queue.empty()
+
+    async def test_drop_oldest(self):
+        """验证队列写满时丢弃最旧的通知并记录丢弃数。"""
+        sub = Subscription("bugs", "app1", asyncio.Queue(maxsize=2))
+        listener = self._listener(sub)
+        for i in range(4):
+            listener.dispatch({"collection": "bugs", "app_name": "app1", "id": f"b{i}"})
+
+        assert sub.dropped == 2
+        assert [sub.queue.get_nowait()["id"] for _ in range(2)] == ["b2", "b3"]
+
+    async def test_disconnect_policy(self, monkeypatch):
+        """验证 disconnect 策略下溢出后只保留一条 resync 事件。"""
+        monkeypatch.setattr(get_settings(), "sse_drop_policy", DISCONNECT)
+        sub = Subscription("bugs", "app1", asyncio.Queue(maxsize=2))
+        listener = self._listener(sub)
+        for i in range(4):
+            listener.dispatch({"collection": "bugs", "app_name": "app1", "id": f"b{i}"})
+
+        assert sub.overflowed
+        assert sub.queue.get_nowait() == {"event": "resync", "reason": "overflow"}
+        assert sub.queue.empty()
+
+
+class TestCollectionSchema:
+    """集合 JSON Schema 编译与校验测试类（无数据库）。"""
+
+    SCHEMA = {
+        "type": "object",
+        "required": ["title"],
+        "properties": {"title": {"type": "string"}, "n": {"type": "integer", "default": 1}},
+    }
+
+    def test_validate(self):
+        validator = compile_schema(self.SCHEMA)
+        payload = {"id": "1", "title": "t"}
+        assert validation_error(validator, payload) is None
+        # 只校验，不填充默认值
+        assert payload == {"id": "1", "title": "t"}
+        assert validation_error(validator, {"id": "1", "title": 3}) == "data.title must be string"
+
+    def test_compiled_once(self):
+        """验证相同内容的 schema 复用同一个已编译校验器。"""
+        assert compile_schema(dict(self.SCHEMA)) is compile_schema(dict(self.SCHEMA))
+
+    @pytest.mark.parametrize(
+        "schema",
+        [{"type": "nope"}, {"properties": 3}, {"$ref": "http://example.com/s.json"}, {"$ref": "file:///etc/passwd"}],
+    )
+    def test_invalid_schema(self, schema):
+        with pytest.raises(ValueError):
+            compile_schema(schema)
+
+
+class TestDocumentRoutes:
+    """通用文档路由注册测试类（无数据库）。"""
+
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "/api/v1/data/{collection}/_bulk_delete",
+            "/api/v1/data/{collection}/_delete_by_query",
+            "/api/v1/testcases/_bulk_delete",
+            "/api/v1/testcases/_delete_by_query",
+        ],
+    )
+    def test_bulk_delete_endpoints_exist(self, path):
+        """验证批量删除端点已注册。"""
+        routes = [r for r in app.routes if getattr(r, "path", "") == path and "POST" in r.methods]
+        assert len(routes) > 0, f"POST {path} 端点应该已注册"
+
+    def test_mget_endpoint_exists(self):
+        """验证 POST /data/{collection}/_mget 端点已注册。"""
+        routes = [
+            r
+            for r in app.routes
+            if getattr(r, "path", "") == "/api/v1/data/{collection}/_mget" and "POST" in r.methods
+        ]
+        assert len(routes) > 0, "POST /data/{collection}/_mget 端点应该已注册"
+
+    @pytest.mark.parametrize("name", ["_changes", "_export", "_facets"])
+    def test_changes_endpoint_before_get(self, name):
+        """验证 GET /data/{collection}/_changes 等固定路径注册在 /{collection}/{id} 之前。"""
+        paths = [getattr(r, "path", "") for r in app.routes if "GET" in getattr(r, "methods", set())]
+        assert paths.index(f"/api/v1/data/{{collection}}/{name}") < paths.index(
+            "/api/v1/data/{collection}/{id}"
+        )
@@ -0,0 +1,77 @@
+"""列式导出的列解析、类型推断与编码测试模块（无数据库）。"""
+import io
+from datetime import datetime
+
+import pytest
+
+from app.services.export_service import (
+    ExportColumn,
+    _ChunkSink,
+    arrow_schema,
+    infer_columns,
+    open_writer,
+    parse_columns,
+    record_batch,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+class TestExport:
+    """列式导出测试类。"""
+
+    def test_parse_columns(self):
+        assert parse_columns(None) is None
+        assert parse_columns("status, priority:int64,id,owner.name") == [
+            ("status", None),
+            ("priority", "int64"),
+            ("owner.name", None),
+        ]
+        for raw in [",", "a:decimal", "a..b"]:
+            with pytest.raises(ValueError):
+                parse_columns(raw)
+
+    def test_infer_columns(self):
+        """嵌套对象展开，数值混合为 float64，对象与标量混合时整体为 json。"""
+        payloads = [
+            {"id": "1", "app_name": "a", "n": 1, "owner": {"name": "x"}, "meta": {"k": 1}, "log": {"$blob": "h"}},
+            {"id": "2", "n": 1.5, "owner": {"name": None}, "meta": "text", "tags": ["a"], "done": None},
+        ]
+        columns = {c.field: c.type for c in infer_columns(payloads)}
+        assert columns == {
+            "n": "float64",
+            "owner.name": "string",
+            "meta": "json",
+            "log": "json",
+            "tags": "json",
+            "done": "string",
+        }
+        requested = [("owner", None), ("n", "int64")]
+        assert [(c.field, c.type) for c in infer_columns(payloads, requested)] == [("owner", "json"), ("n", "int64")]
+
+    @pytest.mark.skipif(pa is None, reason="未安装 pyarrow")
+    def test_record_batch_round_trip(self):
+        """值按列类型转换，无法转换的写入 null，Parquet 按批写出后可完整读回。"""
+        columns = [ExportColumn("n", "int64"), ExportColumn("when", "timestamp"), ExportColumn("meta", "json")]
+        schema = arrow_schema(columns)
+        sink = _ChunkSink()
+        writer = open_writer("parquet", sink, schema)
+        ts = datetime(2024, 5, 1)
+        chunks = []
+        for rows in ([("1", ts, 3, "2024-05-01T08:00:00+08:00", {"k": 1})], [("2", ts, "x", "bad", None)]):
+            writer.write_batch(record_batch(rows, columns, schema))
+            chunks.append(sink.drain())
+        writer.close()
+        chunks.append(sink.drain())
+
+        table = pq.read_table(io.BytesIO(b"".join(chunks)))
+        assert table.schema == schema
+        assert table.column("n").to_pylist() == [3, None]
+        assert table.column("meta").to_pylist() == ['{"k": 1}', None]
+        assert table.column("when")[0].as_py() == table.column("_updated_at")[0].as_py()
+        assert table.column("when")[1].as_py() is None
+        assert isinstance(schema.field("when").type, pa.TimestampType)
@@ -0,0 +1,89 @@
+"""字段取值分布的测试模块。"""
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql
+
+from app.core.database import get_db_context
+from app.models import Document
+from app.models.collection_counter import COUNTER_FUNCTION_SQL
+from app.repositories.document_repository import document_repository
+from app.repositories.stats_repository import stats_repository
+from app.services import facet_service as facet_module
+from app.services.facet_service import facet_service
+
+COLLECTION = "facet_test"
+
+
+def _sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+class TestFacets:
+    """字段取值分布的 SQL 与缓存测试类（无数据库）。"""
+
+    async def test_single_scan_query(self):
+        """所有字段一次扫描完成，数组逐元素展开，按文档去重计数，每个字段按 size 截断。"""
+        executed = []
+
+        async def execute(stmt):
+            executed.append(stmt)
+            return SimpleNamespace(all=lambda: [("status", "open", 2)])
+
+        rows = await document_repository.facet_counts(
+            SimpleNamespace(execute=execute), "bugs", "app1", ["status", "owner.tags"], 5
+        )
+        sql = _sql(executed[0])
+        assert rows == [("status", "open", 2)]
+        assert sql.count("FROM uni_documents") == 1
+        assert "jsonb_build_object('status', docs.payload #> '{status}', 'owner.tags', docs.payload #> '{owner,tags}')" in sql
+        assert "count(DISTINCT docs.id)" in sql
+        assert "jsonb_array_elements" in sql and "PARTITION BY counted.field" in sql
+
+    async def test_cache_follows_write_version(self, monkeypatch):
+        """写入版本不变时命中缓存，版本变化后重新统计。"""
+        version = [1]
+        scans = []
+
+        async def get_write_version(db, app_name, collection):
+            return version[0]
+
+        async def facet_counts(db, collection, app_name, fields, size, *args):
+            scans.append(fields)
+            return [("status", "open", version[0])]
+
+        monkeypatch.setattr(facet_module, "_facet_cache", OrderedDict())
+        monkeypatch.setattr(stats_repository, "get_write_version", get_write_version)
+        monkeypatch.setattr(document_repository, "facet_counts", facet_counts)
+        db = SimpleNamespace(info={})
+
+        first = await facet_service.get_facets(db, "bugs", "app1", ["status", "status"])
+        assert first == {"facets": {"status": [{"value": "open", "count": 1}]}, "cached": False}
+        assert (await facet_service.get_facets(db, "bugs", "app1", ["status"]))["cached"] is True
+        version[0] = 2
+        assert (await facet_service.get_facets(db, "bugs", "app1", ["status"]))["facets"]["status"][0]["count"] == 2
+        assert scans == [["status"], ["status"]]
+
+    def test_counter_tracks_writes(self):
+        """计数函数累加 write_count，软删除（更新为墓碑）也计为一次写入。"""
+        assert "write_count = c.write_count + excluded.write_count" in COUNTER_FUNCTION_SQL
+        assert "1 AS dw FROM new_rows" in COUNTER_FUNCTION_SQL
+        assert "FROM new_rows WHERE" not in COUNTER_FUNCTION_SQL
+
+
+class TestFacetCounts:
+    """字段取值分布的计数（需要数据库）。"""
+
+    async def test_counts_documents_not_occurrences(self, app_tables):
+        """数组中重复出现的取值只计一次。"""
+        async with get_db_context() as db:
+            await db.execute(delete(Document).where(Document.collection == COLLECTION))
+            db.add_all([
+                Document(collection=COLLECTION, id="1", app_name="app1", payload={"id": "1", "tags": ["a", "a", "b"]}),
+                Document(collection=COLLECTION, id="2", app_name="app1", payload={"id": "2", "tags": "a"}),
+            ])
+
+        async with get_db_context() as db:
+            rows = await document_repository.facet_counts(db, COLLECTION, "app1", ["tags"], 10)
+        assert rows == [("tags", "a", 2), ("tags", "b", 1)]
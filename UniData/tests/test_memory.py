@@ -0,0 +1,52 @@
+"""worker 内存诊断的测试模块（无数据库）。"""
+import threading
+
+from app.models.document import Document
+from app.services import memory_service as memory_module
+from app.services.memory_service import MemoryService, memory_service
+
+
+class TestMemoryDiagnostics:
+    """内存诊断测试类。"""
+
+    async def test_snapshot_diff(self):
+        """第二次快照与第一次比较，能定位到新增分配所在的行。"""
+        service = MemoryService()
+        service.start_tracing(1)
+        try:
+            first = await service.take_snapshot(5, "lineno")
+            assert first["compared"] is False
+            held = [bytearray(1024) for _ in range(1000)]
+            second = await service.take_snapshot(5, "lineno")
+            assert second["compared"] is True
+            assert "test_memory.py:" in second["top"][0]["location"]
+            assert second["top"][0]["size_diff"] >= 1024 * 1000
+            del held
+        finally:
+            service.stop_tracing()
+
+    async def test_snapshot_runs_off_the_event_loop(self, monkeypatch):
+        """拍摄与比较快照在线程中执行。"""
+        threads = []
+        snapshot_top = memory_module._snapshot_top
+
+        def record(*args):
+            threads.append(threading.current_thread())
+            return snapshot_top(*args)
+
+        monkeypatch.setattr(memory_module, "_snapshot_top", record)
+        service = MemoryService()
+        service.start_tracing(1)
+        try:
+            await service.take_snapshot(1, "filename")
+        finally:
+            service.stop_tracing()
+        assert threads and threads[0] is not threading.main_thread()
+
+    async def test_memory_stats_counts_orm_objects(self):
+        before = (await memory_service.memory_stats())["orm_objects"]["Document"]
+        docs = [Document(collection="c", id=str(i), app_name="a", payload={}) for i in range(3)]
+        stats = await memory_service.memory_stats()
+        assert stats["orm_objects"]["Document"] == before + 3
+        assert set(stats["caches"]) >= {"declared_indexes", "collection_schemas", "change_waiters"}
+        del docs
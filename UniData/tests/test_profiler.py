@@ -0,0 +1,100 @@
+"""采样分析器的测试模块（无数据库）。"""
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+
+import pytest
+
+from app.core.auth import _base64url_encode, is_admin_authorization, peek_token_claims
+from app.core.config import get_settings
+from app.core.profiler import Profiler, StackSampler, profiler
+
+
+def _signed_token(claims: dict) -> str:
+    """用 jwt_secret 签发带任意 claims 的令牌（generate_jwt 只支持列表形式的 scopes）。"""
+    header = _base64url_encode(b'{"alg":"HS256","typ":"JWT"}')
+    body = _base64url_encode(json.dumps({"app_name": "app1", "exp": int(time.time()) + 60, **claims}).encode())
+    signature = hmac.new(
+        get_settings().jwt_secret.encode("utf-8"), f"{header}.{body}".encode("ascii"), hashlib.sha256
+    ).digest()
+    return f"Bearer {header}.{body}.{_base64url_encode(signature)}"
+
+
+class TestProfiler:
+    """采样分析器测试类。"""
+
+    def test_collapsed_output(self):
+        """输出为「线程;帧;... 次数」，能采到正在运行的函数。"""
+        done = threading.Event()
+
+        def spin_for_profile():
+            while not done.is_set():
+                time.sleep(0.001)
+
+        worker = threading.Thread(target=spin_for_profile, name="spinner")
+        worker.start()
+        sampler = StackSampler(0.002)
+        sampler.start()
+        time.sleep(0.05)
+        collapsed = sampler.stop()
+        done.set()
+        worker.join()
+
+        lines = [l for l in collapsed.splitlines() if l.startswith("thread:spinner;")]
+        assert lines
+        stack, _, count = lines[0].rpartition(" ")
+        assert "spin_for_profile" in stack
+        assert int(count) > 0
+
+    def test_only_one_sampler(self):
+        p = Profiler()
+        sampler = p.start(0.01)
+        assert p.start(0.01) is None
+        p.stop(sampler)
+        assert not p.running
+
+    def test_load_rejects_bad_id(self):
+        assert profiler.load("../../etc/passwd") is None
+
+    def test_prune_keeps_newest(self, tmp_path, monkeypatch):
+        """保存结果后只保留最新的 profile_max_files 个文件，其他文件不受影响。"""
+        monkeypatch.setattr(get_settings(), "profile_dir", str(tmp_path))
+        monkeypatch.setattr(get_settings(), "profile_max_files", 2)
+        (tmp_path / "notes.txt").write_text("keep")
+        ids = [uuid.uuid4().hex for _ in range(4)]
+        for i, profile_id in enumerate(ids):
+            profiler.save(profile_id, f"thread:main {i}\n")
+            os.utime(tmp_path / f"{profile_id}.collapsed", ns=(i * 10**9, i * 10**9))
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+            ["notes.txt", f"{ids[2]}.collapsed", f"{ids[3]}.collapsed"]
+        )
+        assert profiler.load(ids[3]) == "thread:main 3\n"
+
+
+class TestAdminAuthorization:
+    """中间件使用的 admin 判断与 get_admin_app 的 scopes 解析一致。"""
+
+    @pytest.mark.parametrize(
+        "claims, admin",
+        [
+            ({"scopes": ["admin"]}, True),
+            ({"scopes": "read admin"}, True),
+            ({"scope": "admin"}, True),
+            ({"scopes": "nonadmin"}, False),
+            ({"scopes": "sysadmin"}, False),
+            ({"scopes": ["sysadmin"]}, False),
+            ({}, False),
+        ],
+    )
+    def test_scopes(self, claims, admin):
+        authorization = _signed_token(claims)
+        assert is_admin_authorization(authorization) is admin
+        assert ("admin" in peek_token_claims(authorization)["scopes"]) is admin
+
+    def test_bad_signature(self):
+        authorization = _signed_token({"scopes": ["admin"]})
+        assert not is_admin_authorization(authorization[:-2] + "xx")
@@ -0,0 +1,78 @@
+"""墓碑清理的测试模块（需要数据库）。"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.core.config import get_settings
+from app.core.database import get_db_context
+from app.models.document import Document
+from app.models.testcase import TestCase as CaseRow
+from app.repositories.document_repository import document_repository
+from app.repositories.testcase_repository import testcase_repository
+from app.services.purge_service import purge_service
+
+COLLECTION = "purge_test"
+# 远早于任何真实数据的时间，按它截断时只会命中本模块写入的墓碑
+ANCIENT = datetime(2000, 1, 1)
+
+
+async def _seed(rows):
+    """写入 (id, is_delete, updated_at) 形式的文档与同 ID 的测试用例。"""
+    async with get_db_context() as db:
+        await db.execute(delete(Document).where(Document.collection == COLLECTION))
+        await db.execute(delete(CaseRow).where(CaseRow.id.like(f"{COLLECTION}-%")))
+        for id, is_delete, updated_at in rows:
+            db.add(Document(
+                collection=COLLECTION, id=id, app_name="purge_app", payload={"id": id},
+                is_delete=is_delete, updated_at=updated_at,
+            ))
+            db.add(CaseRow(id=f"{COLLECTION}-{id}", payload={}, is_delete=is_delete, updated_at=updated_at))
+
+
+async def _remaining():
+    async with get_db_context() as db:
+        docs = await db.scalars(select(Document.id).where(Document.collection == COLLECTION))
+        cases = await db.scalars(select(CaseRow.id).where(CaseRow.id.like(f"{COLLECTION}-%")))
+        return sorted(docs.all()), sorted(c.removeprefix(f"{COLLECTION}-") for c in cases.all())
+
+
+class TestPurge:
+    """墓碑清理的保留期、分批与存活行保护。"""
+
+    async def test_batches(self, app_tables):
+        """每次只删除 limit 行，直到删完；存活行即使早于截止时间也不删除。"""
+        await _seed(
+            [(f"t{i}", True, ANCIENT + timedelta(minutes=i)) for i in range(5)]
+            + [("live", False, ANCIENT)]
+        )
+        before = ANCIENT + timedelta(days=1)
+        for purge in (document_repository.purge_deleted_documents, testcase_repository.purge_deleted_test_cases):
+            counts = []
+            for _ in range(4):
+                async with get_db_context() as db:
+                    counts.append(await purge(db, before, 2))
+            assert counts == [2, 2, 1, 0]
+        assert await _remaining() == (["live"], ["live"])
+
+    async def test_retention_cutoff(self, app_tables, monkeypatch):
+        """只清理保留期之前软删除的行，保留期内的墓碑与所有存活行都保留。"""
+        now = datetime.utcnow()
+        await _seed([
+            ("old", True, now - timedelta(days=30)),
+            ("recent", True, now - timedelta(days=1)),
+            ("old_live", False, now - timedelta(days=30)),
+            ("live", False, now),
+        ])
+        settings = get_settings()
+        monkeypatch.setattr(settings, "purge_retention_days", 7)
+        monkeypatch.setattr(settings, "purge_batch_size", 1)
+        monkeypatch.setattr(settings, "purge_batch_pause_seconds", 0)
+
+        report = await purge_service.run_once()
+
+        assert report.documents_purged >= 1 and report.test_cases_purged >= 1
+        # 批大小为 1：文档、测试用例各至少两批（最后一批不满才停止），外加 blob 检查
+        assert report.batches >= 5
+        expected = ["live", "old_live", "recent"]
+        assert await _remaining() == (expected, expected)
@@ -0,0 +1,104 @@
+"""文档接口 SQL 语句数回归测试模块（需要数据库）。
+
+每个用例先预热一次（填充 schema / 索引声明 / 配额等进程内缓存），
+再断言稳态下单次请求经由引擎执行的 SQL 语句数不超过上限；
+多出一次往返（如写入前先 SELECT）会直接导致用例失败。
+"""
+from typing import AsyncGenerator, Dict
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import delete
+
+from app.main import app
+from app.core.auth import generate_jwt
+from app.core.database import get_db_context
+from app.models.document import Document
+
+COLLECTION = "sql_count"
+
+
+@pytest.fixture
+async def api(app_tables) -> AsyncGenerator[AsyncClient, None]:
+    """使用应用自身数据库依赖的客户端，集合在每个用例开始前清空。"""
+    async with get_db_context() as db:
+        await db.execute(delete(Document).where(Document.collection == COLLECTION))
+
+    token = generate_jwt("sql_count_app", [], 60)
+    headers: Dict[str, str] = {"Authorization": f"Bearer {token}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test", headers=headers) as ac:
+        yield ac
+
+
+class TestQueryCounts:
+    """各文档接口单次请求的 SQL 语句数上限。"""
+
+    async def _seed(self, api: AsyncClient) -> None:
+        response = await api.post(
+            f"/api/v1/data/{COLLECTION}/_bulk",
+            json={"docs": [{"id": "a", "n": 1}, {"id": "b", "n": 2}, {"id": "c", "n": 3}]},
+        )
+        assert response.status_code == 201
+
+    async def test_upsert(self, api: AsyncClient, sql_counter):
+        """单条写入（新建与覆盖）各 1 条语句，不先 SELECT。"""
+        await self._seed(api)
+        for payload in ({"id": "new", "n": 1}, {"id": "a", "n": 9}):
+            sql_counter.reset()
+            response = await api.post(f"/api/v1/data/{COLLECTION}", json=payload)
+            assert response.status_code == 201
+            sql_counter.assert_at_most(1, f"upsert {payload['id']}")
+
+    async def test_bulk_upsert(self, api: AsyncClient, sql_counter):
+        """批量写入整批 1 条语句。"""
+        await self._seed(api)
+        sql_counter.reset()
+        await self._seed(api)
+        sql_counter.assert_at_most(1, "bulk upsert")
+
+    async def test_get(self, api: AsyncClient, sql_counter):
+        await self._seed(api)
+        sql_counter.reset()
+        response = await api.get(f"/api/v1/data/{COLLECTION}/a")
+        assert response.json()["n"] == 1
+        sql_counter.assert_at_most(1, "get")
+        assert sql_counter.rows == 1
+
+    async def test_mget(self, api: AsyncClient, sql_counter):
+        await self._seed(api)
+        sql_counter.reset()
+        response = await api.post(f"/api/v1/data/{COLLECTION}/_mget", json={"ids": ["a", "b", "zz"]})
+        assert response.json()["missing"] == ["zz"]
+        sql_counter.assert_at_most(1, "mget")
+
+    async def test_list(self, api: AsyncClient, sql_counter):
+        await self._seed(api)
+        sql_counter.reset()
+        response = await api.get(f"/api/v1/data/{COLLECTION}?limit=2")
+        assert len(response.json()) == 2
+        sql_counter.assert_at_most(1, "list")
+        assert sql_counter.rows == 2
+
+    async def test_delete(self, api: AsyncClient, sql_counter):
+        """单条删除 1 条语句，不存在的文档同样只需 1 条语句即可返回 404。"""
+        await self._seed(api)
+        sql_counter.reset()
+        assert (await api.delete(f"/api/v1/data/{COLLECTION}/a")).status_code == 200
+        sql_counter.assert_at_most(1, "delete")
+        sql_counter.reset()
+        assert (await api.delete(f"/api/v1/data/{COLLECTION}/zz")).status_code == 404
+        sql_counter.assert_at_most(1, "delete missing")
+
+    async def test_bulk_delete(self, api: AsyncClient, sql_counter):
+        await self._seed(api)
+        sql_counter.reset()
+        response = await api.post(f"/api/v1/data/{COLLECTION}/_bulk_delete", json={"ids": ["a", "b"]})
+        assert response.json()["deleted"] == 2
+        sql_counter.assert_at_most(1, "bulk delete")
+
+    async def test_stats(self, api: AsyncClient, sql_counter):
+        await self._seed(api)
+        await api.get("/api/v1/stats")
+        sql_counter.reset()
+        assert (await api.get("/api/v1/stats")).status_code == 200
+        sql_counter.assert_at_most(1, "stats")
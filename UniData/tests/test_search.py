@@ -0,0 +1,114 @@
+"""数据库关键字搜索（_search）与 search 索引的测试模块（无数据库）。"""
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import get_settings
+from app.repositories.collection_index_repository import collection_index_repository
+from app.repositories.document_repository import document_repository
+from app.services import collection_index_service as index_module
+from app.services.collection_index_service import collection_index_service
+from app.services.search_service import search_service
+
+
+def _sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+@asynccontextmanager
+async def _no_conn(shard="default"):
+    yield None
+
+
+class TestFallbackSearch:
+    """数据库关键字搜索的 SQL 与分页测试类。"""
+
+    async def test_search_query(self):
+        """search 字段直接 ILIKE（可命中三元组索引），通配符被转义，总数与分页在同一条语句中。"""
+        executed = []
+
+        async def execute(stmt):
+            executed.append(stmt)
+            return SimpleNamespace(all=lambda: [SimpleNamespace(payload={"id": "a"}, total=7)])
+
+        hits, total = await document_repository.search_documents(
+            SimpleNamespace(execute=execute), "bugs", "app1", "50%_电源", ["title", "owner.name"], 10, 0
+        )
+        assert (hits, total) == ([{"id": "a"}], 7)
+        stmt = executed[0]
+        sql = _sql(stmt)
+        assert "(payload ->> 'title') ILIKE" in sql
+        assert "(payload #>> '{owner,name}') ILIKE" in sql
+        assert "lower((payload ->> 'title')) LIKE" not in sql
+        assert "count(*) OVER ()" in sql
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        assert "%50\\%\\_电源%" in params.values()
+
+    async def test_id_prefix_pagination(self, monkeypatch):
+        """ID 前缀查找多取一条判断是否还有下一页。"""
+
+        async def list_by_id_prefix(db, collection, app_name, prefix, limit, offset):
+            return [{"id": f"{prefix}{i}"} for i in range(limit)]
+
+        monkeypatch.setattr(document_repository, "list_by_id_prefix", list_by_id_prefix)
+        result = await search_service.search(None, "bugs", "app1", "BMC-", offset=20, limit=2, prefix=True)
+        assert [h["id"] for h in result["hits"]] == ["BMC-0", "BMC-1"]
+        assert result["estimatedTotalHits"] == 23
+
+    async def test_undeclared_attribute(self, monkeypatch):
+        """attributesToSearchOn 只能是已声明为 search 的字段。"""
+
+        async def get_declared_fields(db, collection):
+            return {"title": "search", "status": "text"}
+
+        monkeypatch.setattr(collection_index_service, "get_declared_fields", get_declared_fields)
+        assert await search_service.search_fields(None, "bugs") == ["title"]
+        with pytest.raises(HTTPException) as exc:
+            await search_service.search_fields(None, "bugs", ["status"])
+        assert exc.value.status_code == 400
+
+
+class TestSearchIndex:
+    """search 字段的三元组索引 DDL 测试类。"""
+
+    @pytest.fixture
+    def ddl(self, monkeypatch):
+        """替换连接与 DDL 执行，返回记录下的 create_index_concurrently 参数。"""
+        created = []
+
+        async def create_index_concurrently(conn, index_name, table, columns_sql, where_sql, method):
+            created.append((table, columns_sql, where_sql, method))
+
+        monkeypatch.setattr(index_module, "get_autocommit_conn", _no_conn)
+        monkeypatch.setattr(get_settings(), "documents_partitioned", False)
+        monkeypatch.setattr(collection_index_repository, "create_index_concurrently", create_index_concurrently)
+        return created
+
+    async def test_gin_index_is_scoped_to_collection(self, ddl, monkeypatch):
+        """共享表上的 GIN 索引谓词限定 collection。"""
+
+        async def ensure_extension(conn, name):
+            return True
+
+        monkeypatch.setattr(collection_index_repository, "ensure_extension", ensure_extension)
+        await collection_index_service.create_index_ddl("default", "bugs", "title", "search")
+        [(table, columns_sql, where_sql, method)] = ddl
+        assert (table, method) == ("uni_documents", "gin")
+        assert columns_sql.endswith("gin_trgm_ops")
+        assert where_sql.startswith("collection = 'bugs' AND is_delete = false")
+
+    async def test_missing_trigram_is_an_error(self, ddl, monkeypatch):
+        """分片未提供 pg_trgm 时返回 501，不建索引。"""
+
+        async def ensure_extension(conn, name):
+            return False
+
+        monkeypatch.setattr(collection_index_repository, "ensure_extension", ensure_extension)
+        with pytest.raises(HTTPException) as exc:
+            await collection_index_service.create_index_ddl("default", "bugs", "title", "search")
+        assert exc.value.status_code == 501
+        assert "pg_trgm" in exc.value.detail
+        assert ddl == []
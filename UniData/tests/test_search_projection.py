@@ -0,0 +1,64 @@
+"""集合搜索投影的测试模块（替换仓储，无数据库）。"""
+import pytest
+
+from app.main import app
+from app.core.config import get_settings
+from app.repositories.blob_repository import blob_repository
+from app.services.blob_service import blob_service
+from app.services.collection_index_service import collection_index_service
+from app.services.collection_projection_service import (
+    collection_projection_service,
+    normalize_fields,
+    project_payload,
+)
+
+
+class TestSearchProjection:
+    """搜索投影测试类。"""
+
+    def test_normalize_fields(self):
+        assert normalize_fields(["title", "id", "owner.name", "title"]) == ["id", "title", "owner.name"]
+        with pytest.raises(ValueError):
+            normalize_fields(["bad field"])
+
+    def test_project_payload(self):
+        """保持嵌套层级，缺失字段不出现，大字段被去掉。"""
+        payload = {"id": "1", "title": "t", "log": "x" * 1000, "owner": {"name": "n", "email": "e"}, "tags": 3}
+        doc = project_payload(payload, ["id", "title", "owner.name", "missing", "tags.sub"])
+        assert doc == {"id": "1", "title": "t", "owner": {"name": "n"}}
+
+    def test_projection_endpoints_exist(self):
+        paths = [getattr(r, "path", "") for r in app.routes]
+        assert paths.index("/api/v1/data/{collection}/_projection") < paths.index(
+            "/api/v1/data/{collection}/{id}"
+        )
+
+    async def test_project_stored_resolves_blobs(self, monkeypatch):
+        """重算已入库文档时，外置字段按原值投影，与写入时的 search_doc 相同；只取投影涉及的 blob。"""
+        store = {}
+        requested = []
+
+        async def save_blobs(db, items):
+            for h, value, size in items:
+                store[h] = value
+
+        async def get_blobs(db, hashes):
+            requested.extend(hashes)
+            return {h: store[h] for h in hashes if h in store}
+
+        async def get_declared_fields(db, collection):
+            return {}
+
+        monkeypatch.setattr(blob_repository, "save_blobs", save_blobs)
+        monkeypatch.setattr(blob_repository, "get_blobs", get_blobs)
+        monkeypatch.setattr(collection_index_service, "get_declared_fields", get_declared_fields)
+        monkeypatch.setattr(get_settings(), "blob_offload_threshold_bytes", 100)
+
+        fields = ["id", "owner.name", "summary"]
+        payload = {"id": "1", "owner": {"name": "n" * 200}, "summary": "s" * 200, "log": "x" * 1000}
+        stored = await blob_service.offload_payload(None, "c", payload)
+        assert stored["owner"] != payload["owner"]
+
+        docs = await collection_projection_service.project_stored(None, [stored, None], fields)
+        assert docs == [project_payload(payload, fields), {}]
+        assert len(requested) == 2 and len(store) == 3
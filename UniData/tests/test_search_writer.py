@@ -0,0 +1,96 @@
+"""直写 Meilisearch 的测试模块（本地 HTTP 桩，无数据库）。"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from app.core.config import get_settings
+from app.services.search_writer import SearchWriter, search_document
+
+
+class _MeiliStub:
+    """记录收到的请求的本地 HTTP 桩，模拟 Meilisearch 的文档接口。"""
+
+    def __init__(self, status_code: int = 202):
+        received = self.received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                received.append((self.path, json.loads(self.rfile.read(length)), self.headers.get("Authorization")))
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"taskUid": 1}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def meili(monkeypatch):
+    stub = _MeiliStub()
+    settings = get_settings()
+    monkeypatch.setattr(settings, "meili_default_url", stub.url)
+    monkeypatch.setattr(settings, "meili_default_api_key", "k")
+    monkeypatch.setattr(settings, "search_direct_enabled", True)
+    yield stub
+    stub.close()
+
+
+class TestSearchWriter:
+    """直写 Meilisearch 测试类。"""
+
+    def test_search_document_matches_sync_service(self):
+        """与 meilisearch-sync-service 一致：去掉 app_name/collection/is_delete，id 为字符串。"""
+        doc = search_document({"id": 7, "app_name": "a", "collection": "c", "is_delete": False, "t": "x"})
+        assert doc == {"id": "7", "t": "x"}
+
+    async def test_batches_and_coalesces(self, meili):
+        """同一索引的变更合并为一批，同一文档只保留最后一次变更。"""
+        writer = SearchWriter()
+        writer.enqueue([
+            ("app1_bugs", "1", {"id": "1", "v": 1}),
+            ("app1_bugs", "2", {"id": "2", "v": 1}),
+            ("app1_bugs", "2", {"id": "2", "v": 2}),
+            ("app1_bugs", "1", None),
+            ("app2_bugs", "9", {"id": "9"}),
+        ])
+        await writer.stop()
+
+        assert sorted(meili.received) == [
+            ("/indexes/app1_bugs/documents/delete-batch", ["1"], "Bearer k"),
+            ("/indexes/app1_bugs/documents?primaryKey=id", [{"id": "2", "v": 2}], "Bearer k"),
+            ("/indexes/app2_bugs/documents?primaryKey=id", [{"id": "9"}], "Bearer k"),
+        ]
+        assert writer.pushed == 3
+
+    async def test_pending_limit_drops(self, meili, monkeypatch):
+        monkeypatch.setattr(get_settings(), "search_direct_max_pending", 2)
+        writer = SearchWriter()
+        writer.enqueue([("app1_bugs", str(i), {"id": str(i)}) for i in range(5)])
+        await writer.stop()
+
+        assert writer.dropped == 3
+        assert writer.pushed == 2
+
+    async def test_failure_is_counted(self, monkeypatch):
+        stub = _MeiliStub(status_code=500)
+        monkeypatch.setattr(get_settings(), "meili_default_url", stub.url)
+        monkeypatch.setattr(get_settings(), "search_direct_enabled", True)
+        writer = SearchWriter()
+        try:
+            writer.enqueue([("app1_bugs", "1", {"id": "1"})])
+            await writer.stop()
+        finally:
+            stub.close()
+        assert writer.failed == 1
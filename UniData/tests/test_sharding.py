@@ -0,0 +1,96 @@
+"""按应用分片的测试模块。"""
+from datetime import datetime
+
+from sqlalchemy import delete, select, text
+
+from app.core import database
+from app.core.config import get_settings
+from app.core.database import get_db_context
+from app.models import Blob, CollectionIndex, Document
+from app.models.app_shard import AppShard
+from app.repositories.document_repository import document_repository
+from app.services.shard_service import placement_shard, shard_service
+from app.services.stats_service import stats_service
+
+COLLECTION = "shard_test"
+
+
+def _row(id: str, app_name: str, n: int) -> Document:
+    now = datetime.utcnow()
+    return Document(
+        collection=COLLECTION, id=id, app_name=app_name, payload={"id": id, "n": n},
+        is_delete=False, created_at=now, updated_at=now,
+    )
+
+
+class TestSharding:
+    """按应用分片的路由测试类（不连接数据库）。"""
+
+    def test_placement_is_stable_when_shard_added(self):
+        """新增分片时，只有落到新分片上的应用改变归属。"""
+        apps = [f"app{i}" for i in range(200)]
+        before = {a: placement_shard(a, ["default", "s1"]) for a in apps}
+        after = {a: placement_shard(a, ["default", "s1", "s2"]) for a in apps}
+        moved = [a for a in apps if before[a] != after[a]]
+        assert moved and all(after[a] == "s2" for a in moved)
+        assert set(before.values()) == {"default", "s1"}
+
+    async def test_unsharded_route_needs_no_query(self):
+        assert await shard_service.get_route("app1") == ("default", "active")
+
+    def test_shard_session_binds_control_tables_to_default(self, monkeypatch):
+        """分片会话中文档数据表走分片引擎，控制表走 default 引擎。"""
+        monkeypatch.setattr(get_settings(), "shards", {"s1": "postgres://u:p@127.0.0.1:1/s1"})
+        monkeypatch.setattr(database, "_engines", {})
+        monkeypatch.setattr(database, "_session_locals", {})
+        session = database._get_session_local("s1")()
+        sync = session.sync_session
+        shard_engine = database.get_engine("s1").sync_engine
+        control_engine = database.get_engine().sync_engine
+
+        assert database.session_shard(session) == "s1"
+        assert sync.get_bind(Document.__mapper__) is shard_engine
+        assert sync.get_bind(Blob.__mapper__) is shard_engine
+        assert sync.get_bind(CollectionIndex.__mapper__) is control_engine
+        assert sync.get_bind(clause=text("SELECT 1")) is shard_engine
+
+
+class TestShardMigration:
+    """迁移拷贝与跨分片统计（需要数据库）。"""
+
+    async def test_copy_rows_keeps_other_apps_rows(self, app_tables):
+        """目标库中同键文档属于其他应用时不覆盖，并作为冲突返回。"""
+        async with get_db_context() as db:
+            await db.execute(delete(Document).where(Document.collection == COLLECTION))
+            db.add_all([_row("taken", "owner", 1), _row("mine", "mover", 1)])
+
+        async with get_db_context() as db:
+            conflicts = await document_repository.copy_rows(
+                db, [_row("taken", "mover", 2), _row("mine", "mover", 2), _row("new", "mover", 2)]
+            )
+        assert conflicts == [(COLLECTION, "taken")]
+
+        async with get_db_context() as db:
+            result = await db.execute(
+                select(Document.id, Document.app_name, Document.payload["n"].as_integer())
+                .where(Document.collection == COLLECTION)
+                .order_by(Document.id)
+            )
+            assert result.all() == [("mine", "mover", 2), ("new", "mover", 2), ("taken", "owner", 1)]
+
+    async def test_all_stats_does_not_pin_apps(self, app_tables, monkeypatch):
+        """管理统计只读分片登记：未登记的应用按 default 统计，且不会因此被登记。"""
+        app_name = "shard_stats_app"
+        settings = get_settings()
+        monkeypatch.setattr(settings, "shards", {"s1": settings.pg_conn_string})
+        async with get_db_context() as db:
+            await db.execute(delete(Document).where(Document.collection == COLLECTION))
+            await db.execute(delete(AppShard).where(AppShard.app_name == app_name))
+            db.add(_row("1", app_name, 1))
+
+        async with get_db_context() as db:
+            stats = await stats_service.get_all_stats(db)
+            # s1 与 default 指向同一个库：只有按 default 统计时才恰好计一次
+            mine = [s for s in stats if s["app_name"] == app_name]
+            assert len(mine) == 1 and mine[0]["total_count"] == 1
+            assert await db.get(AppShard, app_name) is None
@@ -0,0 +1,50 @@
+"""静态资源缓存与压缩的测试模块（无数据库）。"""
+import re
+
+from app.core.static_assets import accepted_encodings
+
+
+class TestStaticAssets:
+    """静态资源缓存与压缩测试类。"""
+
+    @staticmethod
+    async def _get_all(client, *requests):
+        return [await client.get(url, headers=headers) for url, headers in requests]
+
+    def test_accepted_encodings(self):
+        assert accepted_encodings("gzip;q=0, BR ,deflate;q=0.5") == ["br", "deflate"]
+        assert accepted_encodings("") == []
+
+    async def test_versioned_asset_is_immutable(self, clean_client):
+        """页面中的 /libs 引用带内容版本号；带版本号的请求可永久缓存，gzip 版本解压后与原文一致。"""
+        (page,) = await self._get_all(clean_client, ("/app/review", {"Accept-Encoding": "identity"}))
+        assert page.headers["cache-control"] == "no-cache"
+        url = re.search(r'src="(/libs/layui/layui\.js\?v=[0-9a-f]{12})"', page.text).group(1)
+
+        versioned, stale, plain = await self._get_all(
+            clean_client,
+            (url, {"Accept-Encoding": "gzip"}),
+            ("/libs/layui/layui.js?v=000000000000", {"Accept-Encoding": "gzip"}),
+            ("/libs/layui/layui.js", {"Accept-Encoding": "identity"}),
+        )
+        assert versioned.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert versioned.headers["content-encoding"] == "gzip"
+        assert versioned.headers["vary"] == "Accept-Encoding"
+        assert stale.headers["cache-control"] == "no-cache"
+        assert "content-encoding" not in plain.headers
+        # httpx 已按 Content-Encoding 解压
+        assert versioned.content == plain.content
+        assert int(versioned.headers["content-length"]) < len(plain.content)
+        assert versioned.headers["etag"] != plain.headers["etag"]
+
+    async def test_etag_revalidation(self, clean_client):
+        """If-None-Match 命中当前编码的 ETag 时返回 304。"""
+        (first,) = await self._get_all(clean_client, ("/app/register", {"Accept-Encoding": "gzip"}))
+        etag = first.headers["etag"]
+        again, other_encoding = await self._get_all(
+            clean_client,
+            ("/app/register", {"Accept-Encoding": "gzip", "If-None-Match": etag}),
+            ("/app/register", {"Accept-Encoding": "identity", "If-None-Match": etag}),
+        )
+        assert again.status_code == 304 and again.content == b""
+        assert other_encoding.status_code == 200
@@ -0,0 +1,72 @@
+"""文档计数触发器与统计接口的测试模块（需要数据库）。"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+
+from app.core.database import get_db_context
+from app.models.collection_counter import CollectionCounter
+from app.models.document import Document
+from app.repositories.document_repository import document_repository
+from app.repositories.stats_repository import stats_repository
+from app.services.stats_service import stats_service
+
+APP = "stats_app"
+COLLECTION = "stats_test"
+# 墓碑的软删除时间，按它截断清理时只会命中本模块写入的墓碑
+ANCIENT = datetime(2000, 1, 1)
+
+
+async def _live_bytes() -> int:
+    """按文档表现算未删除文档的 payload 字节数，与计数表对照。"""
+    async with get_db_context() as db:
+        return await db.scalar(
+            select(func.coalesce(func.sum(func.pg_column_size(Document.payload)), 0)).where(
+                Document.collection == COLLECTION, Document.is_delete == False
+            )
+        )
+
+
+async def _counters():
+    async with get_db_context() as db:
+        rows = await stats_repository.list_counters(db, APP)
+        version = await stats_repository.get_write_version(db, APP, COLLECTION)
+    return rows, version
+
+
+class TestCounters:
+    """写入、软删除与墓碑清理后 uni_collection_counters 的取值。"""
+
+    async def test_insert_soft_delete_purge(self, app_tables):
+        async with get_db_context() as db:
+            await db.execute(delete(Document).where(Document.collection == COLLECTION))
+            await db.execute(delete(CollectionCounter).where(CollectionCounter.app_name == APP))
+
+        async with get_db_context() as db:
+            for i in range(3):
+                db.add(Document(collection=COLLECTION, id=str(i), app_name=APP, payload={"id": str(i), "n": i}))
+        rows, version = await _counters()
+        assert rows == [(APP, COLLECTION, 3, await _live_bytes())]
+        assert version == 3
+
+        # 软删除是一次写入：文档数与字节数减少，写入数增加
+        async with get_db_context() as db:
+            await db.execute(
+                update(Document)
+                .where(Document.collection == COLLECTION, Document.id == "0")
+                .values(is_delete=True, updated_at=ANCIENT)
+            )
+        rows, version = await _counters()
+        assert rows == [(APP, COLLECTION, 2, await _live_bytes())]
+        assert version == 4
+
+        # 物理清理墓碑不再重复扣减，也不算新的写入
+        async with get_db_context() as db:
+            assert await document_repository.purge_deleted_documents(db, ANCIENT + timedelta(days=1), 100) == 1
+        assert await _counters() == (rows, version)
+
+        async with get_db_context() as db:
+            stats = await stats_service.get_app_stats(db, APP)
+        assert stats["collections"] == [
+            {"collection": COLLECTION, "live_count": 2, "payload_bytes": rows[0][3]}
+        ]
+        assert (stats["total_count"], stats["total_bytes"]) == (2, rows[0][3])
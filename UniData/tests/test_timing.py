@@ -0,0 +1,41 @@
+"""请求耗时分解（Server-Timing）的测试模块。"""
+
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.core.auth import generate_jwt
+from app.core.timing import RequestTimings, TimedRoute
+
+
+class TestServerTiming:
+    """请求耗时分解测试类。"""
+
+    def test_header_value(self):
+        timings = RequestTimings()
+        timings.add("sql", 0.002)
+        timings.add("sql", 0.001)
+        timings.add("auth", 0.0005)
+        value = timings.header_value()
+        assert value.startswith('auth;dur=0.50, sql;dur=3.00;desc="2 queries", total;dur=')
+
+    async def test_health_has_header(self, clean_client):
+        """不涉及数据库的请求也带 Server-Timing（只有 total）。"""
+        response = await clean_client.get("/health")
+        assert response.headers["server-timing"].startswith("total;dur=")
+
+    def test_routes_use_timed_route(self):
+        route = next(r for r in app.routes if getattr(r, "path", "") == "/api/v1/data/{collection}/{id}")
+        assert isinstance(route, TimedRoute)
+
+    async def test_commit_in_header(self, app_tables):
+        """请求会话在构建响应前提交，commit 出现在响应头中（需要数据库）。"""
+        token = generate_jwt("timing_app", [], 60)
+        async with AsyncClient(
+            transport=ASGITransport(app=app),
+            base_url="http://test",
+            headers={"Authorization": f"Bearer {token}"},
+        ) as api:
+            response = await api.post("/api/v1/data/timing_test", json={"id": "1"})
+        assert response.status_code == 201
+        phases = [part.split(";")[0] for part in response.headers["server-timing"].split(", ")]
+        assert phases.index("sql") < phases.index("commit") < phases.index("total")
@@ -0,0 +1,188 @@
+"""写入暂存（spool）的测试模块（临时目录，无数据库）。"""
+import asyncio
+import fcntl
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.core.timing import close_jsonl_loggers
+from app.services.shard_service import shard_service
+from app.services.write_spool import (
+    OP_DELETE,
+    OP_UPSERT,
+    WriteSpool,
+    _next_run,
+    _open_segments,
+    is_db_unavailable,
+)
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "spool_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "spool_enabled", True)
+    return tmp_path
+
+
+@pytest.fixture
+async def spool(spool_dir, monkeypatch):
+    """_apply 被替换为只记录调用的 WriteSpool。"""
+    spool = WriteSpool()
+    spool.applied = []
+
+    async def apply(op, collection, app_name, items):
+        spool.applied.append((op, collection, items))
+
+    monkeypatch.setattr(spool, "_apply", apply)
+    yield spool
+    await spool.stop()
+
+
+def _write_segment(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def _rec(ts, id, op=OP_UPSERT):
+    item = {"id": id, "ts": ts} if op == OP_UPSERT else id
+    return {"op": op, "collection": "c", "app_name": "a", "items": [item], "ts": f"2026-01-01T00:00:{ts:02d}"}
+
+
+async def _replay(spool, directory):
+    segments = await asyncio.to_thread(_open_segments, str(directory))
+    try:
+        await spool._replay(segments)
+    finally:
+        for segment in segments:
+            if segment.handle is not None:
+                segment.handle.close()
+
+
+class TestWriteSpool:
+    """写入暂存测试类。"""
+
+    def test_is_db_unavailable(self):
+        def wrapped(error):
+            try:
+                try:
+                    raise error
+                except Exception:
+                    raise HTTPException(status_code=500, detail="数据库错误")
+            except HTTPException as e:
+                return e
+
+        assert is_db_unavailable(wrapped(ConnectionRefusedError()))
+        assert is_db_unavailable(wrapped(TimeoutError()))
+        assert not is_db_unavailable(wrapped(ValueError()))
+        assert not is_db_unavailable(HTTPException(status_code=404, detail="x"))
+
+    def test_next_run_groups_consecutive_records(self):
+        def rec(op, collection, n):
+            return {"op": op, "collection": collection, "app_name": "a", "items": list(range(n))}
+
+        records = [rec("upsert", "c", 2), rec("upsert", "c", 2), rec("delete", "c", 1), rec("upsert", "c", 5)]
+        assert _next_run(records, 0, 10) == 2
+        assert _next_run(records, 0, 3) == 1
+        assert _next_run(records, 2, 10) == 3
+        # 单条记录超过批大小时也独立成一批
+        assert _next_run(records, 3, 3) == 4
+
+    async def test_append_and_replay_in_order(self, spool, spool_dir):
+        """追加的记录落盘后按顺序合批重放，重放完成后删除段文件。"""
+        await asyncio.gather(
+            spool.append(OP_UPSERT, "c", "a", [{"id": "1", "v": 1}]),
+            spool.append(OP_UPSERT, "c", "a", [{"id": "2"}, {"id": "1", "v": 2}]),
+        )
+        await spool.append(OP_DELETE, "c", "a", ["2"])
+        segments = sorted(spool_dir.glob("*.log"))
+        lines = segments[0].read_text(encoding="utf-8").splitlines()
+        spool._seal()
+        await _replay(spool, spool_dir)
+
+        assert len(segments) == 1 and len(lines) == 3
+        assert spool.applied == [
+            ("upsert", "c", [{"id": "1", "v": 1}, {"id": "2"}, {"id": "1", "v": 2}]),
+            ("delete", "c", ["2"]),
+        ]
+        assert not list(spool_dir.glob("*.log")) and spool.replayed == 3
+
+    async def test_segments_merged_by_time(self, spool, spool_dir):
+        """不同 worker 的段按记录时间交错重放，而不是整段先后重放。"""
+        _write_segment(spool_dir / "001-1.log", [_rec(1, "x"), _rec(3, "x")])
+        _write_segment(spool_dir / "002-2.log", [_rec(2, "x", OP_DELETE), _rec(4, "x", OP_DELETE)])
+        await _replay(spool, spool_dir)
+
+        assert [(op, items[0]) for op, _, items in spool.applied] == [
+            ("upsert", {"id": "x", "ts": 1}),
+            ("delete", "x"),
+            ("upsert", {"id": "x", "ts": 3}),
+            ("delete", "x"),
+        ]
+        assert not list(spool_dir.glob("*.log"))
+
+    async def test_stops_before_held_segment(self, spool, spool_dir):
+        """其他 worker 持有的段中有更早的记录时，只重放它之前的部分并记录进度。"""
+        _write_segment(spool_dir / "001-1.log", [_rec(1, "a"), _rec(3, "b"), _rec(5, "c")])
+        held = spool_dir / "002-2.log"
+        _write_segment(held, [_rec(2, "x")])
+        with open(held, "rb") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            await _replay(spool, spool_dir)
+
+        assert [items[0]["id"] for _, _, items in spool.applied] == ["a"]
+        assert (spool_dir / "001-1.log.offset").read_text() == "1"
+        assert held.exists()
+
+        # 持有方释放后，下一轮按时间继续
+        await _replay(spool, spool_dir)
+        assert [item["id"] for _, _, items in spool.applied for item in items] == ["a", "x", "b", "c"]
+        assert not list(spool_dir.glob("*.log"))
+
+    async def test_spools_while_segments_exist(self, spool, spool_dir):
+        """目录中还有任一 worker 的段时，新写入也进入 spool，不会先于暂存写入落库。"""
+        assert not await spool.should_spool(None)
+        _write_segment(spool_dir / "001-9.log", [_rec(1, "a")])
+        assert await spool.should_spool(None)
+
+    async def test_partial_tail_ignored(self, spool, spool_dir):
+        """正在写入的半行不被重放，也不计入进度。"""
+        path = spool_dir / "001-1.log"
+        _write_segment(path, [_rec(1, "a")])
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"op": "upsert"')
+        segments = await asyncio.to_thread(_open_segments, str(spool_dir))
+        try:
+            assert [len(s.records) for s in segments] == [1]
+        finally:
+            segments[0].handle.close()
+
+    async def test_append_rejects_missing_id(self, spool_dir):
+        with pytest.raises(HTTPException) as exc:
+            await WriteSpool().append(OP_UPSERT, "c", "a", [{"v": 1}])
+        assert exc.value.status_code == 400
+
+    async def test_apply_routing_errors(self, spool_dir, monkeypatch):
+        """查分片时的 503（迁移中）留到下一轮重放，其他错误记入 rejected.jsonl。"""
+        spool = WriteSpool()
+
+        async def frozen(app_name, write=False):
+            raise HTTPException(status_code=503, detail="迁移中")
+
+        monkeypatch.setattr(shard_service, "shard_for_app", frozen)
+        with pytest.raises(HTTPException):
+            await spool._apply(OP_DELETE, "c", "a", ["1"])
+        assert spool.rejected == 0
+
+        async def broken(app_name, write=False):
+            raise KeyError("unknown shard")
+
+        monkeypatch.setattr(shard_service, "shard_for_app", broken)
+        try:
+            await spool._apply(OP_DELETE, "c", "a", ["1", "2"])
+        finally:
+            close_jsonl_loggers()
+        assert spool.rejected == 2
+        rejected = (spool_dir / "rejected.jsonl").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["item"] for line in rejected] == ["1", "2"]
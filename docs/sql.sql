@@ -28,6 +28,12 @@ CREATE TABLE IF NOT EXISTS test_cases (
     -- 3. 支持对 JSON 内部字段建立索引。
     payload JSONB NOT NULL,
 
+    -- app_name: 写入方应用名称
+    app_name TEXT,
+
+    -- is_delete: 软删除标记，CDC 据此从 Meilisearch 删除文档
+    is_delete BOOLEAN NOT NULL DEFAULT false,
+
     -- created_at: 入库时间
     -- 记录数据首次插入数据库的时间，默认为当前事务时间。
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
@@ -58,6 +64,10 @@ CREATE INDEX IF NOT EXISTS idx_test_cases_status ON test_cases ((payload->>'stat
 -- 示例：针对 "name" (名称) 的索引
 CREATE INDEX IF NOT EXISTS idx_test_cases_name ON test_cases ((payload->>'name'));
 
+-- 3. 墓碑部分索引：供墓碑清理任务按 updated_at 定位已软删除的行
+-- 已有库可在线补建：CREATE INDEX CONCURRENTLY ...（非分区表）
+CREATE INDEX IF NOT EXISTS idx_test_cases_tombstone ON test_cases (updated_at) WHERE is_delete = true;
+
 -- =============================================
 -- 触发器
 -- =============================================
@@ -67,3 +77,248 @@ CREATE TRIGGER update_test_cases_updated_at
     BEFORE UPDATE ON test_cases
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
+
+-- =============================================
+-- 表名: uni_documents（按 collection 的 LIST 分区）
+-- 描述: 通用文档表。各 collection 独立分区，小集合不再被大集合的
+--       vacuum、索引膨胀和顺序扫描拖慢。
+-- 迁移: 已有的普通表可通过 UniData/scripts/partition_documents.py 在线迁移，
+--       之后设置 DOCUMENTS_PARTITIONED=true，服务会在首次写入新 collection 时自动建分区。
+-- =============================================
+CREATE TABLE IF NOT EXISTS uni_documents (
+    id VARCHAR NOT NULL,
+    collection VARCHAR NOT NULL,
+    app_name VARCHAR,
+    payload JSONB,
+    -- 搜索投影：写入应用在 uni_collection_projections 中声明的字段子集，CDC 只同步这一列；
+    -- 该应用未声明投影时为 NULL，同步服务回退到 payload
+    search_doc JSONB,
+    is_delete BOOLEAN NOT NULL DEFAULT false,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    updated_at TIMESTAMP WITHOUT TIME ZONE,
+    -- 最后一次写入该行的事务号（触发器填写），变更订阅按它翻页
+    change_xid BIGINT NOT NULL DEFAULT 0,
+    -- 分区表的主键必须包含分区键
+    PRIMARY KEY (collection, id)
+) PARTITION BY LIST (collection);
+
+CREATE INDEX IF NOT EXISTS idx_collection_app ON uni_documents (collection, app_name);
+CREATE INDEX IF NOT EXISTS ix_uni_documents_app_name ON uni_documents (app_name);
+
+-- 部分索引：读路径（get/list）只看未删除行，墓碑不进入热索引
+CREATE INDEX IF NOT EXISTS idx_uni_documents_live
+    ON uni_documents (collection, app_name, updated_at DESC) WHERE is_delete = false;
+-- GIN 索引：加速 list_documents 的 payload @> 包含过滤
+CREATE INDEX IF NOT EXISTS idx_uni_documents_payload
+    ON uni_documents USING gin (payload jsonb_path_ops);
+-- 墓碑索引：供墓碑清理任务（PurgeService）按 updated_at 定位可物理删除的行
+CREATE INDEX IF NOT EXISTS idx_uni_documents_tombstone
+    ON uni_documents (updated_at) WHERE is_delete = true;
+-- 变更订阅索引：GET /data/{collection}/_changes 按 (change_xid, id) 翻页，包含墓碑
+-- 已有库通过 UniData/scripts/install_change_notify.py 补列、补触发器并替换旧的 idx_uni_documents_changes
+CREATE INDEX IF NOT EXISTS idx_uni_documents_change_xid
+    ON uni_documents (collection, app_name, change_xid, id);
+
+-- 变更通知：每行写入后 NOTIFY uni_documents_changes，唤醒 _changes 长轮询
+CREATE OR REPLACE FUNCTION uni_documents_notify() RETURNS trigger AS $$
+DECLARE
+    body text;
+BEGIN
+    body := json_build_object(
+        'collection', NEW.collection,
+        'app_name', NEW.app_name,
+        'id', NEW.id,
+        'deleted', NEW.is_delete
+    )::text;
+    IF octet_length(body) > 7900 THEN
+        body := json_build_object('collection', NEW.collection)::text;
+    END IF;
+    PERFORM pg_notify('uni_documents_changes', body);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 只有内容或删除状态变化的 UPDATE 才通知；只改 search_doc 的重算（保留 updated_at）不通知。
+-- INSERT 触发器的 WHEN 不能引用 OLD，因此拆成两个触发器
+DROP TRIGGER IF EXISTS trg_uni_documents_notify ON uni_documents;
+DROP TRIGGER IF EXISTS trg_uni_documents_notify_ins ON uni_documents;
+DROP TRIGGER IF EXISTS trg_uni_documents_notify_upd ON uni_documents;
+CREATE TRIGGER trg_uni_documents_notify_ins AFTER INSERT ON uni_documents
+    FOR EACH ROW EXECUTE FUNCTION uni_documents_notify();
+CREATE TRIGGER trg_uni_documents_notify_upd AFTER UPDATE ON uni_documents
+    FOR EACH ROW WHEN (OLD.updated_at IS DISTINCT FROM NEW.updated_at
+                       OR OLD.is_delete IS DISTINCT FROM NEW.is_delete
+                       OR OLD.payload IS DISTINCT FROM NEW.payload)
+    EXECUTE FUNCTION uni_documents_notify();
+
+-- 变更序号：写入时记录事务号（PostgreSQL 13+）。_changes 只返回事务号小于当前快照 xmin 的行，
+-- 这些事务均已结束，游标不会跳过写入时间更早但提交更晚的事务
+CREATE OR REPLACE FUNCTION uni_documents_change_xid() RETURNS trigger AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_uni_documents_change_xid ON uni_documents;
+DROP TRIGGER IF EXISTS trg_uni_documents_change_xid_ins ON uni_documents;
+DROP TRIGGER IF EXISTS trg_uni_documents_change_xid_upd ON uni_documents;
+CREATE TRIGGER trg_uni_documents_change_xid_ins BEFORE INSERT ON uni_documents
+    FOR EACH ROW EXECUTE FUNCTION uni_documents_change_xid();
+CREATE TRIGGER trg_uni_documents_change_xid_upd BEFORE UPDATE ON uni_documents
+    FOR EACH ROW WHEN (OLD.updated_at IS DISTINCT FROM NEW.updated_at
+                       OR OLD.is_delete IS DISTINCT FROM NEW.is_delete
+                       OR OLD.payload IS DISTINCT FROM NEW.payload)
+    EXECUTE FUNCTION uni_documents_change_xid();
+
+-- 默认分区：兜底尚未建立独立分区的 collection
+CREATE TABLE IF NOT EXISTS uni_documents_default PARTITION OF uni_documents DEFAULT;
+
+-- 示例：为 bugs 集合创建独立分区（服务会自动完成，命名规则见 partition_table_name）
+-- CREATE TABLE uni_documents_p_bugs_xxxxxxxx PARTITION OF uni_documents FOR VALUES IN ('bugs');
+
+-- Debezium(pgoutput) 需按父表名输出变更，避免每个分区一个 topic
+-- ALTER PUBLICATION dbz_publication SET (publish_via_partition_root = true);
+
+-- =============================================
+-- 表名: uni_collection_indexes
+-- 描述: 各 collection 已声明索引的 payload 字段。
+--       通过 POST /api/v1/admin/collections/{collection}/indexes 声明，服务会并发创建表达式索引：
+--         非分区表: CREATE INDEX CONCURRENTLY ... ON uni_documents (collection, (payload ->> 'status')) WHERE is_delete = false;
+--         分区表:   CREATE INDEX CONCURRENTLY ... ON <该 collection 的分区> ((payload ->> 'status')) WHERE is_delete = false;
+-- =============================================
+CREATE TABLE IF NOT EXISTS uni_collection_indexes (
+    collection VARCHAR NOT NULL,
+    field VARCHAR NOT NULL,
+    field_type VARCHAR NOT NULL DEFAULT 'text',
+    index_name VARCHAR NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (collection, field)
+);
+
+-- =============================================
+-- 表名: uni_collection_schemas
+-- 描述: 各应用在 collection 上注册的 JSON Schema，该应用写入文档时据此校验 payload，
+--       不影响其他应用对同一集合的写入。
+--       通过 PUT /api/v1/data/{collection}/_schema 注册，version 每次替换加一。
+-- 迁移: 旧版本以 collection 为主键，升级时执行
+--       ALTER TABLE uni_collection_schemas DROP CONSTRAINT uni_collection_schemas_pkey,
+--           ADD PRIMARY KEY (app_name, collection);
+-- =============================================
+CREATE TABLE IF NOT EXISTS uni_collection_schemas (
+    app_name VARCHAR NOT NULL,
+    collection VARCHAR NOT NULL,
+    schema JSONB NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (app_name, collection)
+);
+
+-- =============================================
+-- 表名: uni_collection_projections
+-- 描述: 各应用在 collection 上声明的搜索投影（进入搜索索引的字段路径），该应用写入文档时
+--       据此计算 uni_documents.search_doc，不影响其他应用写入同一集合的文档。
+--       通过 PUT /api/v1/data/{collection}/_projection 声明，
+--       已有文档用 UniData/scripts/backfill_search_doc.py 重算。
+-- 迁移: 旧版本以 collection 为主键，升级时执行
+--       ALTER TABLE uni_collection_projections DROP CONSTRAINT uni_collection_projections_pkey,
+--           ADD PRIMARY KEY (app_name, collection);
+-- =============================================
+CREATE TABLE IF NOT EXISTS uni_collection_projections (
+    app_name VARCHAR NOT NULL,
+    collection VARCHAR NOT NULL,
+    fields JSONB NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (app_name, collection)
+);
+
+-- =============================================
+-- 表名: uni_collection_counters
+-- 描述: 按 (app_name, collection) 增量维护的未删除文档数与 payload 存储字节数。
+--       由 uni_documents 上的语句级触发器（uni_documents_count）按批累加，
+--       每个数据库连接写 pg_backend_pid() % 16 对应的槽，读取时按槽求和。
+--       write_count 为累计写入行数（含软删除），只增不减，_facets 等聚合缓存以它判断是否过期。
+--       已有数据可通过 UniData/scripts/rebuild_counters.py 安装触发器并重算（同时补上 write_count 列）。
+-- =============================================
+CREATE TABLE IF NOT EXISTS uni_collection_counters (
+    app_name VARCHAR NOT NULL,
+    collection VARCHAR NOT NULL,
+    slot SMALLINT NOT NULL DEFAULT 0,
+    live_count BIGINT NOT NULL DEFAULT 0,
+    payload_bytes BIGINT NOT NULL DEFAULT 0,
+    write_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (app_name, collection, slot)
+);
+
+-- =============================================
+-- 表名: uni_app_quotas
+-- 描述: 应用配额，字段为空表示不限制；写入前按 uni_collection_counters 的合计检查。
+-- =============================================
+CREATE TABLE IF NOT EXISTS uni_app_quotas (
+    app_name VARCHAR NOT NULL PRIMARY KEY,
+    max_documents BIGINT,
+    max_payload_bytes BIGINT
+);
+
+-- =============================================
+-- 表名: uni_blobs
+-- 描述: 外置的 payload 大字段，按值的 SHA-256 寻址，相同内容只存一份。
+--       开启 BLOB_OFFLOAD_THRESHOLD_BYTES 后，JSON 编码超过阈值的顶层字段写入此表，
+--       payload 中保留 {"$blob": hash, "$size": 字节数} 引用；
+--       超过 PURGE_RETENTION_DAYS 未被写入且不再被引用的行由墓碑清理任务删除。
+-- =============================================
+CREATE TABLE IF NOT EXISTS uni_blobs (
+    hash VARCHAR(64) NOT NULL PRIMARY KEY,
+    value JSONB NOT NULL,
+    size BIGINT NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    touched_at TIMESTAMP WITHOUT TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS ix_uni_blobs_touched_at ON uni_blobs (touched_at);
+
+-- =============================================
+-- 表名: uni_app_shards（仅控制库，即 default 分片）
+-- 描述: 应用所在的分片。配置 SHARDS 后，应用首次访问时按一致性哈希选定分片并登记，
+--       之后以此表为准；uni_documents / uni_collection_counters / uni_blobs 存放在应用所在分片，
+--       其余表只在控制库。迁移应用使用 scripts/migrate_app_shard.py。
+--       state: active 正常读写；migrating 正在向 target_shard 拷贝；frozen 切换中，写请求返回 503
+-- =============================================
+CREATE TABLE IF NOT EXISTS uni_app_shards (
+    app_name VARCHAR NOT NULL PRIMARY KEY,
+    shard VARCHAR NOT NULL,
+    state VARCHAR NOT NULL,
+    target_shard VARCHAR,
+    updated_at TIMESTAMP WITHOUT TIME ZONE
+);
+
+-- =============================================
+-- 表名: uni_documents_archive（与 uni_documents 在同一分片）
+-- 描述: 冷文档归档表，列与 uni_documents 相同，只存未删除的文档。
+--       开启 ARCHIVE_AFTER_DAYS 后，超过期限未更新的文档由归档任务按批移入；
+--       按 ID 读取时热表未命中会回查此表，写入或删除归档文档时先移回热表。
+--       与 uni_documents 共用计数函数 uni_documents_count()，统计与配额包含归档文档。
+-- =============================================
+CREATE TABLE IF NOT EXISTS uni_documents_archive (
+    id VARCHAR NOT NULL,
+    collection VARCHAR NOT NULL,
+    app_name VARCHAR,
+    payload JSONB,
+    search_doc JSONB,
+    is_delete BOOLEAN NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE,
+    updated_at TIMESTAMP WITHOUT TIME ZONE,
+    archived_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (collection, id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_uni_documents_archive_list ON uni_documents_archive (collection, app_name, updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_uni_documents_archive_app ON uni_documents_archive (app_name);
+
+DROP TRIGGER IF EXISTS trg_uni_documents_archive_count_ins ON uni_documents_archive;
+DROP TRIGGER IF EXISTS trg_uni_documents_archive_count_del ON uni_documents_archive;
+CREATE TRIGGER trg_uni_documents_archive_count_ins AFTER INSERT ON uni_documents_archive
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uni_documents_count();
+CREATE TRIGGER trg_uni_documents_archive_count_del AFTER DELETE ON uni_documents_archive
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION uni_documents_count();
@@ -104,6 +104,11 @@ func Run(ctx context.Context, client *kgo.Client, meiliClient meilisearch.Servic
 					log.Printf("跳过删除: app_name 或 collection 为空 topic=%s partition=%d offset=%d app_name=%s collection=%s doc=%v", record.Topic, record.Partition, record.Offset, appNameVal, collectionVal, doc)
 					continue
 				}
+				// 生产者只软删除文档；未标记删除的行被物理删除来自冷文档归档或分片迁移，文档仍然存在
+				if v, ok := doc["is_delete"]; ok && !isDeleted(doc) {
+					logger.DebugLogf("跳过未标记删除的物理删除（归档/迁移） index=%s id=%s is_delete=%v", indexName, delID, v)
+					continue
+				}
 				logger.DebugLogf("执行硬删除 index=%s id=%s doc=%v", indexName, delID, doc)
 				_, err := meiliClient.Index(indexName).DeleteDocument(delID, nil)
 				if err != nil {
@@ -204,7 +209,13 @@ func extractDocument(p model.DebeziumPayload) (map[string]interface{}, string, e
 
 	var doc map[string]interface{}
 
-	if raw, ok := base["payload"]; ok {
+	// 集合声明了搜索投影时 search_doc 为精简后的文档，优先使用；否则回退到完整 payload
+	raw, ok := base["search_doc"]
+	if !ok || raw == nil {
+		raw, ok = base["payload"]
+	}
+
+	if ok {
 		switch v := raw.(type) {
 		case string:
 			if err := json.Unmarshal([]byte(v), &doc); err != nil {